@@ -0,0 +1,132 @@
+"""
+Micro-benchmark del decoder de Frame of Data (PacketID 7).
+
+Compara el parser vectorizado (np.frombuffer sobre memoryview) contra el parser
+original basado en struct.unpack por campo.
+
+Uso (desde backend/):
+    python benchmarks/bench_decode.py --rigid-bodies 30 --skeletons 8 --bones 26
+"""
+import argparse
+import os
+import struct
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.natnet_client import decode_frame_of_data
+
+
+def build_frame_packet(frame_number: int, rb_count: int, sk_count: int, bone_count: int) -> bytes:
+    """Genera un datagrama PacketID 7 sintético con el layout que espera el decoder."""
+    rng = np.random.default_rng(frame_number)
+    body = bytearray()
+    body += struct.pack('<I', frame_number)
+    body += struct.pack('<I', 0) # Marker sets
+
+    def rows(count, first_id):
+        data = bytearray()
+        for i in range(count):
+            pos = rng.standard_normal(3)
+            rot = rng.standard_normal(4)
+            rot /= np.linalg.norm(rot)
+            data += struct.pack('<I3f4ff', first_id + i, *pos, *rot, 0.0005)
+        return data
+
+    body += struct.pack('<I', rb_count)
+    body += rows(rb_count, 1)
+    body += struct.pack('<I', sk_count)
+    for s in range(sk_count):
+        body += struct.pack('<II', s + 1, bone_count)
+        body += rows(bone_count, 1)
+
+    return struct.pack('<HH', 7, len(body) & 0xFFFF) + bytes(body)
+
+
+# --- Parser original (referencia) ---
+
+def _legacy_unpack_rigid_body(data, offset):
+    rb_id = struct.unpack('<I', data[offset:offset+4])[0]
+    offset += 4
+    pos = struct.unpack('<fff', data[offset:offset+12])
+    offset += 12
+    rot = struct.unpack('<ffff', data[offset:offset+16])
+    offset += 16
+    return {"id": rb_id, "pos": pos, "rot": rot}, offset
+
+
+def legacy_unpack_frame_of_data(data):
+    offset = 4
+    frame_number = struct.unpack('<I', data[offset:offset+4])[0]
+    offset += 4
+    marker_set_count = struct.unpack('<I', data[offset:offset+4])[0]
+    offset += 4
+    for _ in range(marker_set_count):
+        while data[offset] != 0: offset += 1
+        offset += 1
+        marker_count = struct.unpack('<I', data[offset:offset+4])[0]
+        offset += 4 + (marker_count * 12)
+
+    rb_count = struct.unpack('<I', data[offset:offset+4])[0]
+    offset += 4
+    rigid_bodies = []
+    for _ in range(rb_count):
+        rb_data, offset = _legacy_unpack_rigid_body(data, offset)
+        rigid_bodies.append(rb_data)
+        offset += 4
+
+    sk_count = struct.unpack('<I', data[offset:offset+4])[0]
+    offset += 4
+    skeletons = []
+    for _ in range(sk_count):
+        sk_id = struct.unpack('<I', data[offset:offset+4])[0]
+        offset += 4
+        sk_rb_count = struct.unpack('<I', data[offset:offset+4])[0]
+        offset += 4
+        sk_rbs = []
+        for _ in range(sk_rb_count):
+            rb_data, offset = _legacy_unpack_rigid_body(data, offset)
+            sk_rbs.append(rb_data)
+            offset += 4
+        skeletons.append({"id": sk_id, "rigid_bodies": sk_rbs})
+
+    return {"frame_number": frame_number, "rigid_bodies": rigid_bodies, "skeletons": skeletons}
+
+
+def _check_equivalence(packet: bytes):
+    legacy = legacy_unpack_frame_of_data(packet)
+    frame = decode_frame_of_data(packet)
+    legacy_pos = [rb["pos"] for rb in legacy["rigid_bodies"]]
+    legacy_pos += [b["pos"] for sk in legacy["skeletons"] for b in sk["rigid_bodies"]]
+    assert frame.frame_number == legacy["frame_number"]
+    assert np.array_equal(frame.positions, np.array(legacy_pos, dtype=np.float32).reshape(-1, 3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rigid-bodies", type=int, default=30)
+    parser.add_argument("--skeletons", type=int, default=8)
+    parser.add_argument("--bones", type=int, default=26)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    packet = build_frame_packet(1, args.rigid_bodies, args.skeletons, args.bones)
+    _check_equivalence(packet)
+
+    rows = args.rigid_bodies + args.skeletons * args.bones
+    print(f"Paquete: {len(packet)} bytes, {rows} filas ({args.rigid_bodies} RB + {args.skeletons}x{args.bones} huesos)")
+
+    results = {}
+    for name, fn in (("legacy struct", legacy_unpack_frame_of_data), ("numpy frombuffer", decode_frame_of_data)):
+        best = min(timeit.repeat(lambda: fn(packet), number=args.iterations, repeat=5))
+        results[name] = best / args.iterations * 1e6
+        print(f"{name:>18}: {results[name]:8.2f} us/frame")
+
+    print(f"{'speedup':>18}: {results['legacy struct'] / results['numpy frombuffer']:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Suite de benchmarks end-to-end del Hub con datos sintéticos (benchmarks/natnet_synth.py).
+
+Etapas medidas (throughput y percentiles de latencia p50/p99/max):
+    decode     -> decode_frame_of_data sobre datagramas sintéticos
+    transform  -> MocapTransformer.process_frame
+    serialize  -> cada encoder de wire_format (json, binary float32/float16/int16)
+    fanout     -> StreamServer.broadcast hacia N clientes TCP reales en loopback,
+                  con latencia broadcast -> mensaje completo recibido por cliente
+    e2e        -> (--e2e) pipeline headless completo: UDP en loopback -> NatNetClient ->
+                  transform -> StreamServer -> N clientes, con las métricas por etapa del Hub
+
+Uso (desde backend/):
+    python benchmarks/bench_pipeline.py --rigid-bodies 30 --skeletons 8 --bones 26 --clients 4
+    python benchmarks/bench_pipeline.py --e2e --rate 240 --duration 5
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from natnet_synth import NatNetSynthesizer, PacketSender
+from core.metrics import LatencyHistogram, get_metrics
+from core.natnet_client import decode_frame_of_data
+from exporters.stream_server import StreamServer
+from exporters.wire_format import WIRE_MAGIC, create_encoder
+from logic.processor import MocapTransformer
+
+_ENCODER_KEYS = (("json", None), ("binary", "float32"), ("binary", "float16"), ("binary", "int16"))
+_FRAME_NUMBER_OFFSET = 8 # Dentro del payload binario: magic(4) version(1) precision(1) subjects(2)
+
+
+def _report(name: str, histogram: LatencyHistogram, extra="", throughput=True):
+    s = histogram.snapshot()
+    rate = f"{1e6 / s['mean_us']:10.0f} /s" if throughput and s["mean_us"] else " " * 13
+    print(f"{name:>24}: {rate} | p50 {s['p50_us']:8.1f} us | p99 {s['p99_us']:8.1f} us | "
+          f"max {s['max_us']:8.1f} us {extra}")
+
+
+def _time_each(fn, items, iterations):
+    histogram = LatencyHistogram()
+    results = None
+    count = len(items)
+    for i in range(iterations):
+        item = items[i % count]
+        started = time.perf_counter()
+        results = fn(item)
+        histogram.record(time.perf_counter() - started)
+    return histogram, results
+
+
+def bench_stages(synthesizer: NatNetSynthesizer, iterations: int):
+    packets = list(synthesizer.packets(256))
+    histogram, _ = _time_each(decode_frame_of_data, packets, iterations)
+    _report("decode", histogram, f"({synthesizer.packet_size} bytes)")
+
+    frames = [decode_frame_of_data(p) for p in packets]
+    transformer = MocapTransformer()
+    histogram, _ = _time_each(transformer.process_frame, frames, iterations)
+    _report("transform", histogram, f"({frames[0].row_count} filas)")
+
+    processed = transformer.process_frame(frames[0])
+    for key in _ENCODER_KEYS:
+        encoder = create_encoder(key)
+        size = len(encoder.encode(processed))
+        histogram, _ = _time_each(encoder.encode, [processed], iterations)
+        _report(f"serialize {key[0]}/{key[1] or '-'}", histogram, f"({size} bytes)")
+    return frames
+
+
+class _BenchClient(threading.Thread):
+    """Cliente TCP que negocia binario y registra cuándo recibe cada frame completo."""
+    def __init__(self, port: int, precision: str):
+        super().__init__(daemon=True)
+        self.sock = socket.create_connection(("127.0.0.1", port))
+        self.sock.sendall((json.dumps({"format": "binary", "precision": precision}) + "\n").encode('utf-8'))
+        self._file = self.sock.makefile("rb")
+        self.ack = json.loads(self._file.readline())
+        self.received = {}
+        self.bytes_received = 0
+
+    def run(self):
+        read = self._file.read
+        try:
+            while True:
+                header = read(4)
+                if len(header) < 4:
+                    break
+                body = read(int.from_bytes(header, "little"))
+                now = time.perf_counter()
+                if body[:4] != WIRE_MAGIC:
+                    continue # Mensaje de modelo (YMDL)
+                frame_number = int.from_bytes(body[_FRAME_NUMBER_OFFSET:_FRAME_NUMBER_OFFSET + 4], "little")
+                self.received[frame_number] = now
+                self.bytes_received += len(body) + 4
+        except OSError:
+            pass
+
+
+def _wait_for_clients(server, count, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while len(server.clients) < count and time.perf_counter() < deadline:
+        time.sleep(0.01)
+
+
+def bench_fanout(frames, clients: int, rate: float, count: int, precision: str, lag_policy: str):
+    transformer = MocapTransformer()
+    server = StreamServer("127.0.0.1", 0, lag_policy=lag_policy)
+    server.start()
+    port = server._server_socket.getsockname()[1]
+
+    readers = [_BenchClient(port, precision) for _ in range(clients)]
+    _wait_for_clients(server, clients)
+    for reader in readers:
+        reader.start()
+
+    broadcast_hist = LatencyHistogram()
+    sent_at = {}
+    interval = 1.0 / rate if rate > 0 else 0.0
+    started = time.perf_counter()
+    for i in range(count):
+        if interval:
+            deadline = started + i * interval
+            while time.perf_counter() < deadline:
+                time.sleep(0)
+        frame = frames[i % len(frames)]
+        frame.frame_number = i
+        processed = transformer.process_frame(frame)
+        t0 = time.perf_counter()
+        server.broadcast(processed)
+        broadcast_hist.record(time.perf_counter() - t0)
+        sent_at[i] = t0
+    elapsed = time.perf_counter() - started
+
+    time.sleep(0.5)
+    server.stop()
+    for reader in readers:
+        reader.join(2.0)
+
+    _report(f"broadcast x{clients}", broadcast_hist)
+    delivery = LatencyHistogram()
+    delivered = 0
+    total_bytes = 0
+    for reader in readers:
+        delivered += len(reader.received)
+        total_bytes += reader.bytes_received
+        for frame_number, received_at in reader.received.items():
+            delivery.record(received_at - sent_at[frame_number])
+    _report("delivery (por cliente)", delivery, throughput=False)
+    print(f"{'fan-out':>24}: {delivered}/{count * clients} frames entregados, "
+          f"{count / elapsed:.0f} frames/s emitidos, {total_bytes / elapsed / 1e6:.1f} MB/s totales")
+
+
+def bench_e2e(synthesizer: NatNetSynthesizer, clients: int, rate: float, duration: float, data_port: int,
+              threading_mode: str, precision: str, handoff: str = "latest"):
+    # Import diferido: solo este modo levanta el pipeline completo
+    from pipeline import HeadlessPipeline, build_arg_parser
+
+    config = build_arg_parser().parse_args([
+        "--data-port", str(data_port), "--port", "0", "--threading", threading_mode, "--handoff", handoff,
+        "--stats-interval", "0", "--metrics-port", "0",
+    ])
+    pipeline = HeadlessPipeline(config)
+    if not pipeline.start():
+        print("No se pudo iniciar el pipeline (¿puerto UDP ocupado?)")
+        return
+    port = pipeline.server._server_socket.getsockname()[1]
+    readers = [_BenchClient(port, precision) for _ in range(clients)]
+    _wait_for_clients(pipeline.server, clients)
+    for reader in readers:
+        reader.start()
+
+    metrics = get_metrics()
+    metrics.reset()
+    sender = PacketSender("127.0.0.1", data_port)
+    elapsed = sender.run(synthesizer, rate, duration)
+    time.sleep(0.5)
+    sender.close()
+    pipeline.stop()
+
+    print(f"{'e2e':>24}: {sender.sent} frames enviados en {elapsed:.2f} s ({sender.late} con retraso), "
+          f"{pipeline.frames_out} emitidos, modo {threading_mode}, hand-off {handoff}")
+    for stage, histogram in metrics.snapshot()["stages"].items():
+        if histogram["count"]:
+            print(f"{stage:>24}: n={histogram['count']:6d} | p50 {histogram['p50_us']:8.1f} us | "
+                  f"p99 {histogram['p99_us']:8.1f} us | max {histogram['max_us']:8.1f} us")
+    for reader in readers:
+        print(f"{'cliente':>24}: {len(reader.received)} frames, {reader.bytes_received / 1e6:.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rigid-bodies", type=int, default=30)
+    parser.add_argument("--skeletons", type=int, default=8)
+    parser.add_argument("--bones", type=int, default=26)
+    parser.add_argument("--marker-sets", type=int, default=0)
+    parser.add_argument("--nan-rate", type=float, default=0.0)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--precision", default="float32", choices=("float32", "float16", "int16"))
+    parser.add_argument("--lag-policy", default="latest")
+    parser.add_argument("--frames", type=int, default=2000, help="Frames del benchmark de fan-out")
+    parser.add_argument("--rate", type=float, default=0.0, help="Hz del fan-out/e2e (0 = lo más rápido posible en fan-out)")
+    parser.add_argument("--e2e", action="store_true", help="Ejecuta también el pipeline completo por UDP")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--data-port", type=int, default=15110)
+    parser.add_argument("--threading", default="thread", choices=("inline", "thread", "process", "shm"))
+    parser.add_argument("--handoff", default="latest", choices=("latest", "drop_oldest", "fifo"))
+    args = parser.parse_args()
+
+    synthesizer = NatNetSynthesizer(args.rigid_bodies, args.skeletons, args.bones, args.marker_sets,
+                                    nan_rate=args.nan_rate)
+    print(f"Frame sintético: {synthesizer.row_count} filas ({args.rigid_bodies} RB + "
+          f"{args.skeletons}x{args.bones} huesos), {args.marker_sets} marker sets, NaN {args.nan_rate:g}")
+
+    frames = bench_stages(synthesizer, args.iterations)
+    bench_fanout(frames, args.clients, args.rate, args.frames, args.precision, args.lag_policy)
+    if args.e2e:
+        bench_e2e(synthesizer, args.clients, args.rate or 240.0, args.duration, args.data_port,
+                  args.threading, args.precision, args.handoff)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Micro-benchmark del SkeletonSolver (huesos globales -> locales relativos al padre).
+
+Compara el cálculo hueso a hueso en Python (lo que hacía cada cliente dentro de Maya)
+contra el solver vectorizado sobre el array apilado de todos los Skeletons, y mide
+process_frame con --bone-space native / local.
+
+Uso (desde backend/):
+    python benchmarks/bench_skeleton.py --skeletons 8 --bones 26
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_decode import build_frame_packet
+from core.data_descriptions import DataDescriptions, RigidBodyDescription, SkeletonDescription
+from core.natnet_client import decode_frame_of_data
+from logic.processor import MocapTransformer
+from logic.skeleton_solver import SkeletonSolver
+
+
+def build_descriptions(sk_count: int, bone_count: int) -> DataDescriptions:
+    """Skeletons con huesos 1..bone_count en árbol (padre de b: b // 2, raíz 1), como los del frame sintético."""
+    descriptions = DataDescriptions()
+    for s in range(1, sk_count + 1):
+        bones = [RigidBodyDescription(f"Bone_{b}", b, b // 2 if b > 1 else 0, (0.0, 0.0, 0.0))
+                 for b in range(1, bone_count + 1)]
+        descriptions.skeletons[s] = SkeletonDescription(f"Actor_{s}", s, bones)
+    return descriptions
+
+
+def per_bone_to_local(model, positions, rotations):
+    """Referencia: un bucle de Python por hueso con cuaterniones escalares."""
+    out_pos = positions.copy()
+    out_rot = rotations.copy()
+    for i, parents in enumerate(model.bone_parents):
+        if parents is None:
+            continue
+        start = int(model.offsets[i])
+        for bone, parent in enumerate(parents.tolist()):
+            if parent < 0:
+                continue
+            px, py, pz, pw = rotations[start + parent].tolist()
+            x, y, z, w = rotations[start + bone].tolist()
+            # conj(q_padre) * q
+            ix, iy, iz, iw = -px, -py, -pz, pw
+            out_rot[start + bone] = (iw * x + ix * w + iy * z - iz * y, iw * y - ix * z + iy * w + iz * x,
+                                     iw * z + ix * y - iy * x + iz * w, iw * w - ix * x - iy * y - iz * z)
+            # conj(q_padre) rota (p - p_padre)
+            vx, vy, vz = (positions[start + bone] - positions[start + parent]).tolist()
+            tx, ty, tz = 2 * (iy * vz - iz * vy), 2 * (iz * vx - ix * vz), 2 * (ix * vy - iy * vx)
+            out_pos[start + bone] = (vx + iw * tx + iy * tz - iz * ty, vy + iw * ty + iz * tx - ix * tz,
+                                     vz + iw * tz + ix * ty - iy * tx)
+    return out_pos, out_rot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rigid-bodies", type=int, default=30)
+    parser.add_argument("--skeletons", type=int, default=8)
+    parser.add_argument("--bones", type=int, default=26)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    frame = decode_frame_of_data(build_frame_packet(1, args.rigid_bodies, args.skeletons, args.bones))
+    descriptions = build_descriptions(args.skeletons, args.bones)
+    native = MocapTransformer()
+    local = MocapTransformer(bone_space="local")
+    native.descriptions = local.descriptions = descriptions
+    model = local.subject_model(frame)
+
+    solver = SkeletonSolver()
+    out_pos, out_rot = np.empty_like(frame.positions), np.empty_like(frame.rotations)
+    solver.to_local(model, frame.positions, frame.rotations, out_pos, out_rot)
+    ref_pos, ref_rot = per_bone_to_local(model, frame.positions, frame.rotations)
+    assert np.allclose(out_pos, ref_pos, atol=1e-5) and np.allclose(out_rot, ref_rot, atol=1e-6)
+    # Ida y vuelta
+    back_pos, back_rot = solver.to_world(model, out_pos, out_rot, np.empty_like(out_pos), np.empty_like(out_rot))
+    assert np.allclose(back_pos, frame.positions, atol=1e-4) and np.allclose(back_rot, frame.rotations, atol=1e-5)
+
+    print(f"Frame: {frame.row_count} filas ({args.rigid_bodies} RB + {args.skeletons}x{args.bones} huesos, "
+          f"{len(solver.hierarchy(model).levels)} niveles)")
+    results = {}
+    for name, fn in (
+        ("per-bone python", lambda: per_bone_to_local(model, frame.positions, frame.rotations)),
+        ("solver to_local", lambda: solver.to_local(model, frame.positions, frame.rotations, out_pos, out_rot)),
+        ("solver to_world", lambda: solver.to_world(model, ref_pos, ref_rot, out_pos, out_rot)),
+        ("process native", lambda: native.process_frame(frame)),
+        ("process local", lambda: local.process_frame(frame)),
+    ):
+        best = min(timeit.repeat(fn, number=args.iterations, repeat=5))
+        results[name] = best / args.iterations * 1e6
+        print(f"{name:>20}: {results[name]:8.2f} us/frame")
+
+    print(f"{'speedup (to_local)':>20}: {results['per-bone python'] / results['solver to_local']:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Micro-benchmark del kernel de transformación de MocapTransformer.
+
+Compara el camino original (una llamada a to_unreal_space para los Rigid Bodies y
+otra por cada Skeleton, con np.zeros_like + asignación columna a columna) contra el
+kernel apilado (una matriz 3x3 + índice/signo de cuaternión por espacio, escribiendo
+en buffers preasignados).
+
+Uso (desde backend/):
+    python benchmarks/bench_transform.py --rigid-bodies 30 --skeletons 8 --bones 26
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_decode import build_frame_packet
+from core.natnet_client import decode_frame_of_data
+from logic.processor import MocapTransformer
+from logic.spaces import get_kernel
+
+_LEGACY_UE_POS = np.array([[1, 0, 0], [0, 0, 1], [0, 1, 0]]) * 100.0
+
+
+# --- Camino original (referencia) ---
+
+def _legacy_to_unreal_space(positions, rotations):
+    pos_ue = positions @ _LEGACY_UE_POS
+    rot_ue = np.zeros_like(rotations)
+    rot_ue[:, 0] = rotations[:, 0]
+    rot_ue[:, 1] = rotations[:, 2]
+    rot_ue[:, 2] = rotations[:, 1]
+    rot_ue[:, 3] = -rotations[:, 3]
+    return pos_ue, rot_ue
+
+
+def legacy_transform(frame):
+    rb = frame.rigid_body_count
+    out = [_legacy_to_unreal_space(frame.positions[:rb], frame.rotations[:rb])]
+    out.append((frame.positions[:rb] * 100.0, frame.rotations[:rb]))
+    for i in range(frame.skeleton_count):
+        rows = frame.skeleton_rows(i)
+        out.append(_legacy_to_unreal_space(frame.positions[rows], frame.rotations[rows]))
+    return out
+
+
+def _check_equivalence(frame, transformer):
+    processed = transformer.process_frame(frame)
+    pos_ue, rot_ue = _legacy_to_unreal_space(frame.positions, frame.rotations)
+    assert np.allclose(processed.spaces["unreal"][0], pos_ue, atol=1e-3)
+    assert np.allclose(processed.spaces["unreal"][1], rot_ue)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rigid-bodies", type=int, default=30)
+    parser.add_argument("--skeletons", type=int, default=8)
+    parser.add_argument("--bones", type=int, default=26)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    frame = decode_frame_of_data(build_frame_packet(1, args.rigid_bodies, args.skeletons, args.bones))
+    transformer = MocapTransformer()
+    _check_equivalence(frame, transformer)
+
+    print(f"Frame: {frame.row_count} filas ({args.rigid_bodies} RB + {args.skeletons}x{args.bones} huesos)")
+
+    kernels = [get_kernel("unreal"), get_kernel("maya")]
+    kernel_only = lambda: [k.apply(frame.positions, frame.rotations) for k in kernels]
+    results = {}
+    for name, fn in (
+        ("legacy per-subject", lambda: legacy_transform(frame)),
+        ("stacked kernel", kernel_only),
+        ("process_frame", lambda: transformer.process_frame(frame)),
+    ):
+        best = min(timeit.repeat(fn, number=args.iterations, repeat=5))
+        results[name] = best / args.iterations * 1e6
+        print(f"{name:>20}: {results[name]:8.2f} us/frame")
+
+    print(f"{'speedup (kernel)':>20}: {results['legacy per-subject'] / results['stacked kernel']:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Sintetizador local de paquetes NatNet 3.x (PacketID 7, Frame of Data).
+
+Genera frames con marker sets, Rigid Bodies y Skeletons configurables, movimiento
+suave, inyección de NaN (oclusiones) y los emite por UDP (multicast o unicast en
+loopback) a ritmo fijo (hasta 1 kHz), o los entrega directamente al decoder.
+También responde a NAT_REQUEST_MODELDEF en el puerto de comandos (--command-port)
+con data descriptions coherentes con los frames.
+Permite probar NatNetClient y el pipeline completo sin un Motive real.
+
+Uso (desde backend/):
+    python benchmarks/natnet_synth.py --rate 240 --duration 10 --rigid-bodies 10 --skeletons 4
+    python benchmarks/natnet_synth.py --target 127.0.0.1 --rate 1000 --nan-rate 0.01
+"""
+import argparse
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.frame import RIGID_BODY_DTYPE
+
+_HEADER = struct.Struct('<HHI')      # MessageID, PacketSize, FrameNumber
+_COUNT = struct.Struct('<I')
+_SKELETON_HEADER = struct.Struct('<II')
+# Cola del frame (NatNet 3.x): labeled markers, force plates, devices, timecode,
+# timecode sub, timestamp, 3 stamps de alta resolución, params, end of data
+_TAIL = struct.Struct('<IIIIIdQQQhi')
+_NAT_REQUEST_MODELDEF = 4
+_NAT_MODELDEF = 5
+
+
+class NatNetSynthesizer:
+    """
+    Construye datagramas Frame of Data con el layout que decodifica NatNetClient.
+
+    El paquete se arma una vez como plantilla; por frame solo se reescriben el
+    número de frame, la cola y las filas de Rigid Bodies / huesos a través de
+    vistas numpy sobre la plantilla, así que generar a 1 kHz es barato.
+    """
+    def __init__(self, rigid_bodies=10, skeletons=2, bones=26, marker_sets=0, markers_per_set=8,
+                 nan_rate=0.0, seed=0):
+        self.rigid_bodies = rigid_bodies
+        self.skeletons = skeletons
+        self.bones = bones
+        self.marker_sets = marker_sets
+        self.markers_per_set = markers_per_set
+        self.nan_rate = nan_rate
+        self.params = 0 # Flags de la cola (0x02 = modelos cambiados)
+        self.row_count = rigid_bodies + skeletons * bones
+        self._rng = np.random.default_rng(seed)
+
+        # Movimiento por fila: posición base + oscilación, giro alrededor de un eje propio
+        rows = self.row_count
+        self._base = self._rng.uniform(-2.0, 2.0, (rows, 3)).astype(np.float32)
+        self._amplitude = self._rng.uniform(0.01, 0.2, (rows, 3)).astype(np.float32)
+        self._phase = self._rng.uniform(0.0, 2 * np.pi, (rows, 1)).astype(np.float32)
+        axes = self._rng.standard_normal((rows, 3)).astype(np.float32)
+        self._axes = axes / np.linalg.norm(axes, axis=1, keepdims=True)
+
+        # Plantilla del paquete
+        packet = bytearray(_HEADER.size)
+        packet += _COUNT.pack(marker_sets)
+        for m in range(marker_sets):
+            packet += f"MarkerSet_{m + 1}".encode('utf-8') + b"\0"
+            packet += _COUNT.pack(markers_per_set)
+            packet += self._rng.uniform(-2.0, 2.0, markers_per_set * 3).astype('<f4').tobytes()
+
+        blocks = []
+        packet += _COUNT.pack(rigid_bodies)
+        blocks.append((len(packet), rigid_bodies, 1))
+        packet += bytes(rigid_bodies * RIGID_BODY_DTYPE.itemsize)
+        packet += _COUNT.pack(skeletons)
+        for s in range(skeletons):
+            packet += _SKELETON_HEADER.pack(s + 1, bones)
+            blocks.append((len(packet), bones, 1))
+            packet += bytes(bones * RIGID_BODY_DTYPE.itemsize)
+        self._tail_offset = len(packet)
+        packet += bytes(_TAIL.size)
+        struct.pack_into('<HH', packet, 0, 7, (len(packet) - 4) & 0xFFFF)
+        self._packet = packet
+
+        self._blocks = []
+        row = 0
+        for offset, count, first_id in blocks:
+            view = np.ndarray(count, dtype=RIGID_BODY_DTYPE, buffer=packet, offset=offset)
+            view["id"] = np.arange(first_id, first_id + count)
+            view["err"] = 0.0005
+            self._blocks.append((view, row, row + count))
+            row += count
+
+    @property
+    def packet_size(self) -> int:
+        return len(self._packet)
+
+    def build_packet(self, frame_number: int, timestamp: float = None) -> bytes:
+        """Datagrama del frame `frame_number` (timestamp en segundos; por defecto frame / 120)."""
+        if timestamp is None:
+            timestamp = frame_number / 120.0
+        t = np.float32(timestamp)
+
+        positions = self._base + self._amplitude * np.sin(t * 2.0 + self._phase)
+        half_angle = (t + self._phase) * 0.5
+        rotations = np.empty((self.row_count, 4), dtype=np.float32)
+        rotations[:, :3] = self._axes * np.sin(half_angle)
+        rotations[:, 3:] = np.cos(half_angle)
+
+        if self.nan_rate > 0.0:
+            occluded = self._rng.random(self.row_count) < self.nan_rate
+            positions[occluded] = np.nan
+            rotations[occluded] = np.nan
+
+        for view, start, end in self._blocks:
+            view["pos"] = positions[start:end]
+            view["rot"] = rotations[start:end]
+
+        packet = self._packet
+        _COUNT.pack_into(packet, 4, frame_number)
+        stamp = int(timestamp * 1e7)
+        _TAIL.pack_into(packet, self._tail_offset, 0, 0, 0, frame_number, 0, timestamp, stamp, stamp, stamp,
+                        self.params, 0)
+        return bytes(packet)
+
+    def model_definitions(self) -> bytes:
+        """
+        Paquete NAT_MODELDEF (NatNet 3.x) coherente con los frames: Rigid Bodies "Prop_<id>",
+        Skeletons "Actor_<id>" con huesos "Bone_<n>" encadenados (cada hueso cuelga del anterior).
+        """
+        def cstring(text):
+            return text.encode('utf-8') + b"\0"
+
+        def rigid_body(name, rb_id, parent_id):
+            return cstring(name) + struct.pack('<ii3fi', rb_id, parent_id, 0.0, 0.0, 0.0, 0)
+
+        parts = []
+        for m in range(self.marker_sets):
+            parts.append(struct.pack('<i', 0) + cstring(f"MarkerSet_{m + 1}") + struct.pack('<i', self.markers_per_set)
+                         + b"".join(cstring(f"Marker_{i + 1}") for i in range(self.markers_per_set)))
+        for rb_id in range(1, self.rigid_bodies + 1):
+            parts.append(struct.pack('<i', 1) + rigid_body(f"Prop_{rb_id}", rb_id, -1))
+        for s in range(self.skeletons):
+            bones = b"".join(rigid_body(f"Bone_{b}", b, b - 1) for b in range(1, self.bones + 1))
+            parts.append(struct.pack('<i', 2) + cstring(f"Actor_{s + 1}") + struct.pack('<ii', s + 1, self.bones) + bones)
+        body = struct.pack('<i', len(parts)) + b"".join(parts)
+        return struct.pack('<HH', _NAT_MODELDEF, len(body) & 0xFFFF) + body
+
+    def packets(self, count: int, first_frame=0, rate=120.0):
+        """Genera `count` datagramas consecutivos."""
+        for i in range(count):
+            frame_number = first_frame + i
+            yield self.build_packet(frame_number, frame_number / rate)
+
+
+class PacketSender:
+    """Emite datagramas por UDP a ritmo fijo (multicast en loopback o unicast)."""
+    def __init__(self, target="239.255.42.99", port=1511, ttl=1):
+        self.target = target
+        self.port = port
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        if socket.inet_aton(target)[0] & 0xF0 == 0xE0:
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        self.sent = 0
+        self.late = 0
+
+    def run(self, synthesizer: NatNetSynthesizer, rate: float, duration: float, stop=None):
+        """
+        Envía frames a `rate` Hz durante `duration` s con un calendario absoluto
+        (sleep grueso + espera activa final), así el ritmo no deriva con la carga.
+        """
+        interval = 1.0 / rate
+        total = int(rate * duration)
+        start = time.perf_counter()
+        for i in range(total):
+            if stop is not None and stop.is_set():
+                break
+            deadline = start + i * interval
+            remaining = deadline - time.perf_counter()
+            if remaining > 0.002:
+                time.sleep(remaining - 0.001)
+            while time.perf_counter() < deadline:
+                pass
+            if time.perf_counter() - deadline > interval:
+                self.late += 1
+            self.sock.sendto(synthesizer.build_packet(i, i * interval), (self.target, self.port))
+            self.sent += 1
+        return time.perf_counter() - start
+
+    def close(self):
+        self.sock.close()
+
+
+class CommandResponder:
+    """Responde a NAT_REQUEST_MODELDEF en el puerto de comandos como lo haría Motive."""
+    def __init__(self, synthesizer: NatNetSynthesizer, port=1510, host="127.0.0.1"):
+        self.synthesizer = synthesizer
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.2)
+        self.port = self.sock.getsockname()[1]
+        self.requests = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="SynthCommand", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                data, addr = self.sock.recvfrom(1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if len(data) >= 2 and struct.unpack_from('<H', data)[0] == _NAT_REQUEST_MODELDEF:
+                self.requests += 1
+                self.sock.sendto(self.synthesizer.model_definitions(), addr)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(1.0)
+        self.sock.close()
+
+
+def feed_decoder(client, synthesizer: NatNetSynthesizer, count: int, rate=120.0):
+    """Entrega frames directamente a NatNetClient (sin sockets), como si llegaran por la red."""
+    for packet in synthesizer.packets(count, rate=rate):
+        client._handle_packet(packet, time.perf_counter())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="239.255.42.99", help="IP multicast o unicast destino")
+    parser.add_argument("--port", type=int, default=1511)
+    parser.add_argument("--rate", type=float, default=120.0, help="Frames por segundo (hasta ~1000)")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--rigid-bodies", type=int, default=10)
+    parser.add_argument("--skeletons", type=int, default=2)
+    parser.add_argument("--bones", type=int, default=26)
+    parser.add_argument("--marker-sets", type=int, default=0)
+    parser.add_argument("--markers-per-set", type=int, default=8)
+    parser.add_argument("--nan-rate", type=float, default=0.0, help="Probabilidad de oclusión por fila y frame")
+    parser.add_argument("--command-port", type=int, default=0,
+                        help="Puerto donde responder a NAT_REQUEST_MODELDEF (0 = desactivado)")
+    args = parser.parse_args()
+
+    synthesizer = NatNetSynthesizer(args.rigid_bodies, args.skeletons, args.bones, args.marker_sets,
+                                    args.markers_per_set, args.nan_rate)
+    responder = None
+    if args.command_port:
+        responder = CommandResponder(synthesizer, args.command_port)
+        responder.start()
+    sender = PacketSender(args.target, args.port)
+    print(f"Enviando {synthesizer.packet_size} bytes/frame a {args.target}:{args.port} a {args.rate:g} Hz...")
+    try:
+        elapsed = sender.run(synthesizer, args.rate, args.duration)
+    except KeyboardInterrupt:
+        elapsed = args.duration
+    finally:
+        sender.close()
+        if responder is not None:
+            responder.close()
+    print(f"{sender.sent} frames en {elapsed:.2f} s ({sender.sent / elapsed:.1f} Hz), {sender.late} con retraso")
+
+
+if __name__ == "__main__":
+    main()
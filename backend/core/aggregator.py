@@ -0,0 +1,428 @@
+import copy
+import logging
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+
+import numpy as np
+
+from core.data_descriptions import DataDescriptionCache, DataDescriptions, RigidBodyDescription
+from core.frame import MarkerSets, MocapFrame
+from core.frame_mailbox import create_mailbox
+from core.metrics import get_metrics
+from core.natnet_client import NatNetClient, format_timecode
+from logic.resampler import slerp
+
+# Las fuentes se identifican por su nombre; cada una desplaza sus IDs de Motive en
+# `index * id_stride` (la primera conserva los suyos). Con stride 1000 el Rigid Body 3 de la
+# segunda fuente es el 1003 y el Skeleton 1 de la tercera, el 2001.
+DEFAULT_ID_STRIDE = 1000
+_BONE_ID_MASK = 0xFFFF
+# Seguimiento del offset de reloj: baja al instante, sube muy despacio (deriva entre relojes)
+_OFFSET_CREEP = 0.001
+
+
+class SourceSpec:
+    """
+    Una fuente NatNet: nombre, grupo multicast y puerto de datos y, opcionalmente, la IP de
+    su Motive para pedir las data descriptions. Formato de línea de comandos:
+        nombre=grupo:puerto[,server_ip[:command_port]]
+    p. ej. "stageA=239.255.42.99:1511,10.0.0.5".
+    """
+    __slots__ = ("name", "multicast_ip", "data_port", "server_ip", "command_port")
+
+    def __init__(self, name: str, multicast_ip="239.255.42.99", data_port=1511, server_ip=None, command_port=1510):
+        self.name = name
+        self.multicast_ip = multicast_ip
+        self.data_port = data_port
+        self.server_ip = server_ip
+        self.command_port = command_port
+
+    @classmethod
+    def parse(cls, text: str) -> "SourceSpec":
+        try:
+            name, _, rest = text.partition("=")
+            address, _, server = rest.partition(",")
+            group, _, port = address.rpartition(":")
+            server_ip, _, command_port = server.partition(":")
+            if not name or not group:
+                raise ValueError
+            return cls(name, group, int(port), server_ip or None, int(command_port or 1510))
+        except ValueError:
+            raise ValueError(f"Fuente inválida: {text!r} (formato: nombre=grupo:puerto[,server_ip[:command_port]])")
+
+    def __repr__(self):
+        return f"{self.name}={self.multicast_ip}:{self.data_port}"
+
+
+class _SourceBuffer:
+    """
+    Jitter buffer de una fuente. El Producer de la fuente hace put_nowait (sustituye a su
+    mailbox); cada frame se coloca en el reloj del hub (perf_counter) con
+    t = timestamp de Motive + offset, donde offset sigue el mínimo de (recepción - timestamp):
+    el mínimo descarta el jitter de red y de planificación.
+
+    Si la fuente tiene su caché de data descriptions (`descriptions`), cada frame le pasa
+    sus params al llegar: el aviso de cambio de modelos es por fuente, no del stream fusionado.
+    """
+    def __init__(self, index: int, spec: SourceSpec, namespace: int, depth: int):
+        self.index = index
+        self.spec = spec
+        self.namespace = namespace
+        self.descriptions: Optional[DataDescriptionCache] = None
+        self.frames = deque(maxlen=depth)  # (t_alineado, MocapFrame)
+        self.offset = None
+        self.received = 0
+        self.resets = 0
+        self._last_timestamp = 0.0
+        self._lock = threading.Lock()
+
+    def put_nowait(self, frame: MocapFrame):
+        if self.descriptions is not None:
+            self.descriptions.observe(frame.params)
+        received_at = frame.received_at or time.perf_counter()
+        with self._lock:
+            self.received += 1
+            timestamp = frame.timestamp
+            if not timestamp:
+                aligned = received_at # Sin timestamp de Motive: solo queda el instante de recepción
+            else:
+                if timestamp < self._last_timestamp:
+                    # Motive reinició o saltó atrás: el offset anterior ya no vale
+                    self.offset = None
+                    self.frames.clear()
+                    self.resets += 1
+                self._last_timestamp = timestamp
+                sample = received_at - timestamp
+                if self.offset is None or sample < self.offset:
+                    self.offset = sample
+                else:
+                    self.offset += (sample - self.offset) * _OFFSET_CREEP
+                aligned = timestamp + self.offset
+            self.frames.append((aligned, frame))
+
+    def sample(self, at: float, stale_after: float):
+        """
+        Frames que rodean el instante `at`: (f0, f1, alpha). f1 es None si hay que retener f0
+        (la fuente va retrasada). Devuelve None si la fuente no tiene datos recientes.
+        """
+        with self._lock:
+            frames = self.frames
+            if not frames or frames[-1][0] < at - stale_after:
+                return None
+            # Se descarta lo que ya quedó atrás, conservando el frame anterior a `at`
+            while len(frames) > 1 and frames[1][0] <= at:
+                frames.popleft()
+            t0, f0 = frames[0]
+            if len(frames) == 1 or t0 >= at:
+                return f0, None, 0.0
+            t1, f1 = frames[1]
+            return f0, f1, (at - t0) / (t1 - t0) if t1 > t0 else 1.0
+
+    def stats(self):
+        return {
+            "source": repr(self.spec),
+            "received": self.received,
+            "buffered": len(self.frames),
+            "clock_offset_s": self.offset,
+            "resets": self.resets,
+        }
+
+
+def _same_layout(f0: MocapFrame, f1: MocapFrame) -> bool:
+    return (f0.rigid_body_count == f1.rigid_body_count and np.array_equal(f0.ids, f1.ids)
+            and np.array_equal(f0.skeleton_offsets, f1.skeleton_offsets))
+
+
+def _interpolate(f0: MocapFrame, f1: Optional[MocapFrame], alpha: float):
+    """Posiciones y rotaciones de la fuente en el instante muestreado, y el frame del que sale el layout."""
+    if f1 is None or alpha >= 1.0 or not _same_layout(f0, f1):
+        newest = f1 if f1 is not None and alpha >= 0.5 else f0
+        return newest, newest.positions, newest.rotations
+    positions = f0.positions + (f1.positions - f0.positions) * np.float32(alpha)
+    return f1, positions, slerp(f0.rotations, f1.rotations, alpha)
+
+
+class MultiSourceDescriptions:
+    """
+    DataDescriptions de varias fuentes fusionadas con los IDs desplazados y, si hay más de
+    una fuente, los nombres prefijados con la fuente ("stageB/Actor_1"). Misma interfaz que
+    DataDescriptionCache (start / observe / current / stats / stop).
+    """
+    def __init__(self, specs: List[SourceSpec], id_stride=DEFAULT_ID_STRIDE):
+        self.caches = []
+        self._by_source = {}
+        for index, spec in enumerate(specs):
+            if spec.server_ip:
+                cache = self._by_source[index] = DataDescriptionCache(spec.server_ip, spec.command_port)
+                self.caches.append((spec.name, index * id_stride, cache))
+        self._prefix = len(specs) > 1
+        self._sources = None
+        self._current = None
+
+    def start(self):
+        for _, _, cache in self.caches:
+            cache.start()
+
+    def stop(self):
+        for _, _, cache in self.caches:
+            cache.stop()
+
+    def source_cache(self, index: int) -> Optional[DataDescriptionCache]:
+        """Caché de la fuente `index` (None si no tiene server_ip): la alimenta su jitter buffer."""
+        return self._by_source.get(index)
+
+    def observe(self, params: int):
+        # Solo para quien ve únicamente el stream fusionado (modo shm: el agregador está en
+        # otro proceso). Sus params son el OR de las fuentes: se revisan todas
+        for _, _, cache in self.caches:
+            cache.observe(params)
+
+    @property
+    def current(self) -> Optional[DataDescriptions]:
+        sources = tuple(cache.current for _, _, cache in self.caches)
+        if sources != self._sources:
+            self._sources = sources
+            self._current = self._merge(sources) if any(d is not None for d in sources) else None
+        return self._current
+
+    def _merge(self, sources) -> DataDescriptions:
+        merged = DataDescriptions()
+        for (name, namespace, _), descriptions in zip(self.caches, sources):
+            if descriptions is None:
+                continue
+            prefix = f"{name}/" if self._prefix else ""
+            for rb_id, rb in descriptions.rigid_bodies.items():
+                parent = rb.parent_id + namespace if rb.parent_id >= 0 else rb.parent_id
+                merged.rigid_bodies[rb_id + namespace] = RigidBodyDescription(prefix + rb.name, rb_id + namespace,
+                                                                              parent, rb.offset)
+            for sk_id, skeleton in descriptions.skeletons.items():
+                # Los huesos se buscan por ID & 0xFFFF: solo cambian el nombre y el ID del Skeleton
+                renamed = copy.copy(skeleton)
+                renamed.name = prefix + skeleton.name
+                renamed.id = sk_id + namespace
+                merged.skeletons[sk_id + namespace] = renamed
+            for set_name, markers in descriptions.marker_sets.items():
+                merged.marker_sets[prefix + set_name] = markers
+        return merged
+
+    def stats(self):
+        return {name: cache.stats() for name, _, cache in self.caches}
+
+
+class MultiSourceAggregator:
+    """
+    Ingesta de varias fuentes NatNet (p. ej. un volumen repartido en dos Motive) fusionadas
+    en un único stream de frames alineados en el tiempo.
+
+    Cada fuente tiene su NatNetClient, que entrega los frames en un jitter buffer acotado
+    (`buffer_frames`). Un hilo reloj emite a `rate` Hz un frame por tick, muestreado en
+    t = ahora - `jitter`: por fuente se interpolan (lerp + slerp) los dos frames que rodean
+    ese instante o se retiene el último si la fuente va retrasada; las fuentes sin datos
+    desde hace `stale_after` segundos se omiten. Los IDs se desplazan por fuente (`id_stride`).
+
+    Expone la interfaz de NatNetClient que usa el pipeline (frame_queue, start/stop,
+    decode_markers, descriptions, recorder), así que lo sustituye tal cual.
+    """
+    def __init__(self, sources: List[SourceSpec], rate=120.0, jitter=0.02, id_stride=DEFAULT_ID_STRIDE,
+                 stale_after=0.5, buffer_frames=32, handoff="latest", queue_size=100,
+                 fetch_descriptions=True, **client_options):
+        if not sources:
+            raise ValueError("Se necesita al menos una fuente")
+        names = [spec.name for spec in sources]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Nombres de fuente repetidos: {names}")
+
+        self.sources = sources
+        self.rate = rate
+        self.jitter = jitter
+        self.id_stride = id_stride
+        self.stale_after = stale_after
+        self.frame_queue = create_mailbox(handoff, queue_size)
+        self.recorder = None
+        self.descriptions = MultiSourceDescriptions(sources, id_stride) if fetch_descriptions else None
+        if self.descriptions is not None and not self.descriptions.caches:
+            self.descriptions = None
+
+        self._buffers = [_SourceBuffer(i, spec, i * id_stride, buffer_frames) for i, spec in enumerate(sources)]
+        if self.descriptions is not None:
+            for buffer in self._buffers:
+                buffer.descriptions = self.descriptions.source_cache(buffer.index)
+        self._clients = []
+        # Fuentes que comparten puerto: cada socket se ata a su grupo para no recibir los del resto
+        ports = [spec.data_port for spec in sources]
+        for buffer in self._buffers:
+            spec = buffer.spec
+            shared = ports.count(spec.data_port) > 1
+            client = NatNetClient(spec.multicast_ip, spec.data_port, bind_group=shared, **client_options)
+            client.frame_queue = buffer
+            self._clients.append(client)
+        self._prefix_markers = len(sources) > 1
+        self._decode_markers = False
+        self._frame_number = 0
+        self._epoch = time.perf_counter() - jitter # Origen del timestamp de los frames fusionados
+        self._running = False
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._metrics = get_metrics()
+
+        self.ticks = 0
+        self.frames_out = 0
+        self.sources_missing = 0
+        self.timecode = (0, 0) # Último timecode SMPTE emitido (timecode, subframe)
+
+    @property
+    def decode_markers(self) -> bool:
+        return self._decode_markers
+
+    @decode_markers.setter
+    def decode_markers(self, value: bool):
+        self._decode_markers = value
+        for client in self._clients:
+            client.decode_markers = value
+
+    def feed(self, index: int, frame: MocapFrame):
+        """Entrega directa de un frame de la fuente `index` (sin red; replays y benchmarks)."""
+        self._buffers[index].put_nowait(frame)
+
+    # --- Fusión ---
+
+    def sample(self, at: float) -> Optional[MocapFrame]:
+        """Frame fusionado en el instante `at` (reloj perf_counter). None si ninguna fuente tiene datos."""
+        parts = []
+        for buffer in self._buffers:
+            sampled = buffer.sample(at, self.stale_after)
+            if sampled is None:
+                self.sources_missing += 1
+                continue
+            parts.append((buffer, *_interpolate(*sampled)))
+        if not parts:
+            return None
+
+        rb_ids, rb_pos, rb_rot, rb_err = [], [], [], []
+        sk_rows_ids, sk_pos, sk_rot, sk_err, sk_ids, sk_counts = [], [], [], [], [], []
+        received_at = 0.0
+        params = 0
+        timecode = None
+        marker_sources = []
+        for buffer, frame, positions, rotations in parts:
+            ns = buffer.namespace
+            rbc = frame.rigid_body_count
+            rb_ids.append(frame.ids[:rbc] + np.uint32(ns))
+            rb_pos.append(positions[:rbc])
+            rb_rot.append(rotations[:rbc])
+            rb_err.append(frame.errors[:rbc])
+            if len(frame.skeleton_ids):
+                bone_ids = frame.ids[rbc:]
+                # ID de hueso = (skeleton_id << 16) | bone_id: se desplaza solo la parte del Skeleton
+                sk_rows_ids.append((((bone_ids >> 16) + np.uint32(ns)) << 16) | (bone_ids & _BONE_ID_MASK))
+                sk_pos.append(positions[rbc:])
+                sk_rot.append(rotations[rbc:])
+                sk_err.append(frame.errors[rbc:])
+                sk_ids.append(frame.skeleton_ids + np.uint32(ns))
+                sk_counts.append(np.diff(frame.skeleton_offsets))
+            received_at = max(received_at, frame.received_at)
+            params |= frame.params
+            if timecode is None and frame.timecode:
+                # El de la primera fuente con generador de timecode (en un set genlockeado coinciden)
+                timecode = (frame.timecode, frame.timecode_sub)
+            if frame.marker_sets is not None:
+                marker_sources.append((buffer.spec.name, frame.marker_sets))
+
+        rigid_body_count = sum(len(ids) for ids in rb_ids)
+        counts = np.concatenate(sk_counts) if sk_counts else np.zeros(0, dtype=np.int64)
+        skeleton_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=skeleton_offsets[1:])
+        skeleton_offsets += rigid_body_count
+
+        self._frame_number += 1
+        merged = MocapFrame(
+            frame_number=self._frame_number,
+            ids=np.concatenate(rb_ids + sk_rows_ids).astype(np.uint32, copy=False),
+            positions=np.concatenate(rb_pos + sk_pos),
+            rotations=np.concatenate(rb_rot + sk_rot),
+            errors=np.concatenate(rb_err + sk_err),
+            rigid_body_count=rigid_body_count,
+            skeleton_ids=np.concatenate(sk_ids) if sk_ids else np.zeros(0, dtype=np.uint32),
+            skeleton_offsets=skeleton_offsets,
+            timestamp=at - self._epoch,
+            marker_sets=self._merge_markers(marker_sources),
+            params=params,
+            timecode=timecode[0] if timecode else 0,
+            timecode_sub=timecode[1] if timecode else 0,
+        )
+        merged.received_at = received_at
+        if timecode:
+            self.timecode = timecode
+        return merged
+
+    def _merge_markers(self, marker_sources) -> Optional[MarkerSets]:
+        if not marker_sources:
+            return None
+        if len(marker_sources) == 1 and not self._prefix_markers:
+            return marker_sources[0][1]
+        return MarkerSets.merge(marker_sources)
+
+    # --- Ciclo de vida ---
+
+    def _run_clock(self):
+        period = 1.0 / self.rate
+        next_tick = time.perf_counter()
+        while not self._stop_event.is_set():
+            next_tick += period
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                if self._stop_event.wait(delay):
+                    break
+            elif delay < -period:
+                next_tick = time.perf_counter() # El hilo se retrasó: no se recuperan ticks perdidos
+
+            started = time.perf_counter()
+            self.ticks += 1
+            frame = self.sample(started - self.jitter)
+            if frame is None:
+                continue
+            frame.decoded_at = time.perf_counter()
+            self._metrics.record("aggregate", frame.decoded_at - started)
+            if self.recorder is not None:
+                self.recorder.on_packet(None, frame)
+            self.frames_out += 1
+            self.frame_queue.put_nowait(frame)
+
+    def start(self) -> bool:
+        started = [client.start() for client in self._clients]
+        if not all(started):
+            failed = [repr(spec) for spec, ok in zip(self.sources, started) if not ok]
+            logging.error(f"No se pudieron abrir las fuentes: {failed}")
+            self.stop()
+            return False
+        if self.descriptions is not None:
+            self.descriptions.start()
+        self._epoch = time.perf_counter() - self.jitter
+        self._running = True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run_clock, name="NatNetAggregator", daemon=True)
+        self._thread.start()
+        logging.info(f"Agregador iniciado: {len(self.sources)} fuentes {self.sources} a {self.rate:g} Hz, "
+                     f"jitter buffer {self.jitter * 1000:.0f} ms.")
+        return True
+
+    def stop(self):
+        self._running = False
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+        for client in self._clients:
+            client.stop()
+        if self.descriptions is not None:
+            self.descriptions.stop()
+
+    def stats(self):
+        return {
+            "ticks": self.ticks,
+            "frames_out": self.frames_out,
+            "sources_missing": self.sources_missing,
+            "timecode": format_timecode(*self.timecode) if self.timecode[0] else None,
+            "sources": {buffer.spec.name: buffer.stats() for buffer in self._buffers},
+        }
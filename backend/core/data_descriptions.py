@@ -0,0 +1,309 @@
+import itertools
+import json
+import logging
+import socket
+import struct
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from core.frame import MocapFrame, SUBJECT_RIGID_BODY, SUBJECT_SKELETON
+
+# --- Canal de comandos NatNet (UDP, puerto 1510 por defecto) ---
+NAT_REQUEST_MODELDEF = 4
+NAT_MODELDEF = 5
+
+# Tipos de data description (NatNet 3.x)
+DATASET_MARKER_SET = 0
+DATASET_RIGID_BODY = 1
+DATASET_SKELETON = 2
+DATASET_FORCE_PLATE = 3
+DATASET_DEVICE = 4
+
+# Bit de `params` en el Frame of Data: Motive avisa de que cambiaron los modelos trackeados
+PARAM_MODELS_CHANGED = 0x02
+
+_UINT16 = struct.Struct('<H')
+_INT32 = struct.Struct('<i')
+_RB_HEADER = struct.Struct('<ii3f')      # ID, parent ID, offset x/y/z
+_PLATE_GEOMETRY = 2 * 4 + 3 * 4 + 12 * 12 * 4 + 4 * 3 * 4 # width, length, origen, calibración, esquinas
+_BONE_ID_MASK = 0xFFFF                   # En el frame, ID de hueso = (skeleton_id << 16) | bone_id
+
+_model_revisions = itertools.count(1)
+
+
+class RigidBodyDescription:
+    """Rigid Body (o hueso de Skeleton) tal como lo describe Motive."""
+    __slots__ = ("name", "id", "parent_id", "offset")
+
+    def __init__(self, name: str, id: int, parent_id: int, offset):
+        self.name = name
+        self.id = id
+        self.parent_id = parent_id
+        self.offset = offset
+
+
+class SkeletonDescription:
+    """Skeleton: nombre, ID y jerarquía de huesos (nombres e índice del padre, -1 = raíz)."""
+    __slots__ = ("name", "id", "bone_ids", "bone_names", "parent_indices")
+
+    def __init__(self, name: str, id: int, bones: List[RigidBodyDescription]):
+        self.name = name
+        self.id = id
+        self.bone_ids = np.array([b.id for b in bones], dtype=np.uint32)
+        self.bone_names = [b.name for b in bones]
+        index_of = {b.id: i for i, b in enumerate(bones)}
+        self.parent_indices = np.array([index_of.get(b.parent_id, -1) for b in bones], dtype=np.int32)
+
+
+class DataDescriptions:
+    """Modelos de la escena de Motive (respuesta a NAT_REQUEST_MODELDEF)."""
+    def __init__(self):
+        self.marker_sets: Dict[str, List[str]] = {}
+        self.rigid_bodies: Dict[int, RigidBodyDescription] = {}
+        self.skeletons: Dict[int, SkeletonDescription] = {}
+        self.fetched_at = time.time()
+
+
+def _read_cstring(data: bytes, offset: int):
+    end = data.index(b"\0", offset)
+    return data[offset:end].decode('utf-8', errors='replace'), end + 1
+
+
+def _read_rigid_body(data: bytes, offset: int):
+    name, offset = _read_cstring(data, offset)
+    rb_id, parent_id, x, y, z = _RB_HEADER.unpack_from(data, offset)
+    offset += _RB_HEADER.size
+    # NatNet 3.x: posiciones (12 bytes) y labels requeridos (4 bytes) de los markers del asset
+    marker_count = _INT32.unpack_from(data, offset)[0]
+    offset += 4 + marker_count * 16
+    return RigidBodyDescription(name, rb_id, parent_id, (x, y, z)), offset
+
+
+def _skip_channels(data: bytes, offset: int) -> int:
+    channel_count = _INT32.unpack_from(data, offset)[0]
+    offset += 4
+    for _ in range(channel_count):
+        _, offset = _read_cstring(data, offset)
+    return offset
+
+
+def parse_model_definitions(data) -> DataDescriptions:
+    """
+    Parser de NAT_MODELDEF (NatNet 3.x). Los tipos que el Hub no usa (force plates,
+    devices) se saltan; ante un tipo desconocido se devuelve lo leído hasta ahí.
+    """
+    data = bytes(data)
+    descriptions = DataDescriptions()
+    offset = 4 # MessageID + PacketSize
+    count = _INT32.unpack_from(data, offset)[0]
+    offset += 4
+    for _ in range(count):
+        kind = _INT32.unpack_from(data, offset)[0]
+        offset += 4
+        if kind == DATASET_MARKER_SET:
+            name, offset = _read_cstring(data, offset)
+            marker_count = _INT32.unpack_from(data, offset)[0]
+            offset += 4
+            markers = []
+            for _ in range(marker_count):
+                marker, offset = _read_cstring(data, offset)
+                markers.append(marker)
+            descriptions.marker_sets[name] = markers
+        elif kind == DATASET_RIGID_BODY:
+            rb, offset = _read_rigid_body(data, offset)
+            descriptions.rigid_bodies[rb.id] = rb
+        elif kind == DATASET_SKELETON:
+            name, offset = _read_cstring(data, offset)
+            sk_id, bone_count = struct.unpack_from('<ii', data, offset)
+            offset += 8
+            bones = []
+            for _ in range(bone_count):
+                bone, offset = _read_rigid_body(data, offset)
+                bones.append(bone)
+            descriptions.skeletons[sk_id] = SkeletonDescription(name, sk_id, bones)
+        elif kind == DATASET_FORCE_PLATE:
+            offset += 4 # ID
+            _, offset = _read_cstring(data, offset) # Serial
+            offset += _PLATE_GEOMETRY + 8 # + plate type, channel data type
+            offset = _skip_channels(data, offset)
+        elif kind == DATASET_DEVICE:
+            offset += 4
+            _, offset = _read_cstring(data, offset) # Nombre
+            _, offset = _read_cstring(data, offset) # Serial
+            offset += 8 # device type, channel data type
+            offset = _skip_channels(data, offset)
+        else:
+            logging.warning(f"Data description de tipo desconocido ({kind}): se ignora el resto")
+            break
+    return descriptions
+
+
+class SubjectModel:
+    """
+    Tabla de subjects precalculada para un layout de frame (IDs de Rigid Bodies, Skeletons
+    y huesos) y unas DataDescriptions: nombres estables, IDs, tipos, offsets y jerarquía
+    de huesos en el orden de las filas. Se construye una vez por layout/revisión; por
+    frame solo se compara la clave.
+    Sin descriptions (Motive no respondió) los nombres caen a RB_<id> / SK_<id>.
+    """
+    __slots__ = ("revision", "names", "ids", "kinds", "offsets", "bone_names", "bone_parents", "_description")
+
+    def __init__(self, names: List[str], ids: np.ndarray, kinds: np.ndarray, offsets: np.ndarray,
+                 bone_names: List[Optional[List[str]]], bone_parents: List[Optional[np.ndarray]]):
+        self.revision = next(_model_revisions)
+        self.names = names
+        self.ids = ids                  # (S,) uint32
+        self.kinds = kinds              # (S,) uint8
+        self.offsets = offsets          # (S + 1,) int64
+        self.bone_names = bone_names    # por subject: nombres de huesos en orden de fila (None si no hay)
+        self.bone_parents = bone_parents
+        self._description = None
+
+    @classmethod
+    def build(cls, frame: MocapFrame, descriptions: Optional[DataDescriptions]) -> "SubjectModel":
+        rb_count = frame.rigid_body_count
+        rb_ids = frame.ids[:rb_count].tolist()
+        sk_ids = frame.skeleton_ids.tolist()
+        rigid_bodies = descriptions.rigid_bodies if descriptions is not None else {}
+        skeletons = descriptions.skeletons if descriptions is not None else {}
+
+        names = [rigid_bodies[i].name if i in rigid_bodies else f"RB_{i}" for i in rb_ids]
+        bone_names = [None] * rb_count
+        bone_parents = [None] * rb_count
+        for index, sk_id in enumerate(sk_ids):
+            skeleton = skeletons.get(sk_id)
+            if skeleton is None:
+                names.append(f"SK_{sk_id}")
+                bone_names.append(None)
+                bone_parents.append(None)
+                continue
+            names.append(skeleton.name)
+            # Huesos en el orden en que llegan en el frame (normalmente el de la description)
+            rows = frame.skeleton_rows(index)
+            index_of = {bone_id: i for i, bone_id in enumerate(skeleton.bone_ids.tolist())}
+            order = [index_of.get(bone_id & _BONE_ID_MASK, -1) for bone_id in frame.ids[rows].tolist()]
+            row_of = {desc_index: row for row, desc_index in enumerate(order)}
+            bone_names.append([skeleton.bone_names[i] if i >= 0 else f"Bone_{row}" for row, i in enumerate(order)])
+            bone_parents.append(np.array(
+                [row_of.get(int(skeleton.parent_indices[i]), -1) if i >= 0 else -1 for i in order], dtype=np.int32))
+
+        # Cada Rigid Body ocupa una fila, cada Skeleton un rango de huesos
+        ids = np.array(rb_ids + sk_ids, dtype=np.uint32)
+        kinds = np.empty(len(ids), dtype=np.uint8)
+        kinds[:rb_count] = SUBJECT_RIGID_BODY
+        kinds[rb_count:] = SUBJECT_SKELETON
+        offsets = np.concatenate((np.arange(rb_count, dtype=np.int64), frame.skeleton_offsets))
+        return cls(names, ids, kinds, offsets, bone_names, bone_parents)
+
+    def describe(self) -> str:
+        """JSON del modelo (se envía a los clientes cuando cambia). Cacheado."""
+        if self._description is None:
+            subjects = []
+            for i, name in enumerate(self.names):
+                entry = {"name": name, "id": int(self.ids[i]), "kind": "rigid_body" if self.kinds[i] == SUBJECT_RIGID_BODY else "skeleton"}
+                if self.bone_names[i] is not None:
+                    entry["bones"] = self.bone_names[i]
+                    entry["parents"] = self.bone_parents[i].tolist()
+                subjects.append(entry)
+            self._description = json.dumps({"type": "model", "revision": self.revision, "subjects": subjects})
+        return self._description
+
+
+class DataDescriptionCache:
+    """
+    Pide las data descriptions a Motive por el canal de comandos y las guarda en caché.
+
+    Un hilo propio hace la petición al arrancar y solo vuelve a pedirlas cuando se invalida
+    la caché (Motive marca PARAM_MODELS_CHANGED en un frame) o si la petición falló
+    (reintento cada `retry_interval` s). `current` se sustituye de forma atómica: los
+    lectores (decoder, transformer) nunca ven un estado a medias.
+    """
+    def __init__(self, server_ip="127.0.0.1", command_port=1510, timeout=1.0, retry_interval=5.0):
+        self.server_ip = server_ip
+        self.command_port = command_port
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.current: Optional[DataDescriptions] = None
+        self.fetches = 0
+        self.failures = 0
+        self._stale = True
+        self._models_changed = False
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="NatNetCommand", daemon=True)
+        self._thread.start()
+
+    def invalidate(self):
+        """Marca la caché como obsoleta; el hilo de comandos la vuelve a pedir."""
+        self._stale = True
+        self._wake.set()
+
+    def observe(self, params: int):
+        """Revisa los flags de un frame; Motive mantiene el aviso varios frames y solo cuenta el flanco de subida."""
+        changed = bool(params & PARAM_MODELS_CHANGED)
+        if changed and not self._models_changed:
+            logging.info("Motive reporta cambios en los modelos: se piden de nuevo las data descriptions.")
+            self.invalidate()
+        self._models_changed = changed
+
+    def fetch(self) -> Optional[DataDescriptions]:
+        """Petición síncrona de NAT_REQUEST_MODELDEF. Devuelve None si Motive no responde."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        try:
+            sock.bind(('', 0))
+            sock.settimeout(self.timeout)
+            sock.sendto(struct.pack('<HH', NAT_REQUEST_MODELDEF, 0), (self.server_ip, self.command_port))
+            deadline = time.monotonic() + self.timeout
+            while time.monotonic() < deadline:
+                data, _ = sock.recvfrom(65535)
+                if len(data) >= 4 and _UINT16.unpack_from(data, 0)[0] == NAT_MODELDEF:
+                    return parse_model_definitions(data)
+        except (OSError, ValueError, struct.error) as e:
+            logging.debug(f"Petición de data descriptions sin respuesta: {e}")
+        finally:
+            sock.close()
+        return None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if not self._stale:
+                self._wake.wait(self.retry_interval)
+                self._wake.clear()
+                continue
+            self._stale = False
+            descriptions = self.fetch()
+            if descriptions is None:
+                self.failures += 1
+                if self.failures == 1:
+                    logging.warning(f"Motive no respondió a la petición de data descriptions en "
+                                    f"{self.server_ip}:{self.command_port}; se usan nombres RB_<id>/SK_<id>.")
+                self._stale = True
+                self._stop_event.wait(self.retry_interval)
+                continue
+            self.current = descriptions
+            self.fetches += 1
+            logging.info(f"Data descriptions actualizadas: {len(descriptions.rigid_bodies)} Rigid Bodies, "
+                         f"{len(descriptions.skeletons)} Skeletons, {len(descriptions.marker_sets)} marker sets")
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+
+    def stats(self):
+        current = self.current
+        return {
+            "loaded": current is not None,
+            "fetches": self.fetches,
+            "failures": self.failures,
+            "rigid_bodies": len(current.rigid_bodies) if current else 0,
+            "skeletons": len(current.skeletons) if current else 0,
+        }
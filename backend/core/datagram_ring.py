@@ -0,0 +1,125 @@
+import ctypes
+import errno
+import select
+import socket
+import sys
+from typing import List
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IOVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+def _load_recvmmsg():
+    """Resuelve recvmmsg(2) de la libc (solo Linux). Devuelve None si no existe."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fn = libc.recvmmsg
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    fn.restype = ctypes.c_int
+    return fn
+
+
+_recvmmsg = _load_recvmmsg()
+_MSG_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0x40)
+_EAGAIN = {errno.EAGAIN, errno.EWOULDBLOCK}
+
+
+class DatagramRing:
+    """
+    Ring preasignado de slots `bytearray` para recepción UDP sin asignaciones por paquete.
+
+    Cada datagrama se escribe con recv_into en el siguiente slot y se entrega como
+    memoryview del slot (sin copia). El consumidor debe terminar con la vista antes
+    de que el ring dé la vuelta: con el decoder actual (que copia a arrays propios)
+    basta con que `slot_count >= max_batch`.
+    """
+    def __init__(self, slot_count=64, slot_size=65535):
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self._slots = [bytearray(slot_size) for _ in range(slot_count)]
+        self._views = [memoryview(slot) for slot in self._slots]
+        self._index = 0
+        self._mmsg = None
+
+    @property
+    def batch_supported(self) -> bool:
+        """True si la plataforma permite drenar varios datagramas con un solo recvmmsg."""
+        return _recvmmsg is not None
+
+    def recv_into(self, sock: socket.socket) -> memoryview:
+        """Recibe un datagrama en el siguiente slot (bloqueante según el timeout del socket)."""
+        view = self._views[self._index]
+        self._index = (self._index + 1) % self.slot_count
+        nbytes = sock.recv_into(view)
+        return view[:nbytes]
+
+    def recv_batch(self, sock: socket.socket, max_batch=16, timeout=0.2) -> List[memoryview]:
+        """
+        Espera hasta `timeout` a que haya datos y drena hasta `max_batch` datagramas
+        encolados en una sola activación. El socket debe estar en modo no bloqueante.
+        """
+        readable, _, _ = select.select([sock], [], [], timeout)
+        if not readable:
+            return []
+
+        max_batch = min(max_batch, self.slot_count)
+        if _recvmmsg is not None:
+            return self._recvmmsg(sock, max_batch)
+
+        views = []
+        while len(views) < max_batch:
+            try:
+                views.append(self.recv_into(sock))
+            except BlockingIOError:
+                break
+        return views
+
+    def _build_mmsg(self):
+        """Prepara una única vez los iovec/mmsghdr apuntando a los slots del ring."""
+        self._c_buffers = [(ctypes.c_char * self.slot_size).from_buffer(slot) for slot in self._slots]
+        self._iovecs = (_IOVec * self.slot_count)()
+        self._mmsg = (_MMsgHdr * self.slot_count)()
+        for i, buf in enumerate(self._c_buffers):
+            self._iovecs[i].iov_base = ctypes.addressof(buf)
+            self._iovecs[i].iov_len = self.slot_size
+            self._mmsg[i].msg_hdr.msg_iov = ctypes.pointer(self._iovecs[i])
+            self._mmsg[i].msg_hdr.msg_iovlen = 1
+
+    def _recvmmsg(self, sock: socket.socket, max_batch: int) -> List[memoryview]:
+        if self._mmsg is None:
+            self._build_mmsg()
+
+        # recvmmsg escribe en slots consecutivos: no cruzamos el final del ring
+        start = self._index
+        vlen = min(max_batch, self.slot_count - start)
+        entries = ctypes.cast(ctypes.addressof(self._mmsg) + start * ctypes.sizeof(_MMsgHdr), ctypes.POINTER(_MMsgHdr))
+        received = _recvmmsg(sock.fileno(), entries, vlen, _MSG_DONTWAIT, None)
+        if received < 0:
+            err = ctypes.get_errno()
+            if err in _EAGAIN:
+                return []
+            raise OSError(err, "recvmmsg falló")
+
+        self._index = (start + received) % self.slot_count
+        return [self._views[start + i][:self._mmsg[start + i].msg_len] for i in range(received)]
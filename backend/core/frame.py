@@ -0,0 +1,235 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+# Layout binario de un Rigid Body / hueso de Skeleton en NatNet 3.x (36 bytes, little-endian)
+# ID (4b), Pos (3x4b float), Rot (4x4b float), Marker Error (4b float)
+RIGID_BODY_DTYPE = np.dtype([
+    ("id", "<u4"),
+    ("pos", "<f4", (3,)),
+    ("rot", "<f4", (4,)),
+    ("err", "<f4"),
+])
+
+
+class MarkerSets:
+    """
+    Marker sets de un frame, materializados bajo demanda.
+
+    El decoder solo copia el bloque de marker sets del datagrama (un único memcpy) y anota
+    dónde empieza cada set; los arrays (M, 3) float32 se crean con np.frombuffer (sin copia
+    sobre ese bloque) la primera vez que alguien los pide.
+    """
+    __slots__ = ("names", "counts", "_block", "_starts", "_stacked")
+
+    def __init__(self, names: List[str], counts: List[int], block: bytes, starts: List[int]):
+        self.names = names          # nombres internados ("MarkerSet_1", "all"...)
+        self.counts = counts        # markers por set
+        self._block = block         # copia del bloque de marker sets del datagrama
+        self._starts = starts       # offset de las posiciones de cada set dentro de `_block`
+        self._stacked = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @classmethod
+    def merge(cls, parts: List[Tuple[str, "MarkerSets"]]) -> "MarkerSets":
+        """Une los marker sets de varias fuentes, con los nombres prefijados ("fuente/set")."""
+        names, counts, blocks, starts = [], [], [], []
+        base = 0
+        for source, sets in parts:
+            names.extend(f"{source}/{name}" for name in sets.names)
+            counts.extend(sets.counts)
+            starts.extend(base + start for start in sets._starts)
+            blocks.append(sets._block)
+            base += len(sets._block)
+        return cls(names, counts, b"".join(blocks), starts)
+
+    @property
+    def marker_count(self) -> int:
+        return sum(self.counts)
+
+    def positions(self, index: int) -> np.ndarray:
+        """Posiciones (M, 3) float32 del set `index` (vista de solo lectura)."""
+        return np.frombuffer(self._block, dtype="<f4", count=self.counts[index] * 3,
+                             offset=self._starts[index]).reshape(-1, 3)
+
+    def stacked(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Todas las posiciones apiladas (M_total, 3) y los offsets (K + 1) de cada set."""
+        if self._stacked is None:
+            offsets = np.zeros(len(self.counts) + 1, dtype=np.int64)
+            np.cumsum(self.counts, out=offsets[1:])
+            if len(self.counts) == 1:
+                positions = self.positions(0)
+            elif self.counts:
+                positions = np.concatenate([self.positions(i) for i in range(len(self.counts))])
+            else:
+                positions = np.empty((0, 3), dtype=np.float32)
+            self._stacked = (positions, offsets)
+        return self._stacked
+
+
+class MocapFrame:
+    """
+    Frame de NatNet decodificado en layout compacto.
+
+    Todas las filas viven en arrays contiguos: primero los Rigid Bodies sueltos
+    y a continuación los huesos de cada Skeleton. `skeleton_offsets` (S + 1)
+    indica el rango de filas de cada Skeleton dentro de los arrays apilados.
+    `marker_sets` es None salvo que el decoder tenga pedido decodificar markers.
+    `params` son los flags de la cola del frame (bit 0x02: cambiaron los modelos en Motive).
+    `timecode` / `timecode_sub` son el timecode SMPTE empaquetado de Motive (0 si no hay
+    generador de timecode); ver natnet_client.decode_timecode.
+    """
+    __slots__ = (
+        "frame_number", "timestamp", "ids", "positions", "rotations", "errors",
+        "rigid_body_count", "skeleton_ids", "skeleton_offsets", "received_at", "decoded_at", "marker_sets",
+        "params", "timecode", "timecode_sub",
+    )
+
+    def __init__(self, frame_number: int, ids: np.ndarray, positions: np.ndarray,
+                 rotations: np.ndarray, errors: np.ndarray, rigid_body_count: int,
+                 skeleton_ids: np.ndarray, skeleton_offsets: np.ndarray, timestamp: float = 0.0,
+                 marker_sets: Optional[MarkerSets] = None, params: int = 0, timecode: int = 0,
+                 timecode_sub: int = 0):
+        self.frame_number = frame_number
+        self.timestamp = timestamp          # segundos desde el arranque de Motive (0 = desconocido)
+        self.ids = ids                      # (N,) uint32
+        self.positions = positions          # (N, 3) float32
+        self.rotations = rotations          # (N, 4) float32 [x, y, z, w]
+        self.errors = errors                # (N,) float32
+        self.rigid_body_count = rigid_body_count
+        self.skeleton_ids = skeleton_ids            # (S,) uint32
+        self.skeleton_offsets = skeleton_offsets    # (S + 1,) int64
+        self.marker_sets = marker_sets
+        self.params = params
+        self.timecode = timecode
+        self.timecode_sub = timecode_sub
+        # Instrumentación (time.perf_counter): datagrama recibido / frame decodificado
+        self.received_at = 0.0
+        self.decoded_at = 0.0
+
+    @property
+    def skeleton_count(self) -> int:
+        return len(self.skeleton_ids)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.ids)
+
+    def skeleton_rows(self, index: int) -> slice:
+        """Rango de filas que ocupan los huesos del Skeleton `index`."""
+        return slice(int(self.skeleton_offsets[index]), int(self.skeleton_offsets[index + 1]))
+
+
+SUBJECT_RIGID_BODY = 0
+SUBJECT_SKELETON = 1
+
+
+class ProcessedFrame:
+    """
+    Frame ya transformado, listo para los exporters.
+
+    Mantiene el layout apilado del MocapFrame: una tabla de subjects (nombre, tipo y
+    rango de filas en `subject_offsets`) y, por cada espacio destino ("unreal", "maya"...),
+    un par de arrays (N, 3) / (N, 4) float32. Los exporters serializan directamente
+    desde los arrays; `to_payload()` reconstruye el dict anidado para JSON.
+
+    `subject_fresh` (S,) bool indica qué subjects traen datos nuevos en este frame;
+    los que no, llevan la última pose válida (frame-hold) o una pose nula.
+
+    `markers` es None salvo que algún cliente pidiera marker sets: entonces es
+    (nombres, offsets (K + 1), {espacio: posiciones (M, 3)}).
+
+    `subject_ids` (S,) uint32 son los IDs de Motive de cada subject y `model` el
+    SubjectModel completo del que sale la tabla (jerarquías de huesos), si se conoce.
+
+    `encoded` es None o {stream_key: mensaje} con serializaciones de este mismo frame ya
+    hechas en otro proceso (workers de --threading process/shm); los servidores las usan
+    en lugar de volver a serializar. Las copias filtradas o remuestreadas no lo heredan.
+    """
+    __slots__ = ("frame_number", "timestamp", "subject_names", "subject_kinds", "subject_offsets", "spaces",
+                 "subject_fresh", "received_at", "markers", "subject_ids", "model", "encoded")
+
+    def __init__(self, frame_number: int, timestamp: float, subject_names: List[str],
+                 subject_kinds: np.ndarray, subject_offsets: np.ndarray,
+                 spaces: Dict[str, Tuple[np.ndarray, np.ndarray]], subject_fresh: np.ndarray = None,
+                 received_at: float = 0.0,
+                 markers: Optional[Tuple[List[str], np.ndarray, Dict[str, np.ndarray]]] = None,
+                 subject_ids: np.ndarray = None, model=None):
+        self.frame_number = frame_number
+        self.timestamp = timestamp
+        self.subject_names = subject_names          # S nombres ("RB_1", "SK_2"...)
+        self.subject_kinds = subject_kinds          # (S,) uint8: SUBJECT_RIGID_BODY / SUBJECT_SKELETON
+        self.subject_offsets = subject_offsets      # (S + 1,) int64
+        self.spaces = spaces                        # espacio -> (positions, rotations)
+        if subject_fresh is None:
+            subject_fresh = np.ones(len(subject_names), dtype=bool)
+        self.subject_fresh = subject_fresh          # (S,) bool
+        self.received_at = received_at              # perf_counter del datagrama de origen (0 = desconocido)
+        self.markers = markers
+        self.subject_ids = subject_ids              # (S,) uint32 o None
+        self.model = model
+        self.encoded = None
+
+    def copy(self) -> "ProcessedFrame":
+        """
+        Copia que se puede retener: los arrays del transformer (y los de un slot de los
+        workers) son vistas sobre buffers que se reutilizan en los frames siguientes.
+        """
+        spaces = {space: (pos.copy(), rot.copy()) for space, (pos, rot) in self.spaces.items()}
+        markers = self.markers
+        if markers is not None:
+            names, offsets, positions = markers
+            markers = (names, offsets, {space: p.copy() for space, p in positions.items()})
+        frame = ProcessedFrame(self.frame_number, self.timestamp, self.subject_names, self.subject_kinds.copy(),
+                               self.subject_offsets.copy(), spaces, self.subject_fresh.copy(), self.received_at,
+                               markers, self.subject_ids, self.model)
+        frame.encoded = self.encoded
+        return frame
+
+    @property
+    def row_count(self) -> int:
+        return int(self.subject_offsets[-1])
+
+    @property
+    def freshness_mask(self) -> bytes:
+        """Bitmask de frescura: bit i (LSB primero) = subject i con datos nuevos."""
+        return np.packbits(self.subject_fresh, bitorder="little").tobytes()
+
+    def to_payload(self) -> Dict[str, Any]:
+        """Payload anidado compatible con el JSON original del Hub."""
+        subjects = {}
+        offsets = self.subject_offsets.tolist()
+        kinds = self.subject_kinds.tolist()
+        fresh = self.subject_fresh.tolist()
+        ids = self.subject_ids.tolist() if self.subject_ids is not None else None
+        spaces = {name: (pos.tolist(), rot.tolist()) for name, (pos, rot) in self.spaces.items()}
+
+        for i, name in enumerate(self.subject_names):
+            start, end = offsets[i], offsets[i + 1]
+            if kinds[i] == SUBJECT_RIGID_BODY:
+                entry = {"fresh": fresh[i]}
+                for space, (pos, rot) in spaces.items():
+                    entry[space] = {"pos": pos[start], "rot": rot[start]}
+            else:
+                entry = {"fresh": fresh[i], "bone_count": end - start}
+                for space, (pos, rot) in spaces.items():
+                    entry[space] = {"positions": pos[start:end], "rotations": rot[start:end]}
+            if ids is not None:
+                entry["id"] = ids[i]
+            subjects[name] = entry
+
+        payload = {
+            "frame_number": self.frame_number,
+            "timestamp": self.timestamp,
+            "subjects": subjects
+        }
+        if self.markers is not None:
+            marker_names, marker_offsets, marker_spaces = self.markers
+            bounds = marker_offsets.tolist()
+            positions = {space: pos.tolist() for space, pos in marker_spaces.items()}
+            payload["markers"] = {
+                name: {space: pos[bounds[i]:bounds[i + 1]] for space, pos in positions.items()}
+                for i, name in enumerate(marker_names)
+            }
+        return payload
@@ -0,0 +1,142 @@
+import abc
+import queue
+import threading
+from collections import deque
+from typing import Any, Dict
+
+
+class FrameMailbox(abc.ABC):
+    """
+    Punto de hand-off entre el Producer (NatNetClient) y el Consumer.
+    Expone la misma API básica que queue.Queue (put_nowait / get / get_nowait /
+    qsize / empty) y lleva contadores de frames producidos, consumidos,
+    descartados (entrantes rechazados) y sobrescritos (pendientes reemplazados).
+    put_nowait nunca bloquea ni lanza queue.Full: la política decide qué se pierde.
+    Cada política implementa put_nowait, _pop y qsize.
+    """
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self.produced = 0
+        self.consumed = 0
+        self.dropped = 0
+        self.overwritten = 0
+
+    @abc.abstractmethod
+    def put_nowait(self, frame: Any):
+        ...
+
+    @abc.abstractmethod
+    def _pop(self) -> Any:
+        """Extrae el siguiente frame (con el lock tomado) o None si no hay."""
+
+    @abc.abstractmethod
+    def qsize(self) -> int:
+        ...
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def get(self, block=True, timeout=None) -> Any:
+        with self._cond:
+            if block:
+                self._cond.wait_for(lambda: self.qsize() > 0, timeout)
+            frame = self._pop()
+            if frame is None:
+                raise queue.Empty
+            self.consumed += 1
+            return frame
+
+    def get_nowait(self) -> Any:
+        return self.get(block=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "produced": self.produced,
+            "consumed": self.consumed,
+            "dropped": self.dropped,
+            "overwritten": self.overwritten,
+            "depth": self.qsize(),
+        }
+
+
+class LatestFrameMailbox(FrameMailbox):
+    """
+    Slot único "el último gana": el Consumer siempre recibe la pose más fresca.
+    Un frame no consumido se reemplaza en O(1) (sin colas ni asignaciones).
+    """
+    def __init__(self, capacity=1):
+        super().__init__()
+        self._frame = None
+
+    def put_nowait(self, frame: Any):
+        with self._cond:
+            if self._frame is not None:
+                self.overwritten += 1
+            self._frame = frame
+            self.produced += 1
+            self._cond.notify()
+
+    def _pop(self) -> Any:
+        frame, self._frame = self._frame, None
+        return frame
+
+    def qsize(self) -> int:
+        return 0 if self._frame is None else 1
+
+
+class DropOldestRing(FrameMailbox):
+    """Ring acotado: al llenarse, el frame más viejo se sobrescribe con el nuevo."""
+    def __init__(self, capacity=8):
+        super().__init__()
+        self._frames = deque(maxlen=capacity)
+
+    def put_nowait(self, frame: Any):
+        with self._cond:
+            if len(self._frames) == self._frames.maxlen:
+                self.overwritten += 1
+            self._frames.append(frame)
+            self.produced += 1
+            self._cond.notify()
+
+    def _pop(self) -> Any:
+        return self._frames.popleft() if self._frames else None
+
+    def qsize(self) -> int:
+        return len(self._frames)
+
+
+class FifoMailbox(FrameMailbox):
+    """FIFO acotada (comportamiento original): al llenarse se descarta el frame entrante."""
+    def __init__(self, capacity=100):
+        super().__init__()
+        self.capacity = capacity
+        self._frames = deque()
+
+    def put_nowait(self, frame: Any):
+        with self._cond:
+            self.produced += 1
+            if len(self._frames) >= self.capacity:
+                self.dropped += 1
+                return
+            self._frames.append(frame)
+            self._cond.notify()
+
+    def _pop(self) -> Any:
+        return self._frames.popleft() if self._frames else None
+
+    def qsize(self) -> int:
+        return len(self._frames)
+
+
+HANDOFF_POLICIES = {
+    "latest": LatestFrameMailbox,
+    "drop_oldest": DropOldestRing,
+    "fifo": FifoMailbox,
+}
+
+
+def create_mailbox(policy="latest", capacity=100) -> FrameMailbox:
+    """Instancia la estrategia de hand-off configurada."""
+    if policy not in HANDOFF_POLICIES:
+        raise ValueError(f"Política de hand-off inválida: {policy!r} (opciones: {tuple(HANDOFF_POLICIES)})")
+    return HANDOFF_POLICIES[policy](capacity)
@@ -0,0 +1,303 @@
+import json
+import logging
+import math
+import threading
+import time
+import weakref
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Etapas del pipeline, en orden (timestamps monotónicos de time.perf_counter):
+#   decode     -> datagrama recibido en _listen hasta MocapFrame decodificado
+#   queue      -> frame decodificado hasta que el Consumer lo saca del mailbox
+#   transform  -> MocapTransformer.process_frame
+#   serialize  -> codificación de un mensaje (por formato/suscripción) en broadcast
+#   send       -> mensaje encolado para un cliente hasta escrito por completo en su socket
+#   end_to_end -> datagrama recibido hasta frame escrito en el socket del cliente
+STAGES = ("decode", "queue", "transform", "serialize", "send", "end_to_end")
+
+
+class LatencyHistogram:
+    """
+    Histograma de latencias con buckets logarítmicos fijos (1 us .. 10 s, 20 por década):
+    registrar es O(1) y sin asignaciones; los percentiles tienen un error relativo < 12%.
+    """
+    def __init__(self, min_value=1e-6, max_value=10.0, buckets_per_decade=20):
+        self.min_value = min_value
+        self.buckets_per_decade = buckets_per_decade
+        self._bucket_count = int(math.ceil(math.log10(max_value / min_value) * buckets_per_decade)) + 1
+        self.reset()
+
+    def reset(self):
+        self._counts = [0] * self._bucket_count
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        if seconds <= self.min_value:
+            index = 0
+        else:
+            index = min(int(math.log10(seconds / self.min_value) * self.buckets_per_decade) + 1, self._bucket_count - 1)
+        self._counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """Suma los buckets de `other` (mismos límites) a este histograma."""
+        self._counts = [a + b for a, b in zip(self._counts, other._counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+    def _upper_bound(self, index: int) -> float:
+        return self.min_value * 10.0 ** (index / self.buckets_per_decade)
+
+    def percentile(self, q: float) -> float:
+        """Cota superior del bucket que contiene el percentil `q` (0..100)."""
+        if self.count == 0:
+            return 0.0
+        target = self.count * q / 100.0
+        cumulative = 0
+        for index, count in enumerate(self._counts):
+            cumulative += count
+            if cumulative >= target and count:
+                # El último bucket recoge todo lo que supera max_value: su cota real es el máximo visto
+                if index == self._bucket_count - 1:
+                    return self.max
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count * 1e6 if self.count else 0.0,
+            "p50_us": self.percentile(50) * 1e6,
+            "p99_us": self.percentile(99) * 1e6,
+            "max_us": self.max * 1e6,
+        }
+
+
+class ThroughputMeter:
+    """Frames y bytes por segundo medidos en ventanas de `window` s (se expone la última completa)."""
+    def __init__(self, window=1.0):
+        self.window = window
+        self._started = time.perf_counter()
+        self._frames = 0
+        self._bytes = 0
+        self.fps = 0.0
+        self.bytes_per_second = 0.0
+
+    def add(self, nbytes: int, now: float):
+        self._frames += 1
+        self._bytes += nbytes
+        elapsed = now - self._started
+        if elapsed >= self.window:
+            self.fps = self._frames / elapsed
+            self.bytes_per_second = self._bytes / elapsed
+            self._started = now
+            self._frames = 0
+            self._bytes = 0
+
+    def rates(self, now: float) -> Dict[str, float]:
+        # Sin envíos durante más de dos ventanas, la última medida ya no es representativa
+        if now - self._started > 2 * self.window:
+            return {"fps": 0.0, "kbps": 0.0}
+        return {"fps": self.fps, "kbps": self.bytes_per_second * 8 / 1000.0}
+
+
+class PipelineMetrics:
+    """
+    Métricas en proceso del Hub: un histograma por etapa, contadores y gauges
+    (callables que se evalúan al pedir el snapshot: profundidad de colas, clientes...).
+
+    Una misma etapa la registran varios hilos ("decode" uno por fuente en el agregador,
+    "send" uno por cliente...), así que cada hilo escribe en sus propios histogramas
+    (thread-local, sin lock en el camino caliente) y el snapshot los fusiona. Los de hilos
+    que terminan se pliegan en `_retired` para que la lista no crezca con cada cliente.
+    """
+    def __init__(self):
+        self.enabled = True
+        self.started = time.time()
+        self._local = threading.local()
+        self._shards: List[Tuple[weakref.ref, Dict[str, LatencyHistogram]]] = []
+        self._retired: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, Callable[[], Any]] = {}
+        self._lock = threading.Lock()
+
+    def _thread_histograms(self) -> Dict[str, LatencyHistogram]:
+        histograms = getattr(self._local, "histograms", None)
+        if histograms is None:
+            histograms = self._local.histograms = {}
+            with self._lock:
+                self._shards.append((weakref.ref(threading.current_thread()), histograms))
+        return histograms
+
+    def record(self, stage: str, seconds: float):
+        if self.enabled:
+            histograms = self._thread_histograms()
+            histogram = histograms.get(stage)
+            if histogram is None:
+                histogram = histograms[stage] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def count(self, name: str, amount=1):
+        if self.enabled:
+            with self._lock:
+                self._counters[name] = self._counters.get(name, 0) + amount
+
+    def register_gauge(self, name: str, fn: Callable[[], Any]):
+        with self._lock:
+            self._gauges[name] = fn
+
+    def unregister_gauge(self, name: str):
+        with self._lock:
+            self._gauges.pop(name, None)
+
+    def _merged(self) -> Dict[str, LatencyHistogram]:
+        """Histogramas de todos los hilos fusionados por etapa (copias)."""
+        with self._lock:
+            live = []
+            for thread_ref, histograms in self._shards:
+                thread = thread_ref()
+                if thread is not None and thread.is_alive():
+                    live.append((thread_ref, histograms))
+                    continue
+                # El hilo terminó: ya no escribe, se pliega en los retirados
+                for stage, histogram in list(histograms.items()):
+                    self._retired.setdefault(stage, LatencyHistogram()).merge(histogram)
+            self._shards = live
+            merged = {stage: LatencyHistogram().merge(h) for stage, h in self._retired.items()}
+            for _, histograms in live:
+                for stage, histogram in list(histograms.items()):
+                    merged.setdefault(stage, LatencyHistogram()).merge(histogram)
+        return merged
+
+    def histogram(self, stage: str) -> LatencyHistogram:
+        """Histograma de `stage` fusionado de todos los hilos (copia)."""
+        return self._merged().get(stage) or LatencyHistogram()
+
+    def reset(self):
+        with self._lock:
+            for histogram in self._retired.values():
+                histogram.reset()
+            for _, histograms in self._shards:
+                for histogram in list(histograms.values()):
+                    histogram.reset()
+            self._counters.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado actual de todas las métricas (serializable a JSON)."""
+        with self._lock:
+            gauges = dict(self._gauges)
+        gauge_values = {}
+        for name, fn in gauges.items():
+            try:
+                gauge_values[name] = fn()
+            except Exception as e:
+                gauge_values[name] = {"error": str(e)}
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            "uptime_s": time.time() - self.started,
+            "stages": {stage: h.snapshot() for stage, h in self._merged().items()},
+            "counters": counters,
+            "gauges": gauge_values,
+        }
+
+
+_metrics = PipelineMetrics()
+
+
+def get_metrics() -> PipelineMetrics:
+    """Instancia de métricas compartida por todo el proceso."""
+    return _metrics
+
+
+class LogRing(logging.Handler):
+    """
+    Handler de logging acotado para consolas en vivo (GUI): guarda los últimos `capacity`
+    registros sin formatear; el lector los formatea por lotes en su propio hilo con
+    `drain(seen)`. Registrar es un append a un deque: el hilo que loguea no paga el formato.
+    """
+    def __init__(self, capacity=2000, level=logging.NOTSET):
+        super().__init__(level)
+        self._records = deque(maxlen=capacity)
+        self.total = 0 # Registros emitidos desde el inicio (el lock del Handler serializa emit)
+
+    def emit(self, record: logging.LogRecord):
+        self._records.append(record)
+        self.total += 1
+
+    def drain(self, seen: int) -> Tuple[List[str], int, int]:
+        """
+        Líneas formateadas emitidas después de los `seen` primeros registros.
+        Devuelve (líneas, total actual, registros perdidos por desbordar el ring).
+        """
+        self.acquire()
+        try:
+            total = self.total
+            pending = min(total - seen, len(self._records))
+            records = list(self._records)[len(self._records) - pending:] if pending > 0 else []
+        finally:
+            self.release()
+        lost = max(0, total - seen - len(records))
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                lines.append(str(record.msg))
+        return lines, total, lost
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = json.dumps(get_metrics().snapshot(), default=str).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"MetricsServer: {format % args}")
+
+
+class MetricsServer:
+    """Endpoint HTTP local de solo lectura: GET /metrics devuelve el snapshot en JSON."""
+    def __init__(self, host='127.0.0.1', port=9108):
+        self.host = host
+        self.port = port
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread = None
+
+    def start(self) -> bool:
+        """Abre el endpoint. Si el puerto está ocupado lo registra y devuelve False: las métricas
+        son diagnóstico y no deben impedir que arranque el pipeline."""
+        try:
+            self._httpd = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        except OSError as e:
+            logging.error(f"MetricsServer: no se pudo abrir {self.host}:{self.port} ({e}); se sigue sin endpoint")
+            return False
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.5,), name="MetricsServer", daemon=True)
+        self._thread.start()
+        logging.info(f"MetricsServer en http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
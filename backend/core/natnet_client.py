@@ -1,30 +1,229 @@
 
 import socket
 import struct
+import sys
 import threading
-import queue
 import logging
-from typing import Dict, Any
+import time
+import numpy as np
+
+from core.data_descriptions import DataDescriptionCache
+from core.datagram_ring import DatagramRing
+from core.frame import MarkerSets, MocapFrame, RIGID_BODY_DTYPE
+from core.frame_mailbox import create_mailbox
+from core.metrics import get_metrics
 
 # Configuración de Logging para diagnóstico
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - [NATNET] - %(levelname)s - %(message)s')
 
+_UINT16 = struct.Struct('<H')
+_UINT32 = struct.Struct('<I')
+_SKELETON_HEADER = struct.Struct('<II')
+# Timecode, timecode sub, timestamp, 3 stamps de alta resolución (NatNet 3.0+), params
+_TAIL = struct.Struct('<IIdQQQh')
+_LABELED_MARKER_SIZE = 26 # ID, x/y/z, size, params (i16), residual
+_RB_SIZE = RIGID_BODY_DTYPE.itemsize
+_POLL_INTERVAL = 0.2
+_MAX_INTERNED_NAMES = 1024
+_NAME_WINDOW = 64 # Bytes que se copian de cada vez al buscar el fin de un nombre en una vista
+
+_marker_set_names = {}
+
+
+def _intern_marker_set_name(raw: bytes) -> str:
+    """Los nombres de marker set se repiten en cada frame: se decodifican una sola vez."""
+    name = _marker_set_names.get(raw)
+    if name is None:
+        if len(_marker_set_names) >= _MAX_INTERNED_NAMES:
+            _marker_set_names.clear()
+        name = _marker_set_names[raw] = raw.decode('utf-8', errors='replace')
+    return name
+
+
+def _name_end(view: memoryview, offset: int) -> int:
+    """Posición del terminador del nombre que empieza en `offset`, copiando solo ventanas cortas."""
+    start = offset
+    while True:
+        window = bytes(view[start:start + _NAME_WINDOW])
+        end = window.find(b"\0")
+        if end >= 0:
+            return start + end
+        if len(window) < _NAME_WINDOW:
+            raise ValueError("Nombre de marker set sin terminador")
+        start += _NAME_WINDOW
+
+
+def decode_frame_of_data(data, decode_markers=False) -> MocapFrame:
+    """
+    Parser principal para PacketID 7 (Frame of Data).
+    Basado en la especificación de NatNet 3.x.
+
+    Trabaja sobre un memoryview del datagrama: cada bloque de Rigid Bodies / huesos
+    se mapea directamente al dtype estructurado con np.frombuffer, sin slices de bytes
+    ni unpacks por campo.
+
+    Con `decode_markers` el bloque de marker sets se copia al frame (MarkerSets, arrays
+    materializados bajo demanda); sin él solo se salta.
+    """
+    view = memoryview(data)
+    offset = 4 # Saltamos MessageID (2) y PacketSize (2) ya leídos
+
+    frame_number = _UINT32.unpack_from(view, offset)[0]
+    offset += 4
+
+    # --- Marker sets: nombre (null terminated) + count + posiciones (M x 3 float32) ---
+    marker_set_count = _UINT32.unpack_from(view, offset)[0]
+    offset += 4
+    block_start = offset
+    names, counts, starts = [], [], []
+    # Sobre bytes los nombres se buscan con bytes.index; una vista de slot del ring no se copia
+    # entera: solo las ventanas donde está cada nombre
+    searchable = isinstance(data, (bytes, bytearray))
+    for _ in range(marker_set_count):
+        name_end = data.index(b"\0", offset) if searchable else _name_end(view, offset)
+        if decode_markers:
+            names.append(_intern_marker_set_name(bytes(view[offset:name_end])))
+        offset = name_end + 1
+        marker_count = _UINT32.unpack_from(view, offset)[0]
+        offset += 4
+        if decode_markers:
+            counts.append(marker_count)
+            starts.append(offset - block_start)
+        offset += marker_count * 12
+    marker_sets = None
+    if decode_markers:
+        marker_sets = MarkerSets(names, counts, bytes(view[block_start:offset]), starts)
+
+    # --- Rigid Bodies (bloque contiguo de registros de 36 bytes) ---
+    rb_count = _UINT32.unpack_from(view, offset)[0]
+    offset += 4
+    chunks = [view[offset:offset + rb_count * _RB_SIZE]]
+    offset += rb_count * _RB_SIZE
+
+    # --- Skeletons (NatNet 3.0+) ---
+    sk_count = _UINT32.unpack_from(view, offset)[0]
+    offset += 4
+    skeleton_ids = np.empty(sk_count, dtype=np.uint32)
+    skeleton_offsets = np.empty(sk_count + 1, dtype=np.int64)
+    skeleton_offsets[0] = rb_count
+    for i in range(sk_count):
+        skeleton_ids[i], bone_count = _SKELETON_HEADER.unpack_from(view, offset)
+        offset += 8
+        chunks.append(view[offset:offset + bone_count * _RB_SIZE])
+        offset += bone_count * _RB_SIZE
+        skeleton_offsets[i + 1] = skeleton_offsets[i] + bone_count
+
+    # --- Cola del frame (opcional: un paquete truncado o de otra versión se queda sin ella) ---
+    timestamp, params, timecode, timecode_sub = 0.0, 0, 0, 0
+    try:
+        labeled_count = _UINT32.unpack_from(view, offset)[0]
+        offset += 4 + labeled_count * _LABELED_MARKER_SIZE
+        for _ in range(2): # Force plates y devices: ID, canales y por canal sus muestras float
+            count = _UINT32.unpack_from(view, offset)[0]
+            offset += 4
+            for _ in range(count):
+                channel_count = _UINT32.unpack_from(view, offset + 4)[0]
+                offset += 8
+                for _ in range(channel_count):
+                    offset += 4 + _UINT32.unpack_from(view, offset)[0] * 4
+        timecode, timecode_sub, timestamp, _, _, _, params = _TAIL.unpack_from(view, offset)
+    except struct.error:
+        pass
+
+    # Los slices de memoryview no copian; se unen en un solo bloque y se mapean
+    # de una vez al dtype estructurado. El datagrama puede reutilizarse después.
+    block = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+    rows = np.frombuffer(block, dtype=RIGID_BODY_DTYPE, count=int(skeleton_offsets[-1]))
+    return MocapFrame(
+        frame_number=frame_number,
+        ids=rows["id"].copy(),
+        positions=np.ascontiguousarray(rows["pos"]),
+        rotations=np.ascontiguousarray(rows["rot"]),
+        errors=rows["err"].copy(),
+        rigid_body_count=rb_count,
+        skeleton_ids=skeleton_ids,
+        skeleton_offsets=skeleton_offsets,
+        timestamp=timestamp,
+        marker_sets=marker_sets,
+        params=params,
+        timecode=timecode,
+        timecode_sub=timecode_sub,
+    )
+
+
+def decode_timecode(timecode: int, timecode_sub: int = 0):
+    """Timecode SMPTE empaquetado de NatNet -> (horas, minutos, segundos, frames, subframe)."""
+    return (timecode >> 24) & 0xFF, (timecode >> 16) & 0xFF, (timecode >> 8) & 0xFF, timecode & 0xFF, timecode_sub
+
+
+def format_timecode(timecode: int, timecode_sub: int = 0) -> str:
+    """'HH:MM:SS:FF.sub', como lo muestra Motive."""
+    hours, minutes, seconds, frames, sub = decode_timecode(timecode, timecode_sub)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}:{frames:02d}.{sub}"
+
+
+def parse_timecode(text: str):
+    """'HH:MM:SS:FF[.sub]' -> (timecode empaquetado, subframe). Lanza ValueError si no es válido."""
+    clock, _, sub = text.strip().partition(".")
+    fields = clock.split(":")
+    if len(fields) != 4 or not all(field.isdigit() for field in fields) or (sub and not sub.isdigit()):
+        raise ValueError(f"Timecode inválido: {text!r} (formato HH:MM:SS:FF[.sub])")
+    hours, minutes, seconds, frames = (int(field) for field in fields)
+    if hours > 23 or minutes > 59 or seconds > 59 or frames > 0xFF:
+        raise ValueError(f"Timecode fuera de rango: {text!r}")
+    return (hours << 24) | (minutes << 16) | (seconds << 8) | frames, int(sub or 0)
+
+
 class NatNetClient:
     """
     Producer Engine para YeiciCap Hub.
-    Decodifica el bitstream de NatNet 3.x (Motive 2.x) y lo coloca en una queue thread-safe.
+    Decodifica el bitstream de NatNet 3.x (Motive 2.x) y lo entrega en un mailbox thread-safe.
     """
-    def __init__(self, multicast_ip="239.255.42.99", data_port=1511, buffer_size=65535):
+    RECEIVE_MODES = ("recvfrom", "ring", "batch")
+
+    def __init__(self, multicast_ip="239.255.42.99", data_port=1511, buffer_size=65535,
+                 receive_mode="ring", ring_slots=64, max_batch=16,
+                 handoff="latest", queue_size=100, server_ip=None, command_port=1510, bind_group=False):
+        if receive_mode not in self.RECEIVE_MODES:
+            raise ValueError(f"receive_mode inválido: {receive_mode!r} (opciones: {self.RECEIVE_MODES})")
+
         self.multicast_ip = multicast_ip
         self.data_port = data_port
         self.buffer_size = buffer_size
+        # Bind a la dirección del grupo en lugar de '': solo para varios clientes en el mismo
+        # puerto y grupos distintos (agregador). Un socket así no recibe NatNet unicast.
+        self.bind_group = bind_group
         
-        # Thread-safe Queue para el Consumer
-        self.frame_queue = queue.Queue(maxsize=100)
+        # Modo de recepción:
+        #   recvfrom -> un bytes nuevo por datagrama (comportamiento original)
+        #   ring     -> recv_into sobre un ring preasignado de bytearray
+        #   batch    -> como ring, pero drena varios datagramas por activación (recvmmsg en Linux)
+        self.receive_mode = receive_mode
+        self.max_batch = max_batch
+        self._ring = DatagramRing(ring_slots, buffer_size) if receive_mode != "recvfrom" else None
+        
+        # Hand-off thread-safe hacia el Consumer:
+        #   latest      -> slot único, el Consumer siempre recibe la pose más fresca
+        #   drop_oldest -> ring acotado que sobrescribe lo más viejo
+        #   fifo        -> cola acotada que descarta lo entrante (comportamiento original)
+        self.frame_queue = create_mailbox(handoff, queue_size)
+
+        # Grabación opcional de la toma (core.recording.CaptureRecorder): recibe cada
+        # datagrama de frame junto a su frame decodificado, sin bloquear al Producer
+        self.recorder = None
+
+        # Los marker sets solo se copian al frame si algún cliente los pidió (lo activa el
+        # pipeline a partir de la demanda agregada); si no, el decoder solo los salta
+        self.decode_markers = False
+
+        # Data descriptions (nombres y jerarquías) pedidas a Motive por el canal de comandos;
+        # solo si se indica la IP del servidor. Se vuelven a pedir cuando Motive avisa de cambios.
+        self.descriptions = DataDescriptionCache(server_ip, command_port) if server_ip else None
         
         self._running = False
         self._data_socket = None
         self._stop_event = threading.Event()
+        self._metrics = get_metrics()
 
     def _create_multicast_socket(self):
         """Inicializa el socket UDP con soporte para Multicast."""
@@ -32,8 +231,9 @@ class NatNetClient:
             sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
             sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             
-            # Bind a todas las interfaces en el puerto de datos
-            sock.bind(('', self.data_port))
+            # Bind al puerto de datos (Windows no permite bind a una dirección multicast)
+            group_bind = self.bind_group and sys.platform != "win32"
+            sock.bind((self.multicast_ip if group_bind else '', self.data_port))
             
             # Unirse al grupo multicast
             mreq = struct.pack("4sl", socket.inet_aton(self.multicast_ip), socket.INADDR_ANY)
@@ -45,116 +245,82 @@ class NatNetClient:
             logging.error(f"Error al crear el socket: {e}")
             return None
 
-    def _unpack_rigid_body(self, data, offset):
-        """Decodifica un Rigid Body individual (NatNet 3.x)."""
-        # Estructura: ID (4b), Pos (3x4b float), Rot (4x4b float)
-        rb_id = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        
-        pos = struct.unpack('<fff', data[offset:offset+12])
-        offset += 12
-        
-        rot = struct.unpack('<ffff', data[offset:offset+16])
-        offset += 16
-        
-        return {
-            "id": rb_id,
-            "pos": pos, # X, Y, Z
-            "rot": rot  # X, Y, Z, W
-        }, offset
-
-    def _unpack_frame_of_data(self, data):
-        """
-        Parser principal para PacketID 7 (Frame of Data).
-        Basado en la especificación de NatNet 3.x.
-        """
-        offset = 4 # Saltamos MessageID (2) y PacketSize (2) ya leídos
-        
-        frame_number = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        
-        # --- Marcadores (Omitidos por brevedad pero offset avanzado) ---
-        marker_set_count = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        for _ in range(marker_set_count):
-            # Saltar nombre del marker set (null terminated)
-            while data[offset] != 0: offset += 1
-            offset += 1
-            # Saltar markers individuales
-            marker_count = struct.unpack('<I', data[offset:offset+4])[0]
-            offset += 4 + (marker_count * 12)
-
-        # --- Rigid Bodies ---
-        rb_count = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        rigid_bodies = []
-        for _ in range(rb_count):
-            rb_data, offset = self._unpack_rigid_body(data, offset)
-            rigid_bodies.append(rb_data)
-            # NatNet 3.x incluye marker error (4b) después de cada RB
-            offset += 4 
-
-        # --- Skeletons (NatNet 3.0+) ---
-        sk_count = struct.unpack('<I', data[offset:offset+4])[0]
-        offset += 4
-        skeletons = []
-        for _ in range(sk_count):
-            sk_id = struct.unpack('<I', data[offset:offset+4])[0]
-            offset += 4
-            sk_rb_count = struct.unpack('<I', data[offset:offset+4])[0]
-            offset += 4
-            sk_rbs = []
-            for _ in range(sk_rb_count):
-                rb_data, offset = self._unpack_rigid_body(data, offset)
-                sk_rbs.append(rb_data)
-                offset += 4 # Marker error
-            skeletons.append({"id": sk_id, "rigid_bodies": sk_rbs})
-
-        return {
-            "frame_number": frame_number,
-            "rigid_bodies": rigid_bodies,
-            "skeletons": skeletons
-        }
+    def _unpack_frame_of_data(self, data) -> MocapFrame:
+        """Parser principal para PacketID 7 (Frame of Data)."""
+        return decode_frame_of_data(data, self.decode_markers)
+
+    def _handle_packet(self, data, received_at=0.0):
+        """Identifica el PacketID de un datagrama (bytes o vista de slot) y lo decodifica."""
+        if not data:
+            return
+        try:
+            message_id = _UINT16.unpack_from(data, 0)[0]
+            
+            # PacketID 7 = Frame of Data
+            if message_id == 7:
+                frame = self._unpack_frame_of_data(data)
+                frame.decoded_at = time.perf_counter()
+                if received_at:
+                    frame.received_at = received_at
+                    self._metrics.record("decode", frame.decoded_at - received_at)
+                if self.recorder is not None:
+                    self.recorder.on_packet(data, frame)
+                if self.descriptions is not None:
+                    self.descriptions.observe(frame.params)
+                
+                # Nunca bloquea: la política del mailbox decide qué frame se pierde
+                self.frame_queue.put_nowait(frame)
+        except Exception as e:
+            # Mantener el socket abierto ante paquetes corruptos
+            logging.error(f"Error crítico al decodificar paquete: {e}")
+            self._metrics.count("decode_errors")
+
+    def _receive(self):
+        """Devuelve los datagramas disponibles según el modo de recepción configurado."""
+        if self.receive_mode == "batch":
+            return self._ring.recv_batch(self._data_socket, self.max_batch, _POLL_INTERVAL)
+        if self.receive_mode == "ring":
+            return (self._ring.recv_into(self._data_socket),)
+        data, addr = self._data_socket.recvfrom(self.buffer_size)
+        return (data,)
 
     def _listen(self):
         """Bucle principal de escucha en hilo secundario."""
         while not self._stop_event.is_set():
             try:
-                data, addr = self._data_socket.recvfrom(self.buffer_size)
-                if not data: continue
-                
-                # Identificar PacketID
-                message_id = struct.unpack('<H', data[0:2])[0]
-                
-                # PacketID 7 = Frame of Data
-                if message_id == 7:
-                    frame = self._unpack_frame_of_data(data)
-                    
-                    # Intentar poner en queue sin bloquear indefinidamente
-                    try:
-                        self.frame_queue.put_nowait(frame)
-                    except queue.Full:
-                        # Si la queue está llena, descartamos el frame más viejo (LIFO-like behavior)
-                        # o simplemente ignoramos para priorizar latencia sobre integridad histórica
-                        pass
-                
-            except socket.error as e:
-                if self._running:
-                    logging.error(f"Socket error: {e}")
-            except Exception as e:
-                logging.error(f"Error crítico al decodificar paquete: {e}")
-                continue # Mantener el socket abierto ante paquetes corruptos
+                # Las vistas del ring solo son válidas hasta la siguiente vuelta:
+                # se decodifican (copiando a arrays propios) antes de volver a recibir
+                packets = self._receive()
+                received_at = time.perf_counter()
+                for data in packets:
+                    self._handle_packet(data, received_at)
+            except socket.timeout:
+                continue
+            except (OSError, ValueError) as e:
+                # stop() cierra el socket: recv falla con EBADF y select con ValueError (fileno -1)
+                if not self._running:
+                    break
+                logging.error(f"Socket error: {e}")
+                self._stop_event.wait(_POLL_INTERVAL) # Sin girar en vacío si el error persiste
 
     def start(self):
         """Inicia el proceso de captura."""
         self._data_socket = self._create_multicast_socket()
         if not self._data_socket:
             return False
+
+        # Timeout corto (o modo no bloqueante + select en batch) para revisar _stop_event
+        if self.receive_mode == "batch":
+            self._data_socket.setblocking(False)
+        else:
+            self._data_socket.settimeout(_POLL_INTERVAL)
             
         self._running = True
         self._stop_event.clear()
         self._thread = threading.Thread(target=self._listen, name="NatNetProducer", daemon=True)
         self._thread.start()
+        if self.descriptions is not None:
+            self.descriptions.start()
         logging.info("Producer iniciado y escuchando activamente.")
         return True
 
@@ -162,6 +328,8 @@ class NatNetClient:
         """Detiene el proceso de captura de forma segura."""
         self._running = False
         self._stop_event.set()
+        if self.descriptions is not None:
+            self.descriptions.stop()
         if self._data_socket:
             # Forzar el cierre del socket para desbloquear recvfrom
             self._data_socket.close()
@@ -0,0 +1,423 @@
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import numpy as np
+
+from core.frame import MocapFrame, RIGID_BODY_DTYPE
+from core.natnet_client import decode_frame_of_data, format_timecode
+
+# --- Formato de captura YeiciCap (.ycap + índice .ycap.idx) ---
+#
+# Fichero de datos (append-only):
+#   Header:   magic 'YREC' | version u16 | mode u8 | (relleno) | created f64 (epoch) | reservado
+#   Registros: length u32 | frame_number u32 | time f64 (s desde el inicio de la toma) | payload
+#     mode raw    -> payload = datagrama NatNet (PacketID 7) tal cual llegó
+#     mode frames -> payload = rigid_body_count u32 | skeleton_count u32 | row_count u32 | params i32 |
+#                              timestamp f64 | timecode u32 | timecode_sub u32 |
+#                              skeleton_ids u32[S] | skeleton_offsets i64[S + 1] | filas RIGID_BODY_DTYPE[N]
+#                    (v1: sin params/timestamp/timecode, solo relleno tras row_count; se siguen leyendo)
+#                    Los markers no se guardan: quien los necesite debe grabar en raw
+#
+# Índice (append-only, registros fijos de 32 bytes, mapeable con numpy):
+#   Header: magic 'YIDX' | version u16 | (relleno hasta 16)
+#   Entradas: offset del payload u64 | frame_number u32 | length u32 | time f64 |
+#             timecode u32 | timecode_sub u32 (SMPTE empaquetado de NatNet, 0 si Motive no lo envía)
+#   (v1/v2: registros de 24 bytes sin timecode; se reconstruyen al abrirlos)
+# Si el índice falta, quedó corto (corte de luz, kill) o es de una versión anterior, se
+# reconstruye recorriendo los datos.
+
+CAPTURE_MAGIC = b"YREC"
+INDEX_MAGIC = b"YIDX"
+CAPTURE_VERSION = 2
+_READABLE_VERSIONS = (1, 2)
+INDEX_VERSION = 3
+CAPTURE_MODES = {"raw": 0, "frames": 1}
+
+_FILE_HEADER = struct.Struct("<4sHBxd16x")
+_INDEX_HEADER = struct.Struct("<4sH10x")
+_RECORD = struct.Struct("<IId")
+_FRAME_HEADER = struct.Struct("<IIIidII")
+_FRAME_HEADER_V1 = struct.Struct("<III4x")
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("frame_number", "<u4"), ("length", "<u4"), ("time", "<f8"),
+                        ("timecode", "<u4"), ("timecode_sub", "<u4")])
+_INDEX_ENTRY = struct.Struct("<QIIdII")
+
+
+def _index_path(path: str) -> str:
+    return path + ".idx"
+
+
+def _pack_frame(frame: MocapFrame) -> bytes:
+    """Serializa un MocapFrame al layout fijo del modo frames."""
+    rows = np.empty(frame.row_count, dtype=RIGID_BODY_DTYPE)
+    rows["id"] = frame.ids
+    rows["pos"] = frame.positions
+    rows["rot"] = frame.rotations
+    rows["err"] = frame.errors
+    return b"".join((
+        _FRAME_HEADER.pack(frame.rigid_body_count, frame.skeleton_count, frame.row_count, frame.params,
+                           frame.timestamp, frame.timecode, frame.timecode_sub),
+        frame.skeleton_ids.astype("<u4", copy=False).tobytes(),
+        frame.skeleton_offsets.astype("<i8", copy=False).tobytes(),
+        rows.tobytes(),
+    ))
+
+
+def _unpack_frame(buf, offset: int, frame_number: int, version: int = CAPTURE_VERSION) -> MocapFrame:
+    if version == 1:
+        rb_count, sk_count, row_count = _FRAME_HEADER_V1.unpack_from(buf, offset)
+        params, timestamp, timecode, timecode_sub = 0, 0.0, 0, 0
+        offset += _FRAME_HEADER_V1.size
+    else:
+        rb_count, sk_count, row_count, params, timestamp, timecode, timecode_sub = _FRAME_HEADER.unpack_from(buf, offset)
+        offset += _FRAME_HEADER.size
+    skeleton_ids = np.frombuffer(buf, dtype="<u4", count=sk_count, offset=offset).copy()
+    offset += sk_count * 4
+    skeleton_offsets = np.frombuffer(buf, dtype="<i8", count=sk_count + 1, offset=offset).copy()
+    offset += (sk_count + 1) * 8
+    rows = np.frombuffer(buf, dtype=RIGID_BODY_DTYPE, count=row_count, offset=offset)
+    return MocapFrame(
+        frame_number=frame_number,
+        ids=rows["id"].copy(),
+        positions=np.ascontiguousarray(rows["pos"]),
+        rotations=np.ascontiguousarray(rows["rot"]),
+        errors=rows["err"].copy(),
+        rigid_body_count=rb_count,
+        skeleton_ids=skeleton_ids,
+        skeleton_offsets=skeleton_offsets,
+        timestamp=timestamp,
+        params=params,
+        timecode=timecode,
+        timecode_sub=timecode_sub,
+    )
+
+
+class CaptureRecorder:
+    """
+    Graba la toma en vivo a un fichero append-only con índice por frame/tiempo/timecode.
+
+    `on_packet(data, frame)` se llama desde el hilo del Producer (NatNetClient.recorder):
+    solo copia el datagrama (modo raw) o toma la referencia al frame (modo frames) y lo
+    deja en una cola; un hilo escritor propio hace el I/O en bloques, así el disco nunca
+    frena la recepción.
+    """
+    def __init__(self, path: str, mode="raw", max_pending=4096):
+        if mode not in CAPTURE_MODES:
+            raise ValueError(f"Modo de grabación inválido: {mode!r} (opciones: {tuple(CAPTURE_MODES)})")
+        self.path = path
+        self.mode = mode
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._cond = threading.Condition(threading.Lock())
+        self._running = False
+        self._thread = None
+        self._started_at = None
+
+        self.frames_written = 0
+        self.bytes_written = 0
+        self.frames_dropped = 0
+
+    def start(self):
+        self._data = open(self.path, "wb", buffering=1024 * 1024)
+        self._index = open(_index_path(self.path), "wb", buffering=64 * 1024)
+        self._data.write(_FILE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, CAPTURE_MODES[self.mode], time.time()))
+        self._index.write(_INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION))
+        self._offset = _FILE_HEADER.size
+        self._started_at = None
+        self._running = True
+        self._thread = threading.Thread(target=self._run_writer, name="CaptureRecorder", daemon=True)
+        self._thread.start()
+        logging.info(f"Grabando toma ({self.mode}) en {self.path}")
+
+    def on_packet(self, data, frame: MocapFrame):
+        """Hot path: encola el datagrama (copiado) o el frame decodificado. Nunca bloquea."""
+        if not self._running:
+            return
+        received_at = frame.received_at or time.perf_counter()
+        if self._started_at is None:
+            self._started_at = received_at
+        item = (bytes(data) if self.mode == "raw" else frame, frame.frame_number, received_at - self._started_at,
+                frame.timecode, frame.timecode_sub)
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                self.frames_dropped += 1
+                return
+            self._pending.append(item)
+            self._cond.notify()
+
+    def _run_writer(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or not self._running, 0.5)
+                batch = list(self._pending)
+                self._pending.clear()
+                running = self._running
+            for item in batch:
+                self._write(*item)
+            if not running and not batch:
+                break
+
+    def _write(self, payload, frame_number: int, elapsed: float, timecode: int, timecode_sub: int):
+        if self.mode == "frames":
+            payload = _pack_frame(payload)
+        length = len(payload)
+        self._data.write(_RECORD.pack(length, frame_number, elapsed))
+        self._data.write(payload)
+        payload_offset = self._offset + _RECORD.size
+        self._index.write(_INDEX_ENTRY.pack(payload_offset, frame_number, length, elapsed, timecode, timecode_sub))
+        self._offset = payload_offset + length
+        self.frames_written += 1
+        self.bytes_written += _RECORD.size + length
+
+    def stop(self):
+        if not self._running:
+            return
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join()
+        self._data.close()
+        self._index.close()
+        logging.info(f"Grabación cerrada: {self.frames_written} frames, {self.bytes_written / 1e6:.1f} MB, "
+                     f"{self.frames_dropped} descartados")
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "mode": self.mode,
+            "frames_written": self.frames_written,
+            "bytes_written": self.bytes_written,
+            "frames_dropped": self.frames_dropped,
+            "pending": len(self._pending),
+        }
+
+
+class CaptureReader:
+    """
+    Lectura aleatoria de una captura mediante mmap: ni los datos ni el índice se cargan
+    en RAM (el sistema pagina lo que se va leyendo), así que sirve para sesiones de varios GB.
+
+    Búsqueda por frame O(1) cuando la numeración es consecutiva (lo normal) y por tiempo
+    O(1) amortizado con una estimación a ritmo constante; si no, búsqueda binaria. Por
+    timecode SMPTE, recorrido vectorizado de la columna del índice.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, mode_code, self.created = _FILE_HEADER.unpack_from(self._mm, 0)
+        if magic != CAPTURE_MAGIC or self.version not in _READABLE_VERSIONS:
+            raise ValueError(f"{path!r} no es una captura YeiciCap v{CAPTURE_VERSION}")
+        self.mode = next(name for name, code in CAPTURE_MODES.items() if code == mode_code)
+
+        self._index_mm = None
+        self.index = self._load_index()
+        # Como en NatNetClient: los marker sets de las capturas raw solo se decodifican si se piden
+        self.decode_markers = False
+        self.frame_numbers = self.index["frame_number"]
+        self.times = self.index["time"]
+
+    def _load_index(self) -> np.ndarray:
+        index_path = _index_path(self.path)
+        entries = None
+        if os.path.exists(index_path) and os.path.getsize(index_path) >= _INDEX_HEADER.size:
+            with open(index_path, "rb") as f:
+                self._index_mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version = _INDEX_HEADER.unpack_from(self._index_mm, 0)
+            if magic == INDEX_MAGIC and version == INDEX_VERSION:
+                count = (len(self._index_mm) - _INDEX_HEADER.size) // INDEX_DTYPE.itemsize
+                entries = np.frombuffer(self._index_mm, dtype=INDEX_DTYPE, count=count, offset=_INDEX_HEADER.size)
+
+        # El índice es válido si cubre exactamente hasta el final de los datos
+        end = int(entries["offset"][-1] + entries["length"][-1]) if entries is not None and len(entries) else _FILE_HEADER.size
+        if entries is not None and end == len(self._mm):
+            return entries
+        if self._index_mm is not None:
+            # Soltar el mapeo antes de reescribir el fichero (Windows no deja truncar un fichero mapeado)
+            entries = None
+            self._index_mm.close()
+            self._index_mm = None
+        logging.warning(f"Índice de {self.path} ausente, incompleto o sin timecode: reconstruyendo...")
+        return self._rebuild_index(index_path)
+
+    def _rebuild_index(self, index_path: str) -> np.ndarray:
+        rows = []
+        offset = _FILE_HEADER.size
+        size = len(self._mm)
+        while offset + _RECORD.size <= size:
+            length, frame_number, elapsed = _RECORD.unpack_from(self._mm, offset)
+            payload = offset + _RECORD.size
+            if payload + length > size:
+                break # Registro truncado al final: se ignora
+            rows.append((payload, frame_number, length, elapsed) + self._record_timecode(payload, length))
+            offset = payload + length
+        entries = np.array(rows, dtype=INDEX_DTYPE)
+        with open(index_path, "wb") as f:
+            f.write(_INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION))
+            f.write(entries.tobytes())
+        return entries
+
+    def _record_timecode(self, offset: int, length: int):
+        """(timecode, timecode_sub) de un registro, para reconstruir el índice."""
+        if self.mode == "frames":
+            return _FRAME_HEADER.unpack_from(self._mm, offset)[5:] if self.version >= 2 else (0, 0)
+        try:
+            frame = decode_frame_of_data(memoryview(self._mm)[offset:offset + length])
+        except (ValueError, struct.error):
+            return 0, 0
+        return frame.timecode, frame.timecode_sub
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def duration(self) -> float:
+        return float(self.times[-1] - self.times[0]) if len(self.index) else 0.0
+
+    def frame(self, position: int) -> MocapFrame:
+        """Frame en la posición `position` del índice (decodificado desde el mmap)."""
+        entry = self.index[position]
+        offset, length, frame_number = int(entry["offset"]), int(entry["length"]), int(entry["frame_number"])
+        if self.mode == "raw":
+            return decode_frame_of_data(memoryview(self._mm)[offset:offset + length], self.decode_markers)
+        return _unpack_frame(self._mm, offset, frame_number, self.version)
+
+    def position_of_frame(self, frame_number: int) -> int:
+        """Posición del primer frame >= `frame_number`."""
+        count = len(self.index)
+        if not count:
+            return 0
+        guess = frame_number - int(self.frame_numbers[0])
+        if 0 <= guess < count and self.frame_numbers[guess] == frame_number:
+            return guess
+        return min(int(np.searchsorted(self.frame_numbers, frame_number)), count - 1)
+
+    def position_of_time(self, seconds: float) -> int:
+        """Posición del último frame con time <= `seconds` (segundos desde el inicio de la toma)."""
+        count = len(self.index)
+        if count < 2:
+            return 0
+        times = self.times
+        first, last = float(times[0]), float(times[-1])
+        position = int((seconds - first) / (last - first) * (count - 1)) if last > first else 0
+        position = min(max(position, 0), count - 1)
+        # Corrección local de la estimación (unos pocos pasos con ritmo estable)
+        for _ in range(8):
+            if position > 0 and times[position] > seconds:
+                position -= 1
+            elif position < count - 1 and times[position + 1] <= seconds:
+                position += 1
+            else:
+                return position
+        return max(int(np.searchsorted(times, seconds, side="right")) - 1, 0)
+
+    def position_of_timecode(self, timecode: int, timecode_sub: int = 0) -> int:
+        """
+        Posición del primer frame (en orden de grabación) con timecode >= el pedido; el último
+        si ninguno llega. No se asume orden: el timecode puede aparecer a mitad de toma (genlock
+        tardío) o dar la vuelta a medianoche. Lanza ValueError si la captura no tiene timecode.
+        """
+        codes = self.index["timecode"]
+        if not len(codes) or not codes.any():
+            raise ValueError(f"{self.path!r} no tiene timecode")
+        keys = (codes.astype(np.uint64) << np.uint64(32)) | self.index["timecode_sub"]
+        reached = keys >= np.uint64((timecode << 32) | timecode_sub)
+        position = int(np.argmax(reached))
+        if not reached[position]:
+            logging.warning(f"Timecode {format_timecode(timecode, timecode_sub)} posterior al final de "
+                            f"{self.path}: se usa el último frame")
+            return len(codes) - 1
+        return position
+
+    def close(self):
+        self.index = self.frame_numbers = self.times = None
+        self._mm.close()
+        if self._index_mm is not None:
+            self._index_mm.close()
+        self._file.close()
+
+
+class CaptureReplayer:
+    """
+    Reproduce una captura hacia `sink(frame)` (p. ej. MocapTransformer -> StreamServer) en
+    tiempo real (`speed=1`), escalado (`speed=0.5`, `2.0`...) o a máxima velocidad (`speed=0`).
+    `seek_frame` / `seek_time` / `seek_timecode` pueden llamarse en caliente desde otro hilo.
+    """
+    def __init__(self, reader: CaptureReader, sink: Callable[[MocapFrame], None], speed=1.0, loop=False):
+        self.reader = reader
+        self.sink = sink
+        self.speed = speed
+        self.loop = loop
+        self._seek_to: Optional[int] = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.position = 0
+        self.frames_played = 0
+
+    def seek_frame(self, frame_number: int):
+        self._seek_to = self.reader.position_of_frame(frame_number)
+
+    def seek_time(self, seconds: float):
+        self._seek_to = self.reader.position_of_time(seconds)
+
+    def seek_timecode(self, timecode: int, timecode_sub: int = 0):
+        self._seek_to = self.reader.position_of_timecode(timecode, timecode_sub)
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="CaptureReplayer", daemon=True)
+        self._thread.start()
+        logging.info(f"Reproduciendo {self.reader.path} ({len(self.reader)} frames, {self.reader.duration:.1f} s, "
+                     f"velocidad {self.speed or 'máxima'})")
+
+    def _run(self):
+        reader = self.reader
+        times = reader.times
+        count = len(reader)
+        position = self.position
+        anchor = None # (posición, instante de reloj) que ancla el calendario de reproducción
+        while not self._stop_event.is_set():
+            if self._seek_to is not None:
+                position, self._seek_to, anchor = self._seek_to, None, None
+            if position >= count:
+                if not self.loop or not count:
+                    break
+                position, anchor = 0, None
+
+            if self.speed > 0:
+                now = time.perf_counter()
+                if anchor is None:
+                    anchor = (position, now)
+                deadline = anchor[1] + (times[position] - times[anchor[0]]) / self.speed
+                if deadline - now > 0.5:
+                    # Hueco largo en la toma (pausa de grabación): no quedarse dormido sin atender seeks
+                    self._stop_event.wait(0.1)
+                    continue
+                if deadline > now:
+                    time.sleep(deadline - now)
+
+            frame = reader.frame(position)
+            frame.received_at = frame.decoded_at = time.perf_counter()
+            self.position = position
+            self.sink(frame)
+            self.frames_played += 1
+            position += 1
+        logging.info(f"Reproducción terminada: {self.frames_played} frames.")
+
+    def wait(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stop(self):
+        self._stop_event.set()
+        self.wait(2.0)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
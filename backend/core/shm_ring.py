@@ -0,0 +1,604 @@
+import logging
+import multiprocessing
+import queue
+import struct
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from core.frame import MocapFrame
+from core.frame_mailbox import HANDOFF_POLICIES
+
+# --- Layout del bloque de memoria compartida ---
+#
+#   Header global (128 bytes): magic 'YSHM' | version u32 | slot_count u32 | max_rows u32 |
+#                              max_skeletons u32 | policy u32 | (relleno) | contadores u64 @ 64:
+#                              write_seq | dropped | read_seq | consumed | overwritten | torn_reads
+#   Slots (slot_count), cada uno con layout fijo:
+#       seq u64 | frame_number u32 | rigid_body_count u32 | row_count u32 | skeleton_count u32 |
+#       timestamp f64 | received_at f64 | decoded_at f64 | params i32 | timecode u32 | timecode_sub u32 | ids u32[max_rows] | positions f32[max_rows, 3] | rotations f32[max_rows, 4] |
+#       errors f32[max_rows] | skeleton_ids u32[max_skeletons] | skeleton_offsets i64[max_skeletons + 1]
+#
+# Handshake por número de secuencia (seqlock por slot): el frame n se escribe en el slot
+# n % slot_count marcándolo 2n+1 (escribiendo) y luego 2n+2 (listo); después se publica
+# write_seq = n + 1. El lector copia el slot y lo da por bueno solo si seq vale 2n+2
+# antes y después de copiar, y publica read_seq (siguiente frame que leerá).
+#
+# La política de hand-off (la misma --handoff del resto del Hub) decide qué frames lee:
+#   latest      -> siempre el más reciente; los intermedios cuentan como sobrescritos
+#   drop_oldest -> en orden; si el escritor dio la vuelta, se salta a lo más antiguo aún válido
+#   fifo        -> en orden y sin pérdidas en el ring: con el ring lleno (write_seq - read_seq ==
+#                  slot_count) el escritor descarta el frame entrante y lo cuenta en dropped
+# Los contadores del lector también viven en el header: cualquier proceso ve las estadísticas.
+
+SHM_MAGIC = b"YSHM"
+SHM_VERSION = 4
+
+_HEADER = struct.Struct("<4sIIIII")
+_HEADER_SIZE = 128
+_COUNTERS_OFFSET = 64
+_WRITE_SEQ, _DROPPED, _READ_SEQ, _CONSUMED, _OVERWRITTEN, _TORN_READS = range(6)
+_POLICY_CODES = {name: code for code, name in enumerate(HANDOFF_POLICIES)}
+_SLOT_HEADER = np.dtype([
+    ("seq", "<u8"),
+    ("frame_number", "<u4"),
+    ("rigid_body_count", "<u4"),
+    ("row_count", "<u4"),
+    ("skeleton_count", "<u4"),
+    ("timestamp", "<f8"),
+    ("received_at", "<f8"),
+    ("decoded_at", "<f8"),
+    ("params", "<i4"),
+    ("timecode", "<u4"),
+    ("timecode_sub", "<u4"),
+])
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+class _SlotView:
+    """Vistas numpy (sin copia) sobre un slot del bloque compartido."""
+    __slots__ = ("header", "ids", "positions", "rotations", "errors", "skeleton_ids", "skeleton_offsets")
+
+    def __init__(self, buf, offset: int, max_rows: int, max_skeletons: int):
+        def view(dtype, shape):
+            nonlocal offset
+            array = np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+            offset += _align(array.nbytes)
+            return array
+
+        self.header = view(_SLOT_HEADER, (1,))[0]
+        self.ids = view("<u4", (max_rows,))
+        self.positions = view("<f4", (max_rows, 3))
+        self.rotations = view("<f4", (max_rows, 4))
+        self.errors = view("<f4", (max_rows,))
+        self.skeleton_ids = view("<u4", (max_skeletons,))
+        self.skeleton_offsets = view("<i8", (max_skeletons + 1,))
+
+    @staticmethod
+    def size(max_rows: int, max_skeletons: int) -> int:
+        return (_align(_SLOT_HEADER.itemsize) + _align(max_rows * 4) * 3 + _align(max_rows * 12)
+                + _align(max_rows * 16) + _align(max_skeletons * 4) + _align((max_skeletons + 1) * 8))
+
+
+class SharedFrameRing:
+    """
+    Ring de MocapFrames en `multiprocessing.shared_memory` para pasar frames decodificados
+    entre procesos sin pickle: un único escritor y un único lector.
+
+    Expone la API de mailbox del resto del Hub: el escritor hace `put_nowait(frame)` (se
+    puede usar como `NatNetClient.frame_queue`) y el lector `get(block, timeout)`, que
+    entrega los frames según la política de hand-off `policy` (ver HANDOFF_POLICIES);
+    tras cada lectura `last_seq` es la secuencia del frame devuelto. Se crea en el proceso
+    padre y se pasa al hijo como argumento de `Process` (viaja solo el nombre del bloque y
+    el evento de aviso).
+    """
+    def __init__(self, slot_count=8, max_rows=2048, max_skeletons=64, name: Optional[str] = None,
+                 create=True, notify=None, policy="latest"):
+        if create:
+            if policy not in _POLICY_CODES:
+                raise ValueError(f"Política de hand-off desconocida: {policy!r} (opciones: {tuple(HANDOFF_POLICIES)})")
+            self.slot_count = slot_count
+            self.max_rows = max_rows
+            self.max_skeletons = max_skeletons
+            self.policy = policy
+            size = _HEADER_SIZE + slot_count * _SlotView.size(max_rows, max_skeletons)
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self._shm.buf[:_HEADER_SIZE] = bytes(_HEADER_SIZE)
+            _HEADER.pack_into(self._shm.buf, 0, SHM_MAGIC, SHM_VERSION, slot_count, max_rows, max_skeletons,
+                              _POLICY_CODES[policy])
+            self._notify = notify if notify is not None else multiprocessing.get_context("spawn").Event()
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            magic, version, self.slot_count, self.max_rows, self.max_skeletons, code = _HEADER.unpack_from(self._shm.buf, 0)
+            if magic != SHM_MAGIC or version != SHM_VERSION:
+                self._shm.close()
+                raise ValueError(f"Bloque compartido {name!r} no es un SharedFrameRing v{SHM_VERSION}")
+            self.policy = tuple(HANDOFF_POLICIES)[code]
+            self._notify = notify
+
+        self.name = self._shm.name
+        self._owner = create
+        self._in_order = self.policy != "latest"
+        self._counters = np.ndarray((6,), dtype="<u8", buffer=self._shm.buf, offset=_COUNTERS_OFFSET)
+        slot_size = _SlotView.size(self.max_rows, self.max_skeletons)
+        self._slots = [
+            _SlotView(self._shm.buf, _HEADER_SIZE + i * slot_size, self.max_rows, self.max_skeletons)
+            for i in range(self.slot_count)
+        ]
+        self._next_seq = int(self._counters[_READ_SEQ])
+        self.last_seq = -1
+
+    def __reduce__(self):
+        return (_attach, (self.name, self._notify))
+
+    # --- Escritor ---
+
+    def put_nowait(self, frame: MocapFrame) -> bool:
+        """Copia el frame al siguiente slot y lo publica. Nunca bloquea; False si se descartó."""
+        rows, skeletons = frame.row_count, frame.skeleton_count
+        if rows > self.max_rows or skeletons > self.max_skeletons:
+            self._counters[_DROPPED] += 1
+            logging.warning(f"Frame {frame.frame_number} excede la capacidad del ring compartido "
+                            f"({rows}/{self.max_rows} filas, {skeletons}/{self.max_skeletons} skeletons)")
+            return False
+
+        n = int(self._counters[_WRITE_SEQ])
+        if self.policy == "fifo" and n - int(self._counters[_READ_SEQ]) >= self.slot_count:
+            self._counters[_DROPPED] += 1 # Lleno: se descarta el entrante, nunca lo no leído
+            return False
+        slot = self._slots[n % self.slot_count]
+        header = slot.header
+        header["seq"] = 2 * n + 1
+        header["frame_number"] = frame.frame_number
+        header["rigid_body_count"] = frame.rigid_body_count
+        header["row_count"] = rows
+        header["skeleton_count"] = skeletons
+        header["timestamp"] = frame.timestamp
+        header["received_at"] = frame.received_at
+        header["decoded_at"] = frame.decoded_at
+        header["params"] = frame.params
+        header["timecode"] = frame.timecode
+        header["timecode_sub"] = frame.timecode_sub
+        slot.ids[:rows] = frame.ids
+        slot.positions[:rows] = frame.positions
+        slot.rotations[:rows] = frame.rotations
+        slot.errors[:rows] = frame.errors
+        slot.skeleton_ids[:skeletons] = frame.skeleton_ids
+        slot.skeleton_offsets[:skeletons + 1] = frame.skeleton_offsets
+        header["seq"] = 2 * n + 2
+        self._counters[_WRITE_SEQ] = n + 1
+        if self._notify is not None:
+            self._notify.set()
+        return True
+
+    # --- Lector ---
+
+    def _read_slot(self, n: int) -> Optional[MocapFrame]:
+        slot = self._slots[n % self.slot_count]
+        ready = 2 * n + 2
+        if slot.header["seq"] != ready:
+            return None
+        header = slot.header.copy()
+        rows, skeletons = int(header["row_count"]), int(header["skeleton_count"])
+        frame = MocapFrame(
+            frame_number=int(header["frame_number"]),
+            ids=slot.ids[:rows].copy(),
+            positions=slot.positions[:rows].copy(),
+            rotations=slot.rotations[:rows].copy(),
+            errors=slot.errors[:rows].copy(),
+            rigid_body_count=int(header["rigid_body_count"]),
+            skeleton_ids=slot.skeleton_ids[:skeletons].copy(),
+            skeleton_offsets=slot.skeleton_offsets[:skeletons + 1].copy(),
+            timestamp=float(header["timestamp"]),
+            params=int(header["params"]),
+            timecode=int(header["timecode"]),
+            timecode_sub=int(header["timecode_sub"]),
+        )
+        # perf_counter es CLOCK_MONOTONIC en todo el sistema: comparable entre procesos
+        frame.received_at = float(header["received_at"])
+        frame.decoded_at = float(header["decoded_at"])
+        # Si el escritor dio la vuelta mientras copiábamos, la copia no es válida
+        return frame if slot.header["seq"] == ready else None
+
+    def _read_next(self) -> Optional[MocapFrame]:
+        counters = self._counters
+        while True:
+            published = int(counters[_WRITE_SEQ])
+            if published <= self._next_seq:
+                return None
+            if not self._in_order:
+                n = published - 1
+            else:
+                # Lo más antiguo que sigue en el ring (con fifo el escritor nunca adelanta al lector)
+                n = max(self._next_seq, published - self.slot_count)
+            counters[_OVERWRITTEN] += n - self._next_seq
+            frame = self._read_slot(n)
+            if frame is not None:
+                self._next_seq = n + 1
+                counters[_READ_SEQ] = n + 1
+                counters[_CONSUMED] += 1
+                self.last_seq = n
+                return frame
+            counters[_TORN_READS] += 1
+            self._next_seq = n
+            if int(counters[_WRITE_SEQ]) == published:
+                # Nada nuevo publicado: el slot sigue a medio escribir (escritor caído o a mitad
+                # de la vuelta). Se salta ese frame en lugar de girar hasta que cambie
+                self._next_seq = n + 1
+                counters[_READ_SEQ] = n + 1
+
+    def get(self, block=True, timeout=None) -> MocapFrame:
+        frame = self._read_next()
+        if frame is None and block and self._notify is not None:
+            # Orden clear -> leer write_seq: un frame publicado entretanto vuelve a activar el evento
+            while frame is None and self._notify.wait(timeout):
+                self._notify.clear()
+                frame = self._read_next()
+        if frame is None:
+            raise queue.Empty
+        return frame
+
+    def get_nowait(self) -> MocapFrame:
+        return self.get(block=False)
+
+    def qsize(self) -> int:
+        pending = int(self._counters[_WRITE_SEQ]) - int(self._counters[_READ_SEQ])
+        return min(pending, self.slot_count) if self._in_order else min(pending, 1)
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def stats(self) -> Dict[str, Any]:
+        counters = self._counters
+        return {
+            "policy": self.policy,
+            "produced": int(counters[_WRITE_SEQ]),
+            "consumed": int(counters[_CONSUMED]),
+            "dropped": int(counters[_DROPPED]),
+            "overwritten": int(counters[_OVERWRITTEN]),
+            "torn_reads": int(counters[_TORN_READS]),
+            "depth": self.qsize(),
+        }
+
+    # --- Ciclo de vida ---
+
+    def close(self):
+        # Las vistas numpy mantienen exportado el buffer: hay que soltarlas antes de cerrar
+        self._slots = []
+        self._counters = None
+        self._shm.close()
+
+    def unlink(self):
+        """Libera el bloque (solo el proceso que lo creó)."""
+        if self._owner:
+            self._shm.unlink()
+
+
+def _attach(name: str, notify) -> SharedFrameRing:
+    return SharedFrameRing(name=name, create=False, notify=notify)
+
+
+class FrameFanout:
+    """
+    Reparte los frames de un Producer entre varios SharedFrameRing (uno por worker) en
+    round-robin. Un frame descartado por un ring no avanza el turno, así que el k-ésimo
+    frame aceptado es siempre el `k // len(rings)` del ring `k % len(rings)`: quien lea los
+    rings puede reconstruir el orden global sin numerar nada más.
+    """
+    def __init__(self, rings):
+        self.rings = list(rings)
+        self._next = 0
+
+    def put_nowait(self, frame: MocapFrame) -> bool:
+        if not self.rings[self._next % len(self.rings)].put_nowait(frame):
+            return False
+        self._next += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        per_ring = [ring.stats() for ring in self.rings]
+        totals = {key: sum(s[key] for s in per_ring)
+                  for key in ("produced", "consumed", "dropped", "overwritten", "torn_reads", "depth")}
+        return dict(policy=self.rings[0].policy, rings=len(self.rings), **totals)
+
+    def close(self):
+        for ring in self.rings:
+            ring.close()
+
+    def unlink(self):
+        for ring in self.rings:
+            ring.unlink()
+
+
+# --- Ring de frames procesados (workers de transformación -> proceso principal) ---
+#
+#   Header global (128 bytes): magic 'YPFR' | version u32 | slot_count u32 | max_rows u32 |
+#                              max_skeletons u32 | max_spaces u32 | max_messages u32 |
+#                              max_message_bytes u32 | (relleno) | contadores u64 @ 64:
+#                              write_seq | read_seq | done_input | held_rows | null_rows | errors | oversized
+#   Slots (slot_count), cada uno con layout fijo (R = max_rows, K = max_skeletons, S = R + K):
+#       cabecera (_PROCESSED_HEADER) | layout del frame crudo: ids u32[R] | skeleton_ids u32[K] |
+#       skeleton_offsets i64[K + 1] | tabla de subjects: subject_ids u32[S] | subject_kinds u8[S] |
+#       subject_offsets i64[S + 1] | fresh bool[S] | espacios: space_names S32[P] |
+#       positions f32[P, R, 3] | rotations f32[P, R, 4] | mensajes: message_lengths u32[M] |
+#       message_bytes u8[max_message_bytes]
+#
+# Un único escritor (el worker) y un único lector (el hilo de merge). El escritor solo
+# escribe si write_seq - read_seq < slot_count y publica write_seq + 1 al terminar; el
+# lector libera el slot publicando read_seq + 1 cuando ya emitió el frame, así que no
+# hace falta seqlock. `done_input` es la secuencia del ring de entrada hasta la que el
+# worker ya terminó (publicado o descartado): así el lector sabe qué frames no llegarán.
+
+PROCESSED_MAGIC = b"YPFR"
+PROCESSED_VERSION = 1
+MESSAGE_MISSING = 0xFFFFFFFF # Mensaje que el worker no serializó (no cabía): lo hace el lector
+
+_PROCESSED_HEADER_FIELDS = struct.Struct("<4sIIIIIII")
+_P_WRITE_SEQ, _P_READ_SEQ, _P_DONE_INPUT, _P_HELD_ROWS, _P_NULL_ROWS, _P_ERRORS, _P_OVERSIZED = range(7)
+_PROCESSED_HEADER = np.dtype([
+    ("global_seq", "<u8"),
+    ("frame_number", "<u4"),
+    ("rigid_body_count", "<u4"),
+    ("row_count", "<u4"),
+    ("skeleton_count", "<u4"),
+    ("subject_count", "<u4"),
+    ("selected_rows", "<u4"),
+    ("space_count", "<u4"),
+    ("message_count", "<u4"),
+    ("control_version", "<u4"),
+    ("params", "<i4"),
+    ("timestamp", "<f8"),
+    ("received_at", "<f8"),
+    ("decoded_at", "<f8"),
+    ("started_at", "<f8"),
+    ("transform_s", "<f8"),
+    ("serialize_s", "<f8"),
+])
+
+
+class _ProcessedSlotView:
+    """Vistas numpy (sin copia) sobre un slot del ring de frames procesados."""
+    __slots__ = ("header", "ids", "skeleton_ids", "skeleton_offsets", "subject_ids", "subject_kinds",
+                 "subject_offsets", "fresh", "space_names", "positions", "rotations", "message_lengths",
+                 "message_bytes")
+
+    def __init__(self, buf, offset: int, max_rows: int, max_skeletons: int, max_spaces: int,
+                 max_messages: int, max_message_bytes: int):
+        def view(dtype, shape):
+            nonlocal offset
+            array = np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset)
+            offset += _align(array.nbytes)
+            return array
+
+        max_subjects = max_rows + max_skeletons
+        self.header = view(_PROCESSED_HEADER, (1,))[0]
+        self.ids = view("<u4", (max_rows,))
+        self.skeleton_ids = view("<u4", (max_skeletons,))
+        self.skeleton_offsets = view("<i8", (max_skeletons + 1,))
+        self.subject_ids = view("<u4", (max_subjects,))
+        self.subject_kinds = view("u1", (max_subjects,))
+        self.subject_offsets = view("<i8", (max_subjects + 1,))
+        self.fresh = view("?", (max_subjects,))
+        self.space_names = view("S32", (max_spaces,))
+        self.positions = view("<f4", (max_spaces, max_rows, 3))
+        self.rotations = view("<f4", (max_spaces, max_rows, 4))
+        self.message_lengths = view("<u4", (max_messages,))
+        self.message_bytes = view("u1", (max_message_bytes,))
+
+    @staticmethod
+    def size(max_rows: int, max_skeletons: int, max_spaces: int, max_messages: int, max_message_bytes: int) -> int:
+        max_subjects = max_rows + max_skeletons
+        return (_align(_PROCESSED_HEADER.itemsize) + _align(max_rows * 4) + _align(max_skeletons * 4)
+                + _align((max_skeletons + 1) * 8) + _align(max_subjects * 4) + _align(max_subjects) * 2
+                + _align((max_subjects + 1) * 8) + _align(max_spaces * 32) + _align(max_spaces * max_rows * 12)
+                + _align(max_spaces * max_rows * 16) + _align(max_messages * 4) + _align(max_message_bytes))
+
+    def layout(self) -> MocapFrame:
+        """MocapFrame solo con el layout del frame crudo (IDs y skeletons): lo que necesita SubjectModel."""
+        header = self.header
+        rows, skeletons = int(header["row_count"]), int(header["skeleton_count"])
+        return MocapFrame(
+            frame_number=int(header["frame_number"]),
+            ids=self.ids[:rows],
+            positions=None,
+            rotations=None,
+            errors=None,
+            rigid_body_count=int(header["rigid_body_count"]),
+            skeleton_ids=self.skeleton_ids[:skeletons],
+            skeleton_offsets=self.skeleton_offsets[:skeletons + 1],
+        )
+
+    def spaces(self) -> Dict[str, Any]:
+        """espacio -> (positions, rotations), vistas sobre el slot (válidas hasta `release`)."""
+        rows = int(self.header["selected_rows"])
+        return {self.space_names[i].decode("ascii"): (self.positions[i, :rows], self.rotations[i, :rows])
+                for i in range(int(self.header["space_count"]))}
+
+    def messages(self):
+        """Mensajes ya serializados, en el orden del plan (None = no serializado), como vistas."""
+        messages = []
+        start = 0
+        data = memoryview(self.message_bytes)
+        for length in self.message_lengths[:int(self.header["message_count"])].tolist():
+            if length == MESSAGE_MISSING:
+                messages.append(None)
+                continue
+            messages.append(data[start:start + length])
+            start += length
+        return messages
+
+
+class ProcessedFrameRing:
+    """
+    Ring de ProcessedFrames ya transformados (y opcionalmente serializados) en memoria
+    compartida: lo escribe un worker de transformación y lo lee el hilo de merge del
+    proceso principal, sin pickle en ningún sentido. Cada slot lleva el layout del frame
+    crudo (para reconstruir el SubjectModel en el lector), la tabla de subjects, los arrays
+    de cada espacio y los mensajes del plan de serialización vigente.
+
+    Es una cola fifo: si está llena, `put` devuelve False y el worker espera al lector.
+    """
+    def __init__(self, slot_count=8, max_rows=2048, max_skeletons=64, max_spaces=8, max_messages=16,
+                 max_message_bytes=1 << 20, name: Optional[str] = None, create=True, notify=None):
+        if create:
+            self.slot_count, self.max_rows, self.max_skeletons = slot_count, max_rows, max_skeletons
+            self.max_spaces, self.max_messages, self.max_message_bytes = max_spaces, max_messages, max_message_bytes
+            size = _HEADER_SIZE + slot_count * self._slot_size()
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self._shm.buf[:_HEADER_SIZE] = bytes(_HEADER_SIZE)
+            _PROCESSED_HEADER_FIELDS.pack_into(self._shm.buf, 0, PROCESSED_MAGIC, PROCESSED_VERSION, slot_count,
+                                               max_rows, max_skeletons, max_spaces, max_messages, max_message_bytes)
+            self._notify = notify if notify is not None else multiprocessing.get_context("spawn").Event()
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            (magic, version, self.slot_count, self.max_rows, self.max_skeletons, self.max_spaces,
+             self.max_messages, self.max_message_bytes) = _PROCESSED_HEADER_FIELDS.unpack_from(self._shm.buf, 0)
+            if magic != PROCESSED_MAGIC or version != PROCESSED_VERSION:
+                self._shm.close()
+                raise ValueError(f"Bloque compartido {name!r} no es un ProcessedFrameRing v{PROCESSED_VERSION}")
+            self._notify = notify
+
+        self.name = self._shm.name
+        self._owner = create
+        self._counters = np.ndarray((7,), dtype="<u8", buffer=self._shm.buf, offset=_COUNTERS_OFFSET)
+        slot_size = self._slot_size()
+        self._slots = [
+            _ProcessedSlotView(self._shm.buf, _HEADER_SIZE + i * slot_size, self.max_rows, self.max_skeletons,
+                               self.max_spaces, self.max_messages, self.max_message_bytes)
+            for i in range(self.slot_count)
+        ]
+
+    def _slot_size(self) -> int:
+        return _ProcessedSlotView.size(self.max_rows, self.max_skeletons, self.max_spaces, self.max_messages,
+                                       self.max_message_bytes)
+
+    def __reduce__(self):
+        return (_attach_processed, (self.name, self._notify))
+
+    # --- Escritor (worker) ---
+
+    def full(self) -> bool:
+        return int(self._counters[_P_WRITE_SEQ]) - int(self._counters[_P_READ_SEQ]) >= self.slot_count
+
+    def put(self, global_seq: int, raw_frame: MocapFrame, processed, messages, control_version: int,
+            started_at: float, transform_s: float, serialize_s: float) -> bool:
+        """
+        Copia el frame procesado al siguiente slot y lo publica. False si el ring está lleno;
+        ValueError si el frame no cabe en el layout fijo. `messages` son los mensajes del plan
+        de serialización en orden (None = no serializado); los que no caben se marcan como
+        pendientes y los serializa el lector.
+        """
+        rows, skeletons = raw_frame.row_count, raw_frame.skeleton_count
+        subjects, spaces = len(processed.subject_names), processed.spaces
+        selected = int(processed.subject_offsets[-1]) if subjects else 0
+        if rows > self.max_rows or skeletons > self.max_skeletons or len(spaces) > self.max_spaces:
+            raise ValueError(f"Frame {raw_frame.frame_number} excede el ring de frames procesados "
+                             f"({rows}/{self.max_rows} filas, {skeletons}/{self.max_skeletons} skeletons, "
+                             f"{len(spaces)}/{self.max_spaces} espacios)")
+        n = int(self._counters[_P_WRITE_SEQ])
+        if n - int(self._counters[_P_READ_SEQ]) >= self.slot_count:
+            return False
+
+        slot = self._slots[n % self.slot_count]
+        header = slot.header
+        header["global_seq"] = global_seq
+        header["frame_number"] = raw_frame.frame_number
+        header["rigid_body_count"] = raw_frame.rigid_body_count
+        header["row_count"] = rows
+        header["skeleton_count"] = skeletons
+        header["subject_count"] = subjects
+        header["selected_rows"] = selected
+        header["space_count"] = len(spaces)
+        header["control_version"] = control_version
+        header["params"] = raw_frame.params
+        header["timestamp"] = processed.timestamp
+        header["received_at"] = raw_frame.received_at
+        header["decoded_at"] = raw_frame.decoded_at
+        header["started_at"] = started_at
+        header["transform_s"] = transform_s
+        header["serialize_s"] = serialize_s
+        slot.ids[:rows] = raw_frame.ids
+        slot.skeleton_ids[:skeletons] = raw_frame.skeleton_ids
+        slot.skeleton_offsets[:skeletons + 1] = raw_frame.skeleton_offsets
+        slot.subject_ids[:subjects] = processed.subject_ids
+        slot.subject_kinds[:subjects] = processed.subject_kinds
+        slot.subject_offsets[:subjects + 1] = processed.subject_offsets
+        slot.fresh[:subjects] = processed.subject_fresh
+        for i, (space, (positions, rotations)) in enumerate(spaces.items()):
+            slot.space_names[i] = space.encode("ascii")
+            slot.positions[i, :selected] = positions
+            slot.rotations[i, :selected] = rotations
+
+        count = min(len(messages), self.max_messages)
+        used = 0
+        for i, message in enumerate(messages[:count]):
+            size = len(message) if message is not None else 0
+            if message is None or used + size > self.max_message_bytes:
+                if message is not None:
+                    self._counters[_P_OVERSIZED] += 1
+                slot.message_lengths[i] = MESSAGE_MISSING
+                continue
+            slot.message_bytes[used:used + size] = np.frombuffer(message, dtype=np.uint8)
+            slot.message_lengths[i] = size
+            used += size
+        header["message_count"] = count
+
+        self._counters[_P_WRITE_SEQ] = n + 1
+        self._notify.set()
+        return True
+
+    def finish_input(self, seq: int):
+        """Publica que el worker ya terminó (emitido o descartado) todo frame de entrada < seq."""
+        self._counters[_P_DONE_INPUT] = seq
+        self._notify.set()
+
+    def record_worker_stats(self, held_rows: int, null_rows: int, errors: int):
+        counters = self._counters
+        counters[_P_HELD_ROWS], counters[_P_NULL_ROWS], counters[_P_ERRORS] = held_rows, null_rows, errors
+
+    # --- Lector (hilo de merge) ---
+
+    def peek(self) -> Optional[_ProcessedSlotView]:
+        """Slot publicado más antiguo sin liberar (o None); sigue siendo válido hasta `release`."""
+        n = int(self._counters[_P_READ_SEQ])
+        if int(self._counters[_P_WRITE_SEQ]) <= n:
+            return None
+        return self._slots[n % self.slot_count]
+
+    def release(self):
+        self._counters[_P_READ_SEQ] += 1
+
+    @property
+    def done_input(self) -> int:
+        return int(self._counters[_P_DONE_INPUT])
+
+    def stats(self) -> Dict[str, Any]:
+        counters = self._counters
+        return {
+            "produced": int(counters[_P_WRITE_SEQ]),
+            "depth": int(counters[_P_WRITE_SEQ]) - int(counters[_P_READ_SEQ]),
+            "held_rows": int(counters[_P_HELD_ROWS]),
+            "null_rows": int(counters[_P_NULL_ROWS]),
+            "errors": int(counters[_P_ERRORS]),
+            "oversized_messages": int(counters[_P_OVERSIZED]),
+        }
+
+    # --- Ciclo de vida ---
+
+    def close(self):
+        self._slots = []
+        self._counters = None
+        self._shm.close()
+
+    def unlink(self):
+        """Libera el bloque (solo el proceso que lo creó)."""
+        if self._owner:
+            self._shm.unlink()
+
+
+def _attach_processed(name: str, notify) -> ProcessedFrameRing:
+    return ProcessedFrameRing(name=name, create=False, notify=notify)
@@ -0,0 +1,171 @@
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+from core.frame import ProcessedFrame, SUBJECT_RIGID_BODY, SUBJECT_SKELETON
+from logic.resampler import RESAMPLE_MODES
+from logic.spaces import available_spaces, is_registered
+
+# Espacios por defecto (compatibles con el payload original); el resto viene del registro
+DEFAULT_SPACES = ("unreal", "maya")
+
+
+class Subscription:
+    """
+    Qué quiere recibir un cliente: subjects (por nombre de Motive, por el alias RB_<id>/SK_<id>
+    o por ID numérico),
+    subconjunto de huesos (índices dentro de cada Skeleton) y espacios destino
+    (cualquiera registrado en logic.spaces: unreal, maya, blender, unity, raw...).
+    `None` en subjects/bones significa "todos". `markers` añade los marker sets etiquetados
+    (solo entonces el decoder los materializa). `rate` pide una cadencia de salida en Hz
+    (None = la de Motive), servida por decimación o interpolación según `resample`.
+
+    Se negocia en la misma línea JSON del handshake de formato, p. ej.
+        {"format": "binary", "subjects": ["SK_1", 3], "bones": [0, 1, 2], "spaces": ["unreal"], "markers": true,
+         "rate": 60, "resample": "interpolate"}
+    """
+    __slots__ = ("subjects", "bones", "spaces", "markers", "rate", "resample", "key", "_names", "_ids",
+                 "_table_key", "_selection")
+
+    def __init__(self, subjects: Optional[Iterable[Any]] = None, bones: Optional[Iterable[int]] = None,
+                 spaces: Iterable[str] = DEFAULT_SPACES, markers: bool = False, rate: Optional[float] = None,
+                 resample: str = "interpolate"):
+        self.subjects = None if subjects is None else frozenset(str(s) for s in subjects)
+        self.bones = None if bones is None else tuple(sorted({int(b) for b in bones}))
+        self.spaces = tuple(dict.fromkeys(spaces))
+        self.markers = bool(markers)
+        self.rate = None if rate is None else float(rate)
+        self.resample = resample
+        if not self.spaces:
+            raise ValueError("La suscripción necesita al menos un espacio")
+        for space in self.spaces:
+            if not is_registered(space):
+                raise ValueError(f"Espacio inválido: {space!r} (opciones: {available_spaces()})")
+        if self.rate is not None and not self.rate > 0:
+            raise ValueError(f"Cadencia inválida: {rate!r}")
+        if resample not in RESAMPLE_MODES:
+            raise ValueError(f"Modo de remuestreo inválido: {resample!r} (opciones: {RESAMPLE_MODES})")
+
+        # Clave hashable: clientes con la misma suscripción comparten serialización
+        self.key = (None if self.subjects is None else tuple(sorted(self.subjects)), self.bones, self.spaces,
+                    self.markers, self.rate_key)
+        self._names = self.subjects or frozenset()
+        self._ids = frozenset(s for s in self._names if s.isdigit())
+        self._table_key = None
+        self._selection = None
+
+    @classmethod
+    def from_request(cls, request: Dict[str, Any]) -> "Subscription":
+        """Construye la suscripción a partir del handshake del cliente. Lanza ValueError si es inválida."""
+        spaces = request.get("spaces", DEFAULT_SPACES)
+        if isinstance(spaces, str):
+            spaces = (spaces,)
+        try:
+            return cls(request.get("subjects"), request.get("bones"), spaces, request.get("markers", False),
+                       request.get("rate"), request.get("resample", "interpolate"))
+        except TypeError as e:
+            raise ValueError(f"Suscripción inválida: {e}")
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "subjects": None if self.subjects is None else sorted(self.subjects),
+            "bones": None if self.bones is None else list(self.bones),
+            "spaces": list(self.spaces),
+            "markers": self.markers,
+            "rate": self.rate,
+            "resample": self.resample if self.rate is not None else None,
+        }
+
+    @property
+    def rate_key(self):
+        """Clave del stream remuestreado que necesita el cliente (None = cadencia nativa)."""
+        return None if self.rate is None else (self.rate, self.resample)
+
+    def matches(self, name: str, kind: int = None, subject_id: int = None) -> bool:
+        if self.subjects is None or name in self._names:
+            return True
+        if subject_id is None:
+            return name.split("_", 1)[-1] in self._ids
+        alias = ("RB_" if kind == SUBJECT_RIGID_BODY else "SK_") + str(subject_id)
+        return alias in self._names or str(subject_id) in self._ids
+
+    def select(self, names, kinds: np.ndarray, offsets: np.ndarray, ids: np.ndarray = None, with_bones=True):
+        """
+        Filtra una tabla de subjects. Devuelve (names, kinds, offsets, rows, subjects) donde
+        `rows` son los índices de fila a extraer de los arrays apilados y `subjects` los índices
+        de los subjects conservados (ambos None si no hay filtro).
+        Con `ids` (IDs de Motive) también se aceptan el alias RB_<id>/SK_<id> y el ID numérico.
+        El resultado se cachea mientras la tabla no cambie.
+        """
+        table_key = (tuple(names), offsets.tobytes(), None if ids is None else ids.tobytes(), with_bones)
+        if table_key == self._table_key:
+            return self._selection
+
+        bones = self.bones if with_bones else None
+        if self.subjects is None and bones is None:
+            selection = (names, kinds, offsets, None, None)
+        else:
+            sel_names, sel_kinds, sel_offsets, rows, subjects = [], [], [0], [], []
+            offset_list = offsets.tolist()
+            kind_list = kinds.tolist()
+            id_list = ids.tolist() if ids is not None else [None] * len(names)
+            for i, name in enumerate(names):
+                if not self.matches(name, kind_list[i], id_list[i]):
+                    continue
+                start, end = offset_list[i], offset_list[i + 1]
+                if kind_list[i] == SUBJECT_SKELETON and bones is not None:
+                    subject_rows = [start + b for b in bones if b < end - start]
+                else:
+                    subject_rows = range(start, end)
+                sel_names.append(name)
+                sel_kinds.append(kind_list[i])
+                subjects.append(i)
+                rows.extend(subject_rows)
+                sel_offsets.append(len(rows))
+            selection = (
+                sel_names,
+                np.array(sel_kinds, dtype=np.uint8),
+                np.array(sel_offsets, dtype=np.int64),
+                np.array(rows, dtype=np.intp),
+                np.array(subjects, dtype=np.intp),
+            )
+
+        self._table_key = table_key
+        self._selection = selection
+        return selection
+
+    def apply(self, frame: ProcessedFrame) -> ProcessedFrame:
+        """Vista del ProcessedFrame restringida a lo que pidió el cliente."""
+        names, kinds, offsets, rows, subjects = self.select(frame.subject_names, frame.subject_kinds,
+                                                            frame.subject_offsets, frame.subject_ids)
+        spaces = {}
+        for space in self.spaces:
+            if space in frame.spaces:
+                pos, rot = frame.spaces[space]
+                spaces[space] = (pos, rot) if rows is None else (pos[rows], rot[rows])
+        fresh = frame.subject_fresh if subjects is None else frame.subject_fresh[subjects]
+        ids = frame.subject_ids if subjects is None or frame.subject_ids is None else frame.subject_ids[subjects]
+        markers = None
+        if self.markers and frame.markers is not None:
+            marker_names, marker_offsets, marker_spaces = frame.markers
+            markers = (marker_names, marker_offsets, {s: marker_spaces[s] for s in self.spaces if s in marker_spaces})
+        return ProcessedFrame(frame.frame_number, frame.timestamp, names, kinds, offsets, spaces, fresh,
+                              frame.received_at, markers, ids, frame.model)
+
+
+def merge_subscriptions(subscriptions: Iterable[Subscription]) -> Optional[Subscription]:
+    """
+    Demanda agregada de todos los clientes: unión de espacios y subjects (y markers si alguno los pide).
+    Los huesos no se filtran en el procesador (cada cliente los recorta al serializar).
+    Devuelve None si no hay clientes.
+    """
+    subscriptions = list(subscriptions)
+    if not subscriptions:
+        return None
+
+    spaces = dict.fromkeys(space for sub in subscriptions for space in sub.spaces)
+    if any(sub.subjects is None for sub in subscriptions):
+        subjects = None
+    else:
+        subjects = frozenset().union(*(sub.subjects for sub in subscriptions))
+    return Subscription(subjects, None, spaces, any(sub.markers for sub in subscriptions))
@@ -0,0 +1,382 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from core.metrics import ThroughputMeter, get_metrics
+from core.subscription import Subscription, merge_subscriptions
+from exporters.delta_codec import DeltaMessage
+from exporters.wire_format import (JsonFrameEncoder, STATEFUL_FORMATS, WIRE_VERSION, create_encoder, encode_model,
+                                   parse_format_request)
+from logic.resampler import FrameResampler
+
+try:
+    from websockets.asyncio.server import serve as ws_serve # websockets >= 13
+except ImportError:
+    try:
+        from websockets import serve as ws_serve
+    except ImportError:
+        ws_serve = None
+
+KIND_TCP = "tcp"
+KIND_WEBSOCKET = "ws"
+
+
+class _AsyncClient:
+    """
+    Cliente del motor asyncio (TCP o WebSocket).
+    Cada cliente tiene un slot "último frame gana" y una tarea emisora propia:
+    el broadcast solo deja el mensaje en el slot, nunca espera al socket.
+    """
+    def __init__(self, kind, addr, send, close):
+        self.kind = kind
+        self.addr = addr
+        self.close = close
+        self.wire_format = JsonFrameEncoder.key # Fallback hasta que el cliente negocie
+        self.subscription = Subscription()
+        self.model_revision = None # Revisión del SubjectModel que ya tiene el cliente
+        self._send = send
+        self._control = []
+        self._pending = None
+        self._sent_sequence = None # Formato delta: secuencia del último mensaje entregado al emisor
+        self._ready = asyncio.Event()
+        self.handler = None # Tarea que atiende la conexión (la asigna _register)
+        self.task = None    # Tarea emisora (run_sender)
+
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_sent = 0
+        self.send_latency_avg = 0.0
+        self.send_latency_max = 0.0
+        self.throughput = ThroughputMeter()
+        self._metrics = get_metrics()
+
+    def offer(self, message, now: float, received_at=0.0):
+        if self._pending is not None:
+            self.frames_dropped += 1
+        sequence = None
+        if isinstance(message, DeltaMessage):
+            # El pendiente que se reemplaza nunca llega: el delta se valida contra lo último emitido
+            sequence = message.sequence
+            message = message.resolve(self._sent_sequence)
+            if self.kind == KIND_WEBSOCKET:
+                message = message[4:]
+        self._pending = (message, now, received_at, sequence)
+        self._ready.set()
+
+    def switch_format(self, ack, key, subscription):
+        """Encola el ack y cambia formato/suscripción; el frame pendiente anterior se descarta."""
+        self._control.append(ack)
+        if key is not None:
+            self.wire_format = key
+            self.subscription = subscription
+            self.model_revision = None
+            self._pending = None
+            self._sent_sequence = None
+        self._ready.set()
+
+    async def run_sender(self):
+        try:
+            await self._sender_loop()
+        except Exception:
+            pass # Conexión cerrada: el handler de lectura se encarga de dar de baja al cliente
+
+    async def _sender_loop(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._control:
+                await self._send(self._control.pop(0))
+
+            if self._pending is None:
+                continue
+            message, queued_at, received_at, self._sent_sequence = self._pending
+            self._pending = None
+            await self._send(message)
+
+            now = time.perf_counter()
+            latency = now - queued_at
+            self._metrics.record("send", latency)
+            if received_at:
+                self._metrics.record("end_to_end", now - received_at)
+            self.throughput.add(len(message), now)
+            self.frames_sent += 1
+            self.bytes_sent += len(message)
+            self.send_latency_avg += (latency - self.send_latency_avg) * 0.1
+            self.send_latency_max = max(self.send_latency_max, latency)
+
+    def stats(self) -> dict:
+        return {
+            "address": f"{self.addr[0]}:{self.addr[1]}" if self.addr else "?",
+            "transport": self.kind,
+            "format": self.wire_format[0],
+            "precision": self.wire_format[1],
+            "subscription": self.subscription.describe(),
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "bytes_sent": self.bytes_sent,
+            "send_latency_ms": self.send_latency_avg * 1000.0,
+            "send_latency_max_ms": self.send_latency_max * 1000.0,
+            **self.throughput.rates(time.perf_counter()),
+        }
+
+
+class AsyncStreamServer:
+    """
+    Motor de distribución asyncio de YeiciCap Hub.
+
+    Un único event loop (en su propio hilo) sirve clientes TCP crudos (mismo protocolo
+    que StreamServer: handshake por línea JSON, JSON por newline o binario con prefijo
+    de longitud) y clientes WebSocket (handshake como mensaje de texto; JSON como texto,
+    binario como mensaje binario sin prefijo).
+
+    El producer llama a `broadcast(frame)` desde su hilo: el frame se deja en un slot
+    (asignación atómica) y solo se agenda una activación del loop si no había una
+    pendiente. El loop serializa una vez por formato/suscripción y reparte.
+
+    Los clientes con otra cadencia ("rate") comparten un resampler por cadencia; como el
+    slot del cliente guarda solo el último frame, de una ráfaga de upsampling se entrega el último.
+
+    Con {"format": "delta"} cada cliente recibe el delta si ya tiene el frame anterior
+    del stream y un keyframe si no (recién conectado o con el slot sobrescrito).
+    """
+    def __init__(self, host='127.0.0.1', port=54321, ws_port=54322, delta_options=None):
+        self.host = host
+        self.port = port
+        self.ws_port = ws_port
+        self.delta_options = delta_options or {}
+        self._clients = set()
+        self._snapshot = ()
+        self._encoders = {}
+        self._stream_encoders = {}
+        self._resamplers = {}
+        self._demand_key = None
+        self._demand = None
+        self._latest = None
+        self._scheduled = False
+        self._loop = None
+        self._stopped = None
+        self._thread = None
+        self._started = threading.Event()
+
+    # --- API pública (thread-safe) ---
+
+    def start(self):
+        """Inicia el event loop en un hilo separado."""
+        self._thread = threading.Thread(target=self._run_loop, name="AsyncStreamServer", daemon=True)
+        self._thread.start()
+        self._started.wait(5.0)
+
+    def broadcast(self, frame):
+        """
+        Hand-off desde el hilo del producer: el último frame gana. Se serializa más tarde en
+        el loop, cuando el transformer ya habrá reutilizado sus buffers: se retiene una copia.
+        """
+        if not self._snapshot:
+            return
+        self._latest = frame.copy()
+        if not self._scheduled and self._loop is not None:
+            self._scheduled = True
+            self._loop.call_soon_threadsafe(self._dispatch)
+
+    def demand(self):
+        """Unión de las suscripciones de los clientes conectados (None si no hay clientes)."""
+        clients = self._snapshot
+        demand_key = tuple(c.subscription.key for c in clients)
+        if demand_key != self._demand_key:
+            self._demand = merge_subscriptions(c.subscription for c in clients)
+            self._demand_key = demand_key
+        return self._demand
+
+    def encode_plan(self):
+        """Streams {stream_key: suscripción} serializables fuera de este proceso (ver StreamServer.encode_plan)."""
+        plan = {}
+        for client in self._snapshot:
+            key = (client.wire_format, client.subscription.key)
+            if client.subscription.rate_key is None and key[0][0] not in STATEFUL_FORMATS:
+                plan.setdefault(key, client.subscription)
+        return plan
+
+    def client_stats(self):
+        return [c.stats() for c in self._snapshot]
+
+    def stop(self):
+        if self._loop is not None and self._stopped is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+        if self._thread is not None:
+            self._thread.join(2.0)
+
+    # --- Event loop ---
+
+    def _run_loop(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+
+        tcp_server = await asyncio.start_server(self._handle_tcp, self.host, self.port)
+        self.port = tcp_server.sockets[0].getsockname()[1] # Puerto real si se pidió el 0
+        logging.info(f"AsyncStreamServer TCP en {self.host}:{self.port}")
+
+        ws_server = None
+        if ws_serve is None:
+            logging.warning("Paquete 'websockets' no disponible: endpoint WebSocket deshabilitado.")
+        elif self.ws_port:
+            ws_server = await ws_serve(self._handle_ws, self.host, self.ws_port)
+            logging.info(f"AsyncStreamServer WebSocket en ws://{self.host}:{self.ws_port}")
+
+        self._started.set()
+        await self._stopped.wait()
+
+        tcp_server.close()
+        if ws_server is not None:
+            ws_server.close()
+        # Cerrar las conexiones deja que cada handler termine por su cuenta
+        clients = list(self._clients)
+        for client in clients:
+            client.close()
+        await asyncio.gather(*(c.handler for c in clients), return_exceptions=True)
+        await tcp_server.wait_closed()
+        if ws_server is not None:
+            await ws_server.wait_closed()
+
+    def _register(self, client: _AsyncClient):
+        client.handler = asyncio.current_task()
+        client.task = asyncio.ensure_future(client.run_sender())
+        self._clients.add(client)
+        self._snapshot = tuple(self._clients)
+        logging.info(f"Nuevo cliente {client.kind} conectado: {client.addr}")
+
+    def _unregister(self, client: _AsyncClient):
+        if client.task is not None:
+            client.task.cancel()
+        self._clients.discard(client)
+        self._snapshot = tuple(self._clients)
+        logging.info(f"Cliente {client.kind} desconectado.")
+
+    def _dispatch(self):
+        self._scheduled = False
+        frame = self._latest
+        if frame is None or not self._clients:
+            return
+
+        metrics = get_metrics()
+        received_at = getattr(frame, "received_at", 0.0)
+        model = getattr(frame, "model", None)
+        now = time.perf_counter()
+        messages = {}
+        # Serializaciones ya hechas por los workers (solo streams a la cadencia nativa)
+        encoded = dict(frame.encoded) if getattr(frame, "encoded", None) else {}
+        outputs = {}
+        for client in self._clients:
+            if model is not None and client.model_revision != model.revision:
+                # Va por la cola de control: sale antes que el frame y nunca se descarta
+                client._control.append(self._websocket_framing(encode_model(model, client.wire_format),
+                                                               client.kind, client.wire_format))
+                client.model_revision = model.revision
+            rate_key = client.subscription.rate_key
+            output = outputs.get(rate_key, frame)
+            if rate_key is not None and rate_key not in outputs:
+                frames = self._resampler(rate_key).push(frame)
+                output = outputs[rate_key] = frames[-1] if frames else None
+            if output is None:
+                continue # Su cadencia no toca en este frame
+            cache_key = (client.kind, client.wire_format, client.subscription.key)
+            message = messages.get(cache_key)
+            if message is None:
+                stream_key = cache_key[1:]
+                data = encoded.get(stream_key)
+                if data is None:
+                    started = time.perf_counter()
+                    filtered = client.subscription.apply(output)
+                    data = encoded[stream_key] = self._encoder(stream_key).encode(filtered)
+                    metrics.record("serialize", time.perf_counter() - started)
+                if not isinstance(data, DeltaMessage): # El delta se enmarca al resolverlo por cliente
+                    data = self._websocket_framing(data, client.kind, client.wire_format)
+                message = messages[cache_key] = data
+            client.offer(message, now, received_at)
+
+    def _resampler(self, rate_key):
+        """Resampler compartido por todos los clientes de una misma cadencia."""
+        resampler = self._resamplers.get(rate_key)
+        if resampler is None:
+            live = {c.subscription.rate_key for c in self._clients}
+            self._resamplers = {k: r for k, r in self._resamplers.items() if k in live}
+            resampler = self._resamplers[rate_key] = FrameResampler(*rate_key)
+        return resampler
+
+    def _encoder(self, stream_key):
+        """Encoder del stream: compartido por formato salvo los que guardan estado (uno por stream)."""
+        wire_format = stream_key[0]
+        encoder = self._encoders.get(wire_format) or self._stream_encoders.get(stream_key)
+        if encoder is None:
+            encoder = create_encoder(wire_format, self.delta_options)
+            if getattr(encoder, "stateful", False):
+                # Se descartan los streams con estado que ya no tienen clientes
+                live = {(c.wire_format, c.subscription.key) for c in self._clients}
+                self._stream_encoders = {k: e for k, e in self._stream_encoders.items() if k in live}
+                self._stream_encoders[stream_key] = encoder
+            else:
+                self._encoders[wire_format] = encoder
+        return encoder
+
+    @staticmethod
+    def _websocket_framing(message: bytes, kind, key):
+        if kind == KIND_WEBSOCKET:
+            # WebSocket ya delimita mensajes: JSON como texto, binario sin prefijo de longitud
+            return message[:-1].decode('utf-8') if key[0] == "json" else message[4:]
+        return message
+
+    def _handle_control(self, client: _AsyncClient, line):
+        """Procesa un mensaje de control del cliente (negociación de formato y suscripción)."""
+        if not line.strip():
+            return
+        try:
+            request = json.loads(line)
+            key = parse_format_request(request)
+            subscription = Subscription.from_request(request)
+        except ValueError as e:
+            reply, key, subscription = {"error": str(e)}, None, None
+        else:
+            reply = {"ack": "format", "format": key[0], "precision": key[1], "version": WIRE_VERSION,
+                     "subscription": subscription.describe()}
+            logging.info(f"Cliente {client.addr} negoció formato {key[0]} ({key[1]}), suscripción {subscription.describe()}")
+
+        ack = json.dumps(reply)
+        client.switch_format(ack if client.kind == KIND_WEBSOCKET else (ack + "\n").encode('utf-8'), key, subscription)
+
+    async def _handle_tcp(self, reader, writer):
+        async def send(message):
+            writer.write(message)
+            await writer.drain()
+
+        client = _AsyncClient(KIND_TCP, writer.get_extra_info("peername"), send, writer.close)
+        self._register(client)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._handle_control(client, line)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._unregister(client)
+            writer.close()
+
+    async def _handle_ws(self, websocket, *args):
+        def close():
+            asyncio.ensure_future(websocket.close())
+
+        client = _AsyncClient(KIND_WEBSOCKET, websocket.remote_address, websocket.send, close)
+        self._register(client)
+        try:
+            async for message in websocket:
+                if isinstance(message, str):
+                    self._handle_control(client, message)
+        except Exception:
+            pass
+        finally:
+            self._unregister(client)
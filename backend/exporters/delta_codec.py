@@ -0,0 +1,194 @@
+import struct
+from typing import Optional
+
+import numpy as np
+
+from core.frame import ProcessedFrame
+from exporters.wire_format import BinaryFrameEncoder
+from logic.spaces import get_kernel
+
+# --- Stream delta YeiciCap ---
+#
+# Formato negociado con {"format": "delta"}. El stream mezcla dos tipos de mensaje, ambos
+# con prefijo de longitud (u32 LE):
+#   Keyframe: un mensaje binario YCAP normal (float32) con el estado completo. El cliente
+#             reinicia su estado con él.
+#   Delta:    magic 'YDLT' | version u8 | flags u8 | changed_count u16 | frame_number u32 |
+#             base_frame_number u32 | timestamp f64 | frescura ceil(S / 8) bytes |
+#             índices de subject cambiados u16[K] | por espacio, en el orden del keyframe:
+#                 pos_step f32 | dpos int16 (R, 3) | drot int16 (R, 4)
+#             R son las filas de los K subjects, en orden. El cliente suma dpos * pos_step y
+#             drot / 32767 (en float32) al estado que tenía tras `base_frame_number`.
+#
+# Los marker sets (si se pidieron) viajan solo en los keyframes.
+#
+# El encoder lleva el estado de referencia exacto que reconstruye el cliente (cuantización
+# incluida), así los subjects quietos no acumulan deriva: solo se envían cuando su cambio
+# respecto a esa referencia supera epsilon.
+
+DELTA_MAGIC = b"YDLT"
+DELTA_VERSION = 1
+
+_LENGTH = struct.Struct("<I")
+_HEADER = struct.Struct("<4sBBHIId")
+_STEP = struct.Struct("<f")
+_INT16_MAX = 32767
+_ROT_STEP = np.float32(1.0 / _INT16_MAX)
+
+
+class DeltaMessage:
+    """
+    Resultado de codificar un frame: el delta respecto al frame anterior del stream (None si
+    este frame es keyframe para todos) y el keyframe, que se serializa solo si algún cliente
+    lo necesita. Válido hasta el siguiente `encode` del mismo encoder.
+    """
+    __slots__ = ("sequence", "delta", "_encoder", "_keyframe")
+
+    def __init__(self, sequence: int, delta: Optional[memoryview], encoder: "DeltaFrameEncoder",
+                 keyframe: Optional[memoryview] = None):
+        self.sequence = sequence
+        self.delta = delta
+        self._encoder = encoder
+        self._keyframe = keyframe
+
+    def keyframe(self) -> memoryview:
+        if self._keyframe is None:
+            self._keyframe = memoryview(self._encoder.encode_reference())
+        return self._keyframe
+
+    def resolve(self, last_sequence: Optional[int]) -> memoryview:
+        """Bytes para un cliente cuyo último mensaje de este stream fue `last_sequence`."""
+        if self.delta is not None and last_sequence == self.sequence - 1:
+            return self.delta
+        return self.keyframe()
+
+
+class DeltaFrameEncoder:
+    """
+    Encoder con estado: uno por stream (formato + suscripción). Keyframes cada
+    `keyframe_interval` frames, al cambiar la tabla de subjects o si un delta no cabe en int16.
+
+    epsilon:     cambio mínimo de posición (metros de Motive) para reenviar un subject
+    rot_epsilon: ídem en componentes de cuaternión
+    quantum:     paso de cuantización de las posiciones (metros de Motive)
+    """
+    key = ("delta", "int16")
+    stateful = True
+
+    def __init__(self, keyframe_interval=120, epsilon=0.0005, rot_epsilon=0.0005, quantum=0.0001):
+        self.keyframe_interval = keyframe_interval
+        self.epsilon = epsilon
+        self.rot_epsilon = rot_epsilon
+        self.quantum = quantum
+        self.sequence = 0
+        self._keyframe_encoder = BinaryFrameEncoder("float32")
+        self._table_key = None
+        self._frame = None          # Último frame (tabla de subjects) del stream
+        self._reference = {}        # espacio -> (pos, rot) tal como los tiene el cliente
+        self._since_keyframe = 0
+        self._scales = {}
+
+        self.keyframes = 0
+        self.deltas = 0
+        self.subjects_sent = 0
+        self.subjects_skipped = 0
+
+    def _scale(self, space: str) -> float:
+        # Escala del espacio respecto a Motive (p. ej. 100 en Maya/Unreal: metros -> cm)
+        scale = self._scales.get(space)
+        if scale is None:
+            scale = self._scales[space] = float(np.abs(get_kernel(space).pos_matrix).max())
+        return scale
+
+    def encode(self, frame: ProcessedFrame) -> DeltaMessage:
+        self.sequence += 1
+        base = self._frame
+        self._frame = frame
+        table_key = (tuple(frame.subject_names), frame.subject_offsets.tobytes(), tuple(frame.spaces))
+        if table_key != self._table_key or self._since_keyframe + 1 >= self.keyframe_interval:
+            self._table_key = table_key
+            return self._keyframe(frame)
+
+        delta = self._encode_delta(frame, base)
+        if delta is None:
+            return self._keyframe(frame) # Salto demasiado grande para int16
+        self._since_keyframe += 1
+        self.deltas += 1
+        return DeltaMessage(self.sequence, memoryview(delta), self)
+
+    def _keyframe(self, frame: ProcessedFrame) -> DeltaMessage:
+        # La referencia pasa a ser el estado exacto: todos los clientes se resincronizan
+        self._reference = {space: (pos.copy(), rot.copy()) for space, (pos, rot) in frame.spaces.items()}
+        self._since_keyframe = 0
+        self.keyframes += 1
+        self.subjects_sent += len(frame.subject_names)
+        return DeltaMessage(self.sequence, None, self, memoryview(self._keyframe_encoder.encode(frame)))
+
+    def _encode_delta(self, frame: ProcessedFrame, base: ProcessedFrame) -> Optional[bytes]:
+        spaces = list(frame.spaces)
+        offsets = frame.subject_offsets
+        counts = np.diff(offsets)
+
+        # Qué subjects cambiaron: se mide en el primer espacio (los demás son transformaciones lineales suyas).
+        # Sin espacios (frame sin datos) el delta solo lleva cabecera y frescura
+        if spaces:
+            first = spaces[0]
+            pos, rot = frame.spaces[first]
+            ref_pos, ref_rot = self._reference[first]
+            row_changed = np.abs(pos - ref_pos).max(axis=1) > self.epsilon * self._scale(first)
+            row_changed |= np.abs(rot - ref_rot).max(axis=1) > self.rot_epsilon
+            changed_before = np.concatenate(([0], np.cumsum(row_changed)))
+            subject_changed = changed_before[offsets[1:]] > changed_before[offsets[:-1]]
+        else:
+            subject_changed = np.zeros(len(counts), dtype=bool)
+        changed = np.flatnonzero(subject_changed)
+        rows = np.flatnonzero(np.repeat(subject_changed, counts))
+
+        parts = [
+            _HEADER.pack(DELTA_MAGIC, DELTA_VERSION, 0, len(changed), frame.frame_number, base.frame_number,
+                         frame.timestamp),
+            frame.freshness_mask,
+            changed.astype("<u2").tobytes(),
+        ]
+        if len(rows):
+            updates = []
+            for space in spaces:
+                pos, rot = frame.spaces[space]
+                ref_pos, ref_rot = self._reference[space]
+                step = np.float32(self.quantum * self._scale(space))
+                q_pos = np.rint((pos[rows] - ref_pos[rows]) / step)
+                q_rot = np.rint((rot[rows] - ref_rot[rows]) * _INT16_MAX)
+                if np.abs(q_pos).max() > _INT16_MAX or np.abs(q_rot).max() > _INT16_MAX:
+                    return None
+                q_pos = q_pos.astype("<i2")
+                q_rot = q_rot.astype("<i2")
+                parts += [_STEP.pack(step), q_pos.tobytes(), q_rot.tobytes()]
+                updates.append((ref_pos, ref_rot, step, q_pos, q_rot))
+            # Se aplica a la referencia exactamente lo que aplicará el cliente
+            for ref_pos, ref_rot, step, q_pos, q_rot in updates:
+                ref_pos[rows] += q_pos * step
+                ref_rot[rows] += q_rot * _ROT_STEP
+        else:
+            parts += [_STEP.pack(self.quantum * self._scale(space)) for space in spaces]
+
+        self.subjects_sent += len(changed)
+        self.subjects_skipped += len(frame.subject_names) - len(changed)
+        body = b"".join(parts)
+        return _LENGTH.pack(len(body)) + body
+
+    def encode_reference(self) -> bytes:
+        """Keyframe con el estado de referencia actual (el que tienen los clientes sincronizados)."""
+        frame = self._frame
+        spaces = {space: self._reference[space] for space in frame.spaces}
+        reference = ProcessedFrame(frame.frame_number, frame.timestamp, frame.subject_names, frame.subject_kinds,
+                                   frame.subject_offsets, spaces, frame.subject_fresh, frame.received_at,
+                                   frame.markers, frame.subject_ids, frame.model)
+        return self._keyframe_encoder.encode(reference)
+
+    def stats(self):
+        return {
+            "keyframes": self.keyframes,
+            "deltas": self.deltas,
+            "subjects_sent": self.subjects_sent,
+            "subjects_skipped": self.subjects_skipped,
+        }
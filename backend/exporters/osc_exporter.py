@@ -0,0 +1,223 @@
+import logging
+import re
+import socket
+import struct
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from core.frame import ProcessedFrame, SUBJECT_RIGID_BODY
+from core.metrics import get_metrics
+from core.subscription import Subscription
+
+# --- Exporter OSC YeiciCap ---
+#
+# Un frame = un bundle OSC 1.0 por UDP (varios si no cabe en `max_datagram`):
+#   #bundle\0 | timetag u64 (1 = inmediato) | elementos (size i32 + mensaje):
+#     <prefix>/frame                 ,i     número de frame
+#     <prefix>/<subject>/pos         ,fff   Rigid Body
+#     <prefix>/<subject>/rot         ,ffff  cuaternión [x, y, z, w]
+#     <prefix>/<subject>/<bone>/pos  ,fff   hueso de Skeleton (nombre de la description o Bone_<i>)
+#     <prefix>/<subject>/<bone>/rot  ,ffff
+# Todo es big-endian. La plantilla del bundle (direcciones, typetags, tamaños) se construye
+# una vez por tabla de subjects; por frame solo se copian los floats a sus huecos.
+
+_BUNDLE_HEADER = b"#bundle\0" + struct.pack(">Q", 1)
+_ELEMENT_SIZE = struct.Struct(">i")
+_INT32 = struct.Struct(">i")
+# Caracteres reservados en direcciones OSC (y espacios)
+_RESERVED = re.compile(r"[\s#*,/?\[\]{}]")
+
+
+def _osc_string(text: str) -> bytes:
+    data = text.encode("utf-8") + b"\0"
+    return data + b"\0" * (-len(data) % 4)
+
+
+def _address_part(name: str) -> str:
+    return _RESERVED.sub("_", name) or "_"
+
+
+def parse_osc_target(text: str) -> Tuple[str, int, Optional[float]]:
+    """'host:puerto[@hz]' -> (host, puerto, hz o None). Lanza ValueError si no es válido."""
+    address, _, rate = text.partition("@")
+    host, _, port = address.rpartition(":")
+    if not host:
+        raise ValueError(f"Destino OSC inválido: {text!r} (formato host:puerto[@hz])")
+    return host, int(port), float(rate) if rate else None
+
+
+class _BundleTemplate:
+    """
+    Bundle(s) precalculados para una tabla de subjects. `buffers` son bytearrays con todo
+    menos los floats; `float_offsets[i]` son las posiciones (en palabras de 4 bytes) de los
+    floats del buffer i y `sources[i]` sus índices dentro del array (N, 7) pos + rot aplanado.
+    """
+    __slots__ = ("buffers", "views", "float_offsets", "sources", "frame_offsets")
+
+    def __init__(self, prefix: str, frame: ProcessedFrame, max_datagram: int):
+        names = frame.subject_names
+        kinds = frame.subject_kinds.tolist()
+        offsets = frame.subject_offsets.tolist()
+        model = frame.model
+        bone_names = {}
+        if model is not None:
+            bone_names = {name: bones for name, bones in zip(model.names, model.bone_names) if bones is not None}
+
+        # Mensajes: (bytes de dirección + typetag, fila, componente inicial, nº de floats)
+        messages = []
+        for i, name in enumerate(names):
+            subject = f"{prefix}/{_address_part(name)}"
+            start, end = offsets[i], offsets[i + 1]
+            if kinds[i] == SUBJECT_RIGID_BODY:
+                bases = [(subject, start)]
+            else:
+                known = bone_names.get(name)
+                bases = [(f"{subject}/{_address_part(known[b] if known and b < len(known) else f'Bone_{b}')}", start + b)
+                         for b in range(end - start)]
+            for base, row in bases:
+                messages.append((_osc_string(f"{base}/pos") + _osc_string(",fff"), row, 0, 3))
+                messages.append((_osc_string(f"{base}/rot") + _osc_string(",ffff"), row, 3, 4))
+
+        frame_message = _osc_string(f"{prefix}/frame") + _osc_string(",i")
+        self.buffers, self.float_offsets, self.sources, self.frame_offsets = [], [], [], []
+        index = 0
+        while True:
+            # Cada bundle lleva su mensaje /frame y tantos mensajes como quepan
+            parts = [_BUNDLE_HEADER, _ELEMENT_SIZE.pack(len(frame_message) + 4), frame_message]
+            size = sum(len(p) for p in parts) + 4
+            frame_offset = size - 4
+            parts.append(bytes(4))
+            float_offsets, sources = [], []
+            while index < len(messages):
+                header, row, component, count = messages[index]
+                element = len(header) + 4 * count
+                if size + 4 + element > max_datagram and sources:
+                    break
+                parts.append(_ELEMENT_SIZE.pack(element) + header)
+                size += 4 + len(header)
+                float_offsets.extend(range(size, size + 4 * count, 4))
+                sources.extend(range(row * 7 + component, row * 7 + component + count))
+                parts.append(bytes(4 * count))
+                size += 4 * count
+                index += 1
+            self.buffers.append(bytearray(b"".join(parts)))
+            self.frame_offsets.append(frame_offset)
+            self.float_offsets.append(np.array(float_offsets, dtype=np.intp))
+            self.sources.append(np.array(sources, dtype=np.intp))
+            if index >= len(messages):
+                break
+        # Vistas uint32 sobre cada buffer: los floats están alineados a 4 bytes
+        self.views = [np.frombuffer(buffer, dtype=np.uint32) for buffer in self.buffers]
+        self.float_offsets = [offsets // 4 for offsets in self.float_offsets]
+
+    def fill(self, frame_number: int, rows: np.ndarray) -> List[bytearray]:
+        """Copia los floats del frame (array (N, 7) float32 big-endian) en los buffers."""
+        flat = rows.reshape(-1).view(np.uint32)
+        for buffer, view, slots, sources, frame_offset in zip(self.buffers, self.views, self.float_offsets,
+                                                              self.sources, self.frame_offsets):
+            view[slots] = flat[sources]
+            _INT32.pack_into(buffer, frame_offset, frame_number & 0x7FFFFFFF)
+        return self.buffers
+
+
+class OscExporter:
+    """
+    Exporter OSC para clientes ligeros (TouchDesigner, rigs de directo...): cada frame sale
+    como un único bundle OSC por UDP hacia cada destino, en un espacio de coordenadas.
+
+    Cada destino puede limitar su cadencia (`rate` Hz, None = todos los frames). El bundle
+    se construye una sola vez por frame y solo si algún destino lo necesita.
+    Expone la interfaz de salida que usa el pipeline (start, broadcast, demand, client_stats, stop).
+    """
+    def __init__(self, targets: List[Tuple[str, int, Optional[float]]], space="unreal", prefix="/yeici",
+                 subjects=None, max_datagram=65000):
+        if not targets:
+            raise ValueError("Se necesita al menos un destino OSC")
+        self.targets = targets
+        self.space = space
+        self.prefix = "/" + prefix.strip("/")
+        self.max_datagram = max_datagram
+        self.subscription = Subscription(subjects, None, (space,))
+        self._socket = None
+        self._addresses = []
+        self._intervals = [1.0 / rate if rate else 0.0 for _, _, rate in targets]
+        self._next_send = [0.0] * len(targets)
+        self._template_key = None
+        self._template: Optional[_BundleTemplate] = None
+        self._rows = np.empty((0, 7), dtype=">f4")
+
+        self.frames_built = 0
+        self.bundles_sent = [0] * len(targets)
+        self.send_errors = 0
+        self._metrics = get_metrics()
+
+    def start(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+        self._socket.setblocking(False)
+        self._addresses = [(socket.gethostbyname(host), port) for host, port, _ in self.targets]
+        logging.info(f"Salida OSC ({self.space}, {self.prefix}) hacia "
+                     + ", ".join(f"{host}:{port}" + (f" @ {rate:g} Hz" if rate else "") for host, port, rate in self.targets))
+
+    def _template_for(self, frame: ProcessedFrame) -> _BundleTemplate:
+        model = frame.model
+        key = (tuple(frame.subject_names), frame.subject_offsets.tobytes(), model.revision if model is not None else None)
+        if key != self._template_key:
+            self._template = _BundleTemplate(self.prefix, frame, self.max_datagram)
+            self._template_key = key
+            logging.info(f"OSC: plantilla de {len(frame.subject_names)} subjects "
+                         f"({sum(len(b) for b in self._template.buffers)} bytes, {len(self._template.buffers)} bundle(s))")
+        return self._template
+
+    def broadcast(self, frame):
+        if self._socket is None:
+            return
+        now = time.perf_counter()
+        due = [i for i, next_send in enumerate(self._next_send) if now >= next_send]
+        if not due:
+            return
+
+        started = time.perf_counter()
+        filtered = self.subscription.apply(frame)
+        positions, rotations = filtered.spaces[self.space]
+        rows = len(positions)
+        if len(self._rows) != rows:
+            self._rows = np.empty((rows, 7), dtype=">f4")
+        self._rows[:, :3] = positions
+        self._rows[:, 3:] = rotations
+        buffers = self._template_for(filtered).fill(filtered.frame_number, self._rows)
+        self.frames_built += 1
+        self._metrics.record("serialize", time.perf_counter() - started)
+
+        for i in due:
+            # Cadencia por destino: se programa desde el tick previsto para no derivar; si ese tick
+            # ya pasó (primer envío o parón), se reprograma desde ahora para no soltar una ráfaga
+            interval = self._intervals[i]
+            scheduled = self._next_send[i] + interval
+            self._next_send[i] = (scheduled if scheduled > now else now + interval) if interval else 0.0
+            for buffer in buffers:
+                try:
+                    self._socket.sendto(buffer, self._addresses[i])
+                    self.bundles_sent[i] += 1
+                except OSError:
+                    self.send_errors += 1
+
+    def demand(self) -> Subscription:
+        return self.subscription
+
+    def client_stats(self):
+        return [{
+            "address": f"{host}:{port}",
+            "transport": "osc",
+            "space": self.space,
+            "rate": rate,
+            "bundles_sent": self.bundles_sent[i],
+            "send_errors": self.send_errors,
+        } for i, (host, port, rate) in enumerate(self.targets)]
+
+    def stop(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
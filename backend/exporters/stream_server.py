@@ -1,21 +1,265 @@
-
 import socket
 import threading
 import json
 import logging
 import select
+import time
+from collections import deque
+
+from core.metrics import ThroughputMeter, get_metrics
+from core.subscription import Subscription, merge_subscriptions
+from exporters.delta_codec import DeltaMessage
+from exporters.wire_format import (JsonFrameEncoder, STATEFUL_FORMATS, WIRE_VERSION, create_encoder, encode_model,
+                                   parse_format_request)
+from logic.resampler import FrameResampler
+
+LAG_POLICIES = ("latest", "disconnect", "decimate")
+_MAX_DECIMATION = 16
+
+
+class _ClientSession:
+    """
+    Estado por cliente: socket, formato y suscripción negociados, buffer de entrada para
+    el handshake y cola de salida acotada que drena el hilo del servidor cuando el socket es escribible.
+    """
+    def __init__(self, sock, addr, max_queued_bytes):
+        self.sock = sock
+        self.addr = addr
+        self.wire_format = JsonFrameEncoder.key # Fallback hasta que el cliente negocie
+        self.subscription = Subscription()
+        self.model_revision = None # Revisión del SubjectModel que ya tiene el cliente
+        self.max_queued_bytes = max_queued_bytes
+        self.closing = False
+        self._inbox = bytearray()
+
+        # Cola de salida: [memoryview, t_encolado, t_recibido]; t_recibido es None en mensajes
+        # de control (0.0 en frames de origen desconocido). Solo el hilo del servidor envía.
+        self._lock = threading.Lock()
+        self._outbox = deque()
+        self._head_sent = 0
+        self.queued_bytes = 0
+
+        # Estado de la política de lag
+        self.lag_started = None
+        self.decimation = 1
+        self._frame_counter = 0
+        # Formato delta: secuencia del último mensaje encolado (None = necesita keyframe)
+        self.delta_sequence = None
+
+        # Estadísticas
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_sent = 0
+        self.send_latency_avg = 0.0
+        self.send_latency_max = 0.0
+        self.throughput = ThroughputMeter()
+        self._metrics = get_metrics()
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._outbox)
+
+    def feed(self, data: bytes):
+        """Acumula bytes recibidos y devuelve las líneas completas."""
+        self._inbox += data
+        *lines, rest = self._inbox.split(b"\n")
+        self._inbox = bytearray(rest)
+        return lines
+
+    @property
+    def stream_key(self):
+        """Clientes con la misma clave reciben exactamente los mismos bytes."""
+        return (self.wire_format, self.subscription.key)
+
+    def enqueue_control(self, message: bytes, wire_format=None, subscription=None):
+        """
+        Mensajes de control (acks): nunca se descartan. Si se indica `wire_format` /
+        `subscription`, el cambio queda atómico respecto a los frames encolados.
+        """
+        with self._lock:
+            self._outbox.append([memoryview(message), time.perf_counter(), None])
+            self.queued_bytes += len(message)
+            if wire_format is not None:
+                self.wire_format = wire_format
+                self.model_revision = None # Se reenvía en el formato nuevo
+            if subscription is not None:
+                self.subscription = subscription
+            self.delta_sequence = None
+
+    def enqueue_model(self, model):
+        """Encola el modelo si el cliente no tiene ya esta revisión (control: nunca se descarta)."""
+        with self._lock:
+            if self.model_revision == model.revision:
+                return
+            message = encode_model(model, self.wire_format)
+            self._outbox.append([memoryview(message), time.perf_counter(), None])
+            self.queued_bytes += len(message)
+            self.model_revision = model.revision
+
+    def _resolve(self, message):
+        """Bytes a encolar: con formato delta, el delta si el cliente tiene el frame anterior o un keyframe."""
+        if isinstance(message, DeltaMessage):
+            data = message.resolve(self.delta_sequence)
+            self.delta_sequence = message.sequence
+            return data
+        return message
+
+    def enqueue_frame(self, message, stream_key, now: float, policy: str, lag_timeout: float,
+                      received_at=0.0) -> bool:
+        """
+        Encola un frame (memoryview o DeltaMessage) aplicando la política de lag. Devuelve
+        False si el cliente debe desconectarse.
+        """
+        with self._lock:
+            if stream_key != self.stream_key:
+                return True # El cliente renegoció mientras se serializaba
+
+            if policy == "decimate" and self.decimation > 1:
+                self._frame_counter += 1
+                if self._frame_counter % self.decimation:
+                    self.frames_dropped += 1
+                    self.delta_sequence = None
+                    return True
+
+            data = self._resolve(message)
+            if self.queued_bytes + len(data) <= self.max_queued_bytes:
+                self.lag_started = None
+                self._outbox.append([data, now, received_at])
+                self.queued_bytes += len(data)
+                return True
+
+            # El cliente va atrasado: el buffer de salida está lleno
+            if policy == "latest":
+                dropped = self.frames_dropped
+                self._drop_pending_frames()
+                if self.frames_dropped != dropped and isinstance(message, DeltaMessage):
+                    data = message.keyframe() # El delta dependía de un frame descartado
+                self._outbox.append([data, now, received_at])
+                self.queued_bytes += len(data)
+                return True
+
+            self.frames_dropped += 1
+            self.delta_sequence = None
+            if policy == "decimate":
+                self.decimation = min(self.decimation * 2, _MAX_DECIMATION)
+                return True
+
+            # disconnect
+            if self.lag_started is None:
+                self.lag_started = now
+            return (now - self.lag_started) <= lag_timeout
+
+    def _drop_pending_frames(self):
+        """Descarta los frames que aún no empezaron a enviarse (preserva el framing del stream)."""
+        kept = deque()
+        for index, entry in enumerate(self._outbox):
+            started = index == 0 and self._head_sent > 0
+            if entry[2] is not None and not started:
+                self.frames_dropped += 1
+                self.queued_bytes -= len(entry[0])
+            else:
+                kept.append(entry)
+        self._outbox = kept
+
+    def flush(self):
+        """Envía todo lo posible sin bloquear. Lanza OSError si el socket falló."""
+        with self._lock:
+            while self._outbox:
+                entry = self._outbox[0]
+                view = entry[0]
+                try:
+                    sent = self.sock.send(view[self._head_sent:])
+                except BlockingIOError:
+                    return
+                self._head_sent += sent
+                self.bytes_sent += sent
+                self.queued_bytes -= sent
+                if self._head_sent < len(view):
+                    return
+
+                self._outbox.popleft()
+                self._head_sent = 0
+                if entry[2] is not None:
+                    now = time.perf_counter()
+                    latency = now - entry[1]
+                    self._metrics.record("send", latency)
+                    if entry[2]:
+                        self._metrics.record("end_to_end", now - entry[2])
+                    self.throughput.add(len(view), now)
+                    self.frames_sent += 1
+                    self.send_latency_avg += (latency - self.send_latency_avg) * 0.1
+                    self.send_latency_max = max(self.send_latency_max, latency)
+
+            # Cola vacía: el cliente se puso al día, se relaja la decimación
+            self.decimation = max(1, self.decimation // 2)
+
+    def stats(self) -> dict:
+        return {
+            "address": f"{self.addr[0]}:{self.addr[1]}",
+            "format": self.wire_format[0],
+            "precision": self.wire_format[1],
+            "subscription": self.subscription.describe(),
+            "queued_bytes": self.queued_bytes,
+            "queued_messages": len(self._outbox),
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "bytes_sent": self.bytes_sent,
+            "send_latency_ms": self.send_latency_avg * 1000.0,
+            "send_latency_max_ms": self.send_latency_max * 1000.0,
+            "decimation": self.decimation,
+            **self.throughput.rates(time.perf_counter()),
+        }
+
 
 class StreamServer:
     """
     Servidor de distribución de YeiciCap Hub.
     Envía payloads procesados a clientes conectados (Maya/Unreal) vía TCP.
+
+    Cada cliente recibe JSON por newline con todos los subjects salvo que negocie otro
+    formato y/o una suscripción enviando al conectarse una línea JSON, p. ej.
+        {"format": "binary", "precision": "float16", "subjects": ["SK_1"], "spaces": ["unreal"]}
+    El servidor responde con una línea de ack y a partir de ahí usa lo pedido.
+
+    `broadcast` solo serializa y encola: cada cliente tiene su cola de salida acotada
+    (`max_queued_bytes`) que el hilo del servidor drena con select cuando el socket
+    es escribible. Si un cliente se atrasa se aplica `lag_policy`:
+        latest     -> descarta lo pendiente y salta al frame más reciente
+        disconnect -> descarta frames y lo desconecta si sigue atrasado `lag_timeout_ms`
+        decimate   -> envía 1 de cada N frames (N se duplica mientras siga atrasado)
+
+    Con {"format": "delta"} el cliente recibe keyframes y deltas por subject; tras conectarse
+    o perder un frame por la política de lag recibe un keyframe. `delta_options` configura
+    el DeltaFrameEncoder (keyframe_interval, epsilon...).
     """
-    def __init__(self, host='127.0.0.1', port=54321):
+    def __init__(self, host='127.0.0.1', port=54321, lag_policy="latest",
+                 max_queued_bytes=512 * 1024, lag_timeout_ms=500, delta_options=None):
+        if lag_policy not in LAG_POLICIES:
+            raise ValueError(f"lag_policy inválida: {lag_policy!r} (opciones: {LAG_POLICIES})")
+
         self.host = host
         self.port = port
+        self.lag_policy = lag_policy
+        self.max_queued_bytes = max_queued_bytes
+        self.lag_timeout = lag_timeout_ms / 1000.0
         self.clients = []
         self._running = False
         self._server_socket = None
+        self.delta_options = delta_options or {}
+        self._encoders = {}
+        self._stream_encoders = {}
+        self._resamplers = {}
+        self._demand_key = None
+        self._demand = None
+
+        # Socketpair para despertar al select cuando hay datos nuevos que enviar
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._wake_pending = False
 
     def start(self):
         """Inicia el servidor TCP en un hilo separado."""
@@ -24,55 +268,203 @@ class StreamServer:
         self._server_socket.bind((self.host, self.port))
         self._server_socket.listen(5)
         self._server_socket.setblocking(False)
-        
+
         self._running = True
         self._thread = threading.Thread(target=self._run_server, name="StreamServer", daemon=True)
         self._thread.start()
         logging.info(f"StreamServer iniciado en {self.host}:{self.port}")
 
+    def _wake(self):
+        if not self._wake_pending:
+            self._wake_pending = True
+            try:
+                self._wake_w.send(b"\0")
+            except OSError:
+                pass
+
+    def _drain_wake(self):
+        self._wake_pending = False
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except OSError:
+            pass
+
     def _run_server(self):
         while self._running:
-            # Usar select para manejar nuevas conexiones y limpieza de sockets
-            readable, _, _ = select.select([self._server_socket] + self.clients, [], [], 0.1)
-            
+            for session in [c for c in self.clients if c.closing]:
+                self._remove_client(session)
+
+            # Usar select para conexiones nuevas, handshakes, cierres y sockets escribibles
+            clients = self.clients
+            writers = [c for c in clients if c.has_pending]
+            try:
+                readable, writable, _ = select.select([self._server_socket, self._wake_r] + clients, writers, [], 0.1)
+            except (OSError, ValueError):
+                if not self._running:
+                    break
+                continue
+            if not self._running:
+                break
+
             for s in readable:
                 if s is self._server_socket:
                     conn, addr = s.accept()
                     conn.setblocking(False)
-                    self.clients.append(conn)
+                    self.clients = self.clients + [_ClientSession(conn, addr, self.max_queued_bytes)]
                     logging.info(f"Nuevo cliente conectado: {addr}")
+                elif s is self._wake_r:
+                    self._drain_wake()
                 else:
-                    # Si un cliente envía algo o cierra la conexión
+                    # Si un cliente envía algo (handshake) o cierra la conexión
                     try:
-                        data = s.recv(1024)
+                        data = s.sock.recv(1024)
                         if not data:
                             self._remove_client(s)
+                            continue
+                        for line in s.feed(data):
+                            self._handle_client_message(s, line)
                     except:
                         self._remove_client(s)
 
-    def _remove_client(self, client_socket):
-        if client_socket in self.clients:
-            self.clients.remove(client_socket)
-            client_socket.close()
+            for s in writable:
+                try:
+                    s.flush()
+                except OSError:
+                    self._remove_client(s)
+
+    def _handle_client_message(self, session: _ClientSession, line: bytes):
+        """Procesa una línea de control del cliente (negociación de formato y suscripción)."""
+        if not line.strip():
+            return
+        try:
+            request = json.loads(line)
+            key = parse_format_request(request)
+            subscription = Subscription.from_request(request)
+        except ValueError as e:
+            reply = {"error": str(e)}
+            key = subscription = None
+        else:
+            reply = {"ack": "format", "format": key[0], "precision": key[1], "version": WIRE_VERSION,
+                     "subscription": subscription.describe()}
+
+        # El ack y el cambio de formato son atómicos: los frames siguientes ya salen en el nuevo
+        session.enqueue_control((json.dumps(reply) + "\n").encode('utf-8'), key, subscription)
+        if key is not None:
+            logging.info(f"Cliente {session.addr} negoció formato {key[0]} ({key[1]}), suscripción {subscription.describe()}")
+
+    def _remove_client(self, session: _ClientSession):
+        # Copy-on-write: broadcast itera sobre la lista vigente sin locks
+        if session in self.clients:
+            self.clients = [c for c in self.clients if c is not session]
+            session.sock.close()
             logging.info("Cliente desconectado.")
 
-    def broadcast(self, payload: dict):
-        """Envía el JSON del payload a todos los clientes conectados."""
-        if not self.clients:
+    def _encoder(self, stream_key):
+        """Encoder del stream: compartido por formato salvo los que guardan estado (uno por stream)."""
+        wire_format = stream_key[0]
+        encoder = self._encoders.get(wire_format) or self._stream_encoders.get(stream_key)
+        if encoder is None:
+            encoder = create_encoder(wire_format, self.delta_options)
+            if getattr(encoder, "stateful", False):
+                # Se descartan los streams con estado que ya no tienen clientes
+                live = {c.stream_key for c in self.clients}
+                self._stream_encoders = {k: e for k, e in self._stream_encoders.items() if k in live}
+                self._stream_encoders[stream_key] = encoder
+            else:
+                self._encoders[wire_format] = encoder
+        return encoder
+
+    def broadcast(self, frame):
+        """
+        Encola el ProcessedFrame para todos los clientes.
+        La serialización se hace una sola vez por formato y suscripción y se comparte entre
+        clientes; el envío real lo hace el hilo del servidor, así un cliente lento no frena al resto.
+        Los clientes que pidieron otra cadencia reciben la salida del resampler de esa cadencia
+        (uno por cadencia distinta), que puede ser ninguno, uno o varios frames.
+        """
+        clients = self.clients
+        if not clients:
             return
 
-        # Serializar a JSON y añadir newline como delimitador de paquete
-        message = (json.dumps(payload) + "\n").encode('utf-8')
-        
-        for client in self.clients[:]:
-            try:
-                client.sendall(message)
-            except (socket.error, BrokenPipeError):
-                self._remove_client(client)
+        metrics = get_metrics()
+        received_at = getattr(frame, "received_at", 0.0)
+        model = getattr(frame, "model", None)
+        now = time.perf_counter()
+        outputs = {}
+        for session in clients:
+            if model is not None and session.model_revision != model.revision:
+                session.enqueue_model(model)
+            rate_key = session.subscription.rate_key
+            if rate_key not in outputs:
+                outputs[rate_key] = [frame] if rate_key is None else self._resampler(rate_key).push(frame)
+
+        # Frame a frame para todos los clientes: los encoders delta solo valen hasta el siguiente encode
+        for index in range(max(len(frames) for frames in outputs.values())):
+            messages = {}
+            for session in clients:
+                frames = outputs.get(session.subscription.rate_key)
+                if frames is None or index >= len(frames):
+                    continue # Renegoció durante el broadcast o su cadencia no toca en este tick
+                key = session.stream_key
+                message = messages.get(key)
+                if message is None:
+                    source = frames[index]
+                    message = source.encoded.get(key) if getattr(source, "encoded", None) else None
+                    if message is None:
+                        started = time.perf_counter()
+                        message = self._encoder(key).encode(session.subscription.apply(source))
+                        metrics.record("serialize", time.perf_counter() - started)
+                    if not isinstance(message, DeltaMessage):
+                        message = memoryview(message)
+                    messages[key] = message
+                if not session.enqueue_frame(message, key, now, self.lag_policy, self.lag_timeout, received_at):
+                    logging.warning(f"Cliente {session.addr} atrasado más de {self.lag_timeout * 1000:.0f} ms, desconectando.")
+                    session.closing = True
+        self._wake()
+
+    def _resampler(self, rate_key):
+        """Resampler compartido por todos los clientes de una misma cadencia."""
+        resampler = self._resamplers.get(rate_key)
+        if resampler is None:
+            live = {c.subscription.rate_key for c in self.clients}
+            self._resamplers = {k: r for k, r in self._resamplers.items() if k in live}
+            resampler = self._resamplers[rate_key] = FrameResampler(*rate_key)
+        return resampler
+
+    def demand(self):
+        """
+        Unión de las suscripciones de los clientes conectados (None si no hay clientes).
+        Se pasa a MocapTransformer.process_frame para calcular solo lo necesario.
+        """
+        clients = self.clients
+        demand_key = tuple(c.subscription.key for c in clients)
+        if demand_key != self._demand_key:
+            self._demand = merge_subscriptions(c.subscription for c in clients)
+            self._demand_key = demand_key
+        return self._demand
+
+    def encode_plan(self):
+        """
+        Streams {stream_key: suscripción} que se pueden serializar fuera de este proceso
+        (formatos sin estado a la cadencia de Motive); ver ProcessedFrame.encoded.
+        """
+        plan = {}
+        for session in self.clients:
+            key = session.stream_key
+            if session.subscription.rate_key is None and key[0][0] not in STATEFUL_FORMATS:
+                plan.setdefault(key, session.subscription)
+        return plan
+
+    def client_stats(self):
+        """Estadísticas por cliente (bytes en cola, descartes, latencia de envío)."""
+        return [c.stats() for c in self.clients]
 
     def stop(self):
         self._running = False
         for c in self.clients:
-            c.close()
+            c.sock.close()
         if self._server_socket:
             self._server_socket.close()
+        self._wake_r.close()
+        self._wake_w.close()
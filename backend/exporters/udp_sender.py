@@ -0,0 +1,231 @@
+import ipaddress
+import logging
+import socket
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+from core.metrics import ThroughputMeter, get_metrics
+from core.subscription import Subscription
+from exporters.wire_format import create_encoder, encode_model, parse_format_request
+from logic.resampler import FrameResampler
+
+# --- Transporte UDP YeiciCap ---
+#
+# Cada mensaje del stream (frame o modelo, serializado una sola vez con los encoders de
+# wire_format, sin el prefijo de longitud de TCP) se parte en fragmentos que caben en un
+# datagrama. Cada datagrama lleva:
+#   magic 'YUDP' | version u8 | flags u8 | fragment_index u16 | fragment_count u16 |
+#   sequence u32 | message_length u32 | fragmento
+# `sequence` crece con cada mensaje: el receptor reensambla por secuencia y descarta
+# cualquier fragmento de un mensaje más viejo que el último entregado (ver DatagramReassembler).
+# El modelo (YMDL / línea JSON "type": "model") se reenvía periódicamente: en UDP se puede perder.
+
+UDP_MAGIC = b"YUDP"
+UDP_VERSION = 1
+UDP_FORMATS = ("binary", "json") # delta no: necesita que llegue cada mensaje
+
+_FRAGMENT = struct.Struct("<4sBBHHII")
+DEFAULT_PAYLOAD = 1400 - _FRAGMENT.size # Cabe en una MTU Ethernet con cabeceras IP/UDP
+_MAX_FRAGMENTS = 0xFFFF
+
+
+def parse_target(text: str) -> Tuple[str, int]:
+    """'host:puerto' -> (host, puerto). Lanza ValueError si no es válido."""
+    host, _, port = text.rpartition(":")
+    if not host:
+        raise ValueError(f"Destino UDP inválido: {text!r} (formato host:puerto)")
+    return host, int(port)
+
+
+class DatagramStreamer:
+    """
+    Salida por datagramas: serializa cada frame una vez y lo emite a un grupo multicast y/o
+    a una lista de destinos unicast. Sin conexión ni colas por cliente: un paquete perdido
+    no retrasa a los siguientes y añadir nodos receptores (multicast) no cuesta nada al hub.
+
+    El formato y la suscripción son fijos (no hay handshake): se configuran al crearlo con
+    la misma petición que negocian los clientes TCP, p. ej.
+        {"format": "binary", "precision": "float16", "spaces": ["unreal"]}
+    Expone la parte de la interfaz de StreamServer que usa el pipeline (start, broadcast,
+    demand, client_stats, stop).
+    """
+    def __init__(self, targets: List[Tuple[str, int]], request: Optional[Dict] = None,
+                 payload_size=DEFAULT_PAYLOAD, ttl=1, model_interval=1.0):
+        request = request or {"format": "binary"}
+        self.wire_format = parse_format_request(request)
+        if self.wire_format[0] not in UDP_FORMATS:
+            raise ValueError(f"Formato no soportado por UDP: {self.wire_format[0]!r} (opciones: {UDP_FORMATS})")
+        self.subscription = Subscription.from_request(request)
+        if not targets:
+            raise ValueError("Se necesita al menos un destino UDP")
+        self.targets = targets
+        self.payload_size = payload_size
+        self.ttl = ttl
+        self.model_interval = model_interval
+        self._encoder = create_encoder(self.wire_format)
+        self._stream_key = (self.wire_format, self.subscription.key)
+        rate_key = self.subscription.rate_key
+        self._resampler = FrameResampler(*rate_key) if rate_key is not None else None
+        # Los mensajes binarios llevan el prefijo de longitud de TCP: el fragmento ya la lleva
+        self._skip = 0 if self.wire_format[0] == "json" else 4
+        self._socket = None
+        self._addresses = []
+        self._sequence = 0
+        self._model_revision = None
+        self._model_sent_at = 0.0
+
+        self.frames_sent = 0
+        self.datagrams_sent = 0
+        self.send_errors = 0
+        self.bytes_sent = 0
+        self.throughput = ThroughputMeter()
+        self._metrics = get_metrics()
+
+    def start(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self._socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self.ttl)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+        self._socket.setblocking(False)
+        # Se resuelve una vez: sendto con un nombre de host resolvería en cada datagrama
+        self._addresses = [(socket.gethostbyname(host), port) for host, port in self.targets]
+        kinds = ["multicast" if ipaddress.ip_address(host).is_multicast else "unicast" for host, _ in self._addresses]
+        logging.info(f"Salida UDP ({self.wire_format[0]}) hacia "
+                     + ", ".join(f"{host}:{port} ({kind})" for (host, port), kind in zip(self.targets, kinds)))
+
+    def _send(self, message) -> int:
+        """Fragmenta y envía un mensaje a todos los destinos. Devuelve los bytes enviados."""
+        view = memoryview(message)[self._skip:]
+        length = len(view)
+        size = self.payload_size
+        count = max(1, -(-length // size))
+        if count > _MAX_FRAGMENTS:
+            self.send_errors += 1
+            return 0
+        self._sequence = (self._sequence + 1) & 0xFFFFFFFF
+        sent = 0
+        sock = self._socket
+        for index in range(count):
+            datagram = _FRAGMENT.pack(UDP_MAGIC, UDP_VERSION, 0, index, count, self._sequence, length) \
+                + view[index * size:(index + 1) * size]
+            for target in self._addresses:
+                try:
+                    sock.sendto(datagram, target)
+                    sent += len(datagram)
+                    self.datagrams_sent += 1
+                except OSError:
+                    # Buffer de envío lleno o destino inalcanzable: en UDP se pierde y se sigue
+                    self.send_errors += 1
+        return sent
+
+    def broadcast(self, frame):
+        if self._socket is None:
+            return
+        now = time.perf_counter()
+        model = getattr(frame, "model", None)
+        if model is not None and (model.revision != self._model_revision
+                                  or now - self._model_sent_at >= self.model_interval):
+            self._send(encode_model(model, self.wire_format))
+            self._model_revision = model.revision
+            self._model_sent_at = now
+
+        frames = (frame,) if self._resampler is None else self._resampler.push(frame)
+        for output in frames:
+            message = output.encoded.get(self._stream_key) if getattr(output, "encoded", None) else None
+            if message is None:
+                started = time.perf_counter()
+                message = self._encoder.encode(self.subscription.apply(output))
+                self._metrics.record("serialize", time.perf_counter() - started)
+            sending = time.perf_counter()
+            sent = self._send(message)
+            now = time.perf_counter()
+            self._metrics.record("send", now - sending)
+            self.frames_sent += 1
+            self.bytes_sent += sent
+            self.throughput.add(sent, now)
+
+    def demand(self) -> Subscription:
+        return self.subscription
+
+    def encode_plan(self):
+        """Stream serializable fuera de este proceso (ver StreamServer.encode_plan)."""
+        if self.subscription.rate_key is not None:
+            return {}
+        return {self._stream_key: self.subscription}
+
+    def client_stats(self):
+        return [{
+            "address": ", ".join(f"{host}:{port}" for host, port in self.targets),
+            "transport": "udp",
+            "format": self.wire_format[0],
+            "precision": self.wire_format[1],
+            "subscription": self.subscription.describe(),
+            "frames_sent": self.frames_sent,
+            "datagrams_sent": self.datagrams_sent,
+            "send_errors": self.send_errors,
+            "bytes_sent": self.bytes_sent,
+            **self.throughput.rates(time.perf_counter()),
+        }]
+
+    def stop(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class DatagramReassembler:
+    """
+    Lado receptor: reensambla los fragmentos de DatagramStreamer. `feed(datagram)` devuelve
+    el mensaje completo (bytes) cuando llega su último fragmento, o None. Los fragmentos de
+    mensajes más viejos que el último entregado se descartan, y un mensaje incompleto se
+    abandona en cuanto se completa otro más nuevo.
+    """
+    def __init__(self, max_pending=8):
+        self.max_pending = max_pending
+        self.delivered = None
+        self._pending: Dict[int, list] = {}
+        self.stale = 0
+        self.incomplete = 0
+
+    @staticmethod
+    def _newer(a: int, b: int) -> bool:
+        # Comparación con vuelta de los u32
+        return 0 < ((a - b) & 0xFFFFFFFF) < 0x80000000
+
+    def feed(self, datagram) -> Optional[bytes]:
+        if len(datagram) < _FRAGMENT.size:
+            return None
+        magic, version, _, index, count, sequence, length = _FRAGMENT.unpack_from(datagram)
+        if magic != UDP_MAGIC or index >= count:
+            return None
+        if self.delivered is not None and not self._newer(sequence, self.delivered):
+            self.stale += 1
+            return None
+
+        chunk = bytes(datagram[_FRAGMENT.size:])
+        if count == 1:
+            message = chunk
+        else:
+            entry = self._pending.get(sequence)
+            if entry is None:
+                if len(self._pending) >= self.max_pending:
+                    del self._pending[max(self._pending, key=lambda s: (sequence - s) & 0xFFFFFFFF)]
+                    self.incomplete += 1
+                entry = self._pending[sequence] = [[None] * count, 0]
+            parts = entry[0]
+            if parts[index] is None:
+                parts[index] = chunk
+                entry[1] += 1
+            if entry[1] < count:
+                return None
+            message = b"".join(parts)
+
+        if len(message) != length:
+            return None
+        self.delivered = sequence
+        # Lo pendiente más viejo ya no se entregará
+        for pending in [s for s in self._pending if not self._newer(s, sequence)]:
+            del self._pending[pending]
+            if pending != sequence:
+                self.incomplete += 1
+        return message
@@ -0,0 +1,194 @@
+import json
+import math
+import struct
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from core.frame import ProcessedFrame
+
+# --- Protocolo binario YeiciCap (v3) ---
+#
+# Cada mensaje va precedido de su longitud (u32 LE) para delimitarlo sobre TCP.
+# Payload:
+#   Header:        magic 'YCAP' | version u8 | precision u8 | subject_count u16 |
+#                  frame_number u32 | timestamp f64 | row_count u32
+#   Espacios:      space_count u8, luego por espacio: name_len u8 + nombre utf-8
+#   Subjects:      por subject: kind u8 | row_count u16 | name_len u8 + nombre utf-8
+#   Frescura:      ceil(subject_count / 8) bytes, bit i (LSB primero) = subject i con datos
+#                  nuevos; 0 = pose retenida (frame-hold) o nula por oclusión (v2)
+#   Datos:         por espacio, en el orden de la tabla:
+#                    [int16: pos_scale f32] positions (N, 3) + rotations (N, 4)
+#   Markers (v3):  marker_set_count u16 (0 si el cliente no pidió markers), por set:
+#                  marker_count u16 | name_len u8 + nombre utf-8; luego por espacio:
+#                    [int16: pos_scale f32] positions (M, 3)
+#
+# Mensaje de modelo: antes del primer frame y cada vez que cambia la tabla de subjects
+# (data descriptions de Motive) se envía el SubjectModel en JSON: nombres, IDs y, por
+# Skeleton, nombres de huesos e índice del padre. En binario va con su propio magic:
+#   magic 'YMDL' | version u8 | JSON utf-8
+# En JSON es una línea más con "type": "model".
+#
+# Delta ({"format": "delta"}): keyframes YCAP float32 + deltas por subject con magic 'YDLT';
+# el layout está en exporters/delta_codec.py.
+#
+# Precisiones:
+#   float32 -> arrays float32 tal cual
+#   float16 -> arrays float16 (mitad de ancho de banda, ~3 decimales significativos)
+#   int16   -> cuantizado: pos = q * pos_scale (escala por frame), rot = q / 32767
+
+WIRE_MAGIC = b"YCAP"
+MODEL_MAGIC = b"YMDL"
+WIRE_VERSION = 3
+
+PRECISION_CODES = {"float32": 0, "float16": 1, "int16": 2}
+
+_LENGTH = struct.Struct("<I")
+_HEADER = struct.Struct("<4sBBHIdI")
+_SUBJECT = struct.Struct("<BHB")
+_MARKER_SET = struct.Struct("<HB")
+_COUNT16 = struct.Struct("<H")
+_SCALE = struct.Struct("<f")
+_INT16_MAX = 32767.0
+
+
+class JsonFrameEncoder:
+    """Fallback original: JSON delimitado por newline."""
+    key = ("json", None)
+
+    def encode(self, frame) -> bytes:
+        payload = frame.to_payload() if isinstance(frame, ProcessedFrame) else frame
+        return (json.dumps(payload) + "\n").encode('utf-8')
+
+
+class BinaryFrameEncoder:
+    """Serializa un ProcessedFrame a un mensaje binario compacto con la precisión pedida."""
+    def __init__(self, precision="float32"):
+        if precision not in PRECISION_CODES:
+            raise ValueError(f"Precisión inválida: {precision!r} (opciones: {tuple(PRECISION_CODES)})")
+        self.precision = precision
+        self.key = ("binary", precision)
+        # La tabla de subjects casi nunca cambia entre frames: se cachea su versión empaquetada
+        self._table_key = None
+        self._table_bytes = b""
+        self._marker_key = None
+        self._marker_bytes = _COUNT16.pack(0)
+
+    def _tables(self, frame: ProcessedFrame) -> bytes:
+        key = (tuple(frame.spaces), tuple(frame.subject_names), frame.subject_offsets.tobytes())
+        if key != self._table_key:
+            parts = [bytes((len(frame.spaces),))]
+            for space in frame.spaces:
+                name = space.encode('utf-8')
+                parts.append(bytes((len(name),)) + name)
+            counts = np.diff(frame.subject_offsets).tolist()
+            for name, kind, count in zip(frame.subject_names, frame.subject_kinds.tolist(), counts):
+                encoded = name.encode('utf-8')
+                parts.append(_SUBJECT.pack(kind, count, len(encoded)) + encoded)
+            self._table_key = key
+            self._table_bytes = b"".join(parts)
+        return self._table_bytes
+
+    def _marker_table(self, frame: ProcessedFrame) -> bytes:
+        names, offsets, _ = frame.markers
+        key = (tuple(names), offsets.tobytes())
+        if key != self._marker_key:
+            parts = [_COUNT16.pack(len(names))]
+            for name, count in zip(names, np.diff(offsets).tolist()):
+                encoded = name.encode('utf-8')
+                parts.append(_MARKER_SET.pack(count, len(encoded)) + encoded)
+            self._marker_key = key
+            self._marker_bytes = b"".join(parts)
+        return self._marker_bytes
+
+    def _pack_positions(self, positions: np.ndarray):
+        if self.precision == "float32":
+            return [positions.astype(np.float32, copy=False).tobytes()]
+        if self.precision == "float16":
+            return [positions.astype(np.float16).tobytes()]
+
+        # int16 con escala variable por frame para no saturar en volúmenes grandes
+        peak = float(np.max(np.abs(positions))) if positions.size else 0.0
+        if not math.isfinite(peak):
+            # Solo los markers pueden traer NaN (las filas de Rigid Bodies ya vienen saneadas)
+            positions = np.nan_to_num(positions, nan=0.0, posinf=0.0, neginf=0.0)
+            peak = float(np.max(np.abs(positions)))
+        scale = peak / _INT16_MAX if peak > 0 else 1.0
+        return [_SCALE.pack(scale), np.rint(positions / scale).astype(np.int16).tobytes()]
+
+    def _pack_arrays(self, positions: np.ndarray, rotations: np.ndarray):
+        parts = self._pack_positions(positions)
+        if self.precision == "float32":
+            parts.append(rotations.astype(np.float32, copy=False).tobytes())
+        elif self.precision == "float16":
+            parts.append(rotations.astype(np.float16).tobytes())
+        else:
+            parts.append(np.rint(np.clip(rotations, -1.0, 1.0) * _INT16_MAX).astype(np.int16).tobytes())
+        return parts
+
+    def encode(self, frame: ProcessedFrame) -> bytes:
+        header = _HEADER.pack(
+            WIRE_MAGIC, WIRE_VERSION, PRECISION_CODES[self.precision], len(frame.subject_names),
+            frame.frame_number, frame.timestamp, frame.row_count,
+        )
+        parts = [header, self._tables(frame), frame.freshness_mask]
+        for positions, rotations in frame.spaces.values():
+            parts.extend(self._pack_arrays(positions, rotations))
+
+        if frame.markers is None:
+            parts.append(_COUNT16.pack(0))
+        else:
+            parts.append(self._marker_table(frame))
+            marker_spaces = frame.markers[2]
+            for space in frame.spaces:
+                parts.extend(self._pack_positions(marker_spaces[space]))
+
+        body = b"".join(parts)
+        return _LENGTH.pack(len(body)) + body
+
+
+def encode_model(model, key: Tuple[str, Any]) -> bytes:
+    """Mensaje de modelo (SubjectModel) en el formato negociado `key`."""
+    description = model.describe()
+    if key[0] == "json":
+        return (description + "\n").encode('utf-8')
+    body = MODEL_MAGIC + bytes((WIRE_VERSION,)) + description.encode('utf-8')
+    return _LENGTH.pack(len(body)) + body
+
+
+def parse_format_request(request: Dict[str, Any]) -> Tuple[str, Any]:
+    """
+    Valida el handshake enviado por el cliente al conectarse, p. ej.
+        {"format": "binary", "precision": "float16"} o {"format": "delta"}
+    Devuelve la clave de formato. Lanza ValueError si no es soportado.
+    """
+    fmt = request.get("format", "json")
+    if fmt == "json":
+        return JsonFrameEncoder.key
+    if fmt == "binary":
+        precision = request.get("precision", "float32")
+        if precision not in PRECISION_CODES:
+            raise ValueError(f"Precisión inválida: {precision!r}")
+        return ("binary", precision)
+    if fmt == "delta":
+        return ("delta", "int16")
+    raise ValueError(f"Formato inválido: {fmt!r}")
+
+
+# Formatos cuyos encoders guardan estado del stream: no se pueden serializar fuera del
+# proceso que envía (p. ej. en los workers de --threading process/shm)
+STATEFUL_FORMATS = frozenset({"delta"})
+
+
+def create_encoder(key: Tuple[str, Any], delta_options: Dict[str, Any] = None):
+    """
+    Instancia el encoder asociado a una clave de formato negociada. Los encoders con
+    `stateful = True` (delta) guardan estado del stream: uno por formato y suscripción.
+    """
+    fmt, precision = key
+    if fmt == "json":
+        return JsonFrameEncoder()
+    if fmt == "delta":
+        from exporters.delta_codec import DeltaFrameEncoder
+        return DeltaFrameEncoder(**(delta_options or {}))
+    return BinaryFrameEncoder(precision)
@@ -1,15 +1,65 @@
-
+import argparse
+import logging
+import threading
+import time
 import customtkinter as ctk
 import tkinter as tk
-from typing import Dict
+from typing import Callable, Dict, Optional
+
+from core.metrics import LogRing, get_metrics
 
 # Configuración Global de Apariencia
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
+# La GUI nunca toca frames: lee el snapshot de métricas compartido a cadencia fija con
+# after(). Cada refresco cuesta lo mismo haya 60 o 240 frames/s, y los widgets solo se
+# reconfiguran si su texto cambió.
+POLL_INTERVAL_MS = 100      # 10 Hz
+FPS_WINDOW = 1.0            # Segundos de la ventana de FPS
+CONSOLE_MAX_LINES = 1000    # Líneas que conserva la consola (las viejas se recortan)
+LOG_RING_CAPACITY = 2000
+CLOSE_TIMEOUT = 10.0        # Segundos máximos esperando a que el pipeline pare al cerrar
+
+# Colores de los LEDs de estado
+LED_OFF = "#566573"
+LED_OK = "#28B463"
+LED_WAIT = "#D4AC0D"
+LED_ERROR = "#CB4335"
+
+
 class YeiciApp(ctk.CTk):
-    def __init__(self):
+    """
+    GUI del Hub. El pipeline (pipeline.HeadlessPipeline) se crea al pulsar INICIAR y
+    arranca/para en un hilo auxiliar: la GUI solo observa `get_metrics().snapshot()` y el
+    LogRing, así que tenerla abierta durante una toma no compite con la captura.
+    Las pestañas de configuración y ayuda se construyen la primera vez que se muestran.
+    """
+    def __init__(self, config: Optional[argparse.Namespace] = None):
         super().__init__()
+        self.hub_config = config
+        self.pipeline = None
+        self._server_state = "stopped" # stopped | starting | running | stopping | error
+        # Arranque/parada en curso y cierre de la ventana: el lock ordena la entrega del pipeline
+        # recién creado frente a una petición de cierre que llegue mientras arranca
+        self._lifecycle_lock = threading.Lock()
+        self._lifecycle_thread: Optional[threading.Thread] = None
+        self._closing = False
+        self._close_thread: Optional[threading.Thread] = None
+        self._close_deadline = 0.0
+        self._metrics = get_metrics()
+
+        # Consola: los logs de todos los hilos van a un ring acotado que se vuelca por lotes
+        self.log_ring = LogRing(LOG_RING_CAPACITY)
+        self.log_ring.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s', "%H:%M:%S"))
+        logging.getLogger().addHandler(self.log_ring)
+        self._log_seen = 0
+
+        # Estado del sondeo: frames emitidos en la última marca de la ventana de FPS
+        self._fps_mark = (time.perf_counter(), 0)
+        self._fps = 0.0
+        self._texts: Dict[str, str] = {}
+        self._colors: Dict[str, str] = {}
 
         # --- Ventana Principal ---
         self.title("YeiciCap Hub | MoCap Bridge Professional v2.2.0")
@@ -25,48 +75,55 @@ class YeiciApp(ctk.CTk):
         self.sidebar_frame.grid_rowconfigure(6, weight=1)
 
         self.logo_label = ctk.CTkLabel(
-            self.sidebar_frame, 
-            text="YEICICAP HUB", 
+            self.sidebar_frame,
+            text="YEICICAP HUB",
             font=ctk.CTkFont(size=22, weight="bold")
         )
-        self.logo_label.grid(row=0, column=0, padx=20, py=(30, 10))
-        
+        self.logo_label.grid(row=0, column=0, padx=20, pady=(30, 10))
+
         self.version_tag = ctk.CTkLabel(
-            self.sidebar_frame, 
-            text="CORE v2.2.0-STABLE", 
+            self.sidebar_frame,
+            text="CORE v2.2.0-STABLE",
             text_color="#5DADE2",
             font=ctk.CTkFont(size=10, weight="bold")
         )
-        self.version_tag.grid(row=1, column=0, padx=20, py=(0, 30))
+        self.version_tag.grid(row=1, column=0, padx=20, pady=(0, 30))
 
         # Botones de Navegación
-        self.nav_buttons = []
-        self.btn_dashboard = self._add_nav_button("Dashboard", 2, self.show_dashboard)
-        self.btn_config = self._add_nav_button("Configuración", 3, self.show_config)
-        self.btn_maya = self._add_nav_button("Ayuda Maya", 4, self.show_maya_help)
-        self.btn_unreal = self._add_nav_button("Ayuda Unreal", 5, self.show_unreal_help)
+        self.nav_buttons: Dict[str, ctk.CTkButton] = {}
+        self.btn_dashboard = self._add_nav_button("dashboard", "Dashboard", 2, self.show_dashboard)
+        self.btn_config = self._add_nav_button("config", "Configuración", 3, self.show_config)
+        self.btn_maya = self._add_nav_button("maya", "Ayuda Maya", 4, self.show_maya_help)
+        self.btn_unreal = self._add_nav_button("unreal", "Ayuda Unreal", 5, self.show_unreal_help)
 
         # --- Área de Contenido Principal ---
         self.main_area = ctk.CTkFrame(self, fg_color="transparent")
-        self.main_area.grid(row=0, column=1, sticky="nsew", padx=20, py=20)
+        self.main_area.grid(row=0, column=1, sticky="nsew", padx=20, pady=20)
         self.main_area.grid_columnconfigure(0, weight=1)
         self.main_area.grid_rowconfigure(0, weight=1)
 
-        # Diccionario de Frames (Pestañas)
+        # Diccionario de Frames (Pestañas): solo el Dashboard se construye al arrancar
         self.frames: Dict[str, ctk.CTkFrame] = {}
-        
+        self._frame_builders: Dict[str, Callable[[], None]] = {
+            "config": self._init_config_frame,
+            "maya": self._init_maya_frame,
+            "unreal": self._init_unreal_frame,
+        }
+        self.config_entries: Dict[str, ctk.CTkEntry] = {}
+        self._current_tab = None
+
         self._init_dashboard_frame()
-        self._init_config_frame()
-        self._init_maya_frame()
-        self._init_unreal_frame()
 
         # Mostrar Dashboard por defecto
         self.show_dashboard()
 
-    def _add_nav_button(self, text, row, command):
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self.after(POLL_INTERVAL_MS, self._poll)
+
+    def _add_nav_button(self, name, text, row, command):
         btn = ctk.CTkButton(
-            self.sidebar_frame, 
-            text=text, 
+            self.sidebar_frame,
+            text=text,
             command=command,
             fg_color="transparent",
             text_color=("gray10", "gray90"),
@@ -74,13 +131,14 @@ class YeiciApp(ctk.CTk):
             anchor="w",
             height=40
         )
-        btn.grid(row=row, column=0, padx=20, py=5, sticky="ew")
-        self.nav_buttons.append(btn)
+        btn.grid(row=row, column=0, padx=20, pady=5, sticky="ew")
+        self.nav_buttons[name] = btn
         return btn
 
     def _init_dashboard_frame(self):
         frame = ctk.CTkFrame(self.main_area, fg_color="transparent")
         self.frames["dashboard"] = frame
+        frame.grid_columnconfigure(0, weight=1)
 
         # 1. Panel de Estado
         status_panel = ctk.CTkFrame(frame, height=120)
@@ -91,66 +149,96 @@ class YeiciApp(ctk.CTk):
         self.status_maya = self._create_status_indicator(status_panel, "MAYA: ESPERANDO", 1)
         self.status_unreal = self._create_status_indicator(status_panel, "UNREAL: ESPERANDO", 2)
 
-        # 2. Botón Maestro
+        # 2. Métricas en vivo (del snapshot compartido)
+        metrics_panel = ctk.CTkFrame(frame)
+        metrics_panel.grid(row=1, column=0, sticky="ew", pady=(0, 10))
+        metrics_panel.grid_columnconfigure((0, 1, 2, 3), weight=1)
+        self.metric_labels: Dict[str, ctk.CTkLabel] = {}
+        for col, (key, title) in enumerate((("fps", "FPS"), ("latency", "LATENCIA p50/p99"),
+                                            ("dropped", "DESCARTES"), ("clients", "CLIENTES"))):
+            ctk.CTkLabel(metrics_panel, text=title, text_color="#5DADE2",
+                         font=ctk.CTkFont(size=10, weight="bold")).grid(row=0, column=col, pady=(10, 0))
+            label = ctk.CTkLabel(metrics_panel, text="--", font=ctk.CTkFont(size=18, weight="bold"))
+            label.grid(row=1, column=col, pady=(0, 10))
+            self.metric_labels[key] = label
+
+        # 3. Botón Maestro
         self.btn_start = ctk.CTkButton(
-            frame, 
-            text="INICIAR SERVIDOR", 
+            frame,
+            text="INICIAR SERVIDOR",
             height=80,
             font=ctk.CTkFont(size=20, weight="bold"),
             fg_color="#1F618D",
-            hover_color="#1A5276"
+            hover_color="#1A5276",
+            command=self.toggle_server
+        )
+        self.btn_start.grid(row=2, column=0, sticky="ew", pady=10)
+
+        # 4. Contadores por cliente
+        self.clients_box = ctk.CTkTextbox(
+            frame,
+            height=110,
+            font=ctk.CTkFont(family="Consolas", size=12),
+            border_width=1,
+            fg_color="#1C1C1C"
         )
-        self.btn_start.grid(row=1, column=0, sticky="ew", pady=10)
+        self.clients_box.grid(row=3, column=0, sticky="ew", pady=(10, 0))
+        self.clients_box.configure(state="disabled")
 
-        # 3. Consola de Logs
+        # 5. Consola de Logs
         self.console = ctk.CTkTextbox(
-            frame, 
+            frame,
             font=ctk.CTkFont(family="Consolas", size=12),
             border_width=1,
             fg_color="#1C1C1C"
         )
-        self.console.grid(row=2, column=0, sticky="nsew", pady=(10, 0))
-        self.console.insert("0.0", "--- YeiciCap Hub System Console ---\n[INFO] Sistema iniciado correctamente.\n[INFO] Interfaz v2.2.0 lista para operar.\n")
+        self.console.grid(row=4, column=0, sticky="nsew", pady=(10, 0))
+        self.console.insert("0.0", "--- YeiciCap Hub System Console ---\n[INFO] Interfaz v2.2.0 lista para operar.\n")
         self.console.configure(state="disabled")
-        frame.grid_rowconfigure(2, weight=1)
+        frame.grid_rowconfigure(4, weight=1)
 
     def _create_status_indicator(self, parent, text, col):
         container = ctk.CTkFrame(parent, fg_color="transparent")
         container.grid(row=0, column=col, padx=10, pady=20)
-        
+
         # El "LED" visual
-        led = ctk.CTkFrame(container, width=15, height=15, corner_radius=10, fg_color="#566573")
+        led = ctk.CTkFrame(container, width=15, height=15, corner_radius=10, fg_color=LED_OFF)
         led.grid(row=0, column=0, padx=(0, 10))
-        
+
         label = ctk.CTkLabel(container, text=text, font=ctk.CTkFont(size=11, weight="bold"))
         label.grid(row=0, column=1)
-        return led
+        return led, label
 
     def _init_config_frame(self):
         frame = ctk.CTkFrame(self.main_area, fg_color="transparent")
         self.frames["config"] = frame
-        
+
         lbl = ctk.CTkLabel(frame, text="Configuración Global", font=ctk.CTkFont(size=20, weight="bold"))
         lbl.pack(pady=20, anchor="w")
-        
-        # Inputs de ejemplo
-        self._add_config_input(frame, "IP Multicast Motive:", "239.255.42.99")
-        self._add_config_input(frame, "Puerto de Datos (NatNet):", "1511")
-        self._add_config_input(frame, "Puerto de Salida (Bridge):", "54321")
 
-    def _add_config_input(self, parent, label_text, default):
+        # Valores iniciales: los de la línea de comandos / .env
+        config = self.hub_config
+        self._add_config_input(frame, "multicast_ip", "IP Multicast Motive:",
+                               getattr(config, "multicast_ip", "239.255.42.99"))
+        self._add_config_input(frame, "data_port", "Puerto de Datos (NatNet):", getattr(config, "data_port", 1511))
+        self._add_config_input(frame, "port", "Puerto de Salida (Bridge):", getattr(config, "port", 54321))
+        ctk.CTkLabel(frame, text="Los cambios se aplican al iniciar el servidor.", text_color="gray60").pack(pady=(15, 0), anchor="w")
+
+    def _add_config_input(self, parent, name, label_text, default):
         ctk.CTkLabel(parent, text=label_text).pack(pady=(10, 0), anchor="w")
         entry = ctk.CTkEntry(parent, width=400)
-        entry.insert(0, default)
+        entry.insert(0, str(default))
         entry.pack(pady=5, anchor="w")
+        self.config_entries[name] = entry
+        return entry
 
     def _init_maya_frame(self):
         frame = ctk.CTkFrame(self.main_area, fg_color="transparent")
         self.frames["maya"] = frame
-        
+
         title = ctk.CTkLabel(frame, text="Integración con Autodesk Maya", font=ctk.CTkFont(size=20, weight="bold"))
         title.pack(pady=20, anchor="w")
-        
+
         instructions = (
             "1. Asegúrate de que el Servidor del Hub esté en estado 'Iniciado'.\n"
             "2. En Maya, abre el Script Editor (Python tab).\n"
@@ -158,17 +246,17 @@ class YeiciApp(ctk.CTk):
             "4. Los objetos se crearán automáticamente en el Outliner."
         )
         ctk.CTkLabel(frame, text=instructions, justify="left", font=ctk.CTkFont(size=13)).pack(pady=10, anchor="w")
-        
+
         btn_copy = ctk.CTkButton(frame, text="Copiar Script Maya", fg_color="#2E4053", width=200)
         btn_copy.pack(pady=20, anchor="w")
 
     def _init_unreal_frame(self):
         frame = ctk.CTkFrame(self.main_area, fg_color="transparent")
         self.frames["unreal"] = frame
-        
+
         title = ctk.CTkLabel(frame, text="Integración con Unreal Engine 5", font=ctk.CTkFont(size=20, weight="bold"))
         title.pack(pady=20, anchor="w")
-        
+
         instructions = (
             "1. Habilita el plugin 'Live Link' en tu proyecto de Unreal.\n"
             "2. En la ventana Live Link, añade un 'YeiciCap Source'.\n"
@@ -176,28 +264,230 @@ class YeiciApp(ctk.CTk):
             "4. Los esqueletos aparecerán como 'Subjects' disponibles."
         )
         ctk.CTkLabel(frame, text=instructions, justify="left", font=ctk.CTkFont(size=13)).pack(pady=10, anchor="w")
-        
+
         btn_copy = ctk.CTkButton(frame, text="Copiar Blueprint Node", fg_color="#2E4053", width=200)
         btn_copy.pack(pady=20, anchor="w")
 
     def _show_frame(self, name):
-        """Gestiona el intercambio de pestañas."""
+        """Gestiona el intercambio de pestañas (construye la pestaña la primera vez)."""
+        if name not in self.frames:
+            self._frame_builders[name]()
         for f in self.frames.values():
             f.pack_forget()
         self.frames[name].pack(fill="both", expand=True)
-        
+        self._current_tab = name
+
         # Feedback visual en botones laterales
-        for btn in self.nav_buttons:
-            if btn.cget("text") in [name.replace("_", " ").title(), "Dashboard" if name=="dashboard" else ""]:
-                btn.configure(fg_color=("gray75", "gray25"))
-            else:
-                btn.configure(fg_color="transparent")
+        for key, btn in self.nav_buttons.items():
+            btn.configure(fg_color=("gray75", "gray25") if key == name else "transparent")
 
     def show_dashboard(self): self._show_frame("dashboard")
     def show_config(self): self._show_frame("config")
     def show_maya_help(self): self._show_frame("maya")
     def show_unreal_help(self): self._show_frame("unreal")
 
+    # --- Ciclo de vida del pipeline ---
+
+    def toggle_server(self):
+        if self._closing or self._server_state in ("starting", "stopping"):
+            return
+        if self._server_state == "running":
+            self._server_state = "stopping"
+            self._lifecycle_thread = threading.Thread(target=self._stop_pipeline, name="HubStop", daemon=True)
+            self._lifecycle_thread.start()
+            return
+        config = self._pipeline_config()
+        if config is None:
+            return
+        self._server_state = "starting"
+        self._lifecycle_thread = threading.Thread(target=self._start_pipeline, args=(config,), name="HubStart",
+                                                  daemon=True)
+        self._lifecycle_thread.start()
+
+    def _pipeline_config(self) -> Optional[argparse.Namespace]:
+        """Config del pipeline: la de arranque con los campos de la pestaña de configuración."""
+        from pipeline import load_config
+        config = argparse.Namespace(**vars(self.hub_config if self.hub_config is not None else load_config([])))
+        try:
+            for name, entry in self.config_entries.items():
+                value = entry.get().strip()
+                setattr(config, name, int(value) if name.endswith("port") else value)
+        except ValueError as e:
+            logging.error(f"Configuración inválida: {e}")
+            return None
+        return config
+
+    def _start_pipeline(self, config):
+        # Hilo auxiliar: crear los sockets y (en modo process) arrancar los workers tarda
+        from pipeline import HeadlessPipeline
+        try:
+            self._metrics.reset()
+            pipeline = HeadlessPipeline(config)
+            if not pipeline.start():
+                self._server_state = "error"
+                return
+        except Exception as e:
+            logging.error(f"No se pudo iniciar el servidor: {e}")
+            self._server_state = "error"
+            return
+        with self._lifecycle_lock:
+            if not self._closing:
+                self.pipeline = pipeline
+                self._fps_mark = (time.perf_counter(), 0)
+                self._server_state = "running"
+                return
+        # La ventana se cerró mientras arrancaba: nadie más conoce este pipeline
+        pipeline.stop()
+
+    def _stop_pipeline(self):
+        with self._lifecycle_lock:
+            pipeline, self.pipeline = self.pipeline, None
+        if pipeline is not None:
+            pipeline.stop()
+        self._server_state = "stopped"
+
+    def _on_close(self):
+        # La parada (sockets, workers, joins) no corre en el hilo de Tk: la ventana sigue
+        # respondiendo y _poll la destruye cuando el hilo de cierre termina
+        if self._closing:
+            return
+        with self._lifecycle_lock:
+            self._closing = True
+            pipeline, self.pipeline = self.pipeline, None
+        self._server_state = "stopping"
+        self._close_deadline = time.monotonic() + CLOSE_TIMEOUT
+        self._close_thread = threading.Thread(target=self._close_pipeline, args=(pipeline, self._lifecycle_thread),
+                                              name="HubClose", daemon=True)
+        self._close_thread.start()
+
+    @staticmethod
+    def _close_pipeline(pipeline, lifecycle_thread):
+        if pipeline is not None:
+            pipeline.stop()
+        # Un arranque en curso para lo que construyó al ver _closing; una parada en curso termina
+        if lifecycle_thread is not None:
+            lifecycle_thread.join()
+
+    def _finish_close(self):
+        if self._close_thread.is_alive():
+            logging.warning(f"El pipeline no se detuvo en {CLOSE_TIMEOUT:.0f} s: se cierra la ventana igualmente")
+        logging.getLogger().removeHandler(self.log_ring)
+        self.destroy()
+
+    # --- Sondeo (10 Hz) ---
+
+    def _poll(self):
+        if self._closing and (not self._close_thread.is_alive() or time.monotonic() > self._close_deadline):
+            self._finish_close()
+            return
+        try:
+            self._refresh_console()
+            self._refresh_button()
+            # Minimizada o en otra pestaña no se pide snapshot: solo consola y botón
+            if self._current_tab == "dashboard" and self.state() != "iconic":
+                self._refresh_status()
+        except Exception as e:
+            logging.debug(f"Error al refrescar la GUI: {e}")
+        self.after(POLL_INTERVAL_MS, self._poll)
+
+    def _set_text(self, key, widget, text):
+        if self._texts.get(key) != text:
+            self._texts[key] = text
+            widget.configure(text=text)
+
+    def _set_led(self, key, led, color):
+        if self._colors.get(key) != color:
+            self._colors[key] = color
+            led.configure(fg_color=color)
+
+    def _refresh_button(self):
+        text, color = {
+            "running": ("DETENER SERVIDOR", "#922B21"),
+            "starting": ("INICIANDO...", "#7D6608"),
+            "stopping": ("DETENIENDO...", "#7D6608"),
+        }.get(self._server_state, ("INICIAR SERVIDOR", "#1F618D"))
+        if self._texts.get("button") != text:
+            self._texts["button"] = text
+            self.btn_start.configure(text=text, fg_color=color)
+
+    def _refresh_console(self):
+        lines, self._log_seen, lost = self.log_ring.drain(self._log_seen)
+        if not lines:
+            return
+        if lost:
+            lines.insert(0, f"[... {lost} líneas descartadas ...]")
+        console = self.console
+        console.configure(state="normal")
+        console.insert("end", "\n".join(lines) + "\n")
+        excess = int(console.index("end-1c").split(".")[0]) - CONSOLE_MAX_LINES
+        if excess > 0:
+            console.delete("1.0", f"{excess + 1}.0")
+        console.configure(state="disabled")
+        console.see("end")
+
+    def _refresh_status(self):
+        state = self._server_state
+        if state != "running" or self.pipeline is None:
+            motive_led = LED_ERROR if state == "error" else LED_WAIT if state == "starting" else LED_OFF
+            self._set_led("motive", self.status_motive[0], motive_led)
+            self._set_text("motive", self.status_motive[1],
+                           "MOTIVE: ERROR" if state == "error" else "MOTIVE: DESCONECTADO")
+            for key, (led, label) in (("maya", self.status_maya), ("unreal", self.status_unreal)):
+                self._set_led(key, led, LED_OFF)
+                self._set_text(key, label, f"{key.upper()}: ESPERANDO")
+            for key, label in self.metric_labels.items():
+                self._set_text("metric_" + key, label, "--")
+            return
+
+        snapshot = self._metrics.snapshot()
+        gauges = snapshot["gauges"]
+        pipeline = gauges.get("pipeline", {})
+        frames_out = pipeline.get("frames_out", 0)
+
+        # FPS sobre una ventana de FPS_WINDOW s a partir del contador de frames emitidos
+        now = time.perf_counter()
+        mark_time, mark_frames = self._fps_mark
+        if now - mark_time >= FPS_WINDOW:
+            self._fps = (frames_out - mark_frames) / (now - mark_time)
+            self._fps_mark = (now, frames_out)
+        receiving = self._fps > 0.0
+        self._set_led("motive", self.status_motive[0], LED_OK if receiving else LED_WAIT)
+        self._set_text("motive", self.status_motive[1], "MOTIVE: RECIBIENDO" if receiving else "MOTIVE: SIN DATOS")
+
+        clients = list(gauges.get("clients") or []) + list(gauges.get("outputs") or [])
+        for key, (led, label) in (("maya", self.status_maya), ("unreal", self.status_unreal)):
+            count = sum(1 for c in clients if key in (c.get("subscription") or {}).get("spaces", ()) or c.get("space") == key)
+            self._set_led(key, led, LED_OK if count else LED_OFF)
+            self._set_text(key, label, f"{key.upper()}: {count} CLIENTE{'S' if count != 1 else ''}" if count
+                           else f"{key.upper()}: ESPERANDO")
+
+        stages = snapshot["stages"]
+        latency = stages.get("end_to_end") or {}
+        if not latency.get("count"):
+            latency = stages.get("transform") or {}
+        handoff = gauges.get("handoff") or {}
+        dropped = handoff.get("dropped", 0) + handoff.get("overwritten", 0) + sum(c.get("frames_dropped", 0) for c in clients)
+        self._set_text("metric_fps", self.metric_labels["fps"], f"{self._fps:.1f}")
+        self._set_text("metric_latency", self.metric_labels["latency"],
+                       f"{latency.get('p50_us', 0.0) / 1000:.2f} / {latency.get('p99_us', 0.0) / 1000:.2f} ms"
+                       if latency.get("count") else "--")
+        self._set_text("metric_dropped", self.metric_labels["dropped"], str(dropped))
+        self._set_text("metric_clients", self.metric_labels["clients"], str(len(clients)))
+
+        rows = [f"{c.get('address', '?'):<22} {c.get('transport', 'tcp'):<5} {c.get('format', 'osc'):<7} "
+                f"{c.get('fps', 0.0):6.1f} fps  enviados {c.get('frames_sent', c.get('bundles_sent', 0)):>8}  "
+                f"descartes {c.get('frames_dropped', 0):>6}  lat {c.get('send_latency_ms', 0.0):5.2f} ms"
+                for c in clients]
+        text = "\n".join(rows) if rows else "Sin clientes conectados."
+        if self._texts.get("clients_box") != text:
+            self._texts["clients_box"] = text
+            box = self.clients_box
+            box.configure(state="normal")
+            box.delete("1.0", "end")
+            box.insert("1.0", text)
+            box.configure(state="disabled")
+
+
 if __name__ == "__main__":
     app = YeiciApp()
     app.mainloop()
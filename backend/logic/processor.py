@@ -1,36 +1,192 @@
 
 import numpy as np
 import logging
+import math
+import time
 from typing import Dict, List, Any, Optional
 
+from core.data_descriptions import DataDescriptions, SubjectModel
+from core.frame import MarkerSets, MocapFrame, ProcessedFrame
+from core.metrics import get_metrics
+from core.subscription import DEFAULT_SPACES, Subscription
+from logic.skeleton_solver import BONE_SPACES, SKELETON_INPUTS, SkeletonSolver
+from logic.spaces import get_kernel
+
+class _OutputBuffers:
+    """
+    Ring de juegos de buffers float32 preasignados para la salida del transformer.
+    Cada frame usa el siguiente juego, así un ProcessedFrame sigue siendo válido durante
+    las `depth - 1` llamadas siguientes (tiempo de sobra para que los exporters serialicen).
+    Los buffers crecen (con margen) solo si el número de filas supera la capacidad.
+    """
+    def __init__(self, depth=4):
+        self._sets = [{} for _ in range(depth)]
+        self._index = 0
+
+    def next_set(self) -> Dict[str, np.ndarray]:
+        buffers = self._sets[self._index]
+        self._index = (self._index + 1) % len(self._sets)
+        return buffers
+
+    @staticmethod
+    def get(buffers: Dict[str, np.ndarray], name: str, rows: int, width: int) -> np.ndarray:
+        array = buffers.get(name)
+        if array is None or len(array) < rows:
+            array = buffers[name] = np.empty((max(rows, 16) * 2, width), dtype=np.float32)
+        return array[:rows]
+
+
+# Pose nula para filas sin dato válido: origen + cuaternión identidad [x, y, z, w]
+_NULL_ROTATION = np.array([0.0, 0.0, 0.0, 1.0], dtype=np.float32)
+
+
+class FrameSanitizer:
+    """
+    Sanitización vectorizada de NaN/Inf (oclusiones) con frame-hold por fila.
+
+    Cada fila del frame apilado (Rigid Body o hueso de un Skeleton) tiene un slot fijo en
+    los arrays de última pose válida, indexado por (skeleton, id). Por frame se calcula una
+    sola máscara isfinite: si todo es finito (caso normal) solo se refrescan los slots;
+    si no, únicamente las filas malas se sustituyen por su última pose válida, o por la
+    pose nula si nunca la hubo o tiene más de `max_hold` segundos (None = sin límite).
+    """
+    def __init__(self, max_hold: Optional[float] = None, capacity=64):
+        self.max_hold = max_hold
+        self._slot_of: Dict[int, int] = {}
+        self._layout_key = None
+        self._slots = None
+        self._slot_index = None
+        self._ones = np.ones(0, dtype=np.float32)
+        self._last_pos = np.zeros((capacity, 3), dtype=np.float32)
+        self._last_rot = np.tile(_NULL_ROTATION, (capacity, 1))
+        self._last_time = np.full(capacity, -np.inf)
+
+        self.held_rows = 0
+        self.null_rows = 0
+
+    def _row_slots(self, frame: MocapFrame) -> np.ndarray:
+        """Slot de cada fila del frame; solo se recalcula cuando cambia el layout."""
+        layout_key = (frame.ids.tobytes(), frame.skeleton_ids.tobytes(), frame.skeleton_offsets.tobytes())
+        if layout_key == self._layout_key:
+            return self._slots
+
+        # Clave de fila: id del Rigid Body, o (skeleton + 1) << 32 | id del hueso
+        owners = np.zeros(frame.row_count, dtype=np.int64)
+        owners[frame.rigid_body_count:] = np.repeat(
+            frame.skeleton_ids.astype(np.int64) + 1, np.diff(frame.skeleton_offsets))
+        keys = (owners << 32) | frame.ids.astype(np.int64)
+        slot_of = self._slot_of
+        slots = np.array([slot_of.setdefault(k, len(slot_of)) for k in keys.tolist()], dtype=np.intp)
+
+        if len(slot_of) > len(self._last_time):
+            grow = max(len(slot_of), len(self._last_time) * 2) - len(self._last_time)
+            self._last_pos = np.concatenate((self._last_pos, np.zeros((grow, 3), dtype=np.float32)))
+            self._last_rot = np.concatenate((self._last_rot, np.tile(_NULL_ROTATION, (grow, 1))))
+            self._last_time = np.concatenate((self._last_time, np.full(grow, -np.inf)))
+
+        self._layout_key = layout_key
+        self._slots = slots
+        # Layout estable sin huecos (lo normal): los slots son un rango y basta con un slice
+        start = int(slots[0]) if len(slots) else 0
+        contiguous = np.array_equal(slots, np.arange(start, start + len(slots)))
+        self._slot_index = slice(start, start + len(slots)) if contiguous else slots
+        return slots
+
+    def _all_finite(self, positions: np.ndarray, rotations: np.ndarray) -> bool:
+        """Chequeo rápido del caso normal: un NaN/Inf contamina el producto escalar con unos."""
+        size = rotations.size
+        if len(self._ones) < size:
+            self._ones = np.ones(size * 2, dtype=np.float32)
+        return (math.isfinite(positions.ravel() @ self._ones[:positions.size])
+                and math.isfinite(rotations.ravel() @ self._ones[:size]))
+
+    def sanitize(self, frame: MocapFrame, subject_offsets: np.ndarray, buffers: Dict[str, np.ndarray], now: float):
+        """
+        Devuelve (positions, rotations, fresh). Sin filas corruptas se devuelven los arrays
+        del frame sin copiar; si no, una copia saneada en `buffers`.
+        `fresh` (S,) bool: subjects sin ninguna fila corrupta en este frame.
+        """
+        positions, rotations = frame.positions, frame.rotations
+        slots = self._row_slots(frame)
+
+        if self._all_finite(positions, rotations):
+            index = self._slot_index
+            self._last_pos[index] = positions
+            self._last_rot[index] = rotations
+            self._last_time[index] = now
+            return positions, rotations, np.ones(len(subject_offsets) - 1, dtype=bool)
+
+        # Solo con algún valor corrupto (o desbordado) se construye la máscara por fila
+        finite = np.isfinite(positions).all(axis=1)
+        finite &= np.isfinite(rotations).all(axis=1)
+
+        good = np.flatnonzero(finite)
+        bad = np.flatnonzero(~finite)
+        good_slots = slots[good]
+        self._last_pos[good_slots] = positions[good]
+        self._last_rot[good_slots] = rotations[good]
+        self._last_time[good_slots] = now
+
+        n = len(positions)
+        out_pos = _OutputBuffers.get(buffers, "clean_pos", n, 3)
+        out_rot = _OutputBuffers.get(buffers, "clean_rot", n, 4)
+        np.copyto(out_pos, positions)
+        np.copyto(out_rot, rotations)
+
+        bad_slots = slots[bad]
+        out_pos[bad] = self._last_pos[bad_slots]
+        out_rot[bad] = self._last_rot[bad_slots]
+        age = now - self._last_time[bad_slots]
+        expired = bad[age > self.max_hold] if self.max_hold is not None else bad[np.isinf(age)]
+        if len(expired):
+            out_pos[expired] = 0.0
+            out_rot[expired] = _NULL_ROTATION
+        self.held_rows += len(bad) - len(expired)
+        self.null_rows += len(expired)
+
+        # Un subject es fresco si ninguna de sus filas venía corrupta
+        bad_before = np.concatenate(([0], np.cumsum(~finite)))
+        fresh = bad_before[subject_offsets[1:]] == bad_before[subject_offsets[:-1]]
+        return out_pos, out_rot, fresh
+
+    def stats(self) -> Dict[str, int]:
+        return {"held_rows": self.held_rows, "null_rows": self.null_rows, "tracked_slots": len(self._slot_of)}
+
+
 class MocapTransformer:
     """
     Motor matemático de YeiciCap Hub.
     Realiza transformaciones espaciales masivas usando matrices de Numpy para optimizar la latencia.
     """
     
-    def __init__(self):
-        # Cache para sanitización (Frame-hold)
-        self._last_valid_positions: Dict[str, np.ndarray] = {}
-        self._last_valid_rotations: Dict[str, np.ndarray] = {}
-        
-        # Matrices de transformación constantes
-        # Motive (Y-Up, RH) -> Unreal (Z-Up, LH)
-        # Reasignación: X->X, Y->Z, Z->Y. Escala x100
-        self.MOTIVE_TO_UE_POS = np.array([
-            [1, 0, 0],
-            [0, 0, 1],
-            [0, 1, 0]
-        ]) * 100.0
+    def __init__(self, buffer_depth=4, max_hold: Optional[float] = None, bone_space="native", skeleton_input="global"):
+        # Sanitización por fila con frame-hold (max_hold en segundos, None = sin límite)
+        self.sanitizer = FrameSanitizer(max_hold)
 
-    @staticmethod
-    def sanitize_data(data: np.ndarray, fallback: Optional[np.ndarray] = None) -> (np.ndarray, bool):
-        """Detecta valores corruptos (NaN/Inf) y aplica fallback."""
-        if np.any(np.isnan(data)) or np.any(np.isinf(data)):
-            if fallback is not None:
-                return fallback, False # Usar cache, marcar como no-fresco
-            return np.zeros_like(data), False # Invalidez total
-        return data, True
+        # Huesos de Skeleton: `skeleton_input` es lo que envía Motive (ajuste "Skeleton
+        # Coordinates" del streaming) y `bone_space` lo que se emite (native = tal cual)
+        if bone_space not in BONE_SPACES:
+            raise ValueError(f"Espacio de huesos inválido: {bone_space!r} (opciones: {BONE_SPACES})")
+        if skeleton_input not in SKELETON_INPUTS:
+            raise ValueError(f"Coordenadas de Skeleton inválidas: {skeleton_input!r} (opciones: {SKELETON_INPUTS})")
+        self.bone_space = bone_space
+        self.skeleton_solver = SkeletonSolver()
+        self._solve = None
+        if bone_space == "local" and skeleton_input == "global":
+            self._solve = self.skeleton_solver.to_local
+        elif bone_space == "world" and skeleton_input == "local":
+            self._solve = self.skeleton_solver.to_world
+
+        # Data descriptions vigentes (las actualiza el dueño del transformer) y tabla de
+        # subjects precalculada para el último layout de frame visto
+        self.descriptions: Optional[DataDescriptions] = None
+        self._model = None
+        self._model_key = None
+
+        # Kernels compilados (y cacheados) del registro de espacios destino
+        self.MOTIVE_TO_UE_POS = get_kernel("unreal").pos_matrix
+        self._buffers = _OutputBuffers(buffer_depth)
+        self._metrics = get_metrics()
 
     def to_unreal_space(self, positions: np.ndarray, rotations: np.ndarray) -> (np.ndarray, np.ndarray):
         """
@@ -38,81 +194,107 @@ class MocapTransformer:
         positions: array (N, 3)
         rotations: array (N, 4) - Cuaterniones [x, y, z, w]
         """
-        # Posiciones: Producto matricial masivo
-        # (N, 3) @ (3, 3) -> (N, 3) con ejes swappeados y escalados
-        pos_ue = positions @ self.MOTIVE_TO_UE_POS
-        
-        # Rotaciones (Simplified mapping for MoCap bridge)
-        # Motive: [qx, qy, qz, qw] -> UE: [qx, qz, qy, -qw]
-        # Invertir 'w' y swappear Y/Z suele bastar para la mayoría de rigs standard
-        rot_ue = np.zeros_like(rotations)
-        rot_ue[:, 0] = rotations[:, 0] # X
-        rot_ue[:, 1] = rotations[:, 2] # Z
-        rot_ue[:, 2] = rotations[:, 1] # Y
-        rot_ue[:, 3] = -rotations[:, 3] # -W
-        
-        return pos_ue, rot_ue
+        return get_kernel("unreal").apply(positions, rotations)
 
     def to_maya_space(self, positions: np.ndarray, rotations: np.ndarray) -> (np.ndarray, np.ndarray):
         """Mantiene Y-Up pero escala a Centímetros."""
-        return positions * 100.0, rotations
+        return get_kernel("maya").apply(positions, rotations)
 
-    def process_frame(self, raw_frame: Dict[str, Any]) -> Dict[str, Any]:
+    def process_frame(self, raw_frame: MocapFrame, demand: Optional[Subscription] = None) -> ProcessedFrame:
         """
         Punto de entrada para el procesamiento de frames.
-        Devuelve un payload limpio y transformado para múltiples DCCs.
+        Recibe el MocapFrame del decoder (arrays ya apilados) y devuelve un ProcessedFrame
+        con los arrays transformados para múltiples DCCs. Los arrays de salida viven en
+        buffers reutilizados: son válidos durante las `buffer_depth - 1` llamadas siguientes.
+
+        `demand` (unión de las suscripciones de los clientes) restringe los subjects y
+        espacios calculados; sin demand se calcula todo (Unreal + Maya).
         """
-        processed_data = {
-            "frame_number": raw_frame["frame_number"],
-            "timestamp": raw_frame.get("timestamp", 0),
-            "subjects": {}
-        }
-
-        # Procesar Rigid Bodies masivamente si existen
-        if raw_frame["rigid_bodies"]:
-            rbs = raw_frame["rigid_bodies"]
-            ids = [str(rb["id"]) for rb in rbs]
-            
-            # Convertir a arrays de Numpy para procesamiento masivo
-            pos_raw = np.array([rb["pos"] for rb in rbs])
-            rot_raw = np.array([rb["rot"] for rb in rbs])
-            
-            # Sanitización de bloque
-            # (En una implementación pro, haríamos esto por ID individual para no tirar todo el bloque)
-            # Aquí lo hacemos simplificado para la lógica del Hub
-            
-            # Transformar
-            pos_ue, rot_ue = self.to_unreal_space(pos_raw, rot_raw)
-            pos_maya, rot_maya = self.to_maya_space(pos_raw, rot_raw)
-            
-            for i, rb_id in enumerate(ids):
-                processed_data["subjects"][f"RB_{rb_id}"] = {
-                    "unreal": {
-                        "pos": pos_ue[i].tolist(),
-                        "rot": rot_ue[i].tolist()
-                    },
-                    "maya": {
-                        "pos": pos_maya[i].tolist(),
-                        "rot": rot_maya[i].tolist()
-                    }
-                }
-
-        # Procesar Skeletons
-        for sk in raw_frame.get("skeletons", []):
-            sk_id = str(sk["id"])
-            bones = sk["rigid_bodies"]
-            
-            bone_pos_raw = np.array([b["pos"] for b in bones])
-            bone_rot_raw = np.array([b["rot"] for b in bones])
-            
-            bone_pos_ue, bone_rot_ue = self.to_unreal_space(bone_pos_raw, bone_rot_raw)
-            
-            processed_data["subjects"][f"SK_{sk_id}"] = {
-                "bone_count": len(bones),
-                "unreal": {
-                    "positions": bone_pos_ue.tolist(),
-                    "rotations": bone_rot_ue.tolist()
-                }
-            }
-
-        return processed_data
+        started = time.perf_counter()
+        if raw_frame.decoded_at:
+            self._metrics.record("queue", started - raw_frame.decoded_at)
+
+        # Tabla de subjects (nombres, IDs, tipos, offsets): se reutiliza mientras el layout no cambie
+        model = self.subject_model(raw_frame)
+        names, ids, kinds, offsets = model.names, model.ids, model.kinds, model.offsets
+
+        buffers = self._buffers.next_set()
+
+        # Sanitización por fila sobre el frame completo (así el frame-hold de todos los
+        # subjects sigue al día aunque ahora nadie los pida)
+        positions, rotations, fresh = self.sanitizer.sanitize(raw_frame, offsets, buffers, started)
+
+        # Huesos globales <-> locales (relativos al padre) sobre todas las filas a la vez; los
+        # kernels de espacio de abajo son cambios de base y valen igual para ambos
+        if self._solve is not None and len(raw_frame.skeleton_ids):
+            n = len(positions)
+            positions, rotations = self._solve(model, positions, rotations,
+                                               self._buffers.get(buffers, "bone_pos", n, 3),
+                                               self._buffers.get(buffers, "bone_rot", n, 4))
+
+        space_names = DEFAULT_SPACES
+        if demand is not None:
+            space_names = demand.spaces
+            names, kinds, offsets, rows, subjects = demand.select(names, kinds, offsets, ids, with_bones=False)
+            if rows is not None:
+                ids = ids[subjects]
+                n = len(rows)
+                positions = np.take(positions, rows, axis=0, out=self._buffers.get(buffers, "raw_pos", n, 3))
+                rotations = np.take(rotations, rows, axis=0, out=self._buffers.get(buffers, "raw_rot", n, 4))
+                fresh = fresh[subjects]
+
+        # Un solo kernel por espacio pedido sobre todas las filas (Rigid Bodies + huesos),
+        # escribiendo en buffers preasignados que se reutilizan entre frames
+        n = len(positions)
+        spaces = {}
+        for space in space_names:
+            kernel = get_kernel(space)
+            if kernel.is_identity:
+                spaces[space] = (positions, rotations) # raw: coordenadas de Motive
+                continue
+            spaces[space] = kernel.apply(
+                positions, rotations,
+                self._buffers.get(buffers, space + "_pos", n, 3),
+                self._buffers.get(buffers, space + "_rot", n, 4),
+            )
+
+        # Marker sets: solo si algún cliente los pidió (y el decoder los trajo)
+        markers = None
+        if demand is not None and demand.markers and raw_frame.marker_sets is not None:
+            markers = self._transform_markers(raw_frame.marker_sets, space_names, buffers)
+
+        self._metrics.record("transform", time.perf_counter() - started)
+        return ProcessedFrame(
+            frame_number=raw_frame.frame_number,
+            timestamp=raw_frame.timestamp,
+            subject_names=names,
+            subject_kinds=kinds,
+            subject_offsets=offsets,
+            spaces=spaces,
+            subject_fresh=fresh,
+            received_at=raw_frame.received_at,
+            markers=markers,
+            subject_ids=ids,
+            model=model,
+        )
+
+    def subject_model(self, raw_frame: MocapFrame) -> SubjectModel:
+        """SubjectModel del layout del frame; solo se reconstruye si cambian los IDs o las descriptions."""
+        key = (raw_frame.rigid_body_count, raw_frame.ids.tobytes(), raw_frame.skeleton_offsets.tobytes(),
+               raw_frame.skeleton_ids.tobytes(), self.descriptions)
+        if key != self._model_key:
+            self._model = SubjectModel.build(raw_frame, self.descriptions)
+            self._model_key = key
+        return self._model
+
+    def _transform_markers(self, marker_sets: MarkerSets, space_names, buffers):
+        positions, offsets = marker_sets.stacked()
+        m = len(positions)
+        marker_spaces = {}
+        for space in space_names:
+            kernel = get_kernel(space)
+            if kernel.is_identity:
+                marker_spaces[space] = positions
+            else:
+                marker_spaces[space] = kernel.apply_positions(positions, self._buffers.get(buffers, space + "_markers", m, 3))
+        return marker_sets.names, offsets, marker_spaces
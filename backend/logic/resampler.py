@@ -0,0 +1,141 @@
+import numpy as np
+from typing import List, Optional
+
+from core.frame import ProcessedFrame
+
+RESAMPLE_MODES = ("interpolate", "decimate")
+
+# Por encima de este coseno entre cuaterniones se usa nlerp (slerp es numéricamente inestable)
+_SLERP_THRESHOLD = 0.9995
+# Hueco máximo entre frames de entrada que se interpola; más largo = se reinicia la cadencia
+_MAX_GAP = 0.25
+# Frames de salida máximos por frame de entrada (upsampling)
+_MAX_BURST = 8
+
+
+def slerp(q0: np.ndarray, q1: np.ndarray, alpha: float) -> np.ndarray:
+    """Slerp vectorizado entre dos arrays (N, 4) de cuaterniones [x, y, z, w]."""
+    dot = np.einsum("ij,ij->i", q0, q1)
+    # Camino corto: q y -q son la misma rotación
+    q1 = np.where((dot < 0.0)[:, None], -q1, q1)
+    dot = np.abs(dot)
+
+    out = q0 + (q1 - q0) * alpha # nlerp, válido para ángulos pequeños
+    wide = dot < _SLERP_THRESHOLD
+    if wide.any():
+        theta = np.arccos(np.clip(dot[wide], -1.0, 1.0))
+        sin_theta = np.sin(theta)
+        w0 = (np.sin((1.0 - alpha) * theta) / sin_theta)[:, None]
+        w1 = (np.sin(alpha * theta) / sin_theta)[:, None]
+        out[wide] = q0[wide] * w0 + q1[wide] * w1
+    out /= np.linalg.norm(out, axis=1, keepdims=True)
+    return out.astype(np.float32, copy=False)
+
+
+def interpolate_frames(f0: ProcessedFrame, f1: ProcessedFrame, alpha: float, timestamp: float) -> ProcessedFrame:
+    """
+    Frame intermedio entre `f0` y `f1` (misma tabla de subjects): lerp de posiciones y
+    slerp de rotaciones sobre los arrays apilados de cada espacio. Los markers, la frescura
+    y el número de frame se toman de `f1`.
+    """
+    spaces = {}
+    for space, (pos1, rot1) in f1.spaces.items():
+        pos0, rot0 = f0.spaces[space]
+        pos = pos0 + (pos1 - pos0) * np.float32(alpha)
+        spaces[space] = (pos, slerp(rot0, rot1, alpha))
+    return ProcessedFrame(f1.frame_number, timestamp, f1.subject_names, f1.subject_kinds, f1.subject_offsets,
+                          spaces, f1.subject_fresh, f1.received_at, f1.markers, f1.subject_ids, f1.model)
+
+
+class FrameResampler:
+    """
+    Convierte el stream de entrada (cadencia de Motive) a `rate` Hz.
+
+    decimate:    reenvía el frame de entrada más reciente en cada tick de salida
+    interpolate: sintetiza el frame exacto de cada tick interpolando entre los dos frames de
+                 entrada que lo rodean (lerp + slerp); permite también subir la cadencia, a
+                 costa de entregar los frames de un intervalo de entrada juntos
+
+    La base de tiempo es el timestamp de Motive; si el frame no lo trae se usa el instante
+    de recepción. Si el tiempo retrocede (reinicio de Motive, replay en bucle) o hay un
+    hueco largo, la cadencia se reinicia en el frame actual.
+
+    Un solo resampler por cadencia: lo comparten todos los clientes que la piden.
+    """
+    def __init__(self, rate: float, mode: str = "interpolate"):
+        if rate <= 0:
+            raise ValueError(f"Cadencia inválida: {rate!r}")
+        if mode not in RESAMPLE_MODES:
+            raise ValueError(f"Modo de remuestreo inválido: {mode!r} (opciones: {RESAMPLE_MODES})")
+        self.rate = rate
+        self.mode = mode
+        self.period = 1.0 / rate
+        self._previous: Optional[ProcessedFrame] = None
+        self._previous_time = 0.0
+        self._next_tick = None
+        self._use_timestamp = None
+
+        self.frames_in = 0
+        self.frames_out = 0
+
+    def _time_of(self, frame: ProcessedFrame) -> float:
+        if self._use_timestamp is None:
+            self._use_timestamp = frame.timestamp > 0.0
+        return frame.timestamp if self._use_timestamp else frame.received_at
+
+    def reset(self):
+        self._previous = None
+        self._next_tick = None
+        self._use_timestamp = None
+
+    def push(self, frame: ProcessedFrame) -> List[ProcessedFrame]:
+        """Entra un frame; devuelve los frames de salida que tocan (0, 1 o varios al subir cadencia)."""
+        self.frames_in += 1
+        now = self._time_of(frame)
+        previous = self._previous
+        if previous is None or now <= self._previous_time - self.period or now - self._previous_time > _MAX_GAP:
+            # Primer frame o discontinuidad: se emite tal cual y se fija la cadencia a partir de aquí
+            out = [frame]
+            self._next_tick = now + self.period
+        elif self.mode == "decimate":
+            # Tolerancia de medio intervalo de entrada: el jitter no debe hacer saltar ticks
+            tolerance = 0.5 * (now - self._previous_time)
+            out = []
+            if now + tolerance >= self._next_tick:
+                out.append(frame)
+                ticks = max(1.0, np.floor((now + tolerance - self._next_tick) / self.period) + 1.0)
+                self._next_tick += ticks * self.period
+        else:
+            out = self._interpolate(previous, frame, now)
+
+        self._previous_time = now
+        if self.mode == "interpolate":
+            self._previous = frame.copy() # Los arrays del transformer se reutilizan: hay que retenerlos
+        else:
+            self._previous = frame # Solo se usa como marcador de "hay frame anterior"
+        self.frames_out += len(out)
+        return out
+
+    def _interpolate(self, previous: ProcessedFrame, frame: ProcessedFrame, now: float) -> List[ProcessedFrame]:
+        start = self._previous_time
+        if self._next_tick > now:
+            return []
+        same_table = (previous.subject_names == frame.subject_names
+                      and np.array_equal(previous.subject_offsets, frame.subject_offsets)
+                      and previous.spaces.keys() == frame.spaces.keys())
+        out = []
+        span = now - start
+        while self._next_tick <= now and len(out) < _MAX_BURST:
+            tick = self._next_tick
+            self._next_tick += self.period
+            alpha = (tick - start) / span if span > 0 else 1.0
+            if not same_table or alpha >= 1.0:
+                out.append(frame)
+            else:
+                out.append(interpolate_frames(previous, frame, max(alpha, 0.0), tick))
+        if self._next_tick <= now:
+            self._next_tick = now + self.period # Ráfaga truncada: se recoloca la cadencia
+        return out
+
+    def stats(self):
+        return {"rate": self.rate, "mode": self.mode, "frames_in": self.frames_in, "frames_out": self.frames_out}
@@ -0,0 +1,135 @@
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from core.data_descriptions import SubjectModel
+
+BONE_SPACES = ("native", "local", "world")
+SKELETON_INPUTS = ("global", "local")
+
+
+# --- Operaciones de cuaterniones por lotes: arrays (N, 4) [x, y, z, w] ---
+
+_CONJUGATE = np.array([-1.0, -1.0, -1.0, 1.0], dtype=np.float32)
+_YZX = np.array([1, 2, 0], dtype=np.intp)
+_ZXY = np.array([2, 0, 1], dtype=np.intp)
+
+
+def quat_conjugate(q: np.ndarray, out=None) -> np.ndarray:
+    """Conjugado (= inverso para cuaterniones unitarios)."""
+    return np.multiply(q, _CONJUGATE, out=out)
+
+
+def quat_multiply(a: np.ndarray, b: np.ndarray, out=None) -> np.ndarray:
+    """Producto de Hamilton a * b fila a fila (aplica primero b y luego a)."""
+    ax, ay, az, aw = a[:, 0], a[:, 1], a[:, 2], a[:, 3]
+    bx, by, bz, bw = b[:, 0], b[:, 1], b[:, 2], b[:, 3]
+    if out is None:
+        out = np.empty((max(len(a), len(b)), 4), dtype=np.float32)
+    out[:, 0] = aw * bx + ax * bw + ay * bz - az * by
+    out[:, 1] = aw * by - ax * bz + ay * bw + az * bx
+    out[:, 2] = aw * bz + ax * by - ay * bx + az * bw
+    out[:, 3] = aw * bw - ax * bx - ay * by - az * bz
+    return out
+
+
+def _cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # np.cross tiene mucho overhead por llamada con los pocos huesos de cada nivel
+    return a[:, _YZX] * b[:, _ZXY] - a[:, _ZXY] * b[:, _YZX]
+
+
+def quat_rotate(q: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Rota los vectores (N, 3) por los cuaterniones (N, 4): v + 2w (u x v) + 2 u x (u x v)."""
+    u = q[:, :3]
+    t = _cross(u, v)
+    t *= 2.0
+    return v + q[:, 3:4] * t + _cross(u, t)
+
+
+class _Hierarchy:
+    """
+    Jerarquía de todas las filas de un layout: `parents` (índice de fila del padre, -1 en
+    raíces y Rigid Bodies), las filas con padre (`children` / `child_parents`) y esas
+    mismas filas agrupadas por profundidad (`levels`, orden topológico).
+    """
+    __slots__ = ("parents", "children", "child_parents", "levels")
+
+    def __init__(self, model: SubjectModel):
+        rows = int(model.offsets[-1]) if len(model.offsets) else 0
+        parents = np.full(rows, -1, dtype=np.intp)
+        for i, bone_parents in enumerate(model.bone_parents):
+            if bone_parents is None:
+                continue
+            start = int(model.offsets[i])
+            local = bone_parents.astype(np.intp)
+            parents[start:start + len(local)] = np.where(local >= 0, local + start, -1)
+        self.parents = parents
+        self.children = np.flatnonzero(parents >= 0)
+        self.child_parents = parents[self.children]
+
+        # Profundidad de cada fila; con ciclos (descriptions corruptas) se cortan en `rows` pasos
+        depth = np.zeros(rows, dtype=np.intp)
+        current = parents.copy()
+        for _ in range(rows):
+            has_parent = current >= 0
+            if not has_parent.any():
+                break
+            depth[has_parent] += 1
+            current[has_parent] = parents[current[has_parent]]
+        self.levels: List[np.ndarray] = [np.flatnonzero(depth == d) for d in range(1, int(depth.max(initial=0)) + 1)]
+
+
+class SkeletonSolver:
+    """
+    Convierte los huesos de todos los Skeletons entre transformaciones globales (en el
+    espacio de Motive) y locales (relativas al hueso padre), sobre el array apilado del
+    frame y sin bucles por hueso:
+
+    to_local:  un solo paso para todas las filas con padre, porque las globales de los
+               padres ya se conocen: rot = conj(q_padre) * q, pos = conj(q_padre) (p - p_padre)
+    to_world:  un paso por nivel de profundidad (raíces -> hojas), cada uno vectorizado
+               sobre los huesos de ese nivel de todos los Skeletons
+
+    La jerarquía (índices de padre en filas apiladas y niveles) se cachea por revisión del
+    SubjectModel. Los huesos sin jerarquía conocida (Skeletons sin description) y los Rigid
+    Bodies pasan tal cual.
+    """
+    def __init__(self):
+        self._revision = None
+        self._hierarchy: Optional[_Hierarchy] = None
+
+    def hierarchy(self, model: SubjectModel) -> _Hierarchy:
+        if model.revision != self._revision:
+            self._hierarchy = _Hierarchy(model)
+            self._revision = model.revision
+            logging.debug(f"Jerarquía de huesos: {len(self._hierarchy.children)} huesos con padre, "
+                          f"{len(self._hierarchy.levels)} niveles")
+        return self._hierarchy
+
+    def to_local(self, model: SubjectModel, positions: np.ndarray, rotations: np.ndarray,
+                 out_pos: np.ndarray, out_rot: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Globales -> locales. Escribe en `out_*` (no pueden ser los arrays de entrada)."""
+        hierarchy = self.hierarchy(model)
+        np.copyto(out_pos, positions)
+        np.copyto(out_rot, rotations)
+        children, parents = hierarchy.children, hierarchy.child_parents
+        if len(children):
+            inverse = quat_conjugate(rotations[parents])
+            out_rot[children] = quat_multiply(inverse, rotations[children])
+            out_pos[children] = quat_rotate(inverse, positions[children] - positions[parents])
+        return out_pos, out_rot
+
+    def to_world(self, model: SubjectModel, positions: np.ndarray, rotations: np.ndarray,
+                 out_pos: np.ndarray, out_rot: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Locales -> globales, nivel a nivel. Escribe en `out_*` (no pueden ser los de entrada)."""
+        hierarchy = self.hierarchy(model)
+        np.copyto(out_pos, positions)
+        np.copyto(out_rot, rotations)
+        parents = hierarchy.parents
+        for level in hierarchy.levels:
+            parent = parents[level]
+            parent_rot = out_rot[parent]
+            out_pos[level] = out_pos[parent] + quat_rotate(parent_rot, positions[level])
+            out_rot[level] = quat_multiply(parent_rot, rotations[level])
+        return out_pos, out_rot
@@ -0,0 +1,126 @@
+import threading
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+# Motive: Y-Up, Right-Handed, metros, cuaterniones [x, y, z, w]
+_AXES = {"x": 0, "y": 1, "z": 2}
+
+
+class SpaceKernel:
+    """
+    Transformación de espacio precompilada.
+    Posiciones: un solo producto (N, 3) @ (3, 3) con ejes y escala fusionados.
+    Cuaterniones: reordenamiento por índice + vector de signos, sin asignar columna a columna.
+    """
+    __slots__ = ("pos_matrix", "quat_index", "quat_sign", "is_identity")
+
+    def __init__(self, pos_matrix, quat_index, quat_sign):
+        self.pos_matrix = np.asarray(pos_matrix, dtype=np.float32)
+        self.quat_index = np.asarray(quat_index, dtype=np.intp)
+        self.quat_sign = np.asarray(quat_sign, dtype=np.float32)
+        self.is_identity = (
+            np.array_equal(self.pos_matrix, np.eye(3))
+            and np.array_equal(self.quat_index, np.arange(4))
+            and np.all(self.quat_sign == 1)
+        )
+
+    def apply(self, positions: np.ndarray, rotations: np.ndarray, out_pos=None, out_rot=None):
+        """Aplica la transformación a todas las filas; escribe en `out_*` si se pasan."""
+        out_pos = np.matmul(positions, self.pos_matrix, out=out_pos)
+        out_rot = np.take(rotations, self.quat_index, axis=1, out=out_rot)
+        np.multiply(out_rot, self.quat_sign, out=out_rot)
+        return out_pos, out_rot
+
+    def apply_positions(self, positions: np.ndarray, out=None) -> np.ndarray:
+        """Solo posiciones (markers sueltos, sin orientación)."""
+        return np.matmul(positions, self.pos_matrix, out=out)
+
+
+class CoordinateSpace:
+    """
+    Definición declarativa de un espacio destino respecto a Motive.
+
+    axes: de qué eje de Motive sale cada eje destino, con signo opcional.
+          Ej. Unreal ("x", "z", "y"), Unity ("-x", "y", "z").
+    scale: factor de escala de posiciones (100.0 = metros -> centímetros).
+    negate_quat: niega el cuaternión completo (q y -q son la misma rotación);
+                 solo cambia la convención numérica que espera el DCC.
+
+    La parte vectorial del cuaternión se deriva de la permutación de ejes:
+    v' = det(P) * P v, w' = w. Un cambio de handedness (det = -1) queda cubierto.
+    """
+    def __init__(self, name: str, axes: Sequence[str] = ("x", "y", "z"), scale: float = 1.0,
+                 negate_quat: bool = False, description: str = ""):
+        self.name = name
+        self.axes = tuple(axes)
+        self.scale = float(scale)
+        self.negate_quat = negate_quat
+        self.description = description
+
+        permutation = np.zeros((3, 3), dtype=np.float32)
+        for target, axis in enumerate(self.axes):
+            sign = -1.0 if axis.startswith("-") else 1.0
+            source = _AXES.get(axis.lstrip("+-"))
+            if source is None:
+                raise ValueError(f"Eje inválido en el espacio {name!r}: {axis!r}")
+            permutation[target, source] = sign
+        if abs(abs(np.linalg.det(permutation)) - 1.0) > 1e-6:
+            raise ValueError(f"Los ejes del espacio {name!r} no forman una permutación: {self.axes}")
+        self._permutation = permutation
+
+    @property
+    def handedness(self) -> str:
+        return "right" if np.linalg.det(self._permutation) > 0 else "left"
+
+    def compile(self) -> SpaceKernel:
+        """Fusiona permutación, handedness y escala en un SpaceKernel."""
+        # (N, 3) @ M == (P @ v) * scale para cada fila
+        pos_matrix = self._permutation.T * self.scale
+
+        det = np.linalg.det(self._permutation)
+        quat_index = [int(np.argmax(np.abs(row))) for row in self._permutation] + [3]
+        quat_sign = [float(self._permutation[i, quat_index[i]] * det) for i in range(3)] + [1.0]
+        if self.negate_quat:
+            quat_sign = [-s for s in quat_sign]
+        return SpaceKernel(pos_matrix, quat_index, quat_sign)
+
+
+_registry: Dict[str, CoordinateSpace] = {}
+_compiled: Dict[str, SpaceKernel] = {}
+_lock = threading.Lock()
+
+
+def register_space(space: CoordinateSpace, replace: bool = False):
+    """Registra un espacio destino (p. ej. un DCC propio). Su kernel se compila al primer uso."""
+    with _lock:
+        if space.name in _registry and not replace:
+            raise ValueError(f"El espacio {space.name!r} ya está registrado")
+        _registry[space.name] = space
+        _compiled.pop(space.name, None)
+
+
+def get_kernel(name: str) -> SpaceKernel:
+    """Kernel compilado (cacheado) de un espacio registrado. Lanza KeyError si no existe."""
+    kernel = _compiled.get(name)
+    if kernel is None:
+        with _lock:
+            kernel = _compiled[name] = _registry[name].compile()
+    return kernel
+
+
+def is_registered(name: str) -> bool:
+    return name in _registry
+
+
+def available_spaces() -> Tuple[str, ...]:
+    return tuple(_registry)
+
+
+# --- Espacios incluidos ---
+register_space(CoordinateSpace("raw", description="Motive sin transformar (Y-Up, RH, metros)"))
+# Motive: [qx, qy, qz, qw] -> UE: [qx, qz, qy, -qw] (convención histórica del Hub)
+register_space(CoordinateSpace("unreal", ("x", "z", "y"), 100.0, negate_quat=True, description="Z-Up, LH, centímetros"))
+register_space(CoordinateSpace("maya", ("x", "y", "z"), 100.0, description="Y-Up, RH, centímetros"))
+register_space(CoordinateSpace("blender", ("x", "-z", "y"), 1.0, description="Z-Up, RH, metros"))
+register_space(CoordinateSpace("unity", ("-x", "y", "z"), 1.0, description="Y-Up, LH, metros"))
@@ -1,23 +1,27 @@
-
 import numpy as np
 
+from logic.spaces import get_kernel
+
 class MoCapTransformer:
     """
-    Transforma coordenadas de Motive (Y-up, Right-handed) 
+    Transforma coordenadas de Motive (Y-up, Right-handed)
     a Unreal (Z-up, Left-handed) y Maya (Y-up).
+
+    Capa de compatibilidad: delega en los kernels compilados de logic.spaces, así que
+    acepta tanto un único elemento (3,)/(4,) como arrays (N, 3)/(N, 4) y produce
+    exactamente lo mismo que MocapTransformer en logic/processor.py.
     """
+    @staticmethod
+    def _apply(space, position, rotation_quat):
+        pos = np.asarray(position, dtype=np.float32)
+        rot = np.asarray(rotation_quat, dtype=np.float32)
+        pos_out, rot_out = get_kernel(space).apply(pos.reshape(-1, 3), rot.reshape(-1, 4))
+        return pos_out.reshape(pos.shape), rot_out.reshape(rot.shape)
+
     @staticmethod
     def motive_to_unreal(position, rotation_quat):
-        # Re-mapping ejes: X->X, Y->Z, Z->Y
-        # Ajuste de escala (Meters to Centimeters)
-        pos_ue = np.array([position[0], position[2], position[1]]) * 100.0
-        
-        # Ajuste de Cuaternión (Conversión básica)
-        rot_ue = np.array([rotation_quat[0], rotation_quat[2], rotation_quat[1], -rotation_quat[3]])
-        
-        return pos_ue, rot_ue
+        return MoCapTransformer._apply("unreal", position, rotation_quat)
 
     @staticmethod
     def motive_to_maya(position, rotation_quat):
-        # Maya usa Y-up nativo, similar a Motive, pero requiere ajuste de escala (cm)
-        return np.array(position) * 100.0, rotation_quat
+        return MoCapTransformer._apply("maya", position, rotation_quat)
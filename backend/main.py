@@ -1,22 +1,27 @@
-
 import logging
 import sys
-from gui_app import YeiciApp
 
-# Configuración básica de logging
+# Configuración básica de logging (antes de importar módulos que también la configuran)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
 
-def launch_gui():
-    """Lanza la interfaz gráfica principal."""
+from pipeline import load_config, run_headless
+
+def launch_gui(config=None):
+    """Lanza la interfaz gráfica principal (el servidor se arranca desde ella)."""
+    # Import diferido: en modo headless Tk/customtkinter no llegan a cargarse
+    from gui_app import YeiciApp
     try:
         logging.info("Iniciando YeiciCap Hub GUI...")
-        app = YeiciApp()
+        app = YeiciApp(config)
         app.mainloop()
     except Exception as e:
         logging.error(f"Error fatal al iniciar la GUI: {e}")
         sys.exit(1)
 
 if __name__ == "__main__":
-    # En el futuro, podríamos añadir argumentos de línea de comando para modo headless
-    # if "--headless" in sys.argv: run_cli_mode()
-    launch_gui()
+    # --headless (o YEICICAP_HEADLESS=1): pipeline NatNet -> transformer -> exporter sin GUI
+    config = load_config()
+    if config.headless:
+        sys.exit(run_headless(config))
+    logging.getLogger().setLevel(config.log_level.upper())
+    launch_gui(config)
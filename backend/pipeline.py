@@ -0,0 +1,785 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+
+from core.aggregator import DEFAULT_ID_STRIDE, MultiSourceAggregator, MultiSourceDescriptions, SourceSpec
+from core.data_descriptions import DataDescriptionCache
+from core.frame import ProcessedFrame
+from core.natnet_client import NatNetClient, parse_timecode
+from core.frame_mailbox import HANDOFF_POLICIES
+from core.metrics import MetricsServer, get_metrics
+from core.recording import CAPTURE_MODES, CaptureReader, CaptureRecorder, CaptureReplayer
+from core.shm_ring import FrameFanout, ProcessedFrameRing, SharedFrameRing
+from core.subscription import merge_subscriptions
+from exporters.osc_exporter import OscExporter, parse_osc_target
+from exporters.stream_server import LAG_POLICIES, StreamServer
+from exporters.udp_sender import DEFAULT_PAYLOAD, DatagramStreamer, parse_target
+from exporters.wire_format import create_encoder
+from logic.processor import MocapTransformer
+from logic.skeleton_solver import BONE_SPACES, SKELETON_INPUTS
+from logic.spaces import available_spaces
+
+try:
+    from dotenv import load_dotenv
+except ImportError:
+    load_dotenv = None
+
+# Modos de ejecución de la etapa de transformación:
+#   inline  -> se transforma y emite en el propio hilo del Producer (mínima latencia, sin hand-off)
+#   thread  -> hilo dedicado que consume el mailbox del Producer
+#   process -> transformación y serialización en --workers procesos. El Producer corre aquí y
+#              reparte los frames en round-robin por SharedFrameRings (uno por worker, con la
+#              política --handoff); cada worker devuelve el frame transformado y sus mensajes
+#              ya serializados por un ProcessedFrameRing y un hilo de merge los emite en el
+#              orden de llegada. Los frames no cruzan por pickle (solo el control, cuando
+#              cambia: demanda, descriptions y plan de serialización); los rings no llevan markers
+#   shm     -> como process, pero además el Producer (recepción + decode) va a su propio proceso
+THREADING_MODES = ("inline", "thread", "process", "shm")
+SERVER_KINDS = ("stream", "async")
+
+_ENV_PREFIX = "YEICICAP_"
+_POLL_INTERVAL = 0.2
+_OUTPUT_WAIT = 0.0005 # Espera del worker cuando su ring de salida está lleno
+_CONTROL_HISTORY = 64 # Versiones de control recordadas (frames en vuelo con una versión anterior)
+
+
+class _InlineSink:
+    """Sustituye al mailbox del Producer en modo inline: cada frame se procesa al llegar."""
+    def __init__(self, pipeline):
+        self._pipeline = pipeline
+
+    def put_nowait(self, frame):
+        self._pipeline._process_and_emit(frame)
+
+
+# --- Workers de transformación (modos process y shm) ---
+
+def _run_transform_worker(index, worker_count, frames, output, control, stop_event, ready, transformer_options):
+    """
+    Lee su SharedFrameRing según la política de hand-off, transforma con su propio
+    MocapTransformer (frame-hold incluido), serializa los streams del plan vigente y deja
+    el resultado en su ProcessedFrameRing. Demanda, descriptions y plan llegan por
+    `control` (extremo de un Pipe) solo cuando cambian.
+    """
+    transformer = MocapTransformer(**transformer_options)
+    encoders = {}
+    version, demand, plan = 0, None, ()
+    errors = 0
+    ready.release()
+    while not stop_event.is_set():
+        while control.poll():
+            version, demand, plan, transformer.descriptions = control.recv()
+        try:
+            raw_frame = frames.get(timeout=_POLL_INTERVAL)
+        except queue.Empty:
+            continue
+        seq = frames.last_seq
+        output.finish_input(seq) # Lo anterior a `seq` que no se leyó ya no llegará
+        started = time.perf_counter()
+        try:
+            processed = transformer.process_frame(raw_frame, demand)
+            transformed = time.perf_counter()
+            messages = []
+            for wire_format, subscription in plan:
+                encoder = encoders.get(wire_format)
+                if encoder is None:
+                    encoder = encoders[wire_format] = create_encoder(wire_format)
+                messages.append(encoder.encode(subscription.apply(processed)))
+            serialized = time.perf_counter()
+            # El orden global sale del round-robin de FrameFanout
+            while not output.put(seq * worker_count + index, raw_frame, processed, messages, version, started,
+                                 transformed - started, serialized - transformed):
+                if stop_event.is_set():
+                    break
+                time.sleep(_OUTPUT_WAIT) # Ring de salida lleno: el hilo de merge va por detrás
+        except Exception as e:
+            errors += 1
+            logging.error(f"Worker {index}: error al transformar el frame {raw_frame.frame_number}: {e}")
+        output.record_worker_stats(transformer.sanitizer.held_rows, transformer.sanitizer.null_rows, errors)
+        output.finish_input(seq + 1)
+    frames.close()
+    output.close()
+
+
+# --- Proceso decoder (modo shm) ---
+
+def _create_producer(client_options):
+    """NatNetClient, o el agregador si se configuraron varias fuentes (`sources`)."""
+    if client_options.get("sources"):
+        return MultiSourceAggregator(**client_options)
+    return NatNetClient(**client_options)
+
+
+def _run_decoder_process(frames, stop_event, client_options, record_path=None, record_mode="raw", started=None):
+    client = _create_producer(client_options)
+    client.frame_queue = frames # Cada frame decodificado se copia al ring de su worker
+    # La grabación va junto al Producer: los datagramas no cruzan al proceso principal
+    recorder = CaptureRecorder(record_path, record_mode) if record_path else None
+    if recorder is not None:
+        recorder.start()
+        client.recorder = recorder
+    if client.start():
+        if started is not None:
+            started.set()
+        stop_event.wait()
+        client.stop()
+    if recorder is not None:
+        recorder.stop()
+    frames.close()
+
+
+class HeadlessPipeline:
+    """
+    Runner sin GUI: NatNetClient (Producer) -> MocapTransformer -> StreamServer / AsyncStreamServer.
+
+    La etapa de transformación se ejecuta según `config.threading` (ver THREADING_MODES).
+    En modos process y shm cada worker lleva su propio frame-hold, así que las oclusiones
+    se rellenan con la última pose válida que vio ese worker.
+
+    Con `config.replay` la fuente es una captura grabada (core.recording) en lugar de la red:
+    el hilo de reproducción hace de Producer y transforma/emite cada frame en línea.
+    Con `config.record` la toma en vivo se graba mientras se retransmite.
+    Con varias `config.sources` el Producer es un MultiSourceAggregator (core.aggregator)
+    que fusiona las fuentes en un único stream alineado en el tiempo.
+    """
+    def __init__(self, config):
+        self.config = config
+        sources = getattr(config, "sources", None) or []
+        if len(sources) == 1:
+            # Una sola fuente no hay que alinear con nada: NatNetClient directo, sin remuestreo
+            # a --aggregate-rate ni el retardo del jitter buffer
+            source = sources[0]
+            config.multicast_ip, config.data_port = source.multicast_ip, source.data_port
+            if source.server_ip:
+                config.server_ip, config.command_port = source.server_ip, source.command_port
+            sources = []
+        if sources:
+            self.client_options = dict(
+                sources=sources,
+                rate=config.aggregate_rate,
+                jitter=config.jitter_ms / 1000.0,
+                id_stride=config.id_stride,
+                receive_mode=config.receive_mode,
+                handoff=config.handoff,
+                queue_size=config.queue_size,
+            )
+        else:
+            self.client_options = dict(
+                multicast_ip=config.multicast_ip,
+                data_port=config.data_port,
+                receive_mode=config.receive_mode,
+                handoff=config.handoff,
+                queue_size=config.queue_size,
+                server_ip=config.server_ip,
+                command_port=config.command_port,
+            )
+        self.record_mode = config.record_mode
+        if sources and config.record and self.record_mode == "raw":
+            # El stream fusionado no tiene datagramas propios: se graban los frames
+            logging.warning("Con varias fuentes la grabación usa --record-mode frames.")
+            self.record_mode = "frames"
+        # En modo shm el Producer vive en otro proceso: aquí solo queda el extremo lector del ring
+        live = not config.replay and config.threading != "shm"
+        self.client = _create_producer(self.client_options) if live else None
+        self.frames = None
+        self._decoder = None
+        self.recorder = None
+        if config.record and self.client is not None:
+            self.recorder = CaptureRecorder(config.record, self.record_mode)
+            self.client.recorder = self.recorder
+        self.replayer = None
+        # Data descriptions: las pide el propio Producer (cada fuente las suyas). En modo shm
+        # el Producer está en otro proceso, y al reproducir no hay Producer: la caché vive
+        # aquí y el aviso de cambios llega en los params de los frames
+        self.descriptions = self.client.descriptions if self.client is not None else None
+        if self.client is None and sources:
+            self.descriptions = MultiSourceDescriptions(sources, config.id_stride)
+            self.client_options["fetch_descriptions"] = False
+            if not self.descriptions.caches:
+                self.descriptions = None
+        elif self.client is None and config.server_ip:
+            self.descriptions = DataDescriptionCache(config.server_ip, config.command_port)
+            self.client_options["server_ip"] = None
+        self.server = self._create_server(config)
+        # Salidas adicionales sin handshake (UDP): reciben los mismos frames que el servidor
+        self.exporters = self._create_exporters(config)
+        self._outputs = [self.server] + self.exporters
+        self._demand_key = None
+        self._merged_demand = None
+        self._markers_warned = False
+        self.transformer = MocapTransformer(max_hold=config.max_hold, bone_space=config.bone_space,
+                                            skeleton_input=config.skeleton_input)
+
+        self._stop_event = threading.Event()
+        self._threads = []
+
+        # Modos process/shm: workers, sus rings de salida y el canal de control de cada uno
+        self._workers = []
+        self._processed = []
+        self._controls = []
+        self._workers_stop = None
+        self._control_key = None
+        self._control_descriptions = None
+        self._control_version = 0
+        self._control_history = {0: (None, ())}
+        self._names_key = None
+        self._names = None
+
+        self.frames_out = 0
+        self.errors = 0
+        self.metrics = get_metrics()
+        self.metrics_server = MetricsServer(config.metrics_host, config.metrics_port) if config.metrics_port else None
+
+    @staticmethod
+    def _create_server(config):
+        delta_options = {"keyframe_interval": config.keyframe_interval, "epsilon": config.delta_epsilon}
+        if config.server == "async":
+            # Import diferido: asyncio/websockets solo se cargan si se piden
+            from exporters.async_server import AsyncStreamServer
+            return AsyncStreamServer(config.host, config.port, config.ws_port, delta_options=delta_options)
+        return StreamServer(config.host, config.port, lag_policy=config.lag_policy, delta_options=delta_options)
+
+    @staticmethod
+    def _create_exporters(config):
+        exporters = []
+        targets = getattr(config, "udp_targets", None)
+        if targets:
+            request = {"format": config.udp_format, "precision": config.udp_precision,
+                       "spaces": config.udp_spaces.split(",")}
+            if config.udp_rate:
+                request["rate"] = config.udp_rate
+            exporters.append(DatagramStreamer(targets, request, config.udp_payload, config.udp_ttl))
+        osc_targets = getattr(config, "osc_targets", None)
+        if osc_targets:
+            exporters.append(OscExporter(osc_targets, config.osc_space, config.osc_prefix))
+        return exporters
+
+    # --- Ciclo de vida ---
+
+    def start(self) -> bool:
+        self.server.start()
+        for exporter in self.exporters:
+            exporter.start()
+        self._register_gauges()
+        if self.metrics_server is not None:
+            self.metrics_server.start()
+
+        mode = self.config.threading
+        if self.config.replay:
+            return self._start_replay()
+        if mode == "shm":
+            return self._start_shm()
+        if self.recorder is not None:
+            self.recorder.start()
+        self.frames = self.client.frame_queue
+        if mode == "inline":
+            self.client.frame_queue = _InlineSink(self)
+        elif mode == "thread":
+            self._spawn(self._run_transform_thread, "Transform")
+        else:
+            self.frames = self.client.frame_queue = self._start_workers(multiprocessing.get_context("spawn"))
+
+        if self.config.stats_interval > 0:
+            self._spawn(self._run_stats, "PipelineStats")
+
+        if not self.client.start():
+            logging.error("No se pudo iniciar el Producer NatNet.")
+            self.stop()
+            return False
+        logging.info(f"Pipeline headless iniciado (modo {mode}, servidor {self.config.server}).")
+        return True
+
+    def _start_shm(self) -> bool:
+        context = multiprocessing.get_context("spawn")
+        self.frames = self._start_workers(context)
+        self._decoder_stop = context.Event()
+        started = context.Event()
+        self._decoder = context.Process(
+            target=_run_decoder_process, name="NatNetDecoder",
+            args=(self.frames, self._decoder_stop, self.client_options, self.config.record, self.record_mode, started),
+            daemon=True,
+        )
+        self._decoder.start()
+        # Hasta que el decoder no abre el socket no llega nada: si no lo consigue, el proceso termina
+        while not started.wait(_POLL_INTERVAL):
+            if not self._decoder.is_alive():
+                logging.error("No se pudo iniciar el Producer NatNet en el proceso decoder.")
+                self.stop()
+                return False
+        if self.descriptions is not None:
+            self.descriptions.start()
+        if self.config.stats_interval > 0:
+            self._spawn(self._run_stats, "PipelineStats")
+        logging.info(f"Pipeline headless iniciado (modo shm, {len(self._workers)} workers, servidor {self.config.server}).")
+        return True
+
+    def _start_workers(self, context) -> FrameFanout:
+        """Lanza los workers de transformación con sus rings y el hilo de merge; devuelve el reparto de entrada."""
+        config = self.config
+        count = max(1, config.workers)
+        transformer_options = dict(max_hold=config.max_hold, bone_space=config.bone_space,
+                                   skeleton_input=config.skeleton_input)
+        notify = context.Event() # Compartido por los rings de salida: el merge espera a cualquiera
+        self._workers_stop = context.Event()
+        ready = context.Semaphore(0)
+        rings = []
+        for index in range(count):
+            frames = SharedFrameRing(config.shm_slots, config.shm_max_rows, config.shm_max_skeletons,
+                                     notify=context.Event(), policy=config.handoff)
+            output = ProcessedFrameRing(config.shm_slots, config.shm_max_rows, config.shm_max_skeletons,
+                                        max_spaces=len(available_spaces()),
+                                        max_message_bytes=config.shm_message_bytes, notify=notify)
+            receiver, sender = context.Pipe(duplex=False)
+            worker = context.Process(
+                target=_run_transform_worker, name=f"Transform-{index}",
+                args=(index, count, frames, output, receiver, self._workers_stop, ready, transformer_options),
+                daemon=True,
+            )
+            worker.start()
+            rings.append(frames)
+            self._processed.append(output)
+            self._controls.append(sender)
+            self._workers.append(worker)
+        self._processed_notify = notify
+        # Esperar a los workers ahora (spawn tarda) y no perder los primeros frames
+        for _ in range(count):
+            if not ready.acquire(timeout=30.0):
+                logging.warning("Los workers de transformación tardan en arrancar; los primeros frames pueden perderse.")
+                break
+        self._spawn(self._run_merge_thread, "TransformMerge")
+        return FrameFanout(rings)
+
+    def _start_replay(self) -> bool:
+        try:
+            reader = CaptureReader(self.config.replay)
+        except (OSError, ValueError) as e:
+            logging.error(f"No se pudo abrir la captura {self.config.replay}: {e}")
+            self.stop()
+            return False
+        if self.config.threading != "inline":
+            logging.info(f"Reproducción: la transformación corre en línea en el hilo del replayer "
+                         f"(--threading {self.config.threading} no aplica).")
+        self.replayer = CaptureReplayer(reader, self._replay_frame, self.config.replay_speed,
+                                        self.config.replay_loop)
+        if self.descriptions is not None:
+            self.descriptions.start()
+        if self.config.replay_start is not None:
+            self.replayer.seek_time(self.config.replay_start)
+        if self.config.replay_seek is not None:
+            try:
+                self.replayer.seek_timecode(*self.config.replay_seek)
+            except ValueError as e:
+                logging.warning(f"--replay-seek ignorado: {e}")
+        self.metrics.register_gauge("replay", lambda: {
+            "position": self.replayer.position, "frames": len(reader), "played": self.replayer.frames_played,
+        })
+        if self.config.stats_interval > 0:
+            self._spawn(self._run_stats, "PipelineStats")
+        self.replayer.start()
+        return True
+
+    def _register_gauges(self):
+        metrics = self.metrics
+        metrics.register_gauge("pipeline", lambda: {
+            "mode": self.config.threading, "frames_out": self.frames_out, "errors": self.errors,
+        })
+        metrics.register_gauge("handoff", self._handoff_stats)
+        metrics.register_gauge("sanitizer", self._sanitizer_stats)
+        metrics.register_gauge("clients", self.server.client_stats)
+        if self.exporters:
+            metrics.register_gauge("outputs", lambda: [s for e in self.exporters for s in e.client_stats()])
+        if self.recorder is not None:
+            metrics.register_gauge("recorder", self.recorder.stats)
+        if self.descriptions is not None:
+            metrics.register_gauge("descriptions", self.descriptions.stats)
+        if isinstance(self.client, MultiSourceAggregator):
+            metrics.register_gauge("aggregator", self.client.stats)
+
+    def _handoff_stats(self):
+        if self.frames is None or self.config.threading == "inline":
+            return {}
+        stats = self.frames.stats()
+        if self._processed:
+            stats["workers"] = [ring.stats() for ring in self._processed]
+        return stats
+
+    def _sanitizer_stats(self):
+        if not self._processed:
+            return self.transformer.sanitizer.stats()
+        # Cada worker lleva su sanitizer: sus contadores viajan en el header de su ring de salida
+        stats = [ring.stats() for ring in self._processed]
+        return {"held_rows": sum(s["held_rows"] for s in stats), "null_rows": sum(s["null_rows"] for s in stats)}
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def wait(self):
+        """Bloquea hasta que se pida la parada (stop() o SIGINT/SIGTERM) o termine la reproducción."""
+        while not self._stop_event.wait(_POLL_INTERVAL):
+            if self.replayer is not None and not self.replayer.running:
+                break
+
+    def request_stop(self, *_):
+        self._stop_event.set()
+
+    def stop(self):
+        """Parada ordenada: primero el Producer, luego la etapa de transformación y al final el servidor."""
+        self._stop_event.set()
+        if self._decoder is not None:
+            self._decoder_stop.set()
+            self._decoder.join(2.0)
+        if self.client is not None:
+            self.client.stop()
+        elif self.descriptions is not None:
+            self.descriptions.stop() # La caché es de este proceso (modo shm o reproducción)
+        if self.recorder is not None:
+            self.recorder.stop()
+        if self.replayer is not None:
+            self.replayer.stop()
+            self.replayer.reader.close()
+        for thread in self._threads:
+            thread.join(2.0)
+        if self._workers:
+            self._workers_stop.set()
+            for worker in self._workers:
+                worker.join(2.0)
+                if worker.is_alive():
+                    worker.terminate()
+            for ring in [self.frames] + self._processed:
+                ring.close()
+                ring.unlink()
+        self.server.stop()
+        for exporter in self.exporters:
+            exporter.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        logging.info(f"Pipeline detenido. Frames emitidos: {self.frames_out}, errores: {self.errors}")
+
+    # --- Etapa de transformación ---
+
+    def _process_and_emit(self, raw_frame):
+        if self.descriptions is not None:
+            self.transformer.descriptions = self.descriptions.current
+        try:
+            processed = self.transformer.process_frame(raw_frame, self._demand())
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Error al transformar el frame {raw_frame.frame_number}: {e}")
+            return
+        self._emit(processed)
+
+    def _replay_frame(self, raw_frame):
+        if self.descriptions is not None:
+            self.descriptions.observe(raw_frame.params)
+        self._process_and_emit(raw_frame)
+
+    def _demand(self):
+        """Demanda agregada de los clientes; de paso activa el decode de markers solo si alguien los pide."""
+        demand = self.server.demand()
+        if self.exporters:
+            demands = [d for d in [demand] + [e.demand() for e in self.exporters] if d is not None]
+            demand_key = tuple(d.key for d in demands)
+            if demand_key != self._demand_key:
+                self._merged_demand = merge_subscriptions(demands)
+                self._demand_key = demand_key
+            demand = self._merged_demand
+        markers = demand is not None and demand.markers
+        if markers and self._workers:
+            markers = False # Decodificarlos no serviría de nada
+            if not self._markers_warned:
+                self._markers_warned = True
+                logging.warning(f"Un cliente pide markers, pero en --threading {self.config.threading} los rings "
+                                f"compartidos no los transportan: los frames saldrán sin markers.")
+        source = self.client if self.client is not None else self.replayer.reader if self.replayer is not None else None
+        if source is not None and source.decode_markers != markers:
+            source.decode_markers = markers
+        return demand
+
+    def _emit(self, processed):
+        # Cada salida por separado: un fallo en una no debe tumbar el hilo ni dejar sin frame a las demás
+        for output in self._outputs:
+            try:
+                output.broadcast(processed)
+            except Exception as e:
+                self.errors += 1
+                self.metrics.count("emit_errors")
+                logging.error(f"Error al emitir el frame {processed.frame_number} por {type(output).__name__}: {e}")
+        self.frames_out += 1
+
+    def _run_transform_thread(self):
+        mailbox = self.frames
+        while not self._stop_event.is_set():
+            try:
+                raw_frame = mailbox.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            self._process_and_emit(raw_frame)
+
+    # --- Workers de transformación: control y merge ---
+
+    def _update_control(self):
+        """Manda a los workers demanda, descriptions y plan de serialización, solo si cambiaron."""
+        demand = self._demand()
+        descriptions = self.descriptions.current if self.descriptions is not None else None
+        plan = {}
+        for output in self._outputs:
+            encode_plan = getattr(output, "encode_plan", None)
+            if encode_plan is not None:
+                for key, subscription in encode_plan().items():
+                    plan.setdefault(key, subscription)
+        control_key = (demand.key if demand is not None else None, tuple(plan))
+        if control_key == self._control_key and descriptions is self._control_descriptions:
+            return
+        self._control_key = control_key
+        self._control_descriptions = descriptions
+        self._control_version += 1
+        version = self._control_version
+        # Los frames en vuelo traen su versión: el merge sabe con qué descriptions y plan se hicieron
+        self._control_history[version] = (descriptions, tuple(plan))
+        self._control_history.pop(version - _CONTROL_HISTORY, None)
+        message = (version, demand, tuple((key[0], subscription) for key, subscription in plan.items()), descriptions)
+        for control in self._controls:
+            control.send(message)
+
+    def _run_merge_thread(self):
+        """
+        Emite los frames de los workers en el orden global del reparto round-robin: el frame
+        `seq` lo tiene el worker `seq % N`. Un frame que su worker saltó (política de hand-off)
+        o no pudo transformar no llega nunca; se detecta con `done_input` y se pasa al siguiente.
+        """
+        rings = self._processed
+        count = len(rings)
+        seq = 0
+        while not self._stop_event.is_set():
+            self._update_control()
+            ring = rings[seq % count]
+            slot = ring.peek()
+            if slot is None:
+                self._processed_notify.clear()
+                if ring.done_input <= seq // count:
+                    self._processed_notify.wait(_POLL_INTERVAL)
+                    self._check_workers()
+                    continue
+                # El worker publica antes de avanzar done_input: si no está ahora, no llegará
+                slot = ring.peek()
+                if slot is None:
+                    seq += 1
+                    continue
+            if int(slot.header["global_seq"]) != seq:
+                seq += 1 # Saltado en el ring de entrada
+                continue
+            try:
+                self._emit_slot(slot)
+            except Exception as e:
+                self.errors += 1
+                logging.error(f"Error al emitir el frame {int(slot.header['frame_number'])} de los workers: {e}")
+            finally:
+                ring.release()
+            seq += 1
+
+    def _emit_slot(self, slot):
+        """Reconstruye el ProcessedFrame sobre el slot (sin copiar las poses) y lo emite."""
+        header = slot.header
+        descriptions, plan = self._control_history.get(int(header["control_version"]), (None, ()))
+        self.transformer.descriptions = descriptions
+        model = self.transformer.subject_model(slot.layout())
+        count = int(header["subject_count"])
+        ids = slot.subject_ids[:count].copy()
+        kinds = slot.subject_kinds[:count].copy()
+        processed = ProcessedFrame(
+            frame_number=int(header["frame_number"]),
+            timestamp=float(header["timestamp"]),
+            subject_names=self._subject_names(model, ids, kinds),
+            subject_kinds=kinds,
+            subject_offsets=slot.subject_offsets[:count + 1].copy(),
+            spaces=slot.spaces(),
+            subject_fresh=slot.fresh[:count].copy(),
+            received_at=float(header["received_at"]),
+            subject_ids=ids,
+            model=model,
+        )
+        messages = slot.messages()
+        if plan:
+            processed.encoded = {key: bytes(message) for key, message in zip(plan, messages) if message is not None}
+
+        # Las métricas de los workers quedan en su proceso: se registran aquí con sus tiempos
+        received_at, decoded_at = float(header["received_at"]), float(header["decoded_at"])
+        if self._decoder is not None:
+            # En modo shm también el decode fue remoto, y la caché de descriptions vive aquí
+            if received_at:
+                self.metrics.record("decode", decoded_at - received_at)
+            if self.descriptions is not None:
+                self.descriptions.observe(int(header["params"]))
+        if decoded_at:
+            self.metrics.record("queue", float(header["started_at"]) - decoded_at)
+        self.metrics.record("transform", float(header["transform_s"]))
+        if messages:
+            self.metrics.record("serialize", float(header["serialize_s"]))
+        self._emit(processed)
+
+    def _subject_names(self, model, ids, kinds):
+        """Nombres de la tabla de subjects del worker (IDs y tipos) según el SubjectModel de aquí."""
+        key = (model.revision, ids.tobytes(), kinds.tobytes())
+        if key != self._names_key:
+            index_of = {subject: i for i, subject in enumerate(zip(model.kinds.tolist(), model.ids.tolist()))}
+            self._names = [model.names[index_of[subject]] for subject in zip(kinds.tolist(), ids.tolist())]
+            self._names_key = key
+        return self._names
+
+    def _check_workers(self):
+        dead = [worker.name for worker in self._workers if not worker.is_alive()]
+        if dead and not self._stop_event.is_set():
+            logging.error(f"Workers de transformación caídos ({', '.join(dead)}): se detiene el pipeline.")
+            self.request_stop()
+
+    def _run_stats(self):
+        interval = self.config.stats_interval
+        while not self._stop_event.wait(interval):
+            handoff = self._handoff_stats()
+            stages = ", ".join(
+                f"{stage} p50/p99 {h['p50_us']:.0f}/{h['p99_us']:.0f} us"
+                for stage, h in self.metrics.snapshot()["stages"].items() if h["count"]
+            )
+            logging.info(
+                f"Pipeline: {self.frames_out} frames emitidos, {self.errors} errores, mailbox {handoff}, "
+                f"clientes {len(self.server.client_stats())}; {stages}"
+            )
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    """
+    Opciones del modo headless. Cada opción puede venir también de una variable de entorno
+    YEICICAP_<OPCIÓN> (p. ej. YEICICAP_MULTICAST_IP) o de un fichero .env; la línea de
+    comandos tiene prioridad.
+    """
+    env = os.environ.get
+
+    def default(name, fallback):
+        return env(_ENV_PREFIX + name.upper(), fallback)
+
+    parser = argparse.ArgumentParser(description="YeiciCap Hub - modo headless (sin GUI)")
+    parser.add_argument("--headless", action="store_true",
+                        default=default("headless", "").lower() in ("1", "true", "yes"),
+                        help="Ejecuta el pipeline sin GUI")
+    parser.add_argument("--multicast-ip", default=default("multicast_ip", "239.255.42.99"))
+    parser.add_argument("--data-port", type=int, default=default("data_port", 1511))
+    parser.add_argument("--server-ip", default=default("server_ip", None),
+                        help="IP de Motive para pedir las data descriptions (nombres y jerarquías) por el canal de comandos")
+    parser.add_argument("--command-port", type=int, default=default("command_port", 1510))
+    parser.add_argument("--source", dest="sources", type=SourceSpec.parse, action="append",
+                        default=[SourceSpec.parse(s) for s in default("sources", "").split(";") if s],
+                        help="Fuente NatNet nombre=grupo:puerto[,server_ip[:command_port]] en lugar de "
+                             "--multicast-ip/--data-port (repetible; con dos o más se fusionan con el agregador)")
+    parser.add_argument("--aggregate-rate", type=float, default=default("aggregate_rate", 120.0),
+                        help="Hz del stream fusionado (solo con dos o más --source)")
+    parser.add_argument("--jitter-ms", type=float, default=default("jitter_ms", 20.0),
+                        help="Retardo del jitter buffer de cada fuente (ms, solo con dos o más --source)")
+    parser.add_argument("--id-stride", type=int, default=default("id_stride", DEFAULT_ID_STRIDE),
+                        help="Desplazamiento de IDs de Motive por fuente (fuente i: id + i * stride)")
+    parser.add_argument("--receive-mode", choices=NatNetClient.RECEIVE_MODES, default=default("receive_mode", "ring"))
+    parser.add_argument("--handoff", choices=tuple(HANDOFF_POLICIES), default=default("handoff", "latest"))
+    parser.add_argument("--queue-size", type=int, default=default("queue_size", 100))
+    parser.add_argument("--threading", choices=THREADING_MODES, default=default("threading", "thread"),
+                        help="Dónde corre la transformación. process: --workers procesos de transformación y "
+                             "serialización conectados por rings de memoria compartida. shm: además el decode "
+                             "va a su propio proceso. Ninguno de los dos transporta markers")
+    parser.add_argument("--workers", type=int, default=default("workers", 2),
+                        help="Procesos de transformación y serialización en --threading process/shm")
+    parser.add_argument("--max-hold", type=float, default=default("max_hold", None),
+                        help="Segundos máximos de frame-hold ante oclusiones (por defecto sin límite)")
+    parser.add_argument("--bone-space", choices=BONE_SPACES, default=default("bone_space", "native"),
+                        help="Huesos emitidos: native = como llegan, local = relativos al padre, world = globales")
+    parser.add_argument("--skeleton-input", choices=SKELETON_INPUTS, default=default("skeleton_input", "global"),
+                        help="Coordenadas de Skeleton que envía Motive (ajuste de streaming)")
+    parser.add_argument("--shm-slots", type=int, default=default("shm_slots", 8),
+                        help="Slots de cada ring compartido en --threading process/shm")
+    parser.add_argument("--shm-max-rows", type=int, default=default("shm_max_rows", 2048),
+                        help="Filas máximas (Rigid Bodies + huesos) por frame en --threading process/shm")
+    parser.add_argument("--shm-max-skeletons", type=int, default=default("shm_max_skeletons", 64))
+    parser.add_argument("--shm-message-bytes", type=int, default=default("shm_message_bytes", 1 << 20),
+                        help="Bytes por slot para los mensajes ya serializados por los workers (lo que no "
+                             "cabe se serializa en el proceso principal)")
+    parser.add_argument("--server", choices=SERVER_KINDS, default=default("server", "stream"))
+    parser.add_argument("--host", default=default("host", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=default("port", 54321))
+    parser.add_argument("--ws-port", type=int, default=default("ws_port", 54322))
+    parser.add_argument("--lag-policy", choices=LAG_POLICIES, default=default("lag_policy", "latest"))
+    parser.add_argument("--keyframe-interval", type=int, default=default("keyframe_interval", 120),
+                        help="Frames entre keyframes en el formato delta")
+    parser.add_argument("--delta-epsilon", type=float, default=default("delta_epsilon", 0.0005),
+                        help="Metros mínimos de movimiento para reenviar un subject en el formato delta")
+    parser.add_argument("--udp-target", dest="udp_targets", type=parse_target, action="append",
+                        default=[parse_target(t) for t in default("udp_targets", "").split(";") if t],
+                        help="Salida UDP adicional host:puerto, multicast o unicast (repetible)")
+    parser.add_argument("--udp-format", choices=("binary", "json"), default=default("udp_format", "binary"))
+    parser.add_argument("--udp-precision", choices=("float32", "float16", "int16"),
+                        default=default("udp_precision", "float32"))
+    parser.add_argument("--udp-spaces", default=default("udp_spaces", "unreal,maya"),
+                        help="Espacios de la salida UDP, separados por comas")
+    parser.add_argument("--udp-rate", type=float, default=default("udp_rate", None),
+                        help="Hz de la salida UDP (por defecto la cadencia de Motive)")
+    parser.add_argument("--udp-payload", type=int, default=default("udp_payload", DEFAULT_PAYLOAD),
+                        help="Bytes máximos de datos por datagrama (fragmentación)")
+    parser.add_argument("--udp-ttl", type=int, default=default("udp_ttl", 1))
+    parser.add_argument("--osc-target", dest="osc_targets", type=parse_osc_target, action="append",
+                        default=[parse_osc_target(t) for t in default("osc_targets", "").split(";") if t],
+                        help="Salida OSC host:puerto[@hz], un bundle por frame (repetible)")
+    parser.add_argument("--osc-space", default=default("osc_space", "unreal"),
+                        help="Espacio de coordenadas de la salida OSC")
+    parser.add_argument("--osc-prefix", default=default("osc_prefix", "/yeici"),
+                        help="Prefijo de las direcciones OSC")
+    parser.add_argument("--stats-interval", type=float, default=default("stats_interval", 10.0),
+                        help="Segundos entre líneas de estadísticas (0 = desactivado)")
+    parser.add_argument("--metrics-host", default=default("metrics_host", "127.0.0.1"))
+    parser.add_argument("--metrics-port", type=int, default=default("metrics_port", 9108),
+                        help="Puerto del endpoint HTTP de métricas (0 = desactivado)")
+    parser.add_argument("--record", default=default("record", None),
+                        help="Graba la toma en vivo en este fichero (más su índice .idx)")
+    parser.add_argument("--record-mode", choices=tuple(CAPTURE_MODES), default=default("record_mode", "raw"),
+                        help="raw = datagramas NatNet tal cual; frames = frames decodificados de layout fijo "
+                             "(conservan timestamp, params y timecode, pero no los markers)")
+    parser.add_argument("--replay", default=default("replay", None),
+                        help="Reproduce una captura grabada en lugar de escuchar a Motive")
+    parser.add_argument("--replay-speed", type=float, default=default("replay_speed", 1.0),
+                        help="1 = tiempo real, 0.5/2 = escalado, 0 = máxima velocidad")
+    parser.add_argument("--replay-loop", action="store_true",
+                        default=default("replay_loop", "").lower() in ("1", "true", "yes"))
+    parser.add_argument("--replay-start", type=float, default=default("replay_start", None),
+                        help="Segundo de la toma desde el que empezar a reproducir")
+    parser.add_argument("--replay-seek", type=parse_timecode, default=default("replay_seek", None),
+                        help="Timecode SMPTE HH:MM:SS:FF[.sub] desde el que empezar a reproducir "
+                             "(tiene prioridad sobre --replay-start)")
+    parser.add_argument("--log-level", default=default("log_level", "INFO"))
+    return parser
+
+
+def load_config(argv=None):
+    """Carga .env (si python-dotenv está disponible) y parsea la línea de comandos."""
+    if load_dotenv is not None:
+        load_dotenv()
+    return build_arg_parser().parse_args(argv)
+
+
+def run_headless(config) -> int:
+    """Ejecuta el pipeline hasta recibir SIGINT/SIGTERM. Devuelve el código de salida."""
+    logging.getLogger().setLevel(config.log_level.upper())
+    pipeline = HeadlessPipeline(config)
+
+    signal.signal(signal.SIGINT, pipeline.request_stop)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, pipeline.request_stop)
+
+    if not pipeline.start():
+        return 1
+    try:
+        pipeline.wait()
+    finally:
+        pipeline.stop()
+    return 0
@@ -0,0 +1,199 @@
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from bench_decode import build_frame_packet
+from core.aggregator import MultiSourceAggregator, SourceSpec
+from core.natnet_client import NatNetClient, decode_frame_of_data
+from natnet_synth import NatNetSynthesizer, PacketSender
+from pipeline import HeadlessPipeline, build_arg_parser
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_source_spec_parse():
+    spec = SourceSpec.parse("stageA=239.255.42.99:1511,10.0.0.5:1600")
+    assert (spec.name, spec.multicast_ip, spec.data_port, spec.server_ip, spec.command_port) == \
+        ("stageA", "239.255.42.99", 1511, "10.0.0.5", 1600)
+    spec = SourceSpec.parse("b=239.255.42.100:1512")
+    assert spec.server_ip is None and spec.command_port == 1510
+    for text in ("nogroup", "a=239.255.42.99", "=239.255.42.99:1511", "a=239.255.42.99:port"):
+        with pytest.raises(ValueError):
+            SourceSpec.parse(text)
+
+
+def test_group_bind_only_for_shared_ports():
+    aggregator = MultiSourceAggregator([
+        SourceSpec("a", "239.255.42.99", 1511),
+        SourceSpec("b", "239.255.42.100", 1511),
+        SourceSpec("c", "239.255.42.101", 1512),
+    ], fetch_descriptions=False)
+    assert [client.bind_group for client in aggregator._clients] == [True, True, False]
+
+
+def test_merge_offsets_ids_per_source():
+    aggregator = MultiSourceAggregator([SourceSpec("a", data_port=1511), SourceSpec("b", data_port=1512)],
+                                       id_stride=1000, fetch_descriptions=False)
+    now = time.perf_counter()
+    for index in range(2):
+        for n in range(2):
+            frame = decode_frame_of_data(build_frame_packet(n + 1, 2, 1, 3))
+            frame.timestamp = 1.0 + n * 0.01
+            frame.received_at = now + n * 0.01
+            aggregator.feed(index, frame)
+    merged = aggregator.sample(now + 0.005)
+    assert merged.rigid_body_count == 4
+    assert merged.ids[:4].tolist() == [1, 2, 1001, 1002]
+    assert merged.skeleton_ids.tolist() == [1, 1001]
+    assert merged.skeleton_offsets.tolist() == [4, 7, 10]
+    # Huesos: se desplaza solo la parte del Skeleton del ID
+    assert (merged.ids[4:] >> 16).tolist() == [0, 0, 0, 1000, 1000, 1000]
+    assert (merged.ids[4:] & 0xFFFF).tolist() == [1, 2, 3, 1, 2, 3]
+    # A mitad de camino entre los dos frames de cada fuente
+    f1 = decode_frame_of_data(build_frame_packet(1, 2, 1, 3))
+    f2 = decode_frame_of_data(build_frame_packet(2, 2, 1, 3))
+    assert np.allclose(merged.positions[:2], (f1.positions[:2] + f2.positions[:2]) / 2, atol=1e-5)
+
+
+def test_stale_source_is_skipped():
+    aggregator = MultiSourceAggregator([SourceSpec("a", data_port=1511), SourceSpec("b", data_port=1512)],
+                                       stale_after=0.1, fetch_descriptions=False)
+    now = time.perf_counter()
+    frame = decode_frame_of_data(build_frame_packet(1, 2, 0, 0))
+    frame.timestamp, frame.received_at = 1.0, now
+    aggregator.feed(0, frame)
+    merged = aggregator.sample(now)
+    assert merged.ids.tolist() == [1, 2]
+    assert aggregator.sources_missing == 1
+
+
+def test_models_changed_flag_is_observed_per_source():
+    aggregator = MultiSourceAggregator([SourceSpec("a", data_port=1511, server_ip="10.0.0.5"),
+                                        SourceSpec("b", data_port=1512, server_ip="10.0.0.6")])
+    caches = [buffer.descriptions for buffer in aggregator._buffers]
+    for cache in caches:
+        cache._stale = False
+
+    def feed(index, params):
+        frame = decode_frame_of_data(build_frame_packet(1, 1, 0, 0))
+        frame.params = params
+        aggregator.feed(index, frame)
+
+    feed(0, 0x02)
+    assert caches[0]._stale and not caches[1]._stale
+    caches[0]._stale = False
+    # Con el aviso de a aún en alto, el OR del stream fusionado ocultaría el flanco de b
+    feed(1, 0)
+    feed(0, 0x02)
+    feed(1, 0x02)
+    assert caches[1]._stale and not caches[0]._stale
+    caches[1]._stale = False
+    feed(1, 0x02) # Motive mantiene el flag varios frames: no se vuelve a pedir
+    assert not caches[1]._stale
+
+
+def test_merged_frame_carries_timecode():
+    aggregator = MultiSourceAggregator([SourceSpec("a", data_port=1511), SourceSpec("b", data_port=1512)],
+                                       fetch_descriptions=False)
+    now = time.perf_counter()
+    for index in range(2):
+        frame = decode_frame_of_data(build_frame_packet(1, 1, 0, 0))
+        frame.timestamp, frame.received_at = 1.0, now
+        if index == 1: # Solo b tiene generador de timecode
+            frame.timecode, frame.timecode_sub = (1 << 24) | (2 << 16) | (3 << 8) | 4, 5
+        aggregator.feed(index, frame)
+    merged = aggregator.sample(now)
+    assert (merged.timecode, merged.timecode_sub) == ((1 << 24) | (2 << 16) | (3 << 8) | 4, 5)
+    assert aggregator.stats()["timecode"] == "01:02:03:04.5"
+
+
+def test_replay_observes_models_changed_flag():
+    config = build_arg_parser().parse_args(["--replay", "take.ycap", "--server-ip", "10.0.0.5", "--port", "0"])
+    pipeline = HeadlessPipeline(config)
+    pipeline.descriptions._stale = False
+    frame = decode_frame_of_data(build_frame_packet(1, 1, 0, 0))
+    frame.params = 0x02
+    pipeline._replay_frame(frame)
+    assert pipeline.descriptions._stale
+    assert pipeline.frames_out == 1
+
+
+def test_single_source_uses_plain_client():
+    config = build_arg_parser().parse_args(["--source", "main=239.255.42.100:1600,10.0.0.5", "--port", "0"])
+    pipeline = HeadlessPipeline(config)
+    assert type(pipeline.client) is NatNetClient
+    assert (pipeline.client.multicast_ip, pipeline.client.data_port) == ("239.255.42.100", 1600)
+    assert pipeline.client.descriptions is not None
+
+
+@pytest.mark.parametrize("receive_mode", NatNetClient.RECEIVE_MODES)
+def test_unicast_delivery(receive_mode):
+    """Motive en unicast envía al puerto de datos del hub: el socket no puede estar atado al grupo."""
+    port = free_port()
+    client = NatNetClient(data_port=port, receive_mode=receive_mode, handoff="fifo", queue_size=1000)
+    if not client.start():
+        pytest.skip("Sin soporte multicast en este entorno")
+    sender = PacketSender("127.0.0.1", port)
+    try:
+        sender.run(NatNetSynthesizer(rigid_bodies=4, skeletons=1, bones=5), rate=500, duration=0.2)
+        assert wait_for(lambda: client.frame_queue.produced >= sender.sent)
+    finally:
+        sender.close()
+        client.stop()
+    assert client.frame_queue.produced == sender.sent == 100
+
+
+@pytest.mark.parametrize("receive_mode", NatNetClient.RECEIVE_MODES)
+def test_listener_exits_when_stop_closes_the_socket(receive_mode, monkeypatch):
+    client = NatNetClient(data_port=free_port(), receive_mode=receive_mode)
+    if not client.start():
+        pytest.skip("Sin soporte multicast en este entorno")
+    client._stop_event.set()
+    client._thread.join(2.0)
+    # Carrera de stop(): el hilo ya pasó la comprobación de _stop_event cuando se cierra el socket
+    client._stop_event.clear()
+    client._running = False
+    client._data_socket.close()
+    failures = []
+    monkeypatch.setattr(threading, "excepthook", failures.append)
+    listener = threading.Thread(target=client._listen, daemon=True)
+    listener.start()
+    listener.join(2.0)
+    client._stop_event.set()
+    assert not listener.is_alive()
+    assert failures == []
+
+
+def test_aggregator_unicast_delivery():
+    ports = [free_port(), free_port()]
+    aggregator = MultiSourceAggregator([SourceSpec("a", data_port=ports[0]), SourceSpec("b", data_port=ports[1])],
+                                       rate=200, jitter=0.01, fetch_descriptions=False)
+    if not aggregator.start():
+        pytest.skip("Sin soporte multicast en este entorno")
+    senders = [PacketSender("127.0.0.1", port) for port in ports]
+    try:
+        synth = NatNetSynthesizer(rigid_bodies=2, skeletons=0)
+        for sender in senders:
+            sender.run(synth, rate=500, duration=0.05)
+        assert wait_for(lambda: all(b.received == 25 for b in aggregator._buffers))
+        assert wait_for(lambda: aggregator.frame_queue.produced > 0)
+        merged = aggregator.frame_queue.get(timeout=1.0)
+    finally:
+        for sender in senders:
+            sender.close()
+        aggregator.stop()
+    assert merged.ids.tolist() == [1, 2, 1001, 1002]
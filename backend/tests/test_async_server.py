@@ -0,0 +1,167 @@
+import json
+import socket
+import struct
+import time
+
+import numpy as np
+import pytest
+
+from core.natnet_client import decode_frame_of_data
+from core.subscription import Subscription
+from exporters.async_server import AsyncStreamServer
+from exporters.wire_format import MODEL_MAGIC
+from logic.processor import MocapTransformer
+from natnet_synth import NatNetSynthesizer
+from test_wire_format import parse_ycap
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def server():
+    # ws_port=0 deshabilita WebSocket: se reserva un puerto libre
+    server = AsyncStreamServer(port=0, ws_port=free_port())
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def frames():
+    synth = NatNetSynthesizer(rigid_bodies=2, skeletons=1, bones=3, seed=9)
+    transformer = MocapTransformer()
+    return [transformer.process_frame(decode_frame_of_data(packet), Subscription(spaces=("unreal",)))
+            for packet in synth.packets(3, first_frame=1)]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timeout"
+        time.sleep(0.01)
+
+
+class LineClient:
+    def __init__(self, port):
+        self.sock = socket.create_connection(("127.0.0.1", port), timeout=5.0)
+        self.buffer = b""
+
+    def send(self, request):
+        self.sock.sendall((json.dumps(request) + "\n").encode())
+
+    def read_exact(self, size):
+        while len(self.buffer) < size:
+            chunk = self.sock.recv(65536)
+            assert chunk, "conexión cerrada"
+            self.buffer += chunk
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def read_line(self):
+        while b"\n" not in self.buffer:
+            chunk = self.sock.recv(65536)
+            assert chunk, "conexión cerrada"
+            self.buffer += chunk
+        line, _, self.buffer = self.buffer.partition(b"\n")
+        return json.loads(line)
+
+    def read_binary(self):
+        (length,) = struct.unpack("<I", self.read_exact(4))
+        return struct.pack("<I", length) + self.read_exact(length)
+
+
+def test_tcp_json_client_gets_model_then_frame(server, frames):
+    client = LineClient(server.port)
+    try:
+        client.send({"format": "json"})
+        assert client.read_line()["ack"] == "format"
+        server.broadcast(frames[0])
+        model = client.read_line()
+        assert model["type"] == "model"
+        assert [s["name"] for s in model["subjects"]] == ["RB_1", "RB_2", "SK_1"]
+        payload = client.read_line()
+        assert payload["frame_number"] == 1
+        assert set(payload["subjects"]) == {"RB_1", "RB_2", "SK_1"}
+
+        # El modelo solo se reenvía si cambia
+        server.broadcast(frames[1])
+        assert client.read_line()["frame_number"] == 2
+    finally:
+        client.sock.close()
+
+
+def test_tcp_binary_client_with_subscription(server, frames):
+    client = LineClient(server.port)
+    try:
+        client.send({"format": "binary", "subjects": ["RB_2"]})
+        ack = client.read_line()
+        assert (ack["format"], ack["precision"]) == ("binary", "float32")
+        wait_for(lambda: server.demand() is not None)
+        server.broadcast(frames[0])
+        client.read_binary() # Modelo
+        message = parse_ycap(client.read_binary())
+        assert message["frame_number"] == 1
+        assert [name for name, _, _ in message["subjects"]] == ["RB_2"]
+    finally:
+        client.sock.close()
+
+
+def test_broadcast_retains_a_copy(server, frames):
+    client = LineClient(server.port)
+    try:
+        client.send({"format": "json"})
+        client.read_line()
+        wait_for(lambda: len(server.client_stats()) == 1)
+        server.broadcast(frames[0])
+        # El transformer reutiliza sus buffers antes de que el loop serialice: no se comparten
+        latest = server._latest
+        for space, (positions, rotations) in frames[0].spaces.items():
+            assert np.array_equal(latest.spaces[space][0], positions)
+            assert not np.shares_memory(latest.spaces[space][0], positions)
+            assert not np.shares_memory(latest.spaces[space][1], rotations)
+        assert client.read_line()["type"] == "model"
+        assert client.read_line()["frame_number"] == 1
+    finally:
+        client.sock.close()
+
+
+def test_invalid_handshake_is_rejected(server):
+    client = LineClient(server.port)
+    try:
+        client.send({"format": "xml"})
+        assert "error" in client.read_line()
+    finally:
+        client.sock.close()
+
+
+def test_demand_and_stats_follow_clients(server):
+    assert server.demand() is None
+    client = LineClient(server.port)
+    client.send({"format": "json"})
+    client.read_line()
+    wait_for(lambda: len(server.client_stats()) == 1)
+    assert server.client_stats()[0]["transport"] == "tcp"
+    client.sock.close()
+    wait_for(lambda: not server.client_stats())
+
+
+def test_websocket_client(server, frames):
+    sync_client = pytest.importorskip("websockets.sync.client")
+    with sync_client.connect(f"ws://127.0.0.1:{server.ws_port}") as ws:
+        ws.send(json.dumps({"format": "binary"}))
+        assert json.loads(ws.recv(timeout=5))["ack"] == "format"
+        server.broadcast(frames[0])
+        # Binario sin prefijo de longitud: WebSocket ya delimita los mensajes
+        assert ws.recv(timeout=5)[:len(MODEL_MAGIC)] == MODEL_MAGIC
+        message = ws.recv(timeout=5)
+        assert parse_ycap(struct.pack("<I", len(message)) + message)["frame_number"] == 1
+
+        ws.send(json.dumps({"format": "json"}))
+        assert json.loads(ws.recv(timeout=5))["format"] == "json"
+        server.broadcast(frames[1])
+        assert json.loads(ws.recv(timeout=5))["type"] == "model"
+        assert json.loads(ws.recv(timeout=5))["frame_number"] == 2
@@ -0,0 +1,88 @@
+import json
+import struct
+
+import pytest
+
+from core.data_descriptions import (DataDescriptionCache, PARAM_MODELS_CHANGED, SubjectModel,
+                                    parse_model_definitions)
+from core.natnet_client import decode_frame_of_data
+from natnet_synth import CommandResponder, NatNetSynthesizer
+
+
+@pytest.fixture
+def synth():
+    return NatNetSynthesizer(rigid_bodies=2, skeletons=2, bones=4, marker_sets=1, markers_per_set=3, seed=5)
+
+
+def test_parse_model_definitions(synth):
+    descriptions = parse_model_definitions(synth.model_definitions())
+    assert descriptions.marker_sets == {"MarkerSet_1": ["Marker_1", "Marker_2", "Marker_3"]}
+    assert [rb.name for rb in descriptions.rigid_bodies.values()] == ["Prop_1", "Prop_2"]
+    skeleton = descriptions.skeletons[2]
+    assert skeleton.name == "Actor_2"
+    assert skeleton.bone_names == ["Bone_1", "Bone_2", "Bone_3", "Bone_4"]
+    assert skeleton.parent_indices.tolist() == [-1, 0, 1, 2]
+
+
+def test_unknown_description_type_stops_parsing(synth):
+    data = synth.model_definitions()
+    count = struct.unpack_from("<i", data, 4)[0]
+    # Un tipo desconocido al final: se devuelve lo leído hasta ahí
+    data = data[:4] + struct.pack("<i", count + 1) + data[8:] + struct.pack("<i", 99) + b"\xff" * 16
+    descriptions = parse_model_definitions(data)
+    assert len(descriptions.rigid_bodies) == 2 and len(descriptions.skeletons) == 2
+
+
+def test_subject_model_with_descriptions(synth):
+    frame = decode_frame_of_data(synth.build_packet(1))
+    model = SubjectModel.build(frame, parse_model_definitions(synth.model_definitions()))
+    assert model.names == ["Prop_1", "Prop_2", "Actor_1", "Actor_2"]
+    assert model.offsets.tolist() == [0, 1, 2, 6, 10]
+    assert model.bone_names[:2] == [None, None]
+    assert model.bone_names[3] == ["Bone_1", "Bone_2", "Bone_3", "Bone_4"]
+    assert model.bone_parents[3].tolist() == [-1, 0, 1, 2]
+
+    description = json.loads(model.describe())
+    assert description["revision"] == model.revision
+    assert description["subjects"][2] == {"name": "Actor_1", "id": 1, "kind": "skeleton",
+                                          "bones": ["Bone_1", "Bone_2", "Bone_3", "Bone_4"], "parents": [-1, 0, 1, 2]}
+    assert model.describe() is model.describe()
+
+
+def test_subject_model_without_descriptions(synth):
+    frame = decode_frame_of_data(synth.build_packet(1))
+    model = SubjectModel.build(frame, None)
+    assert model.names == ["RB_1", "RB_2", "SK_1", "SK_2"]
+    assert model.bone_names == [None] * 4
+    # Cada modelo construido tiene su propia revisión
+    assert SubjectModel.build(frame, None).revision != model.revision
+
+
+def test_cache_fetches_from_command_channel(synth):
+    responder = CommandResponder(synth, port=0)
+    responder.start()
+    try:
+        descriptions = DataDescriptionCache(command_port=responder.port, timeout=2.0).fetch()
+    finally:
+        responder.close()
+    assert descriptions is not None
+    assert set(descriptions.skeletons) == {1, 2}
+    assert responder.requests == 1
+
+
+def test_cache_fetch_without_server_returns_none():
+    assert DataDescriptionCache(command_port=9, timeout=0.1).fetch() is None
+
+
+def test_observe_invalidates_on_rising_edge_only():
+    cache = DataDescriptionCache()
+    cache._stale = False
+    cache.observe(PARAM_MODELS_CHANGED)
+    assert cache._stale
+    cache._stale = False
+    # Motive mantiene el flag varios frames: no se vuelve a pedir
+    cache.observe(PARAM_MODELS_CHANGED)
+    assert not cache._stale
+    cache.observe(0)
+    cache.observe(PARAM_MODELS_CHANGED)
+    assert cache._stale
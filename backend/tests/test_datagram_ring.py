@@ -0,0 +1,61 @@
+import socket
+
+import pytest
+
+from core import datagram_ring
+from core.datagram_ring import DatagramRing
+
+
+@pytest.fixture
+def sockets():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.connect(receiver.getsockname())
+    yield sender, receiver
+    sender.close()
+    receiver.close()
+
+
+def test_recv_into_reuses_slots(sockets):
+    sender, receiver = sockets
+    ring = DatagramRing(slot_count=2, slot_size=64)
+    receiver.settimeout(1.0)
+    views = []
+    for payload in (b"one", b"two", b"three"):
+        sender.send(payload)
+        views.append(ring.recv_into(receiver))
+    assert bytes(views[1]) == b"two"
+    assert bytes(views[2]) == b"three"
+    # Con dos slots el tercer datagrama reutiliza el slot del primero
+    assert views[2].obj is views[0].obj
+
+
+@pytest.mark.parametrize("use_recvmmsg", [True, False])
+def test_recv_batch_drains_queued_datagrams(sockets, monkeypatch, use_recvmmsg):
+    if use_recvmmsg and datagram_ring._recvmmsg is None:
+        pytest.skip("recvmmsg no disponible")
+    if not use_recvmmsg:
+        monkeypatch.setattr(datagram_ring, "_recvmmsg", None)
+    sender, receiver = sockets
+    receiver.setblocking(False)
+    ring = DatagramRing(slot_count=8, slot_size=64)
+    payloads = [bytes([i]) * (i + 1) for i in range(5)]
+    for payload in payloads:
+        sender.send(payload)
+    assert [bytes(v) for v in ring.recv_batch(receiver, max_batch=16, timeout=1.0)] == payloads
+    assert ring.recv_batch(receiver, timeout=0.01) == []
+
+
+def test_recv_batch_does_not_cross_ring_end(sockets):
+    sender, receiver = sockets
+    receiver.setblocking(False)
+    ring = DatagramRing(slot_count=4, slot_size=64)
+    for i in range(6):
+        sender.send(bytes([i]))
+    received = []
+    while len(received) < 6:
+        batch = ring.recv_batch(receiver, max_batch=16, timeout=1.0)
+        assert batch and len(batch) <= 4
+        received += [bytes(v) for v in batch]
+    assert received == [bytes([i]) for i in range(6)]
@@ -0,0 +1,150 @@
+import struct
+
+import numpy as np
+
+from core.frame import ProcessedFrame
+from core.natnet_client import decode_frame_of_data
+from core.subscription import Subscription
+from exporters.delta_codec import DELTA_MAGIC, DeltaFrameEncoder
+from logic.processor import MocapTransformer
+from natnet_synth import NatNetSynthesizer
+from test_wire_format import parse_ycap
+
+SPACES = ("unreal", "maya")
+_HEADER = struct.Struct("<4sBBHIId")
+
+
+class DeltaClient:
+    """Cliente de referencia: reconstruye el estado aplicando keyframes y deltas como indica delta_codec."""
+    def __init__(self):
+        self.frame_number = None
+        self.offsets = None
+        self.state = {}
+        self.keyframes = 0
+        self.deltas = 0
+
+    def feed(self, message):
+        message = bytes(message)
+        body = memoryview(message)[4:]
+        if bytes(body[:4]) != DELTA_MAGIC:
+            decoded = parse_ycap(message)
+            counts = [count for _, _, count in decoded["subjects"]]
+            self.offsets = np.concatenate(([0], np.cumsum(counts)))
+            self.state = {space: (pos.copy(), rot.copy()) for space, (pos, rot) in decoded["spaces"].items()}
+            self.frame_number = decoded["frame_number"]
+            self.keyframes += 1
+            return
+
+        _, _, _, changed_count, frame_number, base_frame_number, _ = _HEADER.unpack_from(body)
+        assert base_frame_number == self.frame_number
+        offset = _HEADER.size + -(-(len(self.offsets) - 1) // 8)
+        changed = np.frombuffer(body, "<u2", changed_count, offset).astype(np.intp)
+        offset += 2 * changed_count
+        rows = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in changed]) \
+            if changed_count else np.empty(0, dtype=np.intp)
+        for pos, rot in self.state.values():
+            step = np.float32(struct.unpack_from("<f", body, offset)[0])
+            offset += 4
+            q_pos = np.frombuffer(body, "<i2", len(rows) * 3, offset).reshape(-1, 3)
+            offset += q_pos.nbytes
+            q_rot = np.frombuffer(body, "<i2", len(rows) * 4, offset).reshape(-1, 4)
+            offset += q_rot.nbytes
+            pos[rows] += q_pos * step
+            rot[rows] += q_rot * np.float32(1.0 / 32767)
+        assert offset == len(body)
+        self.frame_number = frame_number
+        self.deltas += 1
+
+
+def frames(count, rigid_bodies=3, skeletons=2, bones=5, rate=120.0, seed=3):
+    synth = NatNetSynthesizer(rigid_bodies=rigid_bodies, skeletons=skeletons, bones=bones, seed=seed)
+    transformer = MocapTransformer()
+    demand = Subscription(spaces=SPACES)
+    for packet in synth.packets(count, rate=rate):
+        yield transformer.process_frame(decode_frame_of_data(packet), demand)
+
+
+def test_round_trip_tracks_frames():
+    encoder = DeltaFrameEncoder(keyframe_interval=1000)
+    client = DeltaClient()
+    for frame in frames(60):
+        client.feed(encoder.encode(frame).resolve(encoder.sequence - 1))
+        for space, (pos, rot) in frame.spaces.items():
+            client_pos, client_rot = client.state[space]
+            # El cliente tiene exactamente la referencia del encoder...
+            assert np.array_equal(client_pos, encoder._reference[space][0])
+            assert np.array_equal(client_rot, encoder._reference[space][1])
+            # ...y esta no se aleja del frame más que epsilon (más el paso de cuantización)
+            scale = encoder._scale(space)
+            assert np.abs(client_pos - pos).max() <= (encoder.epsilon + encoder.quantum) * scale
+            assert np.abs(client_rot - rot).max() <= encoder.rot_epsilon + 1.0 / 32767
+    assert client.keyframes == 1
+    assert client.deltas == 59
+
+
+def test_keyframe_interval():
+    encoder = DeltaFrameEncoder(keyframe_interval=10)
+    messages = [encoder.encode(frame) for frame in frames(25)]
+    keyframes = [i for i, message in enumerate(messages) if message.delta is None]
+    assert keyframes == [0, 10, 20]
+
+
+def test_lagging_client_gets_keyframe():
+    encoder = DeltaFrameEncoder()
+    stream = frames(4)
+    encoder.encode(next(stream))
+    encoder.encode(next(stream))
+    message = encoder.encode(next(stream))
+    # Un cliente al día recibe el delta; uno que perdió mensajes, el keyframe de la referencia
+    assert message.resolve(message.sequence - 1) is message.delta
+    client = DeltaClient()
+    client.feed(message.resolve(message.sequence - 2))
+    assert client.keyframes == 1
+    assert np.array_equal(client.state["unreal"][0], encoder._reference["unreal"][0])
+
+
+def test_table_change_forces_keyframe():
+    encoder = DeltaFrameEncoder()
+    stream = frames(3)
+    encoder.encode(next(stream))
+    assert encoder.encode(next(stream)).delta is not None
+    subset = Subscription(["RB_1"], spaces=SPACES).apply(next(stream))
+    assert encoder.encode(subset).delta is None
+
+
+def test_static_subjects_are_skipped():
+    encoder = DeltaFrameEncoder()
+    frame = next(frames(1))
+    still = ProcessedFrame(frame.frame_number, frame.timestamp, frame.subject_names, frame.subject_kinds,
+                           frame.subject_offsets, {s: (p.copy(), r.copy()) for s, (p, r) in frame.spaces.items()})
+    encoder.encode(still)
+    moved = {s: (p.copy(), r.copy()) for s, (p, r) in still.spaces.items()}
+    moved["unreal"][0][0] += 1.0
+    message = encoder.encode(ProcessedFrame(frame.frame_number + 1, frame.timestamp, frame.subject_names,
+                                            frame.subject_kinds, frame.subject_offsets, moved))
+    changed_count = _HEADER.unpack_from(message.delta, 4)[3]
+    assert changed_count == 1
+    assert encoder.subjects_skipped == len(frame.subject_names) - 1
+
+
+def test_large_jump_falls_back_to_keyframe():
+    encoder = DeltaFrameEncoder()
+    frame = next(frames(1))
+    encoder.encode(frame)
+    jumped = {s: (p + 10000.0, r) for s, (p, r) in frame.spaces.items()}
+    message = encoder.encode(ProcessedFrame(frame.frame_number + 1, frame.timestamp, frame.subject_names,
+                                            frame.subject_kinds, frame.subject_offsets, jumped))
+    assert message.delta is None
+    assert encoder.keyframes == 2
+
+
+def test_frames_without_spaces():
+    encoder = DeltaFrameEncoder()
+    frame = next(frames(1))
+    empty = ProcessedFrame(frame.frame_number, frame.timestamp, frame.subject_names, frame.subject_kinds,
+                           frame.subject_offsets, {})
+    encoder.encode(empty)
+    message = encoder.encode(ProcessedFrame(frame.frame_number + 1, frame.timestamp, frame.subject_names,
+                                            frame.subject_kinds, frame.subject_offsets, {}))
+    assert message.delta is not None
+    assert _HEADER.unpack_from(message.delta, 4)[3] == 0
@@ -0,0 +1,65 @@
+import queue
+import threading
+
+import pytest
+
+from core.frame_mailbox import FrameMailbox, create_mailbox
+
+
+def drain(mailbox):
+    frames = []
+    while True:
+        try:
+            frames.append(mailbox.get_nowait())
+        except queue.Empty:
+            return frames
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        FrameMailbox()
+
+
+def test_latest_keeps_newest():
+    mailbox = create_mailbox("latest")
+    for i in range(5):
+        mailbox.put_nowait(i)
+    assert drain(mailbox) == [4]
+    assert mailbox.stats() == {"produced": 5, "consumed": 1, "dropped": 0, "overwritten": 4, "depth": 0}
+
+
+def test_drop_oldest_overwrites():
+    mailbox = create_mailbox("drop_oldest", 3)
+    for i in range(5):
+        mailbox.put_nowait(i)
+    assert drain(mailbox) == [2, 3, 4]
+    assert mailbox.overwritten == 2
+
+
+def test_fifo_drops_incoming():
+    mailbox = create_mailbox("fifo", 3)
+    for i in range(5):
+        mailbox.put_nowait(i)
+    assert drain(mailbox) == [0, 1, 2]
+    assert mailbox.dropped == 2
+
+
+def test_get_times_out():
+    mailbox = create_mailbox("latest")
+    with pytest.raises(queue.Empty):
+        mailbox.get(timeout=0.01)
+
+
+def test_get_wakes_on_put():
+    mailbox = create_mailbox("fifo")
+    timer = threading.Timer(0.05, mailbox.put_nowait, ("frame",))
+    timer.start()
+    try:
+        assert mailbox.get(timeout=2.0) == "frame"
+    finally:
+        timer.cancel()
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        create_mailbox("lifo")
@@ -0,0 +1,47 @@
+import logging
+
+import pytest
+
+from core.metrics import LogRing
+
+
+@pytest.fixture
+def ring():
+    ring = LogRing(capacity=3)
+    ring.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+    logger = logging.getLogger("test_log_ring")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(ring)
+    yield ring, logger
+    logger.removeHandler(ring)
+
+
+def test_drain_returns_only_new_lines(ring):
+    ring, logger = ring
+    logger.info("uno")
+    logger.warning("dos")
+    lines, seen, lost = ring.drain(0)
+    assert lines == ["INFO uno", "WARNING dos"]
+    assert (seen, lost) == (2, 0)
+
+    logger.info("tres")
+    lines, seen, lost = ring.drain(seen)
+    assert lines == ["INFO tres"] and seen == 3
+    assert ring.drain(seen) == ([], 3, 0)
+
+
+def test_overflow_reports_lost_records(ring):
+    ring, logger = ring
+    for i in range(5):
+        logger.info(f"linea {i}")
+    lines, seen, lost = ring.drain(0)
+    assert lines == ["INFO linea 2", "INFO linea 3", "INFO linea 4"]
+    assert (seen, lost) == (5, 2)
+
+
+def test_unformattable_record_falls_back_to_message(ring):
+    ring, logger = ring
+    ring.handle(logger.makeRecord(logger.name, logging.INFO, __file__, 0, "faltan %s %s", ("args",), None))
+    lines, _, _ = ring.drain(0)
+    assert lines == ["faltan %s %s"]
@@ -0,0 +1,67 @@
+import struct
+
+import numpy as np
+import pytest
+
+from core.frame import MarkerSets
+from core.natnet_client import decode_frame_of_data
+from natnet_synth import NatNetSynthesizer
+
+
+def marker_packet(sets):
+    """Frame of Data mínimo: solo marker sets [(nombre, posiciones (M, 3))], sin Rigid Bodies ni Skeletons."""
+    body = struct.pack("<II", 3, len(sets))
+    for name, positions in sets:
+        body += name.encode("utf-8") + b"\0" + struct.pack("<I", len(positions))
+        body += np.asarray(positions, dtype="<f4").tobytes()
+    body += struct.pack("<II", 0, 0)
+    return struct.pack("<HH", 7, len(body)) + body
+
+
+def test_markers_skipped_unless_requested():
+    synth = NatNetSynthesizer(rigid_bodies=2, skeletons=1, bones=3, marker_sets=2, seed=3)
+    packet = synth.build_packet(1)
+    frame = decode_frame_of_data(packet)
+    assert frame.marker_sets is None
+    # Saltar los marker sets no desplaza el resto del frame
+    with_markers = decode_frame_of_data(packet, True)
+    assert np.array_equal(frame.positions, with_markers.positions)
+    assert with_markers.marker_sets.names == ["MarkerSet_1", "MarkerSet_2"]
+
+
+def test_positions_and_stacked():
+    a = np.arange(6, dtype=np.float32).reshape(2, 3)
+    b = np.arange(9, dtype=np.float32).reshape(3, 3) + 100
+    sets = decode_frame_of_data(marker_packet([("A", a), ("B", b)]), True).marker_sets
+    assert sets.counts == [2, 3] and sets.marker_count == 5
+    assert np.array_equal(sets.positions(1), b)
+    positions, offsets = sets.stacked()
+    assert np.array_equal(positions, np.concatenate((a, b)))
+    assert offsets.tolist() == [0, 2, 5]
+    assert sets.stacked() is sets.stacked()
+
+
+@pytest.mark.parametrize("wrap", [bytes, bytearray, memoryview])
+def test_long_names_from_any_buffer(wrap):
+    # Nombres más largos que la ventana de búsqueda, y uno que termina justo en su borde
+    names = ["x" * 200, "y" * 63, "z" * 64, "é" * 40]
+    sets = [(name, np.full((1, 3), i, dtype=np.float32)) for i, name in enumerate(names)]
+    frame = decode_frame_of_data(wrap(marker_packet(sets)), True)
+    assert frame.marker_sets.names == names
+    assert [float(frame.marker_sets.positions(i)[0, 0]) for i in range(len(names))] == [0.0, 1.0, 2.0, 3.0]
+
+
+def test_unterminated_name_raises():
+    packet = marker_packet([("A", np.zeros((1, 3)))])
+    truncated = memoryview(packet[:13]) # Cortado antes del \0 de "A"
+    with pytest.raises(ValueError):
+        decode_frame_of_data(truncated, True)
+
+
+def test_merge_prefixes_sources():
+    a = decode_frame_of_data(marker_packet([("A", np.ones((2, 3)))]), True).marker_sets
+    b = decode_frame_of_data(marker_packet([("B", np.full((1, 3), 2.0))]), True).marker_sets
+    merged = MarkerSets.merge([("left", a), ("right", b)])
+    assert merged.names == ["left/A", "right/B"]
+    assert np.array_equal(merged.positions(1), np.full((1, 3), 2.0, dtype=np.float32))
+    assert merged.stacked()[1].tolist() == [0, 2, 3]
@@ -0,0 +1,128 @@
+import json
+import socket
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from core.metrics import STAGES, LatencyHistogram, MetricsServer, PipelineMetrics, ThroughputMeter, get_metrics
+
+
+def test_histogram_percentiles_within_bucket_error():
+    histogram = LatencyHistogram()
+    for us in range(1, 1001):
+        histogram.record(us * 1e-6)
+    assert histogram.count == 1000
+    assert histogram.max == pytest.approx(1e-3)
+    # Cota superior del bucket: nunca por debajo del valor real y con error relativo < 12%
+    for q, exact in ((50, 500e-6), (99, 990e-6)):
+        value = histogram.percentile(q)
+        assert exact <= value < exact * 1.12
+    assert histogram.percentile(100) == pytest.approx(1e-3)
+
+
+def test_histogram_clamps_out_of_range_values():
+    histogram = LatencyHistogram()
+    histogram.record(0.0)
+    histogram.record(100.0)
+    assert histogram.count == 2
+    assert histogram.percentile(100) == 100.0
+    histogram.reset()
+    assert histogram.snapshot() == {"count": 0, "mean_us": 0.0, "p50_us": 0.0, "p99_us": 0.0, "max_us": 0.0}
+
+
+def test_throughput_uses_last_complete_window():
+    meter = ThroughputMeter(window=1.0)
+    start = meter._started
+    for i in range(10):
+        meter.add(100, start + i * 0.1)
+    assert meter.fps == 0.0
+    meter.add(100, start + 1.0)
+    assert meter.fps == pytest.approx(11.0)
+    assert meter.rates(start + 1.5)["kbps"] == pytest.approx(11 * 100 * 8 / 1000.0)
+    # Sin envíos durante más de dos ventanas la medida caduca
+    assert meter.rates(start + 3.5) == {"fps": 0.0, "kbps": 0.0}
+
+
+def test_snapshot_stages_counters_and_gauges():
+    metrics = PipelineMetrics()
+    metrics.record("decode", 20e-6)
+    metrics.record("custom", 1e-3)
+    metrics.count("frames_dropped", 3)
+    metrics.register_gauge("clients", lambda: 2)
+    metrics.register_gauge("broken", lambda: 1 / 0)
+
+    snapshot = metrics.snapshot()
+    assert set(STAGES) | {"custom"} == set(snapshot["stages"])
+    assert snapshot["stages"]["decode"]["count"] == 1
+    assert snapshot["counters"] == {"frames_dropped": 3}
+    assert snapshot["gauges"]["clients"] == 2
+    assert "error" in snapshot["gauges"]["broken"]
+    json.dumps(snapshot)
+
+    metrics.unregister_gauge("broken")
+    metrics.reset()
+    snapshot = metrics.snapshot()
+    assert "broken" not in snapshot["gauges"]
+    assert snapshot["counters"] == {} and snapshot["stages"]["decode"]["count"] == 0
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = PipelineMetrics()
+    metrics.enabled = False
+    metrics.record("decode", 1e-3)
+    metrics.count("frames_dropped")
+    assert metrics.histogram("decode").count == 0
+    assert metrics.snapshot()["counters"] == {}
+
+
+def test_stages_recorded_from_many_threads_are_merged():
+    metrics = PipelineMetrics()
+    barrier = threading.Barrier(4)
+
+    def producer():
+        barrier.wait()
+        for _ in range(5000):
+            metrics.record("decode", 10e-6)
+            metrics.count("frames")
+
+    threads = [threading.Thread(target=producer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    metrics.record("decode", 1e-3)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["stages"]["decode"]["count"] == 4 * 5000 + 1
+    assert snapshot["counters"]["frames"] == 4 * 5000
+    # Los histogramas de los hilos terminados se pliegan y no se pierden
+    assert len(metrics._shards) == 1
+    assert metrics.histogram("decode").max == pytest.approx(1e-3)
+    metrics.reset()
+    assert metrics.histogram("decode").count == 0
+
+
+def test_metrics_server_on_busy_port_is_skipped():
+    with socket.socket() as busy:
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        server = MetricsServer(port=busy.getsockname()[1])
+        assert not server.start()
+        server.stop()
+
+
+def test_metrics_server_serves_snapshot():
+    server = MetricsServer(port=0)
+    server.start()
+    try:
+        get_metrics().count("test_metrics_server")
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"] == "application/json"
+            body = json.loads(response.read())
+        assert body["counters"]["test_metrics_server"] >= 1
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{server.port}/otra", timeout=5)
+    finally:
+        server.stop()
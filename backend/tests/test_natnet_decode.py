@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from bench_decode import build_frame_packet, legacy_unpack_frame_of_data
+
+from core.natnet_client import decode_frame_of_data, format_timecode, parse_timecode
+from natnet_synth import NatNetSynthesizer
+
+
+def test_matches_legacy_parser():
+    packet = build_frame_packet(42, 5, 3, 7)
+    legacy = legacy_unpack_frame_of_data(packet)
+    frame = decode_frame_of_data(packet)
+
+    rows = legacy["rigid_bodies"] + [b for sk in legacy["skeletons"] for b in sk["rigid_bodies"]]
+    assert frame.frame_number == 42
+    assert frame.rigid_body_count == 5
+    assert frame.row_count == 5 + 3 * 7
+    assert frame.ids.tolist() == [r["id"] for r in rows]
+    assert np.array_equal(frame.positions, np.array([r["pos"] for r in rows], dtype=np.float32))
+    assert np.array_equal(frame.rotations, np.array([r["rot"] for r in rows], dtype=np.float32))
+    assert frame.skeleton_ids.tolist() == [1, 2, 3]
+    assert frame.skeleton_offsets.tolist() == [5, 12, 19, 26]
+
+
+def test_skeleton_rows():
+    frame = decode_frame_of_data(build_frame_packet(1, 2, 2, 4))
+    assert frame.skeleton_count == 2
+    assert frame.skeleton_rows(0) == slice(2, 6)
+    assert frame.skeleton_rows(1) == slice(6, 10)
+
+
+def test_empty_frame():
+    frame = decode_frame_of_data(build_frame_packet(7, 0, 0, 0))
+    assert frame.row_count == 0
+    assert frame.positions.shape == (0, 3)
+    assert frame.rotations.shape == (0, 4)
+    assert frame.skeleton_offsets.tolist() == [0]
+
+
+def test_tail_fields():
+    synth = NatNetSynthesizer(rigid_bodies=2, skeletons=1, bones=3)
+    synth.params = 0x02
+    frame = decode_frame_of_data(synth.build_packet(10, 2.5))
+    assert frame.timestamp == 2.5
+    assert frame.params == 0x02
+    assert frame.timecode == 10
+
+
+def test_parse_timecode_inverts_format():
+    assert parse_timecode("01:02:03:04") == ((1 << 24) | (2 << 16) | (3 << 8) | 4, 0)
+    assert format_timecode(*parse_timecode("23:59:59:29.3")) == "23:59:59:29.3"
+    for text in ("01:02:03", "01:02:03:xx", "24:00:00:00", "01:02:03:04.a"):
+        with pytest.raises(ValueError):
+            parse_timecode(text)
+
+
+def test_truncated_tail_keeps_rows():
+    synth = NatNetSynthesizer(rigid_bodies=2, skeletons=1, bones=3)
+    packet = synth.build_packet(3, 1.0)
+    frame = decode_frame_of_data(packet[:-20])
+    assert frame.row_count == 5
+    assert frame.timestamp == 0.0
+    assert np.array_equal(frame.positions, decode_frame_of_data(packet).positions)
+
+
+def test_memoryview_input():
+    packet = build_frame_packet(5, 3, 2, 4)
+    from_bytes = decode_frame_of_data(packet)
+    from_view = decode_frame_of_data(memoryview(bytearray(packet)))
+    assert np.array_equal(from_bytes.ids, from_view.ids)
+    assert np.array_equal(from_bytes.positions, from_view.positions)
+    assert np.array_equal(from_bytes.errors, from_view.errors)
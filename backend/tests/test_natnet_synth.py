@@ -0,0 +1,52 @@
+import socket
+
+import numpy as np
+
+from core.natnet_client import decode_frame_of_data
+from natnet_synth import NatNetSynthesizer, PacketSender
+
+
+def test_packets_decode_to_configured_layout():
+    synth = NatNetSynthesizer(rigid_bodies=3, skeletons=2, bones=5, marker_sets=1, markers_per_set=4, seed=1)
+    synth.params = 0x02
+    frame = decode_frame_of_data(synth.build_packet(7, 0.5), True)
+    assert frame.frame_number == 7
+    assert frame.timestamp == 0.5 and frame.params == 0x02
+    assert frame.rigid_body_count == 3 and frame.row_count == synth.row_count == 13
+    assert frame.skeleton_ids.tolist() == [1, 2]
+    assert frame.marker_sets.counts == [4]
+    # Cuaterniones unitarios en todas las filas
+    assert np.allclose(np.linalg.norm(frame.rotations, axis=1), 1.0, atol=1e-5)
+
+
+def test_frames_move_and_are_reproducible():
+    a = list(NatNetSynthesizer(rigid_bodies=2, skeletons=1, bones=3, seed=4).packets(3))
+    b = list(NatNetSynthesizer(rigid_bodies=2, skeletons=1, bones=3, seed=4).packets(3))
+    assert a == b
+    first, last = decode_frame_of_data(a[0]), decode_frame_of_data(a[2])
+    assert last.frame_number == 2
+    assert not np.array_equal(first.positions, last.positions)
+
+
+def test_nan_rate_occludes_whole_rows():
+    synth = NatNetSynthesizer(rigid_bodies=50, skeletons=2, bones=25, nan_rate=0.3, seed=2)
+    frame = decode_frame_of_data(synth.build_packet(1))
+    occluded = np.isnan(frame.positions).any(axis=1)
+    assert 0 < occluded.sum() < frame.row_count
+    assert np.isnan(frame.rotations[occluded]).all()
+    assert not np.isnan(frame.positions[~occluded]).any()
+
+
+def test_packet_sender_unicast():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    receiver.settimeout(2.0)
+    sender = PacketSender("127.0.0.1", receiver.getsockname()[1])
+    try:
+        sender.run(NatNetSynthesizer(rigid_bodies=1, skeletons=0, bones=0), rate=200.0, duration=0.05)
+        assert sender.sent == 10
+        frames = [decode_frame_of_data(receiver.recv(65535)).frame_number for _ in range(sender.sent)]
+        assert frames == list(range(10))
+    finally:
+        sender.close()
+        receiver.close()
@@ -0,0 +1,128 @@
+import struct
+
+import numpy as np
+import pytest
+
+from core.natnet_client import decode_frame_of_data
+from core.subscription import Subscription
+from exporters.osc_exporter import OscExporter, parse_osc_target
+from logic.processor import MocapTransformer
+from natnet_synth import NatNetSynthesizer
+
+
+class CaptureSocket:
+    """Sustituto del socket UDP: guarda (destino, datagrama) en lugar de enviarlos."""
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, address):
+        self.sent.append((address, bytes(data)))
+
+    def close(self):
+        pass
+
+
+def _osc_string(data, offset):
+    end = data.index(b"\0", offset)
+    return data[offset:end].decode("utf-8"), (end + 4) & ~3
+
+
+def parse_bundle(data):
+    """Lector OSC de referencia: bundle -> {dirección: tupla de argumentos}."""
+    assert data[:8] == b"#bundle\0"
+    assert struct.unpack_from(">Q", data, 8)[0] == 1
+    messages, offset = {}, 16
+    while offset < len(data):
+        (size,) = struct.unpack_from(">i", data, offset)
+        offset += 4
+        end = offset + size
+        address, cursor = _osc_string(data, offset)
+        typetag, cursor = _osc_string(data, cursor)
+        assert typetag[0] == ","
+        args = struct.unpack_from(">" + typetag[1:], data, cursor)
+        assert cursor + 4 * len(args) == end
+        messages[address] = args
+        offset = end
+    return messages
+
+
+def make_frame(frame_number=1, transformer=None):
+    synth = NatNetSynthesizer(rigid_bodies=2, skeletons=1, bones=3, seed=8)
+    raw = decode_frame_of_data(synth.build_packet(frame_number, frame_number / 120.0))
+    return (transformer or MocapTransformer()).process_frame(raw, Subscription(spaces=("unreal",)))
+
+
+def make_exporter(targets=(("127.0.0.1", 9000, None),), **kwargs):
+    exporter = OscExporter(list(targets), **kwargs)
+    exporter._socket = CaptureSocket()
+    exporter._addresses = [(host, port) for host, port, _ in targets]
+    return exporter
+
+
+def test_parse_osc_target():
+    assert parse_osc_target("localhost:9000") == ("localhost", 9000, None)
+    assert parse_osc_target("10.0.0.2:8000@30") == ("10.0.0.2", 8000, 30.0)
+    with pytest.raises(ValueError):
+        parse_osc_target("9000")
+
+
+def test_bundle_layout_and_values():
+    frame = make_frame(5)
+    exporter = make_exporter()
+    exporter.broadcast(frame)
+    ((_, data),) = exporter._socket.sent
+    messages = parse_bundle(data)
+
+    positions, rotations = frame.spaces["unreal"]
+    assert messages["/yeici/frame"] == (5,)
+    assert np.allclose(messages["/yeici/RB_1/pos"], positions[0])
+    assert np.allclose(messages["/yeici/RB_2/rot"], rotations[1])
+    # Huesos sin description: Bone_<i>
+    assert np.allclose(messages["/yeici/SK_1/Bone_2/pos"], positions[4])
+    assert len(messages) == 1 + 2 * (2 + 3)
+
+
+def test_template_is_reused_across_frames():
+    exporter = make_exporter()
+    transformer = MocapTransformer()
+    exporter.broadcast(make_frame(1, transformer))
+    template = exporter._template
+    frame = make_frame(2, transformer)
+    exporter.broadcast(frame)
+    assert exporter._template is template
+    messages = parse_bundle(exporter._socket.sent[-1][1])
+    assert messages["/yeici/frame"] == (2,)
+    assert np.allclose(messages["/yeici/RB_1/pos"], frame.spaces["unreal"][0][0])
+
+
+def test_large_frame_is_split_into_bundles():
+    frame = make_frame()
+    exporter = make_exporter(max_datagram=200)
+    exporter.broadcast(frame)
+    datagrams = [data for _, data in exporter._socket.sent]
+    assert len(datagrams) > 1
+    assert all(len(data) <= 200 for data in datagrams)
+    merged = {}
+    for data in datagrams:
+        messages = parse_bundle(data)
+        # Cada bundle lleva su propio /frame
+        assert messages.pop("/yeici/frame") == (1,)
+        merged.update(messages)
+    assert len(merged) == 2 * (2 + 3)
+
+
+def test_subject_filter_and_prefix():
+    exporter = make_exporter(subjects=["RB_2"], prefix="live/")
+    exporter.broadcast(make_frame())
+    messages = parse_bundle(exporter._socket.sent[0][1])
+    assert sorted(messages) == ["/live/RB_2/pos", "/live/RB_2/rot", "/live/frame"]
+
+
+def test_per_target_rate():
+    exporter = make_exporter([("127.0.0.1", 9000, None), ("127.0.0.1", 9001, 1.0)])
+    frame = make_frame()
+    for _ in range(5):
+        exporter.broadcast(frame)
+    # El destino a 1 Hz solo recibe el primer frame de la ráfaga
+    assert exporter.bundles_sent == [5, 1]
+    assert exporter.frames_built == 5
@@ -0,0 +1,136 @@
+import multiprocessing
+import time
+
+import pytest
+
+from core.natnet_client import decode_frame_of_data
+from core.subscription import Subscription
+from exporters.wire_format import create_encoder
+from logic.processor import MocapTransformer
+from natnet_synth import NatNetSynthesizer
+from pipeline import HeadlessPipeline, build_arg_parser
+from test_recording import record
+
+
+class RecordingOutput:
+    def __init__(self, fail=False, subscription=None):
+        self.fail = fail
+        self.subscription = subscription
+        self.frames = []
+
+    def broadcast(self, frame):
+        if self.fail:
+            raise RuntimeError("salida rota")
+        self.frames.append(frame.frame_number)
+
+    def demand(self):
+        return self.subscription
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def pipeline():
+    return HeadlessPipeline(build_arg_parser().parse_args(["--port", "0"]))
+
+
+def raw_frame(number):
+    synth = NatNetSynthesizer(rigid_bodies=2, skeletons=1, bones=3, marker_sets=1)
+    return decode_frame_of_data(synth.build_packet(number))
+
+
+def test_environment_sets_defaults_and_command_line_wins(monkeypatch):
+    monkeypatch.setenv("YEICICAP_PORT", "6000")
+    monkeypatch.setenv("YEICICAP_HEADLESS", "yes")
+    monkeypatch.setenv("YEICICAP_LAG_POLICY", "decimate")
+    config = build_arg_parser().parse_args(["--port", "7000"])
+    assert config.headless
+    assert config.lag_policy == "decimate"
+    assert config.port == 7000
+
+
+def test_failing_output_does_not_starve_the_rest(pipeline):
+    broken, healthy = RecordingOutput(fail=True), RecordingOutput()
+    pipeline._outputs = [broken, healthy]
+    pipeline._process_and_emit(raw_frame(1))
+    pipeline._process_and_emit(raw_frame(2))
+    assert healthy.frames == [1, 2]
+    assert pipeline.errors == 2
+    assert pipeline.frames_out == 2
+
+
+def test_replay_seek_starts_at_timecode(tmp_path):
+    path = str(tmp_path / "toma.ycap")
+    record(path, "frames", 10) # Timecodes 01:02:03:04 ... 01:02:03:13, frames 10 ... 19
+    config = build_arg_parser().parse_args(["--port", "0", "--replay", path, "--replay-speed", "0",
+                                            "--replay-seek", "01:02:03:08", "--stats-interval", "0"])
+    pipeline = HeadlessPipeline(config)
+    output = RecordingOutput()
+    pipeline._outputs = [output]
+    try:
+        assert pipeline._start_replay()
+        pipeline.replayer.wait(5.0)
+    finally:
+        pipeline.stop()
+    assert output.frames == list(range(14, 20))
+
+
+def test_demand_merges_exporters_and_toggles_markers(pipeline):
+    pipeline.server = RecordingOutput(subscription=Subscription(["RB_1"], spaces=("unreal",)))
+    pipeline.exporters = [RecordingOutput(subscription=Subscription(["SK_1"], spaces=("maya",), markers=True))]
+    demand = pipeline._demand()
+    assert demand.subjects == frozenset({"RB_1", "SK_1"})
+    assert demand.spaces == ("unreal", "maya")
+    assert pipeline.client.decode_markers
+    pipeline.exporters = []
+    pipeline._demand()
+    assert not pipeline.client.decode_markers
+
+
+class EncodingOutput(RecordingOutput):
+    """Salida que deja la serialización JSON de su suscripción a los workers."""
+    def __init__(self, subscription):
+        super().__init__(subscription=subscription)
+        self.key = (("json", None), subscription.key)
+        self.messages = []
+
+    def broadcast(self, frame):
+        super().broadcast(frame)
+        self.messages.append(frame.encoded.get(self.key) if frame.encoded else None)
+
+    def encode_plan(self):
+        return {self.key: self.subscription}
+
+
+def test_process_workers_emit_every_frame_in_order():
+    config = build_arg_parser().parse_args(["--port", "0", "--threading", "process", "--workers", "2",
+                                            "--handoff", "fifo", "--shm-max-rows", "64", "--shm-max-skeletons", "4"])
+    pipeline = HeadlessPipeline(config)
+    subscription = Subscription(["RB_2"], spaces=("unreal",))
+    output = EncodingOutput(subscription)
+    pipeline.exporters = [output]
+    pipeline._outputs = [output]
+    fanout = pipeline.frames = pipeline._start_workers(multiprocessing.get_context("spawn"))
+    try:
+        synth = NatNetSynthesizer(rigid_bodies=2, skeletons=1, bones=3, seed=8)
+        raw_frames = [decode_frame_of_data(packet) for packet in synth.packets(40, first_frame=1)]
+        # Con el plan ya en los workers, para que todos los frames lleguen serializados
+        deadline = time.monotonic() + 10.0
+        while pipeline._control_version == 0:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        for raw in raw_frames:
+            while not fanout.put_nowait(raw):
+                time.sleep(0.001) # fifo lleno: los workers van por detrás
+        while len(output.frames) < len(raw_frames):
+            assert time.monotonic() < deadline, output.frames
+            time.sleep(0.01)
+    finally:
+        pipeline.stop()
+
+    assert output.frames == list(range(1, 41))
+    expected = create_encoder(("json", None)).encode(subscription.apply(
+        MocapTransformer().process_frame(raw_frames[-1], subscription)))
+    assert output.messages[-1] == expected
+    assert pipeline.errors == 0
@@ -0,0 +1,50 @@
+import numpy as np
+
+from core.natnet_client import decode_frame_of_data
+from core.subscription import DEFAULT_SPACES, Subscription
+from logic.processor import MocapTransformer
+from logic.spaces import get_kernel
+from natnet_synth import NatNetSynthesizer
+
+
+def raw_frames(count, seed=4):
+    synth = NatNetSynthesizer(rigid_bodies=5, skeletons=2, bones=6, seed=seed)
+    return [decode_frame_of_data(packet) for packet in synth.packets(count)]
+
+
+def test_default_spaces_without_demand():
+    processed = MocapTransformer().process_frame(raw_frames(1)[0])
+    assert tuple(processed.spaces) == DEFAULT_SPACES
+    assert processed.subject_names == ["RB_1", "RB_2", "RB_3", "RB_4", "RB_5", "SK_1", "SK_2"]
+
+
+def test_kernels_match_per_space_reference():
+    raw = raw_frames(1)[0]
+    spaces = ("unreal", "maya", "blender", "unity", "raw")
+    processed = MocapTransformer().process_frame(raw, Subscription(spaces=spaces))
+    for space in spaces:
+        pos, rot = get_kernel(space).apply(raw.positions, raw.rotations)
+        assert np.array_equal(processed.spaces[space][0], pos)
+        assert np.array_equal(processed.spaces[space][1], rot)
+
+
+def test_output_buffers_rotate():
+    transformer = MocapTransformer(buffer_depth=3)
+    demand = Subscription(spaces=("unreal",))
+    outputs = [transformer.process_frame(raw, demand) for raw in raw_frames(4)]
+    first, _, _, fourth = (o.spaces["unreal"][0] for o in outputs)
+    # Cada frame es válido durante las depth - 1 llamadas siguientes; luego se reutiliza su juego
+    assert not np.shares_memory(first, outputs[1].spaces["unreal"][0])
+    assert not np.shares_memory(first, outputs[2].spaces["unreal"][0])
+    assert np.shares_memory(first, fourth)
+
+
+def test_demand_selects_subjects_before_transforming():
+    raw = raw_frames(1)[0]
+    processed = MocapTransformer().process_frame(raw, Subscription(["RB_2", "SK_2"], spaces=("maya",)))
+    assert processed.subject_names == ["RB_2", "SK_2"]
+    assert processed.subject_offsets.tolist() == [0, 1, 7]
+    rows = [1] + list(range(11, 17))
+    expected, _ = get_kernel("maya").apply(raw.positions[rows], raw.rotations[rows])
+    assert np.array_equal(processed.spaces["maya"][0], expected)
+    assert processed.subject_ids.tolist() == [2, 2]
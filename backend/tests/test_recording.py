@@ -0,0 +1,186 @@
+import os
+
+import numpy as np
+import pytest
+
+from core.frame import RIGID_BODY_DTYPE
+from core.natnet_client import decode_frame_of_data, parse_timecode
+from core.recording import (CAPTURE_MAGIC, CAPTURE_MODES, INDEX_DTYPE, CaptureReader, CaptureRecorder,
+                            _FILE_HEADER, _FRAME_HEADER_V1, _INDEX_HEADER, _RECORD, INDEX_MAGIC, INDEX_VERSION,
+                            _index_path)
+from natnet_synth import NatNetSynthesizer
+
+RATE = 120.0
+
+
+def packets(count, marker_sets=0):
+    synth = NatNetSynthesizer(rigid_bodies=3, skeletons=2, bones=4, marker_sets=marker_sets, seed=4)
+    synth.params = 0x02
+    return list(synth.packets(count, first_frame=10, rate=RATE))
+
+
+def record(path, mode, count, marker_sets=0):
+    recorder = CaptureRecorder(path, mode=mode)
+    recorder.start()
+    decoded = []
+    for i, packet in enumerate(packets(count, marker_sets)):
+        frame = decode_frame_of_data(packet, True)
+        frame.received_at = 100.0 + i / RATE
+        frame.timecode, frame.timecode_sub = 0x01020304 + i, 7
+        recorder.on_packet(packet, frame)
+        decoded.append(frame)
+    recorder.stop()
+    assert recorder.frames_written == count
+    return decoded
+
+
+def assert_same_frame(copy, frame):
+    assert copy.frame_number == frame.frame_number
+    for name in ("ids", "positions", "rotations", "errors", "skeleton_ids", "skeleton_offsets"):
+        assert np.array_equal(getattr(copy, name), getattr(frame, name)), name
+    assert copy.rigid_body_count == frame.rigid_body_count
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "toma.ycap")
+
+
+def test_frames_round_trip_keeps_header_fields(path):
+    frames = record(path, "frames", 5)
+    reader = CaptureReader(path)
+    try:
+        assert (reader.mode, reader.version, len(reader)) == ("frames", 2, 5)
+        for position, frame in enumerate(frames):
+            copy = reader.frame(position)
+            assert_same_frame(copy, frame)
+            assert (copy.timestamp, copy.params, copy.timecode, copy.timecode_sub) == \
+                (frame.timestamp, frame.params, frame.timecode, frame.timecode_sub)
+    finally:
+        reader.close()
+
+
+def test_raw_round_trip_decodes_markers_on_demand(path):
+    frames = record(path, "raw", 3, marker_sets=2)
+    reader = CaptureReader(path)
+    try:
+        copy = reader.frame(2)
+        assert_same_frame(copy, frames[2])
+        assert copy.marker_sets is None
+        reader.decode_markers = True
+        assert reader.frame(2).marker_sets.names == frames[2].marker_sets.names
+    finally:
+        reader.close()
+
+
+def test_reads_v1_frames_capture(path):
+    frame = decode_frame_of_data(packets(1)[0])
+    rows = np.empty(frame.row_count, dtype=RIGID_BODY_DTYPE)
+    rows["id"], rows["pos"], rows["rot"], rows["err"] = frame.ids, frame.positions, frame.rotations, frame.errors
+    payload = b"".join((
+        _FRAME_HEADER_V1.pack(frame.rigid_body_count, frame.skeleton_count, frame.row_count),
+        frame.skeleton_ids.astype("<u4").tobytes(),
+        frame.skeleton_offsets.astype("<i8").tobytes(),
+        rows.tobytes(),
+    ))
+    with open(path, "wb") as f:
+        f.write(_FILE_HEADER.pack(CAPTURE_MAGIC, 1, CAPTURE_MODES["frames"], 0.0))
+        f.write(_RECORD.pack(len(payload), frame.frame_number, 0.0))
+        f.write(payload)
+
+    reader = CaptureReader(path)
+    try:
+        assert reader.version == 1
+        copy = reader.frame(0)
+        assert_same_frame(copy, frame)
+        assert (copy.timestamp, copy.params, copy.timecode) == (0.0, 0, 0)
+        with pytest.raises(ValueError):
+            reader.position_of_timecode(*parse_timecode("00:00:01:00"))
+    finally:
+        reader.close()
+
+
+def test_missing_index_is_rebuilt(path):
+    record(path, "frames", 4)
+    with open(_index_path(path), "rb") as f:
+        expected = np.frombuffer(f.read(), dtype=INDEX_DTYPE, offset=_INDEX_HEADER.size)
+    os.remove(_index_path(path))
+
+    reader = CaptureReader(path)
+    try:
+        assert np.array_equal(reader.index, expected)
+    finally:
+        reader.close()
+    with open(_index_path(path), "rb") as f:
+        assert f.read(4) == INDEX_MAGIC
+
+
+def test_truncated_record_is_ignored(path):
+    record(path, "frames", 4)
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 10)
+
+    reader = CaptureReader(path)
+    try:
+        assert len(reader) == 3
+    finally:
+        reader.close()
+
+
+def test_seek_by_frame_and_time(path):
+    record(path, "frames", 10)
+    reader = CaptureReader(path)
+    try:
+        assert reader.position_of_frame(10) == 0
+        assert reader.position_of_frame(14) == 4
+        assert reader.position_of_frame(1000) == 9
+        assert reader.position_of_time(0.0) == 0
+        assert reader.position_of_time(3.5 / RATE) == 3
+        assert reader.position_of_time(60.0) == 9
+        assert reader.duration == pytest.approx(9 / RATE)
+    finally:
+        reader.close()
+
+
+def test_seek_by_timecode(path):
+    record(path, "frames", 10)
+    reader = CaptureReader(path)
+    try:
+        assert reader.index["timecode"][0] == 0x01020304
+        assert reader.position_of_timecode(*parse_timecode("01:02:03:04")) == 0
+        assert reader.position_of_timecode(*parse_timecode("01:02:03:08")) == 4
+        assert reader.position_of_timecode(*parse_timecode("01:02:03:08.8")) == 5
+        assert reader.position_of_timecode(*parse_timecode("02:00:00:00")) == 9
+    finally:
+        reader.close()
+
+
+def test_rebuilt_raw_index_reads_timecode_from_packets(path):
+    record(path, "raw", 5)
+    os.remove(_index_path(path))
+    reader = CaptureReader(path)
+    try:
+        # El sintetizador pone timecode = frame_number
+        assert reader.index["timecode"].tolist() == [10, 11, 12, 13, 14]
+        assert reader.position_of_timecode(12) == 2
+    finally:
+        reader.close()
+
+
+def test_index_without_timecode_is_rebuilt(path):
+    record(path, "frames", 3)
+    with open(_index_path(path), "rb") as f:
+        current = np.frombuffer(f.read(), dtype=INDEX_DTYPE, offset=_INDEX_HEADER.size)
+    # Índice v2: mismas entradas sin las columnas de timecode
+    with open(_index_path(path), "wb") as f:
+        f.write(_INDEX_HEADER.pack(INDEX_MAGIC, 2))
+        f.write(current[["offset", "frame_number", "length", "time"]].astype(
+            [("offset", "<u8"), ("frame_number", "<u4"), ("length", "<u4"), ("time", "<f8")]).tobytes())
+
+    reader = CaptureReader(path)
+    try:
+        assert np.array_equal(reader.index, current)
+    finally:
+        reader.close()
+    with open(_index_path(path), "rb") as f:
+        assert _INDEX_HEADER.unpack(f.read(_INDEX_HEADER.size)) == (INDEX_MAGIC, INDEX_VERSION)
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from core.frame import ProcessedFrame, SUBJECT_RIGID_BODY
+from logic.resampler import FrameResampler, interpolate_frames, slerp
+
+
+def axis_angle(axis, angle):
+    axis = np.asarray(axis, dtype=np.float64) / np.linalg.norm(axis)
+    return np.array([[*(axis * np.sin(angle / 2)), np.cos(angle / 2)]], dtype=np.float32)
+
+
+# Timestamp de Motive distinto de 0: con 0 el resampler usaría el instante de recepción
+T0 = 10.0
+
+
+def make_frame(number, timestamp, x=0.0, angle=0.0):
+    pos = np.array([[x, 0.0, 0.0]], dtype=np.float32)
+    rot = axis_angle((0, 0, 1), angle)
+    return ProcessedFrame(number, timestamp, ["RB_1"], np.array([SUBJECT_RIGID_BODY], dtype=np.uint8),
+                          np.array([0, 1], dtype=np.int64), {"raw": (pos, rot)})
+
+
+def run(resampler, rate_in, count):
+    out = []
+    for i in range(count):
+        out.extend(resampler.push(make_frame(i, T0 + i / rate_in, x=float(i))))
+    return out
+
+
+def test_slerp_endpoints_and_midpoint():
+    q0, q1 = axis_angle((0, 0, 1), 0.0), axis_angle((0, 0, 1), np.pi / 2)
+    assert np.allclose(slerp(q0, q1, 0.0), q0, atol=1e-6)
+    assert np.allclose(slerp(q0, q1, 1.0), q1, atol=1e-6)
+    assert np.allclose(slerp(q0, q1, 0.5), axis_angle((0, 0, 1), np.pi / 4), atol=1e-6)
+
+
+def test_slerp_takes_short_path():
+    q0, q1 = axis_angle((0, 1, 0), 0.1), axis_angle((0, 1, 0), 0.3)
+    mid = slerp(q0, -q1, 0.5)
+    # -q1 es la misma rotación: el resultado es la media (salvo signo)
+    assert np.allclose(np.abs(mid), np.abs(axis_angle((0, 1, 0), 0.2)), atol=1e-6)
+    assert np.allclose(np.linalg.norm(mid, axis=1), 1.0)
+
+
+def test_interpolate_frames():
+    f0, f1 = make_frame(1, 0.0, x=0.0, angle=0.0), make_frame(2, 0.1, x=10.0, angle=1.0)
+    mid = interpolate_frames(f0, f1, 0.25, 0.025)
+    pos, rot = mid.spaces["raw"]
+    assert pos[0, 0] == pytest.approx(2.5)
+    assert np.allclose(rot, axis_angle((0, 0, 1), 0.25), atol=1e-6)
+    assert mid.frame_number == 2 and mid.timestamp == 0.025
+
+
+def test_decimate_keeps_rate():
+    out = run(FrameResampler(60, "decimate"), 240, 240)
+    assert len(out) == pytest.approx(60, abs=1)
+    numbers = [f.frame_number for f in out]
+    assert set(np.diff(numbers)) == {4}
+
+
+def test_interpolate_downsample_ticks():
+    out = run(FrameResampler(100, "interpolate"), 240, 241)
+    assert len(out) == pytest.approx(100, abs=1)
+    times = np.array([f.timestamp for f in out])
+    assert np.allclose(np.diff(times), 0.01, atol=1e-9)
+    # Posición lineal en el tiempo: x = t * 240
+    xs = np.array([f.spaces["raw"][0][0, 0] for f in out])
+    assert np.allclose(xs, (times - T0) * 240, atol=1e-3)
+
+
+def test_interpolate_upsample():
+    out = run(FrameResampler(240, "interpolate"), 60, 61)
+    assert len(out) == pytest.approx(241, abs=1)
+    xs = np.array([f.spaces["raw"][0][0, 0] for f in out])
+    assert np.allclose(np.diff(xs), 0.25, atol=1e-4)
+
+
+def test_time_going_backwards_resets():
+    resampler = FrameResampler(60, "interpolate")
+    run(resampler, 120, 30)
+    out = resampler.push(make_frame(0, T0))
+    assert len(out) == 1 and out[0].frame_number == 0
+
+
+def test_long_gap_resets():
+    resampler = FrameResampler(60, "interpolate")
+    resampler.push(make_frame(0, T0))
+    out = resampler.push(make_frame(1, T0 + 1.0, x=100.0))
+    assert len(out) == 1 and out[0].spaces["raw"][0][0, 0] == 100.0
+
+
+def test_retained_frame_survives_buffer_reuse():
+    resampler = FrameResampler(240, "interpolate")
+    first = make_frame(0, T0)
+    resampler.push(first)
+    # El transformer reutiliza sus buffers: el resampler debe haber copiado el frame anterior
+    first.spaces["raw"][0][:] = 1000.0
+    out = resampler.push(make_frame(1, T0 + 1 / 120, x=1.0))
+    assert out[0].spaces["raw"][0][0, 0] == pytest.approx(0.5)
+
+
+def test_received_at_without_timestamp():
+    resampler = FrameResampler(60, "decimate")
+    out = []
+    for i in range(120):
+        frame = make_frame(i, 0.0)
+        frame.received_at = T0 + i / 120
+        out.extend(resampler.push(frame))
+    assert len(out) == pytest.approx(60, abs=1)
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        FrameResampler(0)
+    with pytest.raises(ValueError):
+        FrameResampler(60, "cubic")
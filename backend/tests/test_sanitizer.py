@@ -0,0 +1,90 @@
+import numpy as np
+
+from bench_decode import build_frame_packet
+from core.natnet_client import decode_frame_of_data
+from logic.processor import FrameSanitizer
+
+NULL_ROTATION = [0.0, 0.0, 0.0, 1.0]
+
+
+def frame(number=1, rigid_bodies=3, skeletons=1, bones=4, bad_rows=()):
+    raw = decode_frame_of_data(build_frame_packet(number, rigid_bodies, skeletons, bones))
+    raw.positions[list(bad_rows)] = np.nan
+    return raw
+
+
+def subject_offsets(raw):
+    return np.concatenate((np.arange(raw.rigid_body_count), raw.skeleton_offsets))
+
+
+def sanitize(sanitizer, raw, now):
+    return sanitizer.sanitize(raw, subject_offsets(raw), {}, now)
+
+
+def test_clean_frame_is_not_copied():
+    raw = frame()
+    positions, rotations, fresh = sanitize(FrameSanitizer(), raw, 0.0)
+    assert positions is raw.positions and rotations is raw.rotations
+    assert fresh.all() and len(fresh) == 4
+
+
+def test_occluded_row_holds_last_pose():
+    sanitizer = FrameSanitizer()
+    first = frame(1)
+    sanitize(sanitizer, first, 0.0)
+    second = frame(2, bad_rows=[1, 5])
+    positions, rotations, fresh = sanitize(sanitizer, second, 0.01)
+    assert np.array_equal(positions[[1, 5]], first.positions[[1, 5]])
+    assert np.array_equal(rotations[[1, 5]], first.rotations[[1, 5]])
+    assert np.array_equal(positions[[0, 2, 3]], second.positions[[0, 2, 3]])
+    assert fresh.tolist() == [True, False, True, False]
+    assert sanitizer.held_rows == 2 and sanitizer.null_rows == 0
+
+
+def test_never_seen_row_gets_null_pose():
+    sanitizer = FrameSanitizer()
+    positions, rotations, fresh = sanitize(sanitizer, frame(bad_rows=[0]), 0.0)
+    assert positions[0].tolist() == [0.0, 0.0, 0.0]
+    assert rotations[0].tolist() == NULL_ROTATION
+    assert np.isfinite(positions).all()
+    assert sanitizer.null_rows == 1
+
+
+def test_hold_expires_after_max_hold():
+    sanitizer = FrameSanitizer(max_hold=0.1)
+    sanitize(sanitizer, frame(1), 0.0)
+    held, _, _ = sanitize(sanitizer, frame(2, bad_rows=[2]), 0.05)
+    assert held[2].tolist() != [0.0, 0.0, 0.0]
+    expired, rotations, _ = sanitize(sanitizer, frame(3, bad_rows=[2]), 0.2)
+    assert expired[2].tolist() == [0.0, 0.0, 0.0]
+    assert rotations[2].tolist() == NULL_ROTATION
+
+
+def test_hold_follows_ids_across_layout_changes():
+    sanitizer = FrameSanitizer()
+    first = frame(1, rigid_bodies=3, skeletons=0, bones=0)
+    sanitize(sanitizer, first, 0.0)
+    # Motive deja de enviar el RB 1: el RB 3 pasa a otra fila pero conserva su slot
+    second = frame(2, rigid_bodies=3, skeletons=0, bones=0)
+    second.ids[:] = [2, 3, 4]
+    second.positions[1] = np.nan
+    positions, _, _ = sanitize(sanitizer, second, 0.01)
+    assert np.array_equal(positions[1], first.positions[2])
+    assert sanitizer.stats()["tracked_slots"] == 4
+
+
+def test_bones_of_different_skeletons_do_not_share_slots():
+    sanitizer = FrameSanitizer()
+    first = frame(1, rigid_bodies=0, skeletons=2, bones=2)
+    sanitize(sanitizer, first, 0.0)
+    positions, _, _ = sanitize(sanitizer, frame(2, rigid_bodies=0, skeletons=2, bones=2, bad_rows=[2]), 0.01)
+    assert np.array_equal(positions[2], first.positions[2])
+    assert not np.array_equal(positions[2], first.positions[0])
+
+
+def test_slots_grow_beyond_capacity():
+    sanitizer = FrameSanitizer(capacity=4)
+    first = frame(1, rigid_bodies=10, skeletons=0, bones=0)
+    sanitize(sanitizer, first, 0.0)
+    positions, _, _ = sanitize(sanitizer, frame(2, rigid_bodies=10, skeletons=0, bones=0, bad_rows=[9]), 0.01)
+    assert np.array_equal(positions[9], first.positions[9])
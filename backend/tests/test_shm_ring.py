@@ -0,0 +1,199 @@
+import multiprocessing
+import queue
+
+import numpy as np
+import pytest
+
+from core.natnet_client import decode_frame_of_data
+from core.shm_ring import MESSAGE_MISSING, FrameFanout, ProcessedFrameRing, SharedFrameRing
+from core.subscription import Subscription
+from logic.processor import MocapTransformer
+from natnet_synth import NatNetSynthesizer
+
+
+def frames(count, seed=6):
+    synth = NatNetSynthesizer(rigid_bodies=3, skeletons=2, bones=4, seed=seed)
+    synth.params = 0x02
+    return [decode_frame_of_data(packet) for packet in synth.packets(count)]
+
+
+def write_frames(ring, count):
+    for frame in frames(count):
+        frame.received_at, frame.decoded_at = 1.0, 1.5
+        ring.put_nowait(frame)
+    ring.close()
+
+
+def make_ring(policy="latest", slot_count=4):
+    return SharedFrameRing(slot_count=slot_count, max_rows=64, max_skeletons=4, policy=policy)
+
+
+def release(*rings):
+    for ring in rings:
+        ring.close()
+        ring.unlink()
+
+
+@pytest.fixture
+def ring():
+    ring = make_ring()
+    yield ring
+    release(ring)
+
+
+def assert_same_frame(copy, frame):
+    assert copy.frame_number == frame.frame_number
+    for name in ("ids", "positions", "rotations", "errors", "skeleton_ids", "skeleton_offsets"):
+        assert np.array_equal(getattr(copy, name), getattr(frame, name)), name
+    assert copy.rigid_body_count == frame.rigid_body_count
+    assert (copy.timestamp, copy.params, copy.timecode, copy.timecode_sub) == \
+        (frame.timestamp, frame.params, frame.timecode, frame.timecode_sub)
+
+
+def test_round_trip(ring):
+    (frame,) = frames(1)
+    ring.put_nowait(frame)
+    assert_same_frame(ring.get(timeout=1.0), frame)
+    with pytest.raises(queue.Empty):
+        ring.get_nowait()
+
+
+def test_reader_gets_latest(ring):
+    sent = frames(6)
+    for frame in sent:
+        ring.put_nowait(frame)
+    assert_same_frame(ring.get_nowait(), sent[-1])
+    stats = ring.stats()
+    assert stats["produced"] == 6 and stats["consumed"] == 1 and stats["overwritten"] == 5
+
+
+def test_oversized_frame_is_dropped(ring):
+    synth = NatNetSynthesizer(rigid_bodies=80, skeletons=0)
+    ring.put_nowait(decode_frame_of_data(synth.build_packet(1)))
+    assert ring.stats()["dropped"] == 1
+    assert ring.empty()
+
+
+def test_attach_by_name(ring):
+    reader = SharedFrameRing(name=ring.name, create=False)
+    try:
+        (frame,) = frames(1)
+        ring.put_nowait(frame)
+        assert_same_frame(reader.get_nowait(), frame)
+    finally:
+        reader.close()
+
+
+def test_torn_slot_is_discarded(ring):
+    (frame,) = frames(1)
+    ring.put_nowait(frame)
+    # El escritor dio la vuelta mientras se leía: el seq del slot ya no es el esperado
+    ring._slots[0].header["seq"] = 99
+    with pytest.raises(queue.Empty):
+        ring.get_nowait()
+    assert ring.stats()["torn_reads"] == 1
+    # El siguiente frame publicado se lee con normalidad
+    second = frames(2)[1]
+    ring.put_nowait(second)
+    assert_same_frame(ring.get_nowait(), second)
+
+
+def test_writer_in_another_process(ring):
+    process = multiprocessing.get_context("spawn").Process(target=write_frames, args=(ring, 3))
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+    copy = ring.get(timeout=1.0)
+    assert_same_frame(copy, frames(3)[-1])
+    assert (copy.received_at, copy.decoded_at) == (1.0, 1.5)
+
+
+def test_fifo_reads_in_order_and_drops_incoming_when_full():
+    ring = make_ring("fifo")
+    try:
+        sent = frames(6)
+        accepted = [ring.put_nowait(frame) for frame in sent]
+        assert accepted == [True] * 4 + [False] * 2
+        assert [ring.get_nowait().frame_number for _ in range(4)] == [0, 1, 2, 3]
+        assert ring.last_seq == 3
+        assert ring.put_nowait(sent[4])
+        assert_same_frame(ring.get_nowait(), sent[4])
+        stats = ring.stats()
+        assert (stats["dropped"], stats["overwritten"], stats["consumed"]) == (2, 0, 5)
+    finally:
+        release(ring)
+
+
+def test_drop_oldest_skips_to_oldest_valid_frame():
+    ring = make_ring("drop_oldest")
+    try:
+        for frame in frames(7):
+            assert ring.put_nowait(frame)
+        # El escritor dio casi dos vueltas: quedan los 4 últimos, en orden
+        assert [ring.get_nowait().frame_number for _ in range(4)] == [3, 4, 5, 6]
+        assert ring.stats()["overwritten"] == 3
+        assert ring.empty()
+    finally:
+        release(ring)
+
+
+def test_policy_travels_with_the_block():
+    ring = make_ring("fifo")
+    reader = SharedFrameRing(name=ring.name, create=False)
+    try:
+        assert reader.policy == "fifo"
+    finally:
+        reader.close()
+        release(ring)
+
+
+def test_fanout_round_robin_keeps_global_order():
+    rings = [make_ring("fifo", slot_count=2) for _ in range(2)]
+    fanout = FrameFanout(rings)
+    try:
+        accepted = [fanout.put_nowait(frame) for frame in frames(6)]
+        # Ring 0 lleno tras los frames 0 y 2: el 4 se descarta sin avanzar el turno, el 5 también
+        assert accepted == [True, True, True, True, False, False]
+        order = []
+        for _ in range(2):
+            for index, ring in enumerate(rings):
+                order.append((ring.get_nowait().frame_number, ring.last_seq * 2 + index))
+        assert order == [(0, 0), (1, 1), (2, 2), (3, 3)]
+        assert fanout.stats()["dropped"] == 2
+    finally:
+        release(*rings)
+
+
+def test_processed_ring_round_trip():
+    ring = ProcessedFrameRing(slot_count=2, max_rows=64, max_skeletons=4, max_spaces=2, max_messages=2,
+                              max_message_bytes=16)
+    try:
+        raw = frames(1)[0]
+        processed = MocapTransformer().process_frame(raw, Subscription(["RB_2", "SK_1"], spaces=("unreal",)))
+        assert ring.put(5, raw, processed, [b"abc", b"x" * 20], 3, 1.0, 0.25, 0.5)
+        assert ring.peek() is ring.peek()
+        slot = ring.peek()
+        assert (int(slot.header["global_seq"]), int(slot.header["control_version"])) == (5, 3)
+        layout = slot.layout()
+        assert np.array_equal(layout.ids, raw.ids) and np.array_equal(layout.skeleton_offsets, raw.skeleton_offsets)
+        count = int(slot.header["subject_count"])
+        assert slot.subject_ids[:count].tolist() == processed.subject_ids.tolist()
+        assert slot.subject_offsets[:count + 1].tolist() == processed.subject_offsets.tolist()
+        spaces = slot.spaces()
+        assert list(spaces) == ["unreal"]
+        assert np.array_equal(spaces["unreal"][0], processed.spaces["unreal"][0])
+        assert np.array_equal(spaces["unreal"][1], processed.spaces["unreal"][1])
+        # El segundo mensaje no cabe: queda pendiente para el lector
+        messages = slot.messages()
+        assert bytes(messages[0]) == b"abc" and messages[1] is None
+        assert slot.message_lengths[1] == MESSAGE_MISSING and ring.stats()["oversized_messages"] == 1
+
+        assert ring.put(6, raw, processed, [], 3, 1.0, 0.25, 0.5)
+        assert ring.full() and not ring.put(7, raw, processed, [], 3, 1.0, 0.25, 0.5)
+        ring.release()
+        assert int(ring.peek().header["global_seq"]) == 6
+        ring.finish_input(4)
+        assert ring.done_input == 4
+    finally:
+        ring.close()
+        ring.unlink()
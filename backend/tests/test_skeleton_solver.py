@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from bench_decode import build_frame_packet
+from bench_skeleton import build_descriptions, per_bone_to_local
+from core.natnet_client import decode_frame_of_data
+from core.subscription import Subscription
+from logic.processor import MocapTransformer
+from logic.skeleton_solver import SkeletonSolver, quat_conjugate, quat_multiply, quat_rotate
+
+
+def random_quats(count, seed=0):
+    q = np.random.default_rng(seed).standard_normal((count, 4)).astype(np.float32)
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def rotation_matrix(q):
+    x, y, z, w = q
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ])
+
+
+@pytest.fixture
+def skeleton_frame():
+    frame = decode_frame_of_data(build_frame_packet(1, 3, 4, 9))
+    transformer = MocapTransformer()
+    transformer.descriptions = build_descriptions(4, 9)
+    return frame, transformer.subject_model(frame)
+
+
+def test_quat_ops_match_matrices():
+    a, b = random_quats(8, 1), random_quats(8, 2)
+    v = np.random.default_rng(3).standard_normal((8, 3)).astype(np.float32)
+    ab = quat_multiply(a, b)
+    rotated = quat_rotate(a, v)
+    for i in range(8):
+        assert np.allclose(rotation_matrix(ab[i]), rotation_matrix(a[i]) @ rotation_matrix(b[i]), atol=1e-5)
+        assert np.allclose(rotated[i], rotation_matrix(a[i]) @ v[i], atol=1e-5)
+    identity = quat_multiply(quat_conjugate(a), a)
+    assert np.allclose(np.abs(identity[:, 3]), 1.0, atol=1e-6)
+
+
+def test_to_local_matches_per_bone_loop(skeleton_frame):
+    frame, model = skeleton_frame
+    out_pos, out_rot = np.empty_like(frame.positions), np.empty_like(frame.rotations)
+    SkeletonSolver().to_local(model, frame.positions, frame.rotations, out_pos, out_rot)
+    ref_pos, ref_rot = per_bone_to_local(model, frame.positions, frame.rotations)
+    assert np.allclose(out_pos, ref_pos, atol=1e-5)
+    assert np.allclose(out_rot, ref_rot, atol=1e-6)
+
+
+def test_round_trip(skeleton_frame):
+    frame, model = skeleton_frame
+    solver = SkeletonSolver()
+    local_pos, local_rot = solver.to_local(model, frame.positions, frame.rotations,
+                                           np.empty_like(frame.positions), np.empty_like(frame.rotations))
+    back_pos, back_rot = solver.to_world(model, local_pos, local_rot,
+                                         np.empty_like(local_pos), np.empty_like(local_rot))
+    assert np.allclose(back_pos, frame.positions, atol=1e-4)
+    assert np.allclose(back_rot, frame.rotations, atol=1e-5)
+
+
+def test_rigid_bodies_and_roots_pass_through(skeleton_frame):
+    frame, model = skeleton_frame
+    solver = SkeletonSolver()
+    out_pos, out_rot = solver.to_local(model, frame.positions, frame.rotations,
+                                       np.empty_like(frame.positions), np.empty_like(frame.rotations))
+    hierarchy = solver.hierarchy(model)
+    untouched = hierarchy.parents < 0
+    assert untouched[:3].all()
+    assert np.array_equal(out_pos[untouched], frame.positions[untouched])
+    assert np.array_equal(out_rot[untouched], frame.rotations[untouched])
+    # Árbol binario de 9 huesos (padre de b: b // 2): 3 niveles por debajo de la raíz
+    assert len(hierarchy.levels) == 3
+
+
+def test_skeleton_without_description_passes_through():
+    frame = decode_frame_of_data(build_frame_packet(1, 2, 2, 5))
+    model = MocapTransformer().subject_model(frame)
+    out_pos, out_rot = SkeletonSolver().to_local(model, frame.positions, frame.rotations,
+                                                 np.empty_like(frame.positions), np.empty_like(frame.rotations))
+    assert np.array_equal(out_pos, frame.positions)
+    assert np.array_equal(out_rot, frame.rotations)
+
+
+def test_hierarchy_cached_per_model_revision(skeleton_frame):
+    frame, model = skeleton_frame
+    solver = SkeletonSolver()
+    first = solver.hierarchy(model)
+    assert solver.hierarchy(model) is first
+
+
+def test_process_frame_bone_space_local(skeleton_frame):
+    frame, _ = skeleton_frame
+    native = MocapTransformer()
+    local = MocapTransformer(bone_space="local")
+    native.descriptions = local.descriptions = build_descriptions(4, 9)
+    demand = Subscription(spaces=("raw",))
+    expected, _ = per_bone_to_local(local.subject_model(frame), frame.positions, frame.rotations)
+    assert np.allclose(local.process_frame(frame, demand).spaces["raw"][0], expected, atol=1e-5)
+    assert np.array_equal(native.process_frame(frame, demand).spaces["raw"][0], frame.positions)
+
+
+def test_invalid_bone_space():
+    with pytest.raises(ValueError):
+        MocapTransformer(bone_space="parent")
+    with pytest.raises(ValueError):
+        MocapTransformer(skeleton_input="world")
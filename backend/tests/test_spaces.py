@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from logic.spaces import CoordinateSpace, available_spaces, get_kernel, is_registered, register_space
+from logic.transformer import MoCapTransformer
+
+
+def random_rows(count, seed=0):
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(-2.0, 2.0, (count, 3)).astype(np.float32)
+    rotations = rng.standard_normal((count, 4)).astype(np.float32)
+    rotations /= np.linalg.norm(rotations, axis=1, keepdims=True)
+    return positions, rotations
+
+
+def rotation_matrix(q):
+    x, y, z, w = q.astype(np.float64)
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ])
+
+
+def test_builtin_spaces():
+    assert {"raw", "unreal", "maya", "blender", "unity"} <= set(available_spaces())
+    assert get_kernel("raw").is_identity
+    assert not get_kernel("maya").is_identity
+
+
+def test_unreal_matches_legacy_convention():
+    positions, rotations = random_rows(16)
+    pos, rot = get_kernel("unreal").apply(positions, rotations)
+    assert np.allclose(pos, positions[:, [0, 2, 1]] * 100.0, atol=1e-4)
+    expected = rotations[:, [0, 2, 1, 3]] * np.array([1, 1, 1, -1], dtype=np.float32)
+    assert np.array_equal(rot, expected)
+
+
+@pytest.mark.parametrize("name", ["raw", "unreal", "maya", "blender", "unity"])
+def test_rotations_follow_the_change_of_basis(name):
+    # En el espacio destino la rotación debe ser P R P^T (también con cambio de handedness)
+    positions, rotations = random_rows(8, seed=1)
+    kernel = get_kernel(name)
+    scale = np.abs(kernel.pos_matrix).max()
+    basis = kernel.pos_matrix.T / scale
+    _, rot = kernel.apply(positions, rotations)
+    for source, target in zip(rotations, rot):
+        assert np.allclose(rotation_matrix(target), basis @ rotation_matrix(source) @ basis.T, atol=1e-5)
+
+
+def test_apply_writes_into_buffers():
+    positions, rotations = random_rows(4)
+    out_pos, out_rot = np.empty_like(positions), np.empty_like(rotations)
+    pos, rot = get_kernel("blender").apply(positions, rotations, out_pos, out_rot)
+    assert pos is out_pos and rot is out_rot
+    assert np.allclose(get_kernel("blender").apply_positions(positions), out_pos)
+
+
+def test_register_custom_space():
+    space = CoordinateSpace("test_zup_mm", ("x", "-z", "y"), 1000.0)
+    register_space(space)
+    assert is_registered("test_zup_mm")
+    assert space.handedness == "right"
+    positions, rotations = random_rows(2)
+    pos, _ = get_kernel("test_zup_mm").apply(positions, rotations)
+    assert np.allclose(pos, np.stack([positions[:, 0], -positions[:, 2], positions[:, 1]], axis=1) * 1000.0,
+                       atol=1e-3)
+    with pytest.raises(ValueError):
+        register_space(CoordinateSpace("test_zup_mm"))
+    # Al reemplazarlo se recompila el kernel
+    register_space(CoordinateSpace("test_zup_mm", scale=2.0), replace=True)
+    assert np.allclose(get_kernel("test_zup_mm").apply_positions(positions), positions * 2.0)
+
+
+@pytest.mark.parametrize("axes", [("x", "x", "y"), ("x", "y", "w")])
+def test_invalid_axes(axes):
+    with pytest.raises(ValueError):
+        CoordinateSpace("broken", axes)
+
+
+def test_legacy_transformer_accepts_single_rows():
+    positions, rotations = random_rows(1)
+    pos, rot = MoCapTransformer.motive_to_unreal(positions[0], rotations[0])
+    assert pos.shape == (3,) and rot.shape == (4,)
+    expected_pos, expected_rot = get_kernel("unreal").apply(positions, rotations)
+    assert np.array_equal(pos, expected_pos[0]) and np.array_equal(rot, expected_rot[0])
@@ -0,0 +1,88 @@
+import socket
+
+import pytest
+
+from exporters.stream_server import _ClientSession
+
+
+@pytest.fixture
+def session():
+    local, remote = socket.socketpair()
+    local.setblocking(False)
+    remote.setblocking(False)
+    session = _ClientSession(local, ("127.0.0.1", 0), max_queued_bytes=100)
+    yield session, remote
+    local.close()
+    remote.close()
+
+
+def frame(tag: bytes) -> memoryview:
+    return memoryview(tag.ljust(40, b"."))
+
+
+def enqueue(session, tag, policy="latest", now=0.0, lag_timeout=1.0):
+    return session.enqueue_frame(frame(tag), session.stream_key, now, policy, lag_timeout, received_at=now)
+
+
+def receive(remote) -> bytes:
+    data = b""
+    while True:
+        try:
+            chunk = remote.recv(65536)
+        except BlockingIOError:
+            return data
+        if not chunk:
+            return data
+        data += chunk
+
+
+def test_flush_delivers_in_order(session):
+    session, remote = session
+    session.enqueue_control(b"ack\n")
+    enqueue(session, b"f1")
+    enqueue(session, b"f2")
+    session.flush()
+    assert receive(remote) == b"ack\n" + bytes(frame(b"f1")) + bytes(frame(b"f2"))
+    assert session.frames_sent == 2
+    assert session.queued_bytes == 0 and not session.has_pending
+
+
+def test_latest_keeps_newest_and_control(session):
+    session, remote = session
+    session.enqueue_control(b"ack\n")
+    for tag in (b"f1", b"f2", b"f3", b"f4"):
+        assert enqueue(session, tag)
+    # 40 bytes por frame y 100 de cupo: al llegar f3 se descartan f1 y f2
+    assert session.frames_dropped == 2
+    session.flush()
+    assert receive(remote) == b"ack\n" + bytes(frame(b"f3")) + bytes(frame(b"f4"))
+
+
+def test_decimate_halves_rate_while_behind(session):
+    session, remote = session
+    for tag in (b"f1", b"f2", b"f3"):
+        enqueue(session, tag, "decimate")
+    assert session.decimation == 2
+    assert session.frames_dropped == 1
+    session.flush()
+    receive(remote)
+    # Al vaciarse la cola la decimación se relaja
+    assert session.decimation == 1
+
+
+def test_disconnect_after_lag_timeout(session):
+    session, remote = session
+    assert enqueue(session, b"f1", "disconnect", now=0.0)
+    assert enqueue(session, b"f2", "disconnect", now=0.0)
+    assert enqueue(session, b"f3", "disconnect", now=0.1, lag_timeout=0.5)
+    assert enqueue(session, b"f4", "disconnect", now=0.5, lag_timeout=0.5)
+    assert not enqueue(session, b"f5", "disconnect", now=0.7, lag_timeout=0.5)
+
+
+def test_renegotiated_stream_is_skipped(session):
+    session, remote = session
+    stale_key = session.stream_key
+    session.enqueue_control(b"ack\n", wire_format=("binary", "float32"))
+    assert session.enqueue_frame(frame(b"f1"), stale_key, 0.0, "latest", 1.0)
+    session.flush()
+    assert receive(remote) == b"ack\n"
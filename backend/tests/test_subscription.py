@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from core.natnet_client import decode_frame_of_data
+from core.subscription import Subscription, merge_subscriptions
+from logic.processor import MocapTransformer
+from natnet_synth import NatNetSynthesizer
+
+
+@pytest.fixture
+def frame():
+    synth = NatNetSynthesizer(rigid_bodies=3, skeletons=2, bones=4, seed=2)
+    raw = decode_frame_of_data(synth.build_packet(1, 0.01))
+    return MocapTransformer().process_frame(raw, Subscription(spaces=("unreal", "maya", "raw")))
+
+
+def test_defaults_select_everything(frame):
+    names, kinds, offsets, rows, subjects = Subscription().select(frame.subject_names, frame.subject_kinds,
+                                                                  frame.subject_offsets)
+    assert names == frame.subject_names
+    assert rows is None and subjects is None
+
+
+def test_select_by_name_alias_and_id(frame):
+    sub = Subscription(["RB_2", "SK_1", 3])
+    filtered = sub.apply(frame)
+    assert filtered.subject_names == ["RB_2", "RB_3", "SK_1"]
+    assert filtered.subject_offsets.tolist() == [0, 1, 2, 6]
+    assert np.array_equal(filtered.spaces["unreal"][0], frame.spaces["unreal"][0][[1, 2, 3, 4, 5, 6]])
+
+
+def test_bone_subset(frame):
+    filtered = Subscription(["SK_2"], bones=[0, 2, 9]).apply(frame)
+    assert filtered.subject_names == ["SK_2"]
+    # Los índices fuera de rango se ignoran
+    assert filtered.subject_offsets.tolist() == [0, 2]
+    pos = frame.spaces["maya"][0]
+    assert np.array_equal(filtered.spaces["maya"][0], pos[[7, 9]])
+
+
+def test_apply_keeps_requested_spaces_only(frame):
+    filtered = Subscription(spaces=["raw"]).apply(frame)
+    assert list(filtered.spaces) == ["raw"]
+
+
+def test_from_request():
+    sub = Subscription.from_request({"subjects": ["SK_1"], "bones": [1, 0, 1], "spaces": "unreal",
+                                     "markers": True, "rate": 60})
+    assert sub.subjects == frozenset({"SK_1"})
+    assert sub.bones == (0, 1)
+    assert sub.spaces == ("unreal",)
+    assert sub.markers
+    assert sub.rate_key == (60.0, "interpolate")
+
+
+@pytest.mark.parametrize("request_", [
+    {"spaces": []},
+    {"spaces": ["nowhere"]},
+    {"rate": 0},
+    {"rate": 30, "resample": "cubic"},
+    {"bones": 3},
+])
+def test_invalid_requests(request_):
+    with pytest.raises(ValueError):
+        Subscription.from_request(request_)
+
+
+def test_key_is_shared_by_equal_subscriptions():
+    a = Subscription(["SK_1", "RB_1"], spaces=("unreal",))
+    b = Subscription(["RB_1", "SK_1"], spaces=("unreal", "unreal"))
+    assert a.key == b.key
+    assert a.key != Subscription(["RB_1"], spaces=("unreal",)).key
+
+
+def test_merge_unions_subjects_spaces_and_markers():
+    merged = merge_subscriptions([
+        Subscription(["RB_1"], bones=[0], spaces=("unreal",)),
+        Subscription(["SK_1"], spaces=("maya",), markers=True),
+    ])
+    assert merged.subjects == frozenset({"RB_1", "SK_1"})
+    assert merged.spaces == ("unreal", "maya")
+    assert merged.markers
+    # Los huesos los recorta cada cliente al serializar
+    assert merged.bones is None
+
+
+def test_merge_with_unfiltered_client_selects_all():
+    merged = merge_subscriptions([Subscription(["RB_1"]), Subscription()])
+    assert merged.subjects is None
+    assert merge_subscriptions([]) is None
+
+
+def test_demand_restricts_processing(frame):
+    synth = NatNetSynthesizer(rigid_bodies=3, skeletons=2, bones=4, seed=2)
+    raw = decode_frame_of_data(synth.build_packet(1, 0.01))
+    demand = merge_subscriptions([Subscription(["RB_3"], spaces=("unreal",)), Subscription(["SK_2"], spaces=("unreal",))])
+    processed = MocapTransformer().process_frame(raw, demand)
+    assert processed.subject_names == ["RB_3", "SK_2"]
+    assert list(processed.spaces) == ["unreal"]
+    assert np.allclose(processed.spaces["unreal"][0], frame.spaces["unreal"][0][[2, 7, 8, 9, 10]])
@@ -0,0 +1,144 @@
+import random
+import struct
+
+import numpy as np
+import pytest
+
+from core.natnet_client import decode_frame_of_data
+from core.subscription import Subscription
+from exporters.udp_sender import DatagramReassembler, DatagramStreamer, parse_target
+from logic.processor import MocapTransformer
+from natnet_synth import NatNetSynthesizer
+from test_wire_format import parse_ycap
+
+
+class CaptureSocket:
+    """Sustituto del socket UDP: guarda los datagramas en lugar de enviarlos."""
+    def __init__(self):
+        self.datagrams = []
+
+    def sendto(self, data, address):
+        self.datagrams.append(bytes(data))
+
+    def close(self):
+        pass
+
+
+def make_streamer(payload_size=200, request=None):
+    streamer = DatagramStreamer([("127.0.0.1", 9000)], request or {"format": "binary", "spaces": ["unreal"]},
+                                payload_size=payload_size)
+    streamer._socket = CaptureSocket()
+    streamer._addresses = [("127.0.0.1", 9000)]
+    return streamer
+
+
+def fragments(streamer, message):
+    sock = streamer._socket
+    sock.datagrams.clear()
+    streamer._send(message)
+    return list(sock.datagrams)
+
+
+def test_parse_target():
+    assert parse_target("239.0.0.1:7000") == ("239.0.0.1", 7000)
+    with pytest.raises(ValueError):
+        parse_target("7000")
+
+
+def test_single_fragment():
+    streamer = make_streamer()
+    reassembler = DatagramReassembler()
+    (datagram,) = fragments(streamer, b"\0\0\0\0hello")
+    assert reassembler.feed(datagram) == b"hello"
+
+
+def test_fragments_in_any_order():
+    streamer = make_streamer(payload_size=10)
+    message = bytes(range(256)) * 2
+    parts = fragments(streamer, b"\0\0\0\0" + message)
+    assert len(parts) == -(-len(message) // 10)
+    random.Random(1).shuffle(parts)
+    reassembler = DatagramReassembler()
+    results = [reassembler.feed(part) for part in parts]
+    assert results[:-1] == [None] * (len(parts) - 1)
+    assert results[-1] == message
+
+
+def test_duplicate_fragment_is_ignored():
+    streamer = make_streamer(payload_size=4)
+    parts = fragments(streamer, b"\0\0\0\0abcdefgh")
+    reassembler = DatagramReassembler()
+    assert reassembler.feed(parts[0]) is None
+    assert reassembler.feed(parts[0]) is None
+    assert reassembler.feed(parts[1]) == b"abcdefgh"
+
+
+def test_stale_messages_are_dropped():
+    streamer = make_streamer(payload_size=4)
+    old = fragments(streamer, b"\0\0\0\0oldmsg!!")
+    new = fragments(streamer, b"\0\0\0\0new!")
+    reassembler = DatagramReassembler()
+    assert reassembler.feed(old[0]) is None
+    assert reassembler.feed(new[0]) == b"new!"
+    # El mensaje viejo ya no se entregará: se abandona y sus fragmentos tardíos se descartan
+    assert reassembler.incomplete == 1
+    assert reassembler.feed(old[1]) is None
+    assert reassembler.stale == 1
+
+
+def test_pending_limit():
+    streamer = make_streamer(payload_size=4)
+    reassembler = DatagramReassembler(max_pending=2)
+    firsts = [fragments(streamer, b"\0\0\0\0" + bytes([i]) * 8)[0] for i in range(3)]
+    for part in firsts:
+        assert reassembler.feed(part) is None
+    assert len(reassembler._pending) == 2
+    assert reassembler.incomplete == 1
+
+
+def test_sequence_wraps_around():
+    streamer = make_streamer()
+    streamer._sequence = 0xFFFFFFFF - 1
+    reassembler = DatagramReassembler()
+    assert reassembler.feed(fragments(streamer, b"\0\0\0\0a")[0]) == b"a"
+    assert reassembler.feed(fragments(streamer, b"\0\0\0\0b")[0]) == b"b"
+    assert streamer._sequence == 0
+    assert reassembler.feed(fragments(streamer, b"\0\0\0\0c")[0]) == b"c"
+
+
+def test_rejects_foreign_and_corrupt_datagrams():
+    streamer = make_streamer()
+    (datagram,) = fragments(streamer, b"\0\0\0\0hello")
+    reassembler = DatagramReassembler()
+    assert reassembler.feed(b"XXXX" + datagram[4:]) is None
+    assert reassembler.feed(datagram[:10]) is None
+    assert reassembler.feed(datagram[:-1]) is None # Longitud distinta de la anunciada
+    assert reassembler.feed(datagram) == b"hello"
+
+
+def test_broadcast_round_trip():
+    streamer = make_streamer(payload_size=300)
+    synth = NatNetSynthesizer(rigid_bodies=4, skeletons=2, bones=20, seed=5)
+    frame = MocapTransformer().process_frame(decode_frame_of_data(synth.build_packet(3, 0.05)),
+                                             Subscription(spaces=("unreal",)))
+    streamer.broadcast(frame)
+    reassembler = DatagramReassembler()
+    messages = [m for m in map(reassembler.feed, streamer._socket.datagrams) if m is not None]
+    # Primero el modelo y luego el frame (sin el prefijo de longitud de TCP)
+    assert len(messages) == 2
+    assert messages[0][:4] == b"YMDL"
+    decoded = parse_ycap(struct.pack("<I", len(messages[1])) + messages[1])
+    assert decoded["frame_number"] == 3
+    assert np.array_equal(decoded["spaces"]["unreal"][0], frame.spaces["unreal"][0])
+    assert streamer.frames_sent == 1
+
+
+def test_json_keeps_whole_line():
+    streamer = make_streamer(request={"format": "json"})
+    (datagram,) = fragments(streamer, b'{"a": 1}\n')
+    assert DatagramReassembler().feed(datagram) == b'{"a": 1}\n'
+
+
+def test_delta_is_not_supported():
+    with pytest.raises(ValueError):
+        DatagramStreamer([("127.0.0.1", 9000)], {"format": "delta"})
@@ -0,0 +1,165 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+
+from core.natnet_client import decode_frame_of_data
+from core.subscription import Subscription
+from exporters.wire_format import (BinaryFrameEncoder, JsonFrameEncoder, MODEL_MAGIC, WIRE_MAGIC, WIRE_VERSION,
+                                   encode_model, parse_format_request)
+from logic.processor import MocapTransformer
+from natnet_synth import NatNetSynthesizer
+
+SPACES = ("unreal", "maya")
+_WIDTH = {0: "<f4", 1: "<f2", 2: "<i2"}
+
+
+def make_frame(markers=False, nan_rate=0.0):
+    synth = NatNetSynthesizer(rigid_bodies=3, skeletons=2, bones=5, marker_sets=2 if markers else 0,
+                              markers_per_set=4, nan_rate=nan_rate, seed=1)
+    raw = decode_frame_of_data(synth.build_packet(12, 0.1), decode_markers=markers)
+    return MocapTransformer().process_frame(raw, Subscription(spaces=SPACES, markers=markers))
+
+
+def parse_ycap(message: bytes) -> dict:
+    """Lector de referencia del mensaje YCAP (layout documentado en wire_format)."""
+    length = struct.unpack_from("<I", message)[0]
+    assert length == len(message) - 4
+    body = memoryview(message)[4:]
+    magic, version, precision, subject_count, frame_number, timestamp, row_count = \
+        struct.unpack_from("<4sBBHIdI", body)
+    offset = struct.calcsize("<4sBBHIdI")
+    spaces = []
+    for _ in range(body[offset]):
+        size = body[offset + 1]
+        spaces.append(bytes(body[offset + 2:offset + 2 + size]).decode())
+        offset += 1 + size
+    offset += 1
+    subjects = []
+    for _ in range(subject_count):
+        kind, count, size = struct.unpack_from("<BHB", body, offset)
+        offset += 4
+        subjects.append((bytes(body[offset:offset + size]).decode(), kind, count))
+        offset += size
+    fresh_size = -(-subject_count // 8)
+    fresh = np.unpackbits(np.frombuffer(body, np.uint8, fresh_size, offset), bitorder="little")[:subject_count]
+    offset += fresh_size
+
+    dtype = np.dtype(_WIDTH[precision])
+
+    def read(count, width, scaled):
+        nonlocal offset
+        scale = 1.0
+        if precision == 2 and scaled:
+            scale = struct.unpack_from("<f", body, offset)[0]
+            offset += 4
+        values = np.frombuffer(body, dtype, count * width, offset).astype(np.float32).reshape(count, width)
+        offset += count * width * dtype.itemsize
+        if precision == 2:
+            values = values * scale if scaled else values / 32767.0
+        return values
+
+    data = {}
+    for space in spaces:
+        pos = read(row_count, 3, True)
+        data[space] = (pos, read(row_count, 4, False))
+
+    marker_sets, markers = [], {}
+    marker_set_count = struct.unpack_from("<H", body, offset)[0]
+    offset += 2
+    for _ in range(marker_set_count):
+        count, size = struct.unpack_from("<HB", body, offset)
+        offset += 3
+        marker_sets.append((bytes(body[offset:offset + size]).decode(), count))
+        offset += size
+    if marker_sets:
+        total = sum(count for _, count in marker_sets)
+        markers = {space: read(total, 3, True) for space in spaces}
+    assert offset == len(body)
+    return {"magic": magic, "version": version, "precision": precision, "frame_number": frame_number,
+            "timestamp": timestamp, "subjects": subjects, "fresh": fresh.astype(bool), "spaces": data,
+            "marker_sets": marker_sets, "markers": markers}
+
+
+def test_binary_float32_round_trip():
+    frame = make_frame()
+    decoded = parse_ycap(BinaryFrameEncoder("float32").encode(frame))
+    assert decoded["magic"] == WIRE_MAGIC and decoded["version"] == WIRE_VERSION
+    assert decoded["frame_number"] == 12
+    assert decoded["timestamp"] == pytest.approx(0.1)
+    counts = np.diff(frame.subject_offsets).tolist()
+    assert decoded["subjects"] == list(zip(frame.subject_names, frame.subject_kinds.tolist(), counts))
+    assert np.array_equal(decoded["fresh"], frame.subject_fresh)
+    assert list(decoded["spaces"]) == list(frame.spaces)
+    for space, (pos, rot) in frame.spaces.items():
+        assert np.array_equal(decoded["spaces"][space][0], pos)
+        assert np.array_equal(decoded["spaces"][space][1], rot)
+    assert decoded["marker_sets"] == []
+
+
+@pytest.mark.parametrize("precision, pos_tol, rot_tol", [("float16", 0.2, 1e-3), ("int16", 0.02, 1e-4)])
+def test_binary_reduced_precision(precision, pos_tol, rot_tol):
+    # Las posiciones van en cm (Unreal/Maya): la tolerancia es relativa a ese rango
+    frame = make_frame()
+    decoded = parse_ycap(BinaryFrameEncoder(precision).encode(frame))
+    for space, (pos, rot) in frame.spaces.items():
+        np.testing.assert_allclose(decoded["spaces"][space][0], pos, atol=pos_tol)
+        np.testing.assert_allclose(decoded["spaces"][space][1], rot, atol=rot_tol)
+
+
+@pytest.mark.parametrize("precision", ["float32", "int16"])
+def test_binary_markers(precision):
+    frame = make_frame(markers=True)
+    decoded = parse_ycap(BinaryFrameEncoder(precision).encode(frame))
+    names, offsets, marker_spaces = frame.markers
+    assert decoded["marker_sets"] == list(zip(names, np.diff(offsets).tolist()))
+    for space in SPACES:
+        np.testing.assert_allclose(decoded["markers"][space], marker_spaces[space], atol=0.02)
+
+
+def test_binary_occluded_rows_are_not_fresh():
+    frame = make_frame(nan_rate=0.5)
+    decoded = parse_ycap(BinaryFrameEncoder("int16").encode(frame))
+    assert np.array_equal(decoded["fresh"], frame.subject_fresh)
+    for pos, rot in decoded["spaces"].values():
+        assert np.isfinite(pos).all() and np.isfinite(rot).all()
+
+
+def test_table_cache_follows_layout_changes():
+    encoder = BinaryFrameEncoder()
+    first = parse_ycap(encoder.encode(make_frame()))
+    subset = Subscription(["RB_1", "SK_2"], spaces=SPACES).apply(make_frame())
+    second = parse_ycap(encoder.encode(subset))
+    assert [s[0] for s in first["subjects"]] == ["RB_1", "RB_2", "RB_3", "SK_1", "SK_2"]
+    assert [s[0] for s in second["subjects"]] == ["RB_1", "SK_2"]
+
+
+def test_json_matches_payload():
+    frame = make_frame()
+    message = JsonFrameEncoder().encode(frame)
+    assert message.endswith(b"\n")
+    payload = json.loads(message)
+    assert payload["frame_number"] == 12
+    assert set(payload["subjects"]) == set(frame.subject_names)
+    assert payload["subjects"]["RB_1"]["unreal"]["pos"] == pytest.approx(frame.spaces["unreal"][0][0].tolist())
+
+
+def test_model_message():
+    frame = make_frame()
+    binary = encode_model(frame.model, ("binary", "float32"))
+    assert binary[4:8] == MODEL_MAGIC
+    assert json.loads(binary[9:])["subjects"][0]["name"] == "RB_1"
+    line = encode_model(frame.model, ("json", None))
+    assert json.loads(line)["type"] == "model"
+
+
+def test_parse_format_request():
+    assert parse_format_request({}) == ("json", None)
+    assert parse_format_request({"format": "binary"}) == ("binary", "float32")
+    assert parse_format_request({"format": "binary", "precision": "int16"}) == ("binary", "int16")
+    assert parse_format_request({"format": "delta"}) == ("delta", "int16")
+    with pytest.raises(ValueError):
+        parse_format_request({"format": "xml"})
+    with pytest.raises(ValueError):
+        parse_format_request({"format": "binary", "precision": "float64"})